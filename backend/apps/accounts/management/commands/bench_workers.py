@@ -0,0 +1,202 @@
+"""
+Benchmark the ASGI app under 1..N worker processes: does adding workers add throughput?
+
+Daphne is one process and uses one core. gunicorn.conf.py serves the same app
+from several uvicorn workers; this measures what that buys on this box. For
+each worker count it starts the real server — gunicorn, the config in the
+backend directory, a free local port — drives it with keep-alive HTTP clients
+for --seconds, stops it, and reports requests per second, latency
+percentiles, and scaling efficiency against one worker:
+
+    python manage.py bench_workers                          # 1, 2, all cores
+    python manage.py bench_workers --workers 1,2,4 --seconds 20
+    python manage.py bench_workers --path /api/health/ --concurrency 128
+    python manage.py bench_workers --json                   # for a CI diff
+
+Efficiency is rps(n) / (n x rps(1)); near 1.0 is linear. Expect it to fall
+below that when the path is waiting rather than computing — a route that is
+mostly database round trips scales with the database, not the cores — which
+is why the default path is the career path list: served from the catalog
+cache, it is Django and DRF work, the kind one slow request used to hold up
+for everyone.
+
+More than one worker needs REDIS_URL, as in production; the same check the
+server runs (apps/core/worker_mode.py) refuses here before anything starts.
+The load generator runs on this machine too and takes cores of its own, so
+the numbers are a floor: --clients sets how many processes it uses.
+"""
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core import worker_mode
+
+READY_TIMEOUT = 60.0    # seconds for a server to answer its first request
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _drive(port, path, threads, seconds):
+    """One client process: `threads` keep-alive connections for `seconds`."""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def loop():
+        mine, failed = [], 0
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    failed += 1
+                else:
+                    mine.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, errors[0]
+
+
+class Command(BaseCommand):
+    help = 'Measure ASGI throughput and latency under 1..N gunicorn/uvicorn workers.'
+
+    def add_arguments(self, parser):
+        cores = os.cpu_count() or 1
+        parser.add_argument('--workers', default=','.join(str(n) for n in sorted({1, 2, cores})),
+                            help='comma-separated worker counts (default: 1, 2 and one per core)')
+        parser.add_argument('--path', default='/api/learning/career-paths/',
+                            help='GET this path (anonymous) on every request')
+        parser.add_argument('--seconds', type=float, default=10.0, help='measured time per worker count')
+        parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured load first')
+        parser.add_argument('--concurrency', type=int, default=64, help='connections in flight')
+        parser.add_argument('--clients', type=int, default=max(1, min(4, cores // 2)),
+                            help='load generator processes')
+        parser.add_argument('--json', action='store_true', help='print the results as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError('uvicorn is not installed (pip install -r requirements.txt)')
+        try:
+            counts = [int(n) for n in options['workers'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError('--workers takes numbers, e.g. 1,2,4')
+        for count in counts:
+            problems = worker_mode.problems(count)
+            if problems:
+                raise CommandError(f'{count} workers: ' + '; '.join(problems) + ' — set REDIS_URL')
+
+        rows = []
+        for count in counts:
+            row = self.bench(count, options)
+            rows.append(row)
+            if not options['json']:
+                self.stdout.write(
+                    f"  {count:2} worker(s)  {row['rps']:8.0f} req/s  "
+                    f"p50 {row['p50_ms']:6.1f} ms  p99 {row['p99_ms']:6.1f} ms  "
+                    f"errors {row['errors']}")
+
+        base = rows[0]['rps'] / rows[0]['workers'] if rows and rows[0]['rps'] else 0
+        for row in rows:
+            row['efficiency'] = round(row['rps'] / (row['workers'] * base), 2) if base else None
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        self.stdout.write('')
+        for row in rows:
+            self.stdout.write(f"  {row['workers']:2} worker(s)  efficiency {row['efficiency']}")
+
+    def bench(self, count, options):
+        port = _free_port()
+        log = tempfile.TemporaryFile()
+        env = dict(os.environ, WEB_CONCURRENCY=str(count),
+                   DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'))
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'core.asgi:application',
+             '--workers', str(count), '--bind', f'127.0.0.1:{port}',
+             '--max-requests', '0', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=log)
+        try:
+            self.wait_ready(server, log, port, options['path'])
+            clients = max(1, options['clients'])
+            threads = max(1, options['concurrency'] // clients)
+            with ProcessPoolExecutor(clients) as pool:
+                def load(seconds):
+                    return list(pool.map(_drive, [port] * clients, [options['path']] * clients,
+                                         [threads] * clients, [seconds] * clients))
+                load(options['warmup'])
+                started = time.perf_counter()
+                results = load(options['seconds'])
+                elapsed = time.perf_counter() - started
+        finally:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+            log.close()
+
+        latencies = sorted(lat for lats, _ in results for lat in lats)
+        errors = sum(failed for _, failed in results)
+        if not latencies:
+            raise CommandError(f'{count} worker(s): every request failed')
+        return {
+            'workers': count,
+            'requests': len(latencies),
+            'errors': errors,
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 1),
+            'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+        }
+
+    def wait_ready(self, server, log, port, path):
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                log.seek(0)
+                raise CommandError('the server exited on start:\n'
+                                   + log.read().decode(errors='replace')[-2000:])
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', path)
+                conn.getresponse().read()
+                conn.close()
+                return
+            except (OSError, http.client.HTTPException):
+                time.sleep(0.2)
+        raise CommandError(f'the server did not answer within {READY_TIMEOUT:.0f}s')
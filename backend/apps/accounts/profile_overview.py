@@ -10,35 +10,46 @@ work is worse than one that reports nothing.
 The counters are left alone; other code reads them and this is not the place to
 change what writes them. This just stops the profile depending on them.
 
-Cost is a fixed set of counting queries — no per-item work — so it does not grow
-with how much a student has done.
+Cost is a fixed set of counts — no per-item work — so it does not grow with how
+much a student has done. They are independent of each other and are fetched as
+one statement (apps/core/query_bundle.py): one round trip for the lot, plus
+what challenge_progress() needs.
 """
-from django.db.models import Count, Q, Sum
+from django.db.models import Sum
 
+from apps.core import query_bundle as qb
 
-def _learning(user, public=False):
+
+def _learning(user):
     from apps.learning.models import (
         Certificate, Enrollment, Quiz, QuizAttempt, UserProgress,
     )
 
     enrolments = Enrollment.objects.filter(user=user)
     attempts = QuizAttempt.objects.filter(user=user, status='completed')
-    scores = attempts.aggregate(n=Count('id'), best=Sum('score'))
-
-    learning = {
-        'enrolled': enrolments.count(),
-        'completed_paths': enrolments.filter(status='completed').count(),
-        'modules_completed': UserProgress.objects.filter(
-            user=user, is_completed=True).count(),
-        'certificates': Certificate.objects.filter(user=user).count(),
-        'quizzes_available': Quiz.objects.count(),
+    return {
+        'enrolled': qb.count(enrolments),
+        'completed_paths': qb.count(enrolments.filter(status='completed')),
+        'modules_completed': qb.count(UserProgress.objects.filter(
+            user=user, is_completed=True)),
+        'certificates': qb.count(Certificate.objects.filter(user=user)),
+        'quizzes_available': qb.count(Quiz.objects.all()),
+        'quizzes_taken': qb.count(attempts),
+        'score_total': qb.value(attempts, Sum('score'), default=0),
     }
+
+
+def _shape_learning(n, public=False):
+    learning = {key: n[key] for key in (
+        'enrolled', 'completed_paths', 'modules_completed', 'certificates',
+        'quizzes_available')}
     if not public:
         # Marks are between a student and their instructor. Everything else
         # here is the kind of thing a portfolio is for; this is not.
-        learning['quizzes_taken'] = scores['n'] or 0
+        taken = n['quizzes_taken']
+        learning['quizzes_taken'] = taken
         learning['average_score'] = (
-            round((scores['best'] or 0) / scores['n'], 1) if scores['n'] else None)
+            round(n['score_total'] / taken, 1) if taken else None)
     return learning
 
 
@@ -64,37 +75,28 @@ def _projects(user):
     from apps.projects.models import Project, ProjectMembership, ProjectTask
 
     owned = Project.objects.filter(owner=user)
-    member_of = ProjectMembership.objects.filter(user=user, is_active=True)
     tasks = ProjectTask.objects.filter(assigned_to=user)
-    task_counts = tasks.aggregate(
-        total=Count('id'),
-        done=Count('id', filter=Q(status='done')),
-    )
-
     return {
-        'owned': owned.count(),
-        'member_of': member_of.count(),
-        'active': owned.filter(status__in=['planning', 'in_progress']).count(),
-        'completed': owned.filter(status='completed').count(),
-        'tasks_assigned': task_counts['total'] or 0,
-        'tasks_done': task_counts['done'] or 0,
+        'owned': qb.count(owned),
+        'member_of': qb.count(ProjectMembership.objects.filter(user=user, is_active=True)),
+        'active': qb.count(owned.filter(status__in=['planning', 'in_progress'])),
+        'completed': qb.count(owned.filter(status='completed')),
+        'tasks_assigned': qb.count(tasks),
+        'tasks_done': qb.count(tasks.filter(status='done')),
     }
 
 
 def _community(user):
     from apps.community.models import Comment, Post, PostLike, UserFollow
 
-    posts = Post.objects.filter(author=user)
-    # Likes received across their posts — the number that says whether anyone
-    # was reading, which a bare post count does not.
-    likes_received = PostLike.objects.filter(post__author=user).count()
-
     return {
-        'posts': posts.count(),
-        'comments': Comment.objects.filter(author=user).count(),
-        'likes_received': likes_received,
-        'followers': UserFollow.objects.filter(following=user).count(),
-        'following': UserFollow.objects.filter(follower=user).count(),
+        'posts': qb.count(Post.objects.filter(author=user)),
+        'comments': qb.count(Comment.objects.filter(author=user)),
+        # Likes received across their posts — the number that says whether
+        # anyone was reading, which a bare post count does not.
+        'likes_received': qb.count(PostLike.objects.filter(post__author=user)),
+        'followers': qb.count(UserFollow.objects.filter(following=user)),
+        'following': qb.count(UserFollow.objects.filter(follower=user)),
     }
 
 
@@ -105,9 +107,24 @@ def profile_overview(user, public=False):
     between a student and their instructor. The rest — paths finished,
     challenges solved, projects, posts — is what a profile is for.
     """
-    return {
-        'learning': _learning(user, public=public),
-        'challenges': _challenges(user),
+    sections = {
+        'learning': _learning(user),
         'projects': _projects(user),
         'community': _community(user),
     }
+    # Every count in all three sections, as one statement.
+    n = qb.fetch(**{
+        f'{section}__{key}': scalar
+        for section, scalars in sections.items()
+        for key, scalar in scalars.items()
+    })
+    figures = {
+        section: {key: n[f'{section}__{key}'] for key in scalars}
+        for section, scalars in sections.items()
+    }
+    return {
+        'learning': _shape_learning(figures['learning'], public=public),
+        'challenges': _challenges(user),
+        'projects': figures['projects'],
+        'community': figures['community'],
+    }
@@ -10,7 +10,7 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Q
+from django.db.models import Count
 from django.utils import timezone
 
 from .models import User, UserProfile
@@ -625,47 +625,50 @@ class UserStatsAPIView(APIView):
         # The counts are also aggregated rather than summed in Python. The old
         # `sum(p.likes.count() for p in posts)` ran one query per post, which on
         # a database ~250 ms away is seconds of latency for a single number.
-        from django.db.models import Count as _Count
+        from django.db.models import Count as _Count, Sum
+        from apps.core import query_bundle as qb
+        from apps.learning.models import CodingSubmission
 
-        learning = UserProgress.objects.filter(user=user).aggregate(
-            enrolled=_Count('id'),
-            completed=_Count('id', filter=Q(is_completed=True)),
-        )
-        projects = Project.objects.filter(owner=user).aggregate(
-            owned=_Count('id'),
-            completed=_Count('id', filter=Q(status='completed')),
-        )
-        community = Post.objects.filter(author=user).aggregate(
-            posts=_Count('id', distinct=True),
-            likes_received=_Count('likes', distinct=True),
+        progress = UserProgress.objects.filter(user=user)
+        owned = Project.objects.filter(owner=user)
+        # Ten independent figures, fetched as one statement: one round trip
+        # instead of seven.
+        n = qb.fetch(
+            enrolled=qb.count(progress),
+            completed=qb.count(progress.filter(is_completed=True)),
+            certificates=qb.count(UserCertificate.objects.filter(user=user)),
+            # Points earned on accepted coding submissions. This read
+            # `profile.contribution_points`, which nothing ever wrote — so
+            # every figure around it was computed from source and this one was
+            # 0 for everybody. The column is gone as of 0016.
+            points=qb.value(
+                CodingSubmission.objects.filter(user=user, status='accepted'),
+                Sum('points_earned'), default=0),
+            owned=qb.count(owned),
+            member_of=qb.count(ProjectMembership.objects.filter(user=user, is_active=True)),
+            projects_completed=qb.count(owned.filter(status='completed')),
+            posts=qb.count(Post.objects.filter(author=user)),
+            comments=qb.count(Comment.objects.filter(author=user)),
+            likes_received=qb.value(
+                Post.objects.filter(author=user), _Count('likes', distinct=True), default=0),
         )
 
-        # Points earned on accepted coding submissions. This read
-        # `profile.contribution_points`, which nothing ever wrote — so every
-        # figure around it was computed from source and this one was 0 for
-        # everybody. The column is gone as of 0016.
-        from django.db.models import Sum
-        from apps.learning.models import CodingSubmission
-        points = CodingSubmission.objects.filter(
-            user=user, status='accepted',
-        ).aggregate(n=Sum('points_earned'))['n'] or 0
-
         stats = {
             'learning': {
-                'enrolled_courses': learning['enrolled'],
-                'completed_courses': learning['completed'],
-                'certificates': UserCertificate.objects.filter(user=user).count(),
-                'total_points': points,
+                'enrolled_courses': n['enrolled'],
+                'completed_courses': n['completed'],
+                'certificates': n['certificates'],
+                'total_points': n['points'],
             },
             'projects': {
-                'owned': projects['owned'],
-                'member_of': ProjectMembership.objects.filter(user=user, is_active=True).count(),
-                'completed': projects['completed'],
+                'owned': n['owned'],
+                'member_of': n['member_of'],
+                'completed': n['projects_completed'],
             },
             'community': {
-                'posts': community['posts'],
-                'comments': Comment.objects.filter(author=user).count(),
-                'likes_received': community['likes_received'],
+                'posts': n['posts'],
+                'comments': n['comments'],
+                'likes_received': n['likes_received'],
             },
             'profile': {
                 'role': user.role,
@@ -686,16 +689,20 @@ class PublicStatsView(APIView):
         from apps.projects.models import Project, Team
         from apps.community.models import Post
         
-        # Get actual counts - count ALL records, not just active ones
-        stats = {
-            'total_users': User.objects.count(),  # Count all users
-            'total_courses': CareerPath.objects.count(),  # Count all career paths
-            'total_projects': Project.objects.count(),
-            'total_teams': Team.objects.count(),
-            'total_posts': Post.objects.count(),
-            'total_enrollments': Enrollment.objects.count(),
-            'total_modules': LearningModule.objects.count(),
-        }
+        from apps.core import query_bundle as qb
+
+        # Get actual counts - count ALL records, not just active ones. One
+        # statement for all seven: this is the homepage, and each was a round
+        # trip of its own.
+        stats = qb.fetch(
+            total_users=qb.count(User.objects.all()),  # Count all users
+            total_courses=qb.count(CareerPath.objects.all()),  # Count all career paths
+            total_projects=qb.count(Project.objects.all()),
+            total_teams=qb.count(Team.objects.all()),
+            total_posts=qb.count(Post.objects.all()),
+            total_enrollments=qb.count(Enrollment.objects.all()),
+            total_modules=qb.count(LearningModule.objects.all()),
+        )
         
         return Response(stats)
 
@@ -8,3 +8,6 @@ class CommunityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.community'
     verbose_name = 'Community'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (home feed timelines)
@@ -3,11 +3,13 @@ WebSocket consumers for community app
 """
 import json
 
-from asgiref.sync import sync_to_async as database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from apps.core import db_pool
+from apps.core.profiling import ProfiledConsumer
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+
+class NotificationConsumer(ProfiledConsumer, AsyncWebsocketConsumer):
     """Consumer for real-time notifications"""
     
     async def connect(self):
@@ -51,7 +53,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
 
 
-class ChannelConsumer(AsyncWebsocketConsumer):
+class ChannelConsumer(ProfiledConsumer, AsyncWebsocketConsumer):
     """Live updates for one channel.
 
     Community chat has always been HTTP polling — a fixed 3s interval that had to
@@ -130,7 +132,7 @@ class ChannelConsumer(AsyncWebsocketConsumer):
             return None
         return await self._user_from_token(subprotocols[1])
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _user_from_token(self, raw_token):
         from rest_framework_simplejwt.authentication import JWTAuthentication
 
@@ -142,7 +144,7 @@ class ChannelConsumer(AsyncWebsocketConsumer):
             # back to the client.
             return None
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _may_read(self, room_id):
         from .models import ChatRoom
         return ChatRoom.objects.readable_by(self.user).filter(id=room_id).exists()
@@ -0,0 +1,394 @@
+"""
+Home feed timelines, written when a post is made rather than assembled per read.
+
+The feed was one query per page load: own posts, OR followed users' public
+posts, OR followed users' posts in shared organizations, OR every post in the
+viewer's organizations, `.distinct()`, against a database a long round trip
+away. Nothing in it changes between two loads of the same page except the
+posts themselves, so the work is moved to where a post is created.
+
+Each user has a timeline: post ids scored by creation time, newest
+FEED_TIMELINE_LENGTH kept. A new post is pushed onto the timeline of everyone
+who would have matched that query for it (fan_out) — the author, plus the
+author's accepted followers for a public post, or the organization's active
+members for an organization post. Reading a page is then one range read of the
+timeline and one `pk IN (...)` for the rows.
+
+A page is read from a (score, post id) cursor, not a score alone: posts made
+in the same instant share a score, and a strictly-older-than-the-score read
+would skip whichever of them fell past the page boundary. Ties are ordered by
+post id, as a Redis ZSET orders them.
+
+An audience larger than FEED_FANOUT_LIMIT is not written to one timeline at a
+time. Every post also goes on its source's own list (the author's public posts,
+or the organization's), and a source whose audience has ever been that large is
+marked large; readers subscribed to a large source merge its list in at read
+time (fan-out on read). Marking is sticky, so writer and reader never disagree
+about who delivers a post.
+
+A timeline is derived data. It is built from the original query on first read,
+marked as building before that query runs: a post that commits between the
+query and the store would otherwise miss both, its fan-out skipped because
+there was no timeline yet and then overwritten by the snapshot, and the TTL
+that reads keep refreshing would never bring it back. Posts pushed while a
+timeline is building are held aside and merged in when it is stored. It is
+dropped when the user follows, unfollows, joins or leaves (signals.py) so the
+next read rebuilds it, and expires after FEED_TIMELINE_TTL without reads. A
+post deleted after it was delivered is skipped when the page is hydrated.
+
+Timelines live in Redis when there is one (core.shared_redis), shared by every
+web process.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+
+from apps.core import shared_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'feed:'
+LARGE_KEY = 'feed:large'
+SOURCE_LENGTH = 500         # posts kept on each author's and organization's own list
+BUILD_SECONDS = 60          # how long a timeline counts as building, should the build die
+# Ranked mode: how many of the newest posts are ranked, and how fast age wins.
+RANK_WINDOW = 200
+GRAVITY = 1.5
+
+
+def _length() -> int:
+    return max(1, getattr(settings, 'FEED_TIMELINE_LENGTH', 500))
+
+
+def _fanout_limit() -> int:
+    return max(1, getattr(settings, 'FEED_FANOUT_LIMIT', 500))
+
+
+def _ttl() -> int:
+    return max(60, getattr(settings, 'FEED_TIMELINE_TTL', 3 * 86400))
+
+
+class _MemoryFeed:
+    """In-process stand-in for the Redis ZSETs and SETs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._timelines: dict[str, dict[str, float]] = {}
+            self._subs: dict[str, set[str]] = {}
+            self._pending: dict[str, dict[str, float]] = {}     # pushed while building
+            self._sources: dict[str, dict[str, float]] = {}
+            self._large: set[str] = set()
+
+    @staticmethod
+    def _add(zset, mapping, keep):
+        zset.update(mapping)
+        if len(zset) > keep:
+            for member in sorted(zset, key=zset.get)[:len(zset) - keep]:
+                del zset[member]
+
+    @staticmethod
+    def _before(zset, before, n):
+        items = [(s, m) for m, s in zset.items() if before is None or (s, m) < before]
+        return [(m, s) for s, m in heapq.nlargest(n, items)]
+
+    def built(self, uid):
+        return uid in self._subs
+
+    def begin(self, uid):
+        with self._lock:
+            self._pending.setdefault(uid, {})
+
+    def store(self, uid, items, sources):
+        with self._lock:
+            timeline = {}
+            self._add(timeline, {**dict(items), **self._pending.pop(uid, {})}, _length())
+            self._timelines[uid] = timeline
+            self._subs[uid] = set(sources)
+
+    def push(self, uids, post_id, score):
+        with self._lock:
+            for uid in uids:
+                if uid in self._subs:
+                    self._add(self._timelines[uid], {post_id: score}, _length())
+                if uid in self._pending:
+                    self._pending[uid][post_id] = score
+
+    def publish(self, source, post_id, score, large):
+        with self._lock:
+            self._add(self._sources.setdefault(source, {}), {post_id: score}, SOURCE_LENGTH)
+            if large:
+                self._large.add(source)
+
+    def page(self, uid, before, n):
+        with self._lock:
+            lists = [self._before(self._timelines.get(uid, {}), before, n)]
+            for source in self._subs.get(uid, set()) & self._large:
+                lists.append(self._before(self._sources.get(source, {}), before, n))
+            return lists
+
+    def forget(self, uids):
+        with self._lock:
+            for uid in uids:
+                self._timelines.pop(uid, None)
+                self._subs.pop(uid, None)
+                self._pending.pop(uid, None)
+
+
+class _RedisFeed:
+    """A ZSET timeline and a SET of sources per user; a ZSET per source."""
+
+    def __init__(self, client):
+        self.r = client
+
+    def reset(self):
+        keys = list(self.r.scan_iter(f'{KEY_PREFIX}*'))
+        if keys:
+            self.r.delete(*keys)
+
+    @staticmethod
+    def _ids(rows):
+        return [(m.decode() if isinstance(m, bytes) else m, float(s)) for m, s in rows]
+
+    def built(self, uid):
+        return bool(self.r.exists(f'{KEY_PREFIX}subs:{uid}'))
+
+    def begin(self, uid):
+        self.r.set(f'{KEY_PREFIX}building:{uid}', 1, ex=BUILD_SECONDS)
+
+    def store(self, uid, items, sources):
+        # Swapped in whole, so a reader never sees half a timeline. The sources
+        # set always holds a placeholder, so "built" survives following nobody.
+        # What was pushed while this built is merged in the same transaction;
+        # it is left to expire rather than deleted, for a build running beside
+        # this one.
+        timeline, subs = f'{KEY_PREFIX}tl:{uid}', f'{KEY_PREFIX}subs:{uid}'
+        pending = f'{KEY_PREFIX}pending:{uid}'
+        pipe = self.r.pipeline()
+        pipe.delete(timeline, subs)
+        if items:
+            pipe.zadd(timeline, dict(items))
+        pipe.zunionstore(timeline, [timeline, pending], aggregate='MAX')
+        pipe.zremrangebyrank(timeline, 0, -_length() - 1)
+        pipe.expire(timeline, _ttl())
+        pipe.delete(f'{KEY_PREFIX}building:{uid}')
+        pipe.sadd(subs, '-', *sources)
+        pipe.expire(subs, _ttl())
+        pipe.execute()
+
+    def push(self, uids, post_id, score):
+        uids = list(uids)
+        pipe = self.r.pipeline(transaction=False)
+        for uid in uids:
+            pipe.exists(f'{KEY_PREFIX}subs:{uid}')
+            pipe.exists(f'{KEY_PREFIX}building:{uid}')
+        found = pipe.execute()
+        pipe = self.r.pipeline(transaction=False)
+        for uid, built, building in zip(uids, found[::2], found[1::2]):
+            if not (built or building):
+                continue
+            # Straight onto the timeline as well: if the store went first,
+            # this is where the post belongs, and if not the store replaces it.
+            timeline = f'{KEY_PREFIX}tl:{uid}'
+            pipe.zadd(timeline, {post_id: score})
+            pipe.zremrangebyrank(timeline, 0, -_length() - 1)
+            pipe.expire(timeline, _ttl())
+            if building:
+                pending = f'{KEY_PREFIX}pending:{uid}'
+                pipe.zadd(pending, {post_id: score})
+                pipe.expire(pending, BUILD_SECONDS)
+        pipe.execute()
+
+    def publish(self, source, post_id, score, large):
+        pipe = self.r.pipeline(transaction=False)
+        pipe.zadd(f'{KEY_PREFIX}src:{source}', {post_id: score})
+        pipe.zremrangebyrank(f'{KEY_PREFIX}src:{source}', 0, -SOURCE_LENGTH - 1)
+        if large:
+            pipe.sadd(LARGE_KEY, source)
+        pipe.execute()
+
+    @staticmethod
+    def _read(pipe, key, before, n):
+        """Queue the reads for one list: strictly older scores, then the ties."""
+        high = '+inf' if before is None else f'({before[0]!r}'
+        pipe.zrevrangebyscore(key, high, '-inf', start=0, num=n, withscores=True)
+        if before is not None:
+            pipe.zrangebyscore(key, before[0], before[0], withscores=True)
+
+    def _older(self, results, before, n):
+        rows = self._ids(next(results))
+        if before is None:
+            return rows
+        # Same score as the cursor: only the ids below it are still to come.
+        ties = sorted(((m, s) for m, s in self._ids(next(results)) if m < before[1]),
+                      key=lambda item: item[0], reverse=True)
+        return (ties + rows)[:n]
+
+    def page(self, uid, before, n):
+        pipe = self.r.pipeline(transaction=False)
+        self._read(pipe, f'{KEY_PREFIX}tl:{uid}', before, n)
+        pipe.sinter(f'{KEY_PREFIX}subs:{uid}', LARGE_KEY)
+        pipe.expire(f'{KEY_PREFIX}tl:{uid}', _ttl())
+        pipe.expire(f'{KEY_PREFIX}subs:{uid}', _ttl())
+        results = iter(pipe.execute())
+        lists = [self._older(results, before, n)]
+        large = next(results)
+        if large:
+            pipe = self.r.pipeline(transaction=False)
+            for source in large:
+                source = source.decode() if isinstance(source, bytes) else source
+                self._read(pipe, f'{KEY_PREFIX}src:{source}', before, n)
+            results = iter(pipe.execute())
+            lists.extend(self._older(results, before, n) for _ in large)
+        return lists
+
+    def forget(self, uids):
+        keys = [f'{KEY_PREFIX}{kind}:{uid}' for uid in uids
+                for kind in ('tl', 'subs', 'pending', 'building')]
+        if keys:
+            self.r.delete(*keys)
+
+
+_memory = _MemoryFeed()
+
+
+def _feed():
+    r = shared_redis.client()
+    return _memory if r is None else _RedisFeed(r)
+
+
+def fan_out(post) -> None:
+    """Deliver a just-created post to every timeline that would have shown it."""
+    from .models import OrganizationMembership, UserFollow
+
+    try:
+        if post.organization_id:
+            source = f'org:{post.organization_id}'
+            audience = OrganizationMembership.objects.filter(
+                organization_id=post.organization_id, status='active').values_list('user_id')
+        else:
+            source = f'user:{post.author_id}'
+            audience = UserFollow.objects.filter(
+                following_id=post.author_id, status='accepted').values_list('follower_id')
+        limit = _fanout_limit()
+        uids = [str(uid) for (uid,) in audience[:limit + 1]]
+        large = len(uids) > limit
+        score = post.created_at.timestamp()
+        feed = _feed()
+        feed.publish(source, str(post.pk), score, large)
+        # A large audience reads the source list instead; the author always
+        # sees their own post.
+        feed.push([str(post.author_id)] + ([] if large else uids), str(post.pk), score)
+    except Exception as e:
+        logger.warning(f"[FEED] Fan-out failed for post {post.pk}: {e}")
+
+
+def forget(*user_ids) -> None:
+    """Drop these users' timelines; each rebuilds on its next read."""
+    try:
+        _feed().forget([str(uid) for uid in user_ids])
+    except Exception as e:
+        logger.warning(f"[FEED] Could not drop timelines {user_ids}: {e}")
+
+
+def visible_posts(user):
+    """The original feed query: every post this user's home feed shows."""
+    from .models import OrganizationMembership, Post, UserFollow
+
+    following = list(UserFollow.objects.filter(
+        follower=user, status='accepted').values_list('following_id', flat=True))
+    orgs = list(OrganizationMembership.objects.filter(
+        user=user, status='active').values_list('organization_id', flat=True))
+    # A followed user's posts in a shared organization are already in
+    # "every post in my organizations".
+    posts = Post.objects.filter(
+        Q(author=user)
+        | Q(author_id__in=following, organization__isnull=True)
+        | Q(organization_id__in=orgs)
+    )
+    return posts, [f'user:{uid}' for uid in following] + [f'org:{oid}' for oid in orgs]
+
+
+def pinned(user) -> Q:
+    """The pinned posts this user's feed shows, as a filter on Post.
+
+    Subqueries rather than the lists visible_posts() reads first, so the page
+    can fetch them with its own rows in the same query.
+    """
+    from .models import OrganizationMembership, UserFollow
+
+    following = UserFollow.objects.filter(
+        follower=user, status='accepted').values('following_id')
+    orgs = OrganizationMembership.objects.filter(
+        user=user, status='active').values('organization_id')
+    return Q(is_pinned=True) & (
+        Q(author=user)
+        | Q(author_id__in=following, organization__isnull=True)
+        | Q(organization_id__in=orgs)
+    )
+
+
+def _build(feed, user) -> None:
+    # Before the query: from here on a new post is held for this timeline.
+    feed.begin(str(user.pk))
+    posts, sources = visible_posts(user)
+    rows = posts.order_by('-created_at').values_list('id', 'created_at')[:_length()]
+    feed.store(str(user.pk), [(str(pk), created.timestamp()) for pk, created in rows], sources)
+
+
+def page(user, before: tuple[float, str] | None = None,
+         n: int = 20) -> list[tuple[str, float]]:
+    """The next n (post id, score) of this user's feed, newest first.
+
+    `before` is the (score, post id) of the last post already shown.
+    """
+    feed = _feed()
+    if not feed.built(str(user.pk)):
+        _build(feed, user)
+    merged, seen = [], set()
+    for post_id, score in heapq.merge(*feed.page(str(user.pk), before, n),
+                                      key=lambda item: (item[1], item[0]), reverse=True):
+        if post_id not in seen:
+            seen.add(post_id)
+            merged.append((post_id, score))
+        if len(merged) == n:
+            break
+    return merged
+
+
+def ranked(user, now: float | None = None) -> list[str]:
+    """The newest RANK_WINDOW post ids of this user's feed, best first.
+
+    Ranked by the engagement score the feed used to annotate and never sort
+    by — likes, comments twice, a tenth of views — plus one, so a post with
+    nothing yet still ranks by age, over (hours old + 2) ** GRAVITY. One query
+    for the counters of the window; they move too often to keep on a timeline.
+    """
+    from .models import Post
+
+    now = time.time() if now is None else now
+    candidates = [post_id for post_id, _ in page(user, None, RANK_WINDOW)]
+    rows = Post.objects.filter(pk__in=candidates).values_list(
+        'id', 'like_count', 'comment_count', 'view_count', 'created_at')
+
+    def score(row):
+        _, likes, comments, views, created = row
+        hours = max(0.0, now - created.timestamp()) / 3600
+        return (likes + comments * 2 + views / 10 + 1) / math.pow(hours + 2, GRAVITY)
+
+    return [str(row[0]) for row in sorted(rows, key=score, reverse=True)]
+
+
+def reset() -> None:
+    """Drop every timeline and source list. For tests."""
+    _feed().reset()
@@ -0,0 +1,32 @@
+"""
+Keeping home feed timelines (feed.py) in step with the rows they are built from.
+
+Signals rather than calls at each write site: follows and memberships change in
+a dozen places across the follow, invitation and membership views, and a missed
+call would leave someone's feed quietly wrong until it expired.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import feed
+from .models import OrganizationMembership, Post, UserFollow
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, **kwargs):
+    if created:
+        # After commit: a reader must not be handed an id it cannot load yet.
+        transaction.on_commit(lambda: feed.fan_out(instance))
+
+
+@receiver(post_save, sender=UserFollow)
+@receiver(post_delete, sender=UserFollow)
+def follows_changed(sender, instance, **kwargs):
+    feed.forget(instance.follower_id)
+
+
+@receiver(post_save, sender=OrganizationMembership)
+@receiver(post_delete, sender=OrganizationMembership)
+def membership_changed(sender, instance, **kwargs):
+    feed.forget(instance.user_id)
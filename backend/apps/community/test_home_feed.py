@@ -0,0 +1,218 @@
+"""
+The home feed is read from timelines written when posts are created.
+
+What is pinned: it shows exactly what the old query showed, a new post reaches
+a built timeline without a rebuild, a follow or a join is reflected at once, a
+large organization is merged in at read time instead of pushed, pages do not
+overlap or skip posts made in the same instant, and pinned posts open page one.
+"""
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.community import feed
+from apps.community.models import Organization, OrganizationMembership, Post, UserFollow
+
+
+def _user(username):
+    return User.objects.create_user(
+        email=f'{username}@ssct.edu.ph', username=username,
+        password='pw12345678', role='student',
+    )
+
+
+def _org(slug, *members):
+    org = Organization.objects.create(
+        name=slug, slug=slug, description='d', org_type='club', program='ALL',
+        created_by=members[0])
+    for member in members:
+        OrganizationMembership.objects.create(organization=org, user=member, status='active')
+    return org
+
+
+def _ids(response):
+    assert response.status_code == 200, response.data
+    return [row['id'] for row in response.data['results']]
+
+
+@pytest.fixture
+def viewer(db):
+    return _user('viewer')
+
+
+@pytest.fixture
+def client(viewer):
+    api = APIClient()
+    api.force_authenticate(viewer)
+    return api
+
+
+@pytest.mark.django_db
+class TestWhatTheFeedShows:
+    def test_the_same_posts_the_query_showed(self, client, viewer):
+        followed, stranger = _user('followed'), _user('stranger')
+        UserFollow.objects.create(follower=viewer, following=followed, status='accepted')
+        mine = Post.objects.create(author=viewer, content='mine')
+        public = Post.objects.create(author=followed, content='public')
+        in_my_org = Post.objects.create(
+            author=stranger, content='club news', organization=_org('club', viewer, stranger))
+        Post.objects.create(author=stranger, content='not followed')
+        Post.objects.create(author=followed, content='elsewhere',
+                            organization=_org('other', followed))
+
+        assert set(_ids(client.get('/api/community/posts/feed/'))) == {
+            str(mine.id), str(public.id), str(in_my_org.id)}
+
+    def test_a_new_post_reaches_a_built_timeline(
+            self, client, viewer, django_capture_on_commit_callbacks,
+            django_assert_max_num_queries):
+        followed = _user('followed')
+        UserFollow.objects.create(follower=viewer, following=followed, status='accepted')
+        client.get('/api/community/posts/feed/')          # builds the timeline
+        with django_capture_on_commit_callbacks(execute=True):
+            post = Post.objects.create(author=followed, content='fresh')
+
+        # No rebuild: the rows for the page, nothing else.
+        with django_assert_max_num_queries(1):
+            ids = _ids(client.get('/api/community/posts/feed/'))
+        assert ids == [str(post.id)]
+
+    def test_a_post_made_while_the_timeline_is_built_is_not_lost(
+            self, client, viewer, monkeypatch, django_capture_on_commit_callbacks):
+        followed = _user('followed')
+        UserFollow.objects.create(follower=viewer, following=followed, status='accepted')
+        timelines = feed._feed()
+        store = timelines.store
+        made = []
+
+        def store_late(uid, items, sources):
+            # Committed after the build's query, before its result is stored.
+            with django_capture_on_commit_callbacks(execute=True):
+                made.append(Post.objects.create(author=followed, content='in between'))
+            store(uid, items, sources)
+        monkeypatch.setattr(timelines, 'store', store_late)
+
+        assert _ids(client.get('/api/community/posts/feed/')) == [str(made[0].id)]
+        monkeypatch.undo()
+        assert _ids(client.get('/api/community/posts/feed/')) == [str(made[0].id)]
+
+    def test_following_someone_shows_their_earlier_posts_at_once(self, client, viewer):
+        author = _user('author')
+        earlier = Post.objects.create(author=author, content='before the follow')
+        assert _ids(client.get('/api/community/posts/feed/')) == []
+
+        UserFollow.objects.create(follower=viewer, following=author, status='accepted')
+
+        assert _ids(client.get('/api/community/posts/feed/')) == [str(earlier.id)]
+
+    def test_leaving_an_organization_takes_its_posts_out(self, client, viewer):
+        other = _user('other')
+        org = _org('club', other, viewer)
+        Post.objects.create(author=other, content='members only', organization=org)
+        assert len(_ids(client.get('/api/community/posts/feed/'))) == 1
+
+        OrganizationMembership.objects.filter(organization=org, user=viewer).delete()
+
+        assert _ids(client.get('/api/community/posts/feed/')) == []
+
+    def test_a_deleted_post_is_skipped(
+            self, client, viewer, django_capture_on_commit_callbacks):
+        client.get('/api/community/posts/feed/')
+        with django_capture_on_commit_callbacks(execute=True):
+            kept = Post.objects.create(author=viewer, content='kept')
+            gone = Post.objects.create(author=viewer, content='gone')
+        gone.delete()
+
+        assert _ids(client.get('/api/community/posts/feed/')) == [str(kept.id)]
+
+
+@pytest.mark.django_db
+class TestLargeAudiences:
+    def test_a_large_organization_is_read_not_pushed(
+            self, client, viewer, settings, django_capture_on_commit_callbacks):
+        settings.FEED_FANOUT_LIMIT = 2
+        author = _user('author')
+        org = _org('big', author, viewer, _user('third'))
+        client.get('/api/community/posts/feed/')
+        with django_capture_on_commit_callbacks(execute=True):
+            post = Post.objects.create(author=author, content='to everyone', organization=org)
+
+        assert str(post.id) not in feed._memory._timelines[str(viewer.id)]
+        assert _ids(client.get('/api/community/posts/feed/')) == [str(post.id)]
+
+    def test_a_small_organization_is_pushed(
+            self, client, viewer, django_capture_on_commit_callbacks):
+        author = _user('author')
+        org = _org('small', author, viewer)
+        client.get('/api/community/posts/feed/')
+        with django_capture_on_commit_callbacks(execute=True):
+            post = Post.objects.create(author=author, content='hi', organization=org)
+
+        assert str(post.id) in feed._memory._timelines[str(viewer.id)]
+
+
+@pytest.mark.django_db
+class TestPaging:
+    def test_cursor_pages_do_not_overlap_or_skip(self, client, viewer):
+        start = timezone.now()
+        posts = [Post.objects.create(author=viewer, content=f'p{i}') for i in range(25)]
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(created_at=start - timedelta(minutes=i))
+
+        first = client.get('/api/community/posts/feed/')
+        second = client.get(first.data['next'])
+
+        assert len(first.data['results']) == 20
+        assert _ids(first) + _ids(second) == [str(p.id) for p in posts]
+        assert second.data['next'] is None
+
+    def test_posts_made_in_the_same_instant_are_not_skipped_at_a_page_boundary(
+            self, client, viewer):
+        same = timezone.now() - timedelta(hours=1)
+        posts = [Post.objects.create(author=viewer, content=f'p{i}') for i in range(25)]
+        Post.objects.filter(pk__in=[p.pk for p in posts]).update(created_at=same)
+
+        first = client.get('/api/community/posts/feed/')
+        second = client.get(first.data['next'])
+
+        assert sorted(_ids(first) + _ids(second)) == sorted(str(p.id) for p in posts)
+        assert second.data['next'] is None
+
+    def test_pinned_posts_open_the_first_page_only(self, client, viewer):
+        start = timezone.now()
+        posts = [Post.objects.create(author=viewer, content=f'p{i}') for i in range(25)]
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(created_at=start - timedelta(minutes=i))
+        Post.objects.filter(pk=posts[22].pk).update(is_pinned=True)
+        Post.objects.create(author=_user('stranger'), content='not mine', is_pinned=True)
+
+        first = client.get('/api/community/posts/feed/')
+        second = client.get(first.data['next'])
+
+        assert _ids(first)[0] == str(posts[22].id)
+        assert _ids(first) + _ids(second) == [str(posts[22].id)] + [
+            str(p.id) for p in posts if p is not posts[22]]
+
+    def test_a_bad_cursor_is_a_400(self, client):
+        assert client.get('/api/community/posts/feed/?cursor=nope').status_code == 400
+
+    def test_ranked_puts_engagement_ahead_of_age(self, client, viewer):
+        now = timezone.now()
+        quiet = Post.objects.create(author=viewer, content='new, nothing yet')
+        busy = Post.objects.create(author=viewer, content='older, talked about')
+        Post.objects.filter(pk=busy.pk).update(
+            created_at=now - timedelta(hours=3), like_count=40, comment_count=10)
+
+        assert _ids(client.get('/api/community/posts/feed/?order=ranked')) == [
+            str(busy.id), str(quiet.id)]
+        assert _ids(client.get('/api/community/posts/feed/')) == [
+            str(quiet.id), str(busy.id)]
+
+    def test_a_filtered_feed_still_answers(self, client, viewer):
+        question = Post.objects.create(author=viewer, content='?', post_type='question')
+        Post.objects.create(author=viewer, content='text')
+
+        assert _ids(client.get('/api/community/posts/feed/?type=question')) == [str(question.id)]
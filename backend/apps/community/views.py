@@ -8,6 +8,7 @@ from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnl
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.throttling import UserRateThrottle
 from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.utils.urls import replace_query_param
 from django.db.models import Q, F, Value, Exists, OuterRef
 from django.db.models.functions import Greatest
 from django.shortcuts import get_object_or_404
@@ -16,6 +17,7 @@ from django.utils.dateparse import parse_datetime
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import Http404
 
+from . import feed as home_feed
 from .models import (
     Post, Comment, PostLike, CommentLike, PostTag,
     Hashtag, Notification, Report, UserFollow, Badge, UserBadge,
@@ -319,57 +321,79 @@ class PostViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def feed(self, request):
         """
-        Get personalized feed for current user using smart algorithm:
-        - Posts from users you follow (accepted)
-        - Posts from organizations you're a member of
-        - Your own posts
-        - Weighted by recency, engagement, and relevance
+        The signed-in user's home feed: their own posts, public posts from
+        people they follow (accepted), and every post in their organizations.
+
+        Read from a timeline written when the posts were created (feed.py),
+        a page at a time: `next` carries a cursor, the time and id of the last
+        post on the page, so a post arriving meanwhile does not shift what the
+        next page holds. ?order=ranked orders the newest posts by engagement
+        decayed by age instead.
+
+        Pinned posts the viewer can see open the first page, whichever the
+        order, as they did when the feed was a query; the timeline pages then
+        leave them out rather than show them twice.
+
+        The filters the list route takes (?type=, ?author=, ?hashtag=,
+        ?trending=) are not on the timeline, so a filtered feed is still
+        assembled by query, with page numbers.
         """
         if not request.user.is_authenticated:
             # Return general public feed for unauthenticated users
             posts = self.get_queryset().filter(organization__isnull=True)[:20]
-        else:
-            # Get users the current user follows (accepted only)
-            following_users = UserFollow.objects.filter(
-                follower=request.user,
-                status='accepted'
-            ).values_list('following', flat=True)
-            
-            # Get organizations user is a member of
-            user_orgs = OrganizationMembership.objects.filter(
-                user=request.user,
-                status='active'
-            ).values_list('organization', flat=True)
-            
-            # Build smart feed query:
-            # 1. Own posts
-            # 2. Posts from followed users (public or org posts from shared orgs)
-            # 3. Posts from user's organizations
-            posts = self.get_queryset().filter(
-                Q(author=request.user) |  # Own posts
-                Q(author__in=following_users, organization__isnull=True) |  # Followed users' public posts
-                Q(author__in=following_users, organization__in=user_orgs) |  # Followed users' org posts in shared orgs
-                Q(organization__in=user_orgs)  # All posts from user's organizations
-            ).distinct()
-            
-            # Order by smart algorithm: pinned first, then by engagement score + recency
-            # Engagement score = likes + comments*2 + views/10
-            from django.db.models.functions import Now, Extract
-            from datetime import timedelta
-            
-            posts = posts.annotate(
-                engagement_score=F('like_count') + F('comment_count') * 2 + F('view_count') / 10
-            ).order_by('-is_pinned', '-created_at')
-        
-        page = self.paginate_queryset(posts)
-        
-        if page is not None:
+            page = self.paginate_queryset(posts)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+            serializer = self.get_serializer(posts, many=True)
+            return Response(serializer.data)
+
+        if any(request.query_params.get(f) for f in ('type', 'author', 'hashtag', 'trending')):
+            visible, _ = home_feed.visible_posts(request.user)
+            posts = self.get_queryset().filter(pk__in=visible.values('pk')).order_by(
+                '-is_pinned', '-created_at')
+            page = self.paginate_queryset(posts)
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
-        
+
+        size = self.paginator.page_size or 20
+        cursor = request.query_params.get('cursor')
+        try:
+            if request.query_params.get('order') == 'ranked':
+                ids = home_feed.ranked(request.user)
+                start = int(cursor or 0)
+                chunk = ids[start:start + size]
+                next_cursor = start + size if start + size < len(ids) else None
+            else:
+                before = None
+                if cursor:
+                    score, _, post_id = cursor.partition(':')
+                    before = (float(score), post_id)
+                entries = home_feed.page(request.user, before, size + 1)
+                chunk = [post_id for post_id, _ in entries[:size]]
+                last_id, last_score = entries[size - 1] if len(entries) > size else (None, None)
+                next_cursor = None if last_id is None else f'{last_score!r}:{last_id}'
+        except ValueError:
+            raise ValidationError({'cursor': 'Not a cursor from this feed.'})
+        wanted = Q(pk__in=chunk)
+        if not cursor:
+            wanted |= home_feed.pinned(request.user)
+
+        # A post deleted since it was delivered is simply not found here.
+        rows = {str(post.pk): post for post in self._shaped_posts(Post.objects.filter(wanted))}
+        pinned = [] if cursor else sorted(
+            (post for post in rows.values() if post.is_pinned),
+            key=lambda post: post.created_at, reverse=True)
+        posts = pinned + [rows[post_id] for post_id in chunk
+                          if post_id in rows and not rows[post_id].is_pinned]
         serializer = self.get_serializer(posts, many=True)
-        return Response(serializer.data)
-    
+        return Response({
+            'next': None if next_cursor is None else replace_query_param(
+                request.build_absolute_uri(), 'cursor', next_cursor),
+            'previous': None,
+            'results': serializer.data,
+        })
+
     @action(detail=False, methods=['get'])
     def organization_feed(self, request):
         """Get posts from a specific organization ONLY - excludes posts without organization"""
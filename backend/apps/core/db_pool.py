@@ -0,0 +1,103 @@
+"""
+The websocket consumers' database work, on a bounded pool of threads that keep their connections.
+
+Every consumer query went through database_sync_to_async, which is
+thread-sensitive: in a process with no synchronous caller above it, that means
+one shared thread. Every socket's queries, and every sync view's, queued on it
+in turn. When a 60-student room answered together, the last acknowledgement
+waited for 59 other round trips to Postgres to finish first, while the
+database had capacity to spare. Each consumer also held a connection of its
+own, scoped to its task and opened on its first query. That is the ASGI
+behaviour deploy/setup-pgbouncer.sh describes: CONN_MAX_AGE never reuses
+anything.
+
+Django's async ORM methods (aget, acreate, aupdate, async for) do not change
+this in the Django this runs on. Each one is sync_to_async around its sync
+counterpart, onto that same thread. So the consumers keep their synchronous
+ORM code and run it here instead:
+
+  * a fixed pool of CONSUMER_DB_THREADS threads per process, so queries from
+    different sockets run side by side, up to that many at once;
+  * each thread keeps one connection for as long as CONN_MAX_AGE allows. The
+    pool is therefore also a bounded connection pool. Through PgBouncer, a
+    worker process never holds more than CONSUMER_DB_THREADS server
+    connections for its sockets, and never opens one per socket.
+
+Size it so the workers' threads, plus HTTP and Celery, fit PgBouncer's
+default_pool_size. Queries past that wait in PgBouncer, not in a single
+Python thread.
+
+Connections are checked the way database_sync_to_async checks them: one that
+has failed or outlived CONN_MAX_AGE is closed before and after each call.
+Profiling (profiling.py) follows the work onto the thread, so a message's
+queries are still charged to it.
+
+SQLite gets one thread. It allows one writer at a time, and the test suite's
+shared in-memory database fails rather than waits when two collide.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from . import profiling
+
+_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+
+
+def size() -> int:
+    if connections['default'].vendor == 'sqlite':
+        return 1
+    return max(1, getattr(settings, 'CONSUMER_DB_THREADS', 8))
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(size(), thread_name_prefix='consumer-db')
+    return _executor
+
+
+def _call(probe, func, args, kwargs):
+    # The thread's own context, not a copy of the caller's: the connection
+    # Django keeps in it is what lets the next call reuse it.
+    with profiling.charged_to(probe):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """Call func(*args, **kwargs) on the pool and wait for it."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _pool(), _call, profiling.current(), func, args, kwargs)
+
+
+def pooled(func):
+    """Decorator: the async form of a synchronous function, run on the pool.
+
+    Drop-in for @database_sync_to_async; __wrapped__ is the sync original.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+def reset() -> None:
+    """Stop the pool; the next call starts a new one. For tests."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
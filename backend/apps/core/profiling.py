@@ -0,0 +1,392 @@
+"""
+Where the time goes in production, per endpoint, all the time.
+
+measure_queries answers "how many queries, how long" for one endpoint on demand,
+and test_query_counts pins the counts. Neither says which endpoints real
+traffic is waiting on: latency here is mostly query count times a round trip
+of about 250 ms to the database, and which routes are paying that depends on
+who is using what today.
+
+So every HTTP request and every websocket message is measured as it happens:
+
+  * total latency;
+  * queries issued and time spent in them — counted by an execute wrapper on
+    every database connection, which reports to the request that is current
+    in the context (a contextvar, carried onto db_pool's threads, so a
+    consumer's database work is counted against the message that caused it);
+  * cache hits and misses on the default cache.
+
+Each measurement goes into a histogram for its route and minute — a handful of
+integer increments, in one pipelined round trip to Redis (core.shared_redis;
+in process without it). report() sums the last few minutes into
+p50/p95/p99 per route; the admin-only /api/system/performance/ serves it.
+Percentiles are read off fixed buckets, so a p95 of 500 means "at most 500 ms,
+more than 300": good enough to rank endpoints, which is the point.
+
+Buckets older than PROFILING_RETENTION_MINUTES expire on their own. With DEBUG
+on, each response also carries a Server-Timing header, so the browser's network
+panel shows the database and cache share of a slow request.
+"""
+from __future__ import annotations
+
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from apps.core import shared_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'prof:'
+# Upper bounds. The last bucket catches everything above the one before it.
+MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000,
+              3000, 5000, 10000, 30000, float('inf'))
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, float('inf'))
+PERCENTILES = (50, 95, 99)
+
+
+def enabled() -> bool:
+    return getattr(settings, 'PROFILING_ENABLED', True)
+
+
+def _retention() -> int:
+    return max(1, getattr(settings, 'PROFILING_RETENTION_MINUTES', 60))
+
+
+class Probe:
+    """What one request or message has cost so far."""
+    __slots__ = ('started', 'queries', 'db_seconds', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+_current: contextvars.ContextVar[Probe | None] = contextvars.ContextVar('profiling_probe', default=None)
+
+
+# ── instrumentation ──────────────────────────────────────────────────────
+
+def _count_query(execute, sql, params, many, context):
+    probe = _current.get()
+    if probe is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        probe.queries += 1
+        probe.db_seconds += time.perf_counter() - started
+
+
+def _instrument_connection(conn) -> None:
+    if _count_query not in conn.execute_wrappers:
+        conn.execute_wrappers.append(_count_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _instrument_connection(connection)
+
+
+connection_created.connect(_on_connection_created, dispatch_uid='profiling_count_queries')
+
+_MISS = object()
+
+
+def _instrument_cache(backend) -> None:
+    """Count hits and misses on this cache instance (one per thread or task)."""
+    if getattr(backend, '_profiled', False):
+        return
+    get, get_many = backend.get, backend.get_many
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, _MISS, version=version)
+        probe = _current.get()
+        if probe is not None:
+            if value is _MISS:
+                probe.cache_misses += 1
+            else:
+                probe.cache_hits += 1
+        return default if value is _MISS else value
+
+    def counted_get_many(keys, version=None):
+        keys = list(keys)
+        found = get_many(keys, version=version)
+        probe = _current.get()
+        if probe is not None:
+            probe.cache_hits += len(found)
+            probe.cache_misses += len(keys) - len(found)
+        return found
+
+    backend.get, backend.get_many = counted_get, counted_get_many
+    backend._profiled = True
+
+
+def start() -> tuple[Probe, contextvars.Token]:
+    """Begin measuring; everything until finish() is charged to this probe."""
+    _instrument_connection(connection)
+    _instrument_cache(caches['default'])
+    probe = Probe()
+    return probe, _current.set(probe)
+
+
+def finish(token: contextvars.Token, route: str, probe: Probe, *, error: bool = False) -> None:
+    _current.reset(token)
+    try:
+        _store().record(_minute(), route, probe.elapsed_ms(), probe, error)
+    except Exception as e:
+        logger.warning(f"[PROFILING] Could not record {route}: {e}")
+
+
+def current() -> Probe | None:
+    """The probe being charged in this context, if any."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def charged_to(probe: Probe | None):
+    """Charge work done in this block — on another thread, say — to `probe`."""
+    if probe is not None:
+        _instrument_connection(connection)
+    token = _current.set(probe)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def _minute(at: float | None = None) -> int:
+    return int((time.time() if at is None else at) // 60)
+
+
+def _bucket(edges, value) -> int:
+    return bisect.bisect_left(edges, value)
+
+
+def _fields(latency_ms, probe, error) -> dict[str, float]:
+    fields = {
+        'n': 1,
+        f'lat:{_bucket(MS_BUCKETS, latency_ms)}': 1,
+        f'q:{_bucket(QUERY_BUCKETS, probe.queries)}': 1,
+        f'db:{_bucket(MS_BUCKETS, probe.db_seconds * 1000)}': 1,
+        'sum_ms': latency_ms,
+        'queries': probe.queries,
+        'cache_hits': probe.cache_hits,
+        'cache_misses': probe.cache_misses,
+    }
+    if error:
+        fields['errors'] = 1
+    return fields
+
+
+# ── storage ──────────────────────────────────────────────────────────────
+
+class _MemoryProfile:
+    """In-process stand-in: minute -> route -> counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._minutes: dict[int, dict[str, Counter]] = defaultdict(lambda: defaultdict(Counter))
+
+    def record(self, minute, route, latency_ms, probe, error):
+        with self._lock:
+            self._minutes[minute][route].update(_fields(latency_ms, probe, error))
+            for old in [m for m in self._minutes if m <= minute - _retention()]:
+                del self._minutes[old]
+
+    def read(self, minutes):
+        with self._lock:
+            merged: dict[str, Counter] = defaultdict(Counter)
+            for minute in minutes:
+                for route, counts in self._minutes.get(minute, {}).items():
+                    merged[route].update(counts)
+            return merged
+
+
+class _RedisProfile:
+    """A HASH of counters per route and minute, and a SET of the minute's routes."""
+
+    def __init__(self, client):
+        self.r = client
+
+    def reset(self):
+        keys = list(self.r.scan_iter(f'{KEY_PREFIX}*'))
+        if keys:
+            self.r.delete(*keys)
+
+    def record(self, minute, route, latency_ms, probe, error):
+        key, routes = f'{KEY_PREFIX}{minute}:{route}', f'{KEY_PREFIX}{minute}:routes'
+        ttl = (_retention() + 1) * 60
+        pipe = self.r.pipeline(transaction=False)
+        for field, value in _fields(latency_ms, probe, error).items():
+            if isinstance(value, float):
+                pipe.hincrbyfloat(key, field, value)
+            else:
+                pipe.hincrby(key, field, value)
+        pipe.expire(key, ttl)
+        pipe.sadd(routes, route)
+        pipe.expire(routes, ttl)
+        pipe.execute()
+
+    def read(self, minutes):
+        pipe = self.r.pipeline(transaction=False)
+        for minute in minutes:
+            pipe.smembers(f'{KEY_PREFIX}{minute}:routes')
+        keys = [f'{KEY_PREFIX}{minute}:{route.decode() if isinstance(route, bytes) else route}'
+                for minute, routes in zip(minutes, pipe.execute()) for route in routes]
+        for key in keys:
+            pipe.hgetall(key)
+        merged: dict[str, Counter] = defaultdict(Counter)
+        for key, counts in zip(keys, pipe.execute()):
+            route = key.split(':', 2)[2]
+            merged[route].update({
+                (f.decode() if isinstance(f, bytes) else f): float(v) for f, v in counts.items()})
+        return merged
+
+
+_memory = _MemoryProfile()
+
+
+def _store():
+    r = shared_redis.client()
+    return _memory if r is None else _RedisProfile(r)
+
+
+# ── reading ──────────────────────────────────────────────────────────────
+
+def _percentile(counts: Counter, prefix: str, edges, p: float):
+    n = counts.get('n', 0)
+    if not n:
+        return None
+    seen, target = 0, p / 100 * n
+    for i, edge in enumerate(edges):
+        seen += counts.get(f'{prefix}:{i}', 0)
+        if seen >= target:
+            return None if edge == float('inf') else edge
+    return None
+
+
+def report(minutes: int = 15, now: float | None = None) -> list[dict]:
+    """Every route seen in the last `minutes`, the most total time first."""
+    minutes = max(1, min(minutes, _retention()))
+    current = _minute(now)
+    merged = _store().read([current - i for i in range(minutes)])
+    rows = []
+    for route, counts in merged.items():
+        n = int(counts.get('n', 0))
+        if not n:
+            continue
+        row = {
+            'route': route,
+            'count': n,
+            'total_ms': round(counts.get('sum_ms', 0), 1),
+            'mean_ms': round(counts.get('sum_ms', 0) / n, 1),
+            'mean_queries': round(counts.get('queries', 0) / n, 1),
+            'cache_hits': int(counts.get('cache_hits', 0)),
+            'cache_misses': int(counts.get('cache_misses', 0)),
+            'errors': int(counts.get('errors', 0)),
+        }
+        for p in PERCENTILES:
+            row[f'p{p}_ms'] = _percentile(counts, 'lat', MS_BUCKETS, p)
+            row[f'p{p}_queries'] = _percentile(counts, 'q', QUERY_BUCKETS, p)
+            row[f'p{p}_db_ms'] = _percentile(counts, 'db', MS_BUCKETS, p)
+        rows.append(row)
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+def reset() -> None:
+    """Forget every measurement. For tests."""
+    _store().reset()
+
+
+# ── HTTP ─────────────────────────────────────────────────────────────────
+
+def route_of(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    pattern = match.route.replace('^', '').replace('$', '') if match else '<unmatched>'
+    return f'{request.method} /{pattern}'
+
+
+class ProfilingMiddleware:
+    """Charge each request's latency, queries and cache use to its route.
+
+    First in MIDDLEWARE, so the latency is what the client waited for, less
+    the network.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+        probe, token = start()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            error = response is None or response.status_code >= 500
+            if response is not None and settings.DEBUG:
+                response['Server-Timing'] = (
+                    f'db;dur={probe.db_seconds * 1000:.1f};desc="{probe.queries} queries", '
+                    f'cache;desc="{probe.cache_hits} hits {probe.cache_misses} misses", '
+                    f'total;dur={probe.elapsed_ms():.1f}')
+            finish(token, route_of(request), probe, error=error)
+
+
+# ── websockets ───────────────────────────────────────────────────────────
+
+class ProfiledConsumer:
+    """Mixin for a Channels consumer: each message received is one measurement,
+    charged to "WS <Consumer>.<message type>".
+
+    Message types come from the client, so only the ones the consumer handles
+    name a route — MESSAGE_TYPES, declared next to its receive(). Any other
+    type is "other", and one without a type is "message": a socket sending
+    made-up types cannot grow the report or push real types out of it.
+    """
+
+    MESSAGE_TYPES: frozenset = frozenset()
+
+    async def websocket_receive(self, message):
+        if not enabled():
+            return await super().websocket_receive(message)
+        kind = None
+        try:
+            kind = json.loads(message.get('text') or '{}').get('type')
+        except (ValueError, AttributeError):
+            pass
+        if not kind:
+            kind = 'message'
+        elif kind not in self.MESSAGE_TYPES:
+            kind = 'other'
+        probe, token = start()
+        failed = True
+        try:
+            result = await super().websocket_receive(message)
+            failed = False
+            return result
+        finally:
+            finish(token, f'WS {type(self).__name__}.{kind}', probe, error=failed)
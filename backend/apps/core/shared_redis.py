@@ -0,0 +1,32 @@
+"""
+The Redis connection behind state that every worker has to share.
+
+Leaderboard boards, presence, buffered answers, lab slots and queues, home
+timelines and profiling buckets each keep their data in Redis when the default
+cache is django_redis, so every web process and worker sees the same thing.
+Without it — local development, the test suite — each module falls back to an
+in-process store of its own with the same semantics, which is only as shared
+as the process: all a dev server has.
+
+client() is that choice, made once here rather than in each of them.
+"""
+from __future__ import annotations
+
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def client():
+    """The default cache's Redis connection, or None when there is no Redis to use."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if 'django_redis' not in backend:
+        return None
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception as e:
+        logger.warning(f"[REDIS] Unavailable, keeping shared state in-process: {e}")
+        return None
@@ -0,0 +1,98 @@
+"""
+The consumers' database pool: bounded, reused, and transparent to its callers.
+
+What is pinned: calls from different sockets run side by side up to the pool's
+size and no further; the pool's threads are reused rather than started per
+call; a pooled method still has its sync original under __wrapped__ (the live
+quiz tests call it directly); errors come back to the awaiting coroutine; and
+queries made on the pool are charged to the message that caused them.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from apps.accounts.models import User
+from apps.core import db_pool, profiling
+
+
+@pytest.fixture
+def pool_of(monkeypatch):
+    def make(n):
+        db_pool.reset()
+        monkeypatch.setattr(db_pool, 'size', lambda: n)
+    yield make
+    db_pool.reset()
+
+
+def test_calls_run_side_by_side_up_to_the_pool_size(pool_of):
+    pool_of(3)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    async def scenario():
+        await asyncio.gather(*(db_pool.run(work) for _ in range(9)))
+
+    asyncio.run(scenario())
+    assert peak[0] == 3
+
+
+def test_threads_are_reused_across_calls(pool_of):
+    pool_of(2)
+
+    async def scenario():
+        return {await db_pool.run(threading.get_ident) for _ in range(10)}
+
+    assert len(asyncio.run(scenario())) <= 2
+
+
+def test_sqlite_gets_one_thread():
+    assert db_pool.size() == 1
+
+
+class Thing:
+    @db_pool.pooled
+    def double(self, n):
+        """Twice n."""
+        if n < 0:
+            raise ValueError('negative')
+        return n * 2
+
+
+def test_pooled_keeps_the_sync_original_and_raises_to_the_caller():
+    thing = Thing()
+    assert Thing.double.__wrapped__(thing, 4) == 8
+    assert Thing.double.__doc__ == 'Twice n.'
+    assert asyncio.run(thing.double(5)) == 10
+    with pytest.raises(ValueError):
+        asyncio.run(thing.double(-1))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_queries_on_the_pool_are_charged_to_the_callers_probe():
+    User.objects.create_user(username='pooled', email='pooled@ssct.edu.ph', password='x')
+
+    async def scenario():
+        probe, token = profiling.start()
+        try:
+            users = await db_pool.run(lambda: list(User.objects.values_list('username', flat=True)))
+            seen = await db_pool.run(profiling.current)
+        finally:
+            profiling._current.reset(token)
+        return probe, users, seen
+
+    probe, users, seen = asyncio.run(scenario())
+    assert users == ['pooled']
+    assert probe.queries == 1
+    assert seen is probe
+    # Nothing is left charged to it on the pool thread afterwards.
+    assert asyncio.run(db_pool.run(profiling.current)) is None
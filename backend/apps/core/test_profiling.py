@@ -0,0 +1,152 @@
+"""
+Live per-route profiling: what a request or websocket message cost, by route.
+
+The numbers themselves are the environment's; what is pinned is that every
+request is charged to its route pattern (not its URL, or the report would have
+a row per post), that queries and cache use are attributed to the request that
+caused them — including database_sync_to_async work in a consumer — and that
+only admins can read the report.
+"""
+import asyncio
+import json
+
+import pytest
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.testing import WebsocketCommunicator
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core import profiling
+from apps.core.profiling import ProfiledConsumer
+
+
+def _client(role='admin'):
+    user = User.objects.create_user(
+        username=f'prof_{role}', email=f'prof_{role}@ssct.edu.ph', password='x',
+        role=role, is_staff=role == 'admin')
+    api = APIClient()
+    api.force_authenticate(user)
+    return api
+
+
+def _row(route):
+    rows = {row['route']: row for row in profiling.report()}
+    assert route in rows, sorted(rows)
+    return rows[route]
+
+
+@pytest.mark.django_db
+class TestHttp:
+    def test_a_request_is_charged_to_its_route_pattern(self):
+        api = _client()
+        from apps.community.models import Post
+        posts = [Post.objects.create(author=User.objects.get(), content=f'p{i}') for i in range(2)]
+        for post in posts:
+            api.get(f'/api/community/posts/{post.id}/')
+
+        row = [r for r in profiling.report() if r['route'].startswith('GET /api/community/')]
+        assert len(row) == 1, 'one row for the pattern, not one per post'
+        assert row[0]['count'] == 2
+        assert row[0]['mean_queries'] > 0
+        assert row[0]['p50_ms'] is not None
+
+    def test_cache_hits_and_misses_are_counted(self):
+        api = _client()
+        api.get('/api/system/health/')      # computes and caches
+        api.get('/api/system/health/')      # served from the cache
+
+        row = _row('GET /api/system/health/')
+        assert row['cache_misses'] >= 1
+        assert row['cache_hits'] >= 1
+
+    def test_an_unknown_url_does_not_get_a_row_of_its_own(self):
+        api = _client()
+        api.get('/api/no-such-thing/1/')
+        api.get('/api/no-such-thing/2/')
+
+        assert _row('GET /<unmatched>')['count'] == 2
+
+    def test_server_timing_is_sent_only_in_debug(self, settings):
+        api = _client()
+        assert 'Server-Timing' not in api.get('/api/system/health/')
+
+        settings.DEBUG = True
+        header = api.get('/api/system/health/')['Server-Timing']
+        assert header.startswith('db;dur=') and 'total;dur=' in header
+
+    def test_it_can_be_switched_off(self, settings):
+        settings.PROFILING_ENABLED = False
+        _client().get('/api/system/health/')
+
+        assert profiling.report() == []
+
+
+@pytest.mark.django_db
+class TestTheReport:
+    def test_only_admins_can_read_it(self):
+        assert _client('student').get('/api/system/performance/').status_code == 403
+
+        response = _client().get('/api/system/performance/?minutes=5')
+        assert response.status_code == 200
+        assert response.data['minutes'] == 5
+
+    def test_percentiles_come_from_the_buckets(self):
+        probe = profiling.Probe()
+        for latency in [3] * 90 + [400] * 9 + [2500]:
+            profiling._memory.record(profiling._minute(), 'GET /x', latency, probe, False)
+
+        row = _row('GET /x')
+        assert (row['p50_ms'], row['p95_ms'], row['p99_ms']) == (5, 500, 500)
+        assert row['count'] == 100
+
+    def test_old_minutes_fall_out_of_the_window(self):
+        probe = profiling.Probe()
+        profiling._memory.record(profiling._minute() - 30, 'GET /old', 10, probe, False)
+        profiling._memory.record(profiling._minute(), 'GET /new', 10, probe, False)
+
+        assert [row['route'] for row in profiling.report(15)] == ['GET /new']
+
+
+class Counting(ProfiledConsumer, AsyncWebsocketConsumer):
+    MESSAGE_TYPES = frozenset({'submit_answer'})
+
+    async def receive(self, text_data=None, bytes_data=None):
+        await database_sync_to_async(lambda: User.objects.count())()
+        await self.send(text_data='ok')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_a_websocket_message_is_charged_with_its_queries():
+    async def scenario():
+        socket = WebsocketCommunicator(Counting.as_asgi(), '/ws/test/')
+        await socket.connect()
+        for _ in range(3):
+            await socket.send_to(text_data='{"type": "submit_answer"}')
+            assert await socket.receive_from() == 'ok'
+        await socket.disconnect()
+
+    asyncio.run(scenario())
+
+    row = _row('WS Counting.submit_answer')
+    assert row['count'] == 3
+    assert row['mean_queries'] == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_message_types_the_consumer_does_not_handle_are_other():
+    async def scenario():
+        socket = WebsocketCommunicator(Counting.as_asgi(), '/ws/test/')
+        await socket.connect()
+        for n in range(40):
+            await socket.send_to(text_data=json.dumps({'type': f'made-up-{n}'}))
+            assert await socket.receive_from() == 'ok'
+        await socket.send_to(text_data='{"type": "submit_answer"}')
+        assert await socket.receive_from() == 'ok'
+        await socket.disconnect()
+
+    asyncio.run(scenario())
+
+    routes = {row['route'] for row in profiling.report(15)}
+    assert routes == {'WS Counting.other', 'WS Counting.submit_answer'}
+    assert _row('WS Counting.other')['count'] == 40
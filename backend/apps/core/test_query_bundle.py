@@ -0,0 +1,86 @@
+"""
+query_bundle: independent aggregates as one statement, with the same answers.
+
+Pinned: fetch() is one query however many figures it is given; each figure is
+what count() or aggregate() would have returned for the same queryset —
+filters, conditional aggregates and joins included, and converted to the same
+Python type; and an aggregate over nothing gives its default, not None.
+"""
+from decimal import Decimal
+
+import pytest
+from django.db.models import Avg, Count, Q, Sum
+
+from apps.accounts.models import User
+from apps.core import query_bundle as qb
+from apps.learning.models import CareerPath, LearningModule, Quiz, QuizAttempt
+
+
+def _user(name, role='student', **extra):
+    return User.objects.create_user(
+        username=name, email=f'{name}@ssct.edu.ph', password='x', role=role, **extra)
+
+
+def _attempts(user, *scores):
+    path = CareerPath.objects.create(
+        name='Bundle', slug='bundle', description='d', program_type='BSIT',
+        difficulty_level='beginner', estimated_duration=4)
+    module = LearningModule.objects.create(career_path=path, title='M', description='d', order=0)
+    quiz = Quiz.objects.create(learning_module=module, title='Q', description='d')
+    for score in scores:
+        QuizAttempt.objects.create(user=user, quiz=quiz, score=score, status='completed')
+
+
+@pytest.mark.django_db
+def test_many_figures_are_one_query(django_assert_num_queries):
+    _user('b1')
+    _user('b2', role='instructor')
+    _user('b3', is_active=False)
+    users = User.objects.all()
+
+    with django_assert_num_queries(1):
+        n = qb.fetch(
+            users=qb.count(users),
+            students=qb.count(users.filter(role='student')),
+            active=qb.count(users.filter(is_active=True)),
+            instructors=qb.value(users, Count('id', filter=Q(role='instructor'))),
+        )
+
+    assert n == {'users': 3, 'students': 2, 'active': 2, 'instructors': 1}
+
+
+@pytest.mark.django_db
+def test_figures_match_aggregate_including_their_type():
+    student = _user('scorer')
+    _attempts(student, Decimal('80.50'), Decimal('61.00'))
+    attempts = QuizAttempt.objects.filter(status='completed')
+
+    n = qb.fetch(
+        total=qb.value(attempts, Sum('score')),
+        average=qb.value(attempts, Avg('score')),
+        passed=qb.count(attempts.filter(score__gte=70)),
+        joined=qb.count(attempts.filter(quiz__learning_module__career_path__slug='bundle')),
+    )
+
+    expected = attempts.aggregate(total=Sum('score'), average=Avg('score'))
+    assert n['total'] == expected['total'] == Decimal('141.50')
+    assert isinstance(n['total'], Decimal)
+    assert n['average'] == expected['average']
+    assert (n['passed'], n['joined']) == (1, 2)
+
+
+@pytest.mark.django_db
+def test_an_aggregate_over_nothing_is_its_default(django_assert_num_queries):
+    nothing = QuizAttempt.objects.filter(score__gt=100)
+
+    with django_assert_num_queries(1):
+        n = qb.fetch(
+            count=qb.count(nothing),
+            total=qb.value(nothing, Sum('score'), default=0),
+            average=qb.value(nothing, Avg('score')),
+            # Querysets Django knows are empty are never sent at all.
+            none=qb.count(QuizAttempt.objects.none()),
+            no_ids=qb.value(QuizAttempt.objects.filter(id__in=[]), Sum('score'), default=0),
+        )
+
+    assert n == {'count': 0, 'total': 0, 'average': None, 'none': 0, 'no_ids': 0}
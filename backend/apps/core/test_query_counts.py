@@ -503,3 +503,59 @@ class QueryCountInvarianceTests(TestCase):
             lambda: self._add_users(2),
             lambda: self._add_users(4, offset=2),
         )
+
+
+class DashboardRoundTripTests(TestCase):
+    """
+    The dashboards' single-number figures must stay one statement.
+
+    These endpoints return no lists, so there are no rows for the count to grow
+    with and the invariance check above cannot catch anything. What grows is the
+    number of figures: each new count() or aggregate() is another round trip,
+    and they were at seven to twenty-five each before query_bundle collapsed
+    them. So here the count IS pinned. If a figure is added, add it to the
+    bundle; only a genuinely new kind of query (a grouped breakdown, a list)
+    should move these numbers.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='rt_admin', email='rt_admin@ssct.edu.ph',
+            password='x', role='admin', is_staff=True,
+        )
+        UserProfile.objects.create(user=self.admin)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def assert_queries(self, url, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, f'{url} -> {response.status_code}')
+
+    def test_user_stats(self):
+        self.assert_queries('/api/auth/stats/', 1)
+
+    def test_public_stats(self):
+        self.assert_queries('/api/auth/public-stats/', 1)
+
+    def test_profile_overview(self):
+        # One for every count, five for challenge_progress (grouped and dated
+        # breakdowns, and the recent submissions themselves).
+        self.assert_queries('/api/auth/profile/overview/', 6)
+
+    def test_public_profile_overview(self):
+        # Plus looking the user up.
+        self.assert_queries(f'/api/auth/user/{self.admin.id}/overview/', 7)
+
+    def test_admin_analytics(self):
+        # One for every figure; the other fifteen are the grouped breakdowns
+        # and the instructor and student lists.
+        self.assert_queries('/api/admin/analytics/', 16)
+
+    def test_ai_mentor_system_stats(self):
+        from django.core.cache import cache
+        from apps.ai_mentor.services.data_context_service import DataContextService
+
+        cache.delete('ai_mentor_platform_stats')
+        with self.assertNumQueries(1):
+            DataContextService().get_system_stats()
@@ -0,0 +1,49 @@
+"""
+Every store that has a Redis and an in-process form picks between them here.
+"""
+import django_redis
+
+from apps.community import feed
+from apps.core import profiling, shared_redis
+from apps.lab import scheduler, slots
+from apps.learning import answer_buffer, leaderboard_index, presence
+
+REDIS_CACHE = {'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': 'redis://x'}}
+
+
+def test_a_cache_that_is_not_redis_has_no_client():
+    assert shared_redis.client() is None
+
+
+def test_a_redis_that_cannot_be_reached_has_no_client(settings, monkeypatch):
+    settings.CACHES = REDIS_CACHE
+
+    def refuse(alias):
+        raise ConnectionError('no route to host')
+    monkeypatch.setattr(django_redis, 'get_redis_connection', refuse)
+
+    assert shared_redis.client() is None
+
+
+def test_every_store_follows_the_client(monkeypatch):
+    selectors = [
+        (feed._feed, feed._RedisFeed),
+        (profiling._store, profiling._RedisProfile),
+        (scheduler._scheduler, scheduler._RedisScheduler),
+        (slots._slots, slots._RedisSlots),
+        (answer_buffer._buffer, answer_buffer._RedisBuffer),
+        (leaderboard_index._boards, leaderboard_index._RedisBoards),
+        (presence._store, presence._RedisPresence),
+    ]
+    assert [select() for select, _ in selectors] == [
+        feed._memory, profiling._memory, scheduler._memory, slots._memory,
+        answer_buffer._memory, leaderboard_index._memory, presence._memory]
+
+    connection = object()
+    with monkeypatch.context() as patch:
+        patch.setattr(shared_redis, 'client', lambda: connection)
+        stores = [select() for select, _ in selectors]
+
+    for store, (_, redis_store) in zip(stores, selectors):
+        assert isinstance(store, redis_store)
+        assert store.r is connection
@@ -0,0 +1,42 @@
+"""
+Several ASGI workers are refused when they would not share state.
+
+Nothing fails loudly when four workers each have their own in-memory channel
+layer — broadcasts just stop reaching three quarters of the room — so the
+refusal is the only warning there is.
+"""
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from apps.core import worker_mode
+
+REDIS_LAYER = {'default': {'BACKEND': 'channels_redis.core.RedisChannelLayer'}}
+REDIS_CACHE = {'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': 'redis://x'}}
+
+
+def test_one_worker_runs_on_anything():
+    worker_mode.refuse_unsafe(1)
+
+
+def test_several_workers_on_in_memory_backends_are_refused():
+    with pytest.raises(ImproperlyConfigured) as refused:
+        worker_mode.refuse_unsafe(4)
+
+    assert 'channel layer' in str(refused.value)
+    assert 'cache' in str(refused.value)
+
+
+def test_each_backend_is_checked_on_its_own(settings):
+    settings.CHANNEL_LAYERS = REDIS_LAYER
+    assert len(worker_mode.problems(2)) == 1
+
+    settings.CACHES = REDIS_CACHE
+    assert worker_mode.problems(2) == []
+
+
+def test_the_configured_count_is_the_default(settings):
+    settings.ASGI_WORKERS = 3
+    assert worker_mode.problems()
+
+    settings.ASGI_WORKERS = 1
+    assert worker_mode.problems() == []
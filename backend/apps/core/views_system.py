@@ -6,6 +6,7 @@ from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
 from rest_framework import status
+from django.conf import settings as django_settings
 from django.db import connection
 from django.core.cache import cache
 from django.utils import timezone
@@ -165,6 +166,35 @@ def system_health(request):
     return Response(health_data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def system_performance(request):
+    """
+    The hottest endpoints and websocket messages, from live traffic
+
+    GET /api/system/performance/?minutes=15
+    Returns: {
+        "minutes": 15,
+        "routes": [{"route": "GET /api/...", "count": 120, "p95_ms": 500,
+                    "p95_queries": 8, "p95_db_ms": 300, ...}, ...]
+    }
+    Routes are ordered by total time spent in them. Percentiles are bucket
+    upper bounds (apps/core/profiling.py).
+    """
+    from apps.core import profiling
+
+    try:
+        minutes = int(request.query_params.get('minutes', 15))
+    except ValueError:
+        return Response({'error': 'minutes must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    minutes = max(1, min(minutes, getattr(django_settings, 'PROFILING_RETENTION_MINUTES', 60)))
+    return Response({
+        'enabled': profiling.enabled(),
+        'minutes': minutes,
+        'routes': profiling.report(minutes),
+    })
+
+
 def check_database_connection():
     """Check if database is accessible"""
     try:
@@ -0,0 +1,63 @@
+"""
+Running the ASGI application in more than one process.
+
+One Daphne process serves every page and every socket, so one CPU-heavy
+request — a certificate render, a PDF extraction, a synchronous code run —
+holds up all of them. Several worker processes (gunicorn with uvicorn
+workers, configured by gunicorn.conf.py) spread that over the cores.
+
+That is only correct when nothing a consumer relies on lives in one process.
+Everything that must be seen by every worker is in the channel layer or the
+default cache: group broadcasts, quiz presence (presence.py), room state and
+the active question (live_state.py), buffered answers (answer_buffer.py), lab
+terminal slots (apps/lab/slots.py), run queues (apps/lab/scheduler.py).
+What stays per process is either a copy checked against a shared version or
+owned by the process outright (the warm container pool holds its pipes).
+
+With the in-memory channel layer or LocMemCache each worker would have its own
+— a student on one worker never receiving the instructor's broadcast from
+another, a room's presence split four ways — and nothing would fail loudly.
+So the app refuses to start that way: refuse_unsafe() runs when core.asgi is
+imported, and gunicorn.conf.py runs it before forking a single worker.
+
+The worker count is ASGI_WORKERS (WEB_CONCURRENCY, the variable gunicorn and
+uvicorn both read for their default). gunicorn.conf.py exports the count it
+actually starts, so a --workers on the command line is seen too.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def workers() -> int:
+    return max(1, getattr(settings, 'ASGI_WORKERS', 1))
+
+
+def problems(count: int | None = None) -> list[str]:
+    """Why `count` workers (default: the configured number) would not share state."""
+    count = workers() if count is None else count
+    if count <= 1:
+        return []
+    found = []
+    layer = settings.CHANNEL_LAYERS.get('default', {}).get('BACKEND', '')
+    if not layer or layer.endswith('InMemoryChannelLayer'):
+        found.append(
+            'the channel layer is in-memory, so a group message reaches only the '
+            'sockets on the worker that sent it')
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith(('LocMemCache', 'DummyCache')):
+        found.append(
+            'the default cache is per process, so presence, room state and lab '
+            'slots would be counted separately by each worker')
+    return found
+
+
+def refuse_unsafe(count: int | None = None) -> None:
+    """Raise ImproperlyConfigured if `count` workers cannot share state."""
+    count = workers() if count is None else count
+    found = problems(count)
+    if found:
+        raise ImproperlyConfigured(
+            f'refusing to run {count} ASGI workers: ' + '; and '.join(found)
+            + '. Set REDIS_URL, or run a single worker (WEB_CONCURRENCY=1).')
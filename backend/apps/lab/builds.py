@@ -0,0 +1,194 @@
+"""
+The build step for compiled languages in the lab terminal, cached by source.
+
+A C++ or Java run is two containers: a compile, then the interactive run of
+what it produced. Students press Run over and over on code they have not
+changed — to try another input, or because the first run was stopped — and a
+compile on half a CPU is seconds each time. So the build output is kept,
+keyed by a hash of everything that decides it (image, compiler argv, file
+name, source), and an unchanged program goes straight to the run.
+
+The compile container carries every bound the run does (sandbox.build_argv,
+from the same list), plus BUILD_SECONDS of its own. Only its output directory
+is writable, and the run mounts that directory read-only, so a program cannot
+change the binary the next run of the same source will use.
+
+Cache layout: one directory per hash under LAB_BUILD_CACHE_DIR, shared by
+every worker on the box. A build happens in a private temporary directory and
+is renamed into place only when it succeeded, so a reader never sees half an
+output and two students building the same code at once both end up with one
+entry. Past LAB_BUILD_CACHE_ENTRIES the least recently used entries go — but
+only ones no run can still be using. A run mounts its build for up to
+WALL_CLOCK_SECONDS after the lookup that returned it, and deleting the
+directory under it would take the binary out of a running program; so an
+entry used more recently than IN_USE_SECONDS stays, even if the cache is over
+its limit for a while. An entry being evicted is renamed out of the cache
+first, so a lookup never finds one half deleted. A failed compile is not
+cached: fixing the error is what the student does next.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from . import sandbox
+
+logger = logging.getLogger(__name__)
+
+_ENTRY = re.compile(r'^[0-9a-f]{64}$')
+STALE_SECONDS = 3600        # a temporary build directory this old was abandoned
+# How long after a lookup a run may still have the build mounted: the whole
+# session, plus a margin for starting the container.
+IN_USE_SECONDS = sandbox.WALL_CLOCK_SECONDS + 60
+
+
+@dataclass
+class Build:
+    ok: bool
+    directory: str | None   # the build output, for container_argv's host_dir
+    output: str             # what the compiler printed
+    cached: bool = False
+    code: int | None = None
+
+
+def cache_root() -> str:
+    return (getattr(settings, 'LAB_BUILD_CACHE_DIR', '')
+            or os.path.join(tempfile.gettempdir(), 'codehub_lab_builds'))
+
+
+def key(language: str, code: str) -> str:
+    spec = sandbox.runtime(language)
+    return hashlib.sha256(json.dumps(
+        [spec.image, spec.build, spec.filename, code]).encode('utf-8')).hexdigest()
+
+
+def cached(language: str, code: str) -> str | None:
+    """The build output for this exact source, if it is already built."""
+    path = os.path.join(cache_root(), key(language, code))
+    if not os.path.isdir(path):
+        return None
+    try:
+        os.utime(path)          # recently used: last to be evicted
+    except OSError:
+        return None             # evicted between the check and now
+    return path
+
+
+async def build(language: str, code: str, *, name: str) -> Build:
+    """Compile `code` in a bounded container named `name`, or reuse the last build of it.
+
+    Cancelling this (the student pressed Stop) kills the compile and leaves
+    nothing behind.
+    """
+    hit = cached(language, code)
+    if hit:
+        return Build(ok=True, directory=hit, output='', cached=True)
+
+    spec = sandbox.runtime(language)
+    root = cache_root()
+    os.makedirs(root, exist_ok=True)
+    digest = key(language, code)
+    work = tempfile.mkdtemp(prefix=f'{digest[:12]}.', dir=root)
+    source, out = os.path.join(work, 'src'), os.path.join(work, 'out')
+    os.mkdir(source)
+    os.mkdir(out)
+    with open(os.path.join(source, spec.filename), 'w', encoding='utf-8') as handle:
+        handle.write(code)
+    os.chmod(work, 0o755)
+    os.chmod(source, 0o755)
+    os.chmod(out, 0o755)
+
+    process = None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *sandbox.build_argv(language, source_dir=source, out_dir=out, name=name),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        try:
+            printed, _ = await asyncio.wait_for(process.communicate(), sandbox.BUILD_SECONDS)
+        except asyncio.TimeoutError:
+            await _kill(name)
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            return Build(ok=False, directory=None,
+                         output='[stopped — compiling took too long]\n')
+        output = printed[:sandbox.OUTPUT_BYTES].decode('utf-8', 'replace')
+        if process.returncode != 0:
+            return Build(ok=False, directory=None, output=output, code=process.returncode)
+
+        final = os.path.join(root, digest)
+        try:
+            os.rename(out, final)
+        except OSError:
+            pass            # built at the same moment by someone else; theirs is identical
+        os.utime(final)     # used now, by the run this returns to
+        _evict(root)
+        return Build(ok=True, directory=final, output=output)
+    except asyncio.CancelledError:
+        if process is not None and process.returncode is None:
+            await _kill(name)
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+        raise
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+async def _kill(name: str) -> None:
+    try:
+        killer = await asyncio.create_subprocess_exec(
+            *sandbox.kill_argv(name),
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        await asyncio.wait_for(killer.wait(), timeout=10)
+    except Exception:
+        logger.warning('could not kill build container %s', name)
+
+
+def _evict(root: str) -> None:
+    """Keep the newest LAB_BUILD_CACHE_ENTRIES builds, less any still in use; drop
+    abandoned temporaries."""
+    limit = max(1, getattr(settings, 'LAB_BUILD_CACHE_ENTRIES', 200))
+    entries, now = [], time.time()
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            used = os.stat(path).st_mtime
+        except OSError:
+            continue
+        if _ENTRY.match(name):
+            entries.append((used, path))
+        elif now - used > STALE_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+    entries.sort(reverse=True)
+    for used, path in entries[limit:]:
+        if now - used > IN_USE_SECONDS:
+            _discard(path)
+
+
+def _discard(path: str) -> None:
+    """Take an entry out of the cache, then delete it — unless it was used meanwhile."""
+    doomed = f'{path}.evicted.{os.getpid()}'
+    try:
+        os.rename(path, doomed)
+    except OSError:
+        return              # evicted by another worker already
+    try:
+        # A lookup that touched it between our stat and the rename has just
+        # handed it to a run: put it back.
+        if time.time() - os.stat(doomed).st_mtime <= IN_USE_SECONDS:
+            os.rename(doomed, path)
+            return
+    except OSError:
+        pass                # rebuilt in the meantime; this copy is not needed
+    shutil.rmtree(doomed, ignore_errors=True)
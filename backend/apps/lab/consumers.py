@@ -14,8 +14,13 @@ has already been asked.
 Every container is built by apps/lab/sandbox.py, which cannot produce one
 without resource limits. That is not belt-and-braces: an unbounded container
 took this site down.
+
+C++ and Java compile first, in a container of their own with the same bounds
+(builds.py). The compile runs as a task rather than inside receive(), so Stop
+and a closed tab still reach it, and an unchanged program skips it entirely.
 """
 import asyncio
+import codecs
 import json
 import logging
 import os
@@ -23,24 +28,35 @@ import shutil
 import tempfile
 import uuid
 
-from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.core.cache import cache
 
-from . import sandbox
+from apps.core import db_pool
+from apps.core.profiling import ProfiledConsumer
+
+from . import builds, container_pool, sandbox, slots
 
 logger = logging.getLogger(__name__)
 
 # How many containers may exist at once across the whole box. Two cores, and
 # the sandbox gives each run half of one; past this the room is better served
-# by a queue than by everyone sharing a stalled machine.
+# by a queue than by everyone sharing a stalled machine. Counted across every
+# worker process (slots.py).
 MAX_CONCURRENT = 8
-CONCURRENCY_KEY = 'lab:containers:running'
 
+# Output is sent in frames of at most FRAME_BYTES, each holding whatever the
+# program printed in the FRAME_SECONDS after its first byte, and a terminal is
+# sent no more than OUTPUT_RATE bytes a second once OUTPUT_BURST is spent.
+FRAME_BYTES = 4096
+FRAME_SECONDS = 0.05
+OUTPUT_RATE = 16 * 1024
+OUTPUT_BURST = 32 * 1024
 
-class LabTerminalConsumer(AsyncWebsocketConsumer):
+
+class LabTerminalConsumer(ProfiledConsumer, AsyncWebsocketConsumer):
     """One student's terminal, for the life of one browser tab."""
 
+    MESSAGE_TYPES = frozenset({'run', 'stdin', 'stop'})
+
     async def connect(self):
         self.lab_id = self.scope['url_route']['kwargs']['lab_id']
         self.user = self.scope.get('user')
@@ -49,6 +65,9 @@ class LabTerminalConsumer(AsyncWebsocketConsumer):
         self.workdir = None
         self.pump = None
         self.watchdog = None
+        self.starting = None        # a compile in progress
+        self.slot = None            # the lease token while a run holds a slot
+        self.stats = None
 
         if self.user is None or not self.user.is_authenticated:
             await self.close(code=4401)
@@ -59,6 +78,8 @@ class LabTerminalConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
         await self._send('ready', {})
+        # A terminal was opened, so a Run is coming: have a container waiting.
+        container_pool.fill()
 
     async def disconnect(self, code):
         # A closed tab must not leave a container running. This is the path
@@ -78,30 +99,94 @@ class LabTerminalConsumer(AsyncWebsocketConsumer):
             await self._write_stdin(message.get('data', ''))
         elif kind == 'stop':
             await self._stop_process()
-            await self._send('exit', {'code': None, 'stopped': True})
+            await self._exit(None, stopped=True)
 
     # ── running ──────────────────────────────────────────────────────────
 
     async def _run(self, language: str, code: str):
         await self._stop_process()          # Run replaces whatever was running
+        self.stats = None
 
         if not code.strip():
             await self._send('error', {'detail': 'There is no code to run.'})
             return
 
         try:
-            argv, workdir, name = await self._prepare(language, code)
+            spec = sandbox.runtime(language)
         except sandbox.UnsupportedLanguage as exc:
             await self._send('error', {'detail': str(exc)})
             return
 
-        if not self._take_slot():
-            shutil.rmtree(workdir, ignore_errors=True)
+        token = uuid.uuid4().hex
+        if not await db_pool.run(slots.acquire, token, MAX_CONCURRENT):
             await self._send('error', {
                 'detail': 'The lab is busy. Try again in a moment.'})
             return
+        self.slot = token
+
+        # From here on the slot is held: whatever fails before the program is
+        # running must give it back, or it stays taken until its lease runs out.
+        try:
+            if spec.build:
+                self.starting = asyncio.create_task(self._build_and_start(language, code))
+                return
+
+            warm = await container_pool.claim(language)
+            if warm is not None:
+                try:
+                    await warm.feed(code, spec.filename)
+                except Exception:
+                    # Died between the claim and now; a cold start below instead.
+                    logger.warning('warm container %s would not take its code', warm.name)
+                    await warm.kill()
+                    warm = None
+
+            if warm is not None:
+                self.workdir, self.container, self.process = warm.directory, warm.name, warm.process
+                await self._attach()
+            else:
+                workdir, name = await self._prepare(language, code)
+                self.workdir, self.container = workdir, name
+                await self._launch(sandbox.container_argv(language, host_dir=workdir, name=name))
+        except Exception:
+            logger.exception('could not start a lab program')
+            await self._cleanup()
+            await self._send('error', {'detail': 'Could not start the runtime.'})
+
+    async def _build_and_start(self, language: str, code: str):
+        """Compile (or find the last compile of) `code`, then run what it built.
+
+        The compile's container is this terminal's container while it runs,
+        so Stop kills it by name like any other. A failed compile ends the run
+        the way a failed program does: its output, then exit with its code.
+        """
+        self.container = f'lab_build_{uuid.uuid4().hex[:12]}'
+        if not builds.cached(language, code):
+            await self._send('output', {'data': '[compiling…]\n'})
+        try:
+            result = await builds.build(language, code, name=self.container)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('could not build a lab program')
+            await self._cleanup()
+            await self._send('error', {'detail': 'Could not start the compiler.'})
+            return
 
-        self.workdir, self.container = workdir, name
+        if result.output:
+            await self._send('output', {'data': result.output})
+        if not result.ok:
+            await self._cleanup()
+            await self._exit(result.code)
+            return
+
+        # The build directory belongs to the cache, so there is no workdir of
+        # ours to remove afterwards.
+        name = f'lab_{uuid.uuid4().hex[:12]}'
+        self.container = name
+        await self._launch(sandbox.container_argv(language, host_dir=result.directory, name=name))
+
+    async def _launch(self, argv: list[str]):
         try:
             self.process = await asyncio.create_subprocess_exec(
                 *argv,
@@ -109,52 +194,107 @@ class LabTerminalConsumer(AsyncWebsocketConsumer):
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.STDOUT,
             )
-        except Exception as exc:
+        except Exception:
             logger.exception('could not start a lab container')
-            self._release_slot()
-            shutil.rmtree(workdir, ignore_errors=True)
+            await self._cleanup()
             await self._send('error', {'detail': 'Could not start the runtime.'})
             return
+        await self._attach()
 
+    async def _attach(self):
+        self.stats = {'bytes': 0, 'frames': 0, 'throttled_seconds': 0.0}
         await self._send('started', {})
         self.pump = asyncio.create_task(self._pump_output())
         self.watchdog = asyncio.create_task(self._watchdog())
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _is_participant(self) -> bool:
         from .models import LabParticipant
         return LabParticipant.objects.filter(
             lab_id=self.lab_id, student=self.user).exists()
 
     async def _prepare(self, language: str, code: str):
+        """A directory holding the source, for a container started cold."""
+        runtime = sandbox.runtime(language)
         workdir = tempfile.mkdtemp(prefix='lab_')
-        runtime = sandbox.RUNTIMES.get(language)
-        if runtime is None:
-            # Ask sandbox to raise, so the message stays in one place.
-            sandbox.container_argv(language, host_dir=workdir, name='x')
         source = os.path.join(workdir, runtime.filename)
         with open(source, 'w', encoding='utf-8') as handle:
             handle.write(code)
         os.chmod(workdir, 0o755)
-        name = f'lab_{uuid.uuid4().hex[:12]}'
-        return sandbox.container_argv(language, host_dir=workdir, name=name), workdir, name
+        return workdir, f'lab_{uuid.uuid4().hex[:12]}'
 
     async def _pump_output(self):
-        """Stream output as it appears, not when the process ends."""
-        sent = 0
+        """Stream output as it appears, in frames, no faster than a terminal is read.
+
+        Relaying every read as its own message meant `while True: print(i)` sent
+        thousands of frames of a few bytes each, and every one of them was work
+        for the event loop that also serves every other terminal and quiz on
+        the box. So reads are coalesced: a frame goes out when FRAME_BYTES have
+        gathered or FRAME_SECONDS after its first byte, whichever is first — a
+        prompt still appears at once to a human, a flood becomes 20 frames a
+        second.
+
+        Past OUTPUT_BURST the terminal gets OUTPUT_RATE bytes a second, and the
+        pump waits rather than reads. That wait is the backpressure: the pipe
+        fills, and the program blocks in print() instead of the server
+        buffering for it. The student sees "[output throttled]" once, so a
+        slow loop is not mistaken for a slow program.
+
+        What this terminal was sent goes out with `exit` (stats) and to the log.
+        """
+        loop = asyncio.get_running_loop()
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        stats = self.stats
+        pending = bytearray()
+        deadline = None
+        tokens, refilled = OUTPUT_BURST, loop.time()
+        throttled = False
+        eof = False
         try:
-            while True:
-                chunk = await self.process.stdout.read(1024)
-                if not chunk:
-                    break
-                sent += len(chunk)
-                if sent > sandbox.OUTPUT_BYTES:
+            while not eof:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                try:
+                    chunk = await asyncio.wait_for(
+                        self.process.stdout.read(FRAME_BYTES - len(pending)), timeout)
+                except asyncio.TimeoutError:
+                    chunk = None        # the frame's time is up; nothing was lost
+                if chunk == b'':
+                    eof = True
+                elif chunk:
+                    if not pending:
+                        deadline = loop.time() + FRAME_SECONDS
+                    pending += chunk
+                    self.last_activity = loop.time()
+                if not pending or not (
+                        eof or len(pending) >= FRAME_BYTES or loop.time() >= deadline):
+                    continue
+
+                frame = bytes(pending)
+                pending.clear()
+                deadline = None
+                if stats['bytes'] + len(frame) > sandbox.OUTPUT_BYTES:
+                    frame = frame[:sandbox.OUTPUT_BYTES - stats['bytes']]
+                    await self._frame(decoder.decode(frame, final=True), len(frame))
                     await self._send('output', {
                         'data': '\n[output truncated — this program prints too much]\n'})
                     await self._stop_process()
+                    await self._exit(None, stopped=True)
                     return
-                self.last_activity = asyncio.get_event_loop().time()
-                await self._send('output', {'data': chunk.decode('utf-8', 'replace')})
+
+                now = loop.time()
+                tokens = min(OUTPUT_BURST, tokens + (now - refilled) * OUTPUT_RATE)
+                refilled = now
+                if tokens < len(frame):
+                    if not throttled:
+                        throttled = True
+                        await self._send('output', {'data': '\n[output throttled]\n'})
+                    wait = (len(frame) - tokens) / OUTPUT_RATE
+                    stats['throttled_seconds'] += wait
+                    await asyncio.sleep(wait)
+                    tokens, refilled = len(frame), loop.time()
+                tokens -= len(frame)
+                await self._frame(decoder.decode(frame, final=eof), len(frame))
+                self.last_activity = loop.time()
         except asyncio.CancelledError:
             raise
         except Exception:
@@ -162,7 +302,20 @@ class LabTerminalConsumer(AsyncWebsocketConsumer):
 
         code = await self.process.wait() if self.process else None
         await self._cleanup()
-        await self._send('exit', {'code': code})
+        await self._exit(code)
+
+    async def _frame(self, text: str, size: int):
+        self.stats['bytes'] += size
+        self.stats['frames'] += 1
+        if text:
+            await self._send('output', {'data': text})
+
+    async def _exit(self, code, **extra):
+        stats = self.stats or {}
+        logger.info('lab terminal %s: %s bytes in %s frames, throttled %.1fs',
+                    self.lab_id, stats.get('bytes', 0), stats.get('frames', 0),
+                    stats.get('throttled_seconds', 0.0))
+        await self._send('exit', {'code': code, **extra, 'stats': stats})
 
     async def _watchdog(self):
         """End a session that has stopped being one.
@@ -178,16 +331,20 @@ class LabTerminalConsumer(AsyncWebsocketConsumer):
                 await asyncio.sleep(5)
                 if self.process is None or self.process.returncode is not None:
                     return
+                if self.slot:
+                    await db_pool.run(slots.renew, self.slot)
                 now = asyncio.get_event_loop().time()
                 if now - started > sandbox.WALL_CLOCK_SECONDS:
                     await self._send('output', {
                         'data': '\n[stopped — this run hit the time limit]\n'})
                     await self._stop_process()
+                    await self._exit(None, stopped=True)
                     return
                 if now - self.last_activity > sandbox.IDLE_SECONDS:
                     await self._send('output', {
                         'data': '\n[stopped — nothing happened for a while]\n'})
                     await self._stop_process()
+                    await self._exit(None, stopped=True)
                     return
         except asyncio.CancelledError:
             raise
@@ -205,11 +362,22 @@ class LabTerminalConsumer(AsyncWebsocketConsumer):
     # ── stopping ─────────────────────────────────────────────────────────
 
     async def _stop_process(self):
+        if self.starting:
+            self.starting.cancel()
+            if not self.starting.done():
+                # Let the compile kill its container before we look at ours.
+                await asyncio.wait([self.starting])
+            self.starting = None
+        # The pump and the watchdog stop runs themselves. Cancelling the task
+        # doing the stopping would end it at the next await, before the kill.
+        current = asyncio.current_task()
         if self.watchdog:
-            self.watchdog.cancel()
+            if self.watchdog is not current:
+                self.watchdog.cancel()
             self.watchdog = None
         if self.pump:
-            self.pump.cancel()
+            if self.pump is not current:
+                self.pump.cancel()
             self.pump = None
         if self.container:
             # Kill the container, not the client. Killing the client is what
@@ -225,34 +393,15 @@ class LabTerminalConsumer(AsyncWebsocketConsumer):
         await self._cleanup()
 
     async def _cleanup(self):
-        if self.process is not None:
-            self.process = None
-            self._release_slot()
+        self.process = None
+        if self.slot:
+            token, self.slot = self.slot, None
+            await db_pool.run(slots.release, token)
         if self.container:
             self.container = None
         if self.workdir:
             shutil.rmtree(self.workdir, ignore_errors=True)
             self.workdir = None
 
-    # ── concurrency ──────────────────────────────────────────────────────
-
-    def _take_slot(self) -> bool:
-        try:
-            running = cache.incr(CONCURRENCY_KEY)
-        except ValueError:
-            cache.add(CONCURRENCY_KEY, 1, 3600)
-            running = cache.get(CONCURRENCY_KEY) or 1
-        if running > MAX_CONCURRENT:
-            self._release_slot()
-            return False
-        return True
-
-    def _release_slot(self):
-        try:
-            if (cache.get(CONCURRENCY_KEY) or 0) > 0:
-                cache.decr(CONCURRENCY_KEY)
-        except ValueError:
-            pass
-
     async def _send(self, kind: str, payload: dict):
         await self.send(text_data=json.dumps({'type': kind, **payload}))
@@ -0,0 +1,200 @@
+"""
+Warm containers for the lab terminal.
+
+Pressing Run started a container from nothing: `docker run` creates it, sets
+up its namespaces and cgroup, mounts the source and starts the interpreter,
+and only then does the program print. That start is most of the time to first
+output — a second or more for a program that answers in milliseconds.
+
+A warm container is one started ahead of time with exactly the same bounds
+(sandbox.warm_argv, built from the same lists as container_argv): its own
+empty host directory mounted read-only at /src, and a loader waiting on stdin
+(sandbox.bootstrap). Run claims one, writes the source into that directory,
+sends the loader its line, and from then on it is that run's process: output
+is pumped, stdin is the student's, Stop kills it by name, and the directory is
+removed with the run's.
+
+Each container serves exactly one run. It is `--rm`, so when the program
+exits or is killed it is gone, and nothing a student's program did is seen by
+the next one. Every claim starts a replacement in the background, so the next
+Run finds one ready.
+
+LAB_WARM_CONTAINERS idle containers per runtime are kept per worker process —
+the pool holds their stdin pipes, which cannot be shared between processes. An
+idle container is a shell blocked in `read`, a few MB of the memory limit it
+will be allowed, and it does not count against MAX_CONCURRENT until it is
+claimed. If the worker dies, the pipes close, `read` sees end of input and the
+container exits and removes itself; no sweeper is needed.
+
+Interpreted runtimes only: a compiled run starts from its build (builds.py).
+
+Off (0) by default. With no warm container available — the pool is off, or
+was just emptied by a class pressing Run together, or docker is not there —
+the consumer starts a container the old way, so the pool can change how fast
+a run starts, never whether it does.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+
+from django.conf import settings
+
+from . import sandbox
+
+logger = logging.getLogger(__name__)
+
+# After a container fails to start, how long to leave the pool empty rather
+# than retry on every claim (a missing image or daemon is not fixed in seconds).
+BACKOFF_SECONDS = 60
+
+
+class Warm:
+    """One started container waiting for its code."""
+
+    def __init__(self, name, process, directory):
+        self.name = name
+        self.process = process
+        # Mounted at /src. Once claimed, the run removes it like a cold workdir.
+        self.directory = directory
+
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def feed(self, code: str, filename: str):
+        """Hand the container its program; it starts running when this returns."""
+        with open(os.path.join(self.directory, filename), 'w', encoding='utf-8') as handle:
+            handle.write(code)
+        self.process.stdin.write(b'\n')
+        await self.process.stdin.drain()
+
+    async def kill(self):
+        try:
+            killer = await asyncio.create_subprocess_exec(
+                *sandbox.kill_argv(self.name),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+            await asyncio.wait_for(killer.wait(), timeout=10)
+        except Exception:
+            logger.warning('could not kill warm container %s', self.name)
+        if self.process.returncode is None:
+            self.process.kill()
+        await self.process.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# language -> idle containers. The subprocesses belong to the event loop that
+# started them, so the pool is tied to one (a worker has exactly one).
+_idle: dict[str, list[Warm]] = {}
+_starting: dict[str, int] = {}
+_tasks: set = set()         # starts in flight, so drain() can wait for them
+_loop = None
+_failed_at = None
+
+
+def size() -> int:
+    return max(0, getattr(settings, 'LAB_WARM_CONTAINERS', 0))
+
+
+def _warmable() -> list[str]:
+    # A compiled run starts from its build output, which no container can
+    # hold before the code exists.
+    return [lang for lang, spec in sandbox.RUNTIMES.items() if not spec.build]
+
+
+def _argv(language: str, name: str, directory: str) -> list[str]:
+    return sandbox.warm_argv(language, host_dir=directory, name=name)
+
+
+def _bind_loop():
+    global _loop
+    loop = asyncio.get_running_loop()
+    if loop is not _loop:
+        # A new loop (tests; a restarted worker) cannot use the old pipes.
+        _idle.clear()
+        _starting.clear()
+        _tasks.clear()
+        _loop = loop
+    return loop
+
+
+async def claim(language: str) -> Warm | None:
+    """A started container for `language`, now the caller's; None to start one cold."""
+    if not size() or language not in _warmable():
+        return None
+    _prune(language, _bind_loop())
+    idle = _idle.get(language) or []
+    warm = idle.pop(0) if idle else None
+    fill(language)
+    return warm
+
+
+def fill(language: str | None = None) -> None:
+    """Top the pool up in the background, for one runtime or all of them."""
+    if not size():
+        return
+    loop = _bind_loop()
+    for lang in ([language] if language else _warmable()):
+        _prune(lang, loop)
+        if _failed_at is not None and loop.time() - _failed_at < BACKOFF_SECONDS:
+            return
+        missing = size() - len(_idle[lang]) - _starting.get(lang, 0)
+        for _ in range(max(0, missing)):
+            _starting[lang] = _starting.get(lang, 0) + 1
+            task = loop.create_task(_start(lang))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+
+
+def _prune(language: str, loop) -> None:
+    global _failed_at
+    idle = _idle.setdefault(language, [])
+    if any(not w.alive() for w in idle):
+        # Exited before anyone claimed it: a missing image, a daemon that
+        # refused. Starting more would only fail the same way.
+        for w in idle:
+            if not w.alive():
+                shutil.rmtree(w.directory, ignore_errors=True)
+        idle[:] = [w for w in idle if w.alive()]
+        _failed_at = loop.time()
+        logger.warning(f'a warm {language} container exited while idle; backing off')
+
+
+async def _start(language: str) -> None:
+    global _failed_at
+    name = f'lab_warm_{uuid.uuid4().hex[:12]}'
+    directory = tempfile.mkdtemp(prefix='lab_')
+    os.chmod(directory, 0o755)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *_argv(language, name, directory),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+    except Exception as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        _failed_at = asyncio.get_running_loop().time()
+        logger.warning(f'could not start a warm {language} container: {e}')
+        return
+    finally:
+        _starting[language] = max(0, _starting.get(language, 0) - 1)
+    _failed_at = None
+    _idle.setdefault(language, []).append(Warm(name, process, directory))
+
+
+def ready(language: str) -> int:
+    """How many warm containers for `language` are ready now."""
+    return sum(1 for w in _idle.get(language, []) if w.alive())
+
+
+async def drain() -> None:
+    """Kill every idle container. For tests and shutdown."""
+    global _failed_at
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    warm = [w for ws in _idle.values() for w in ws]
+    _idle.clear()
+    _starting.clear()
+    _failed_at = None
+    await asyncio.gather(*(w.kill() for w in warm))
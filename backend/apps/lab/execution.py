@@ -15,16 +15,19 @@ again supersedes the previous one rather than adding to the queue. That alone
 caps the queue at the number of students in the room.
 
 **An honest wait.** A spinner with no information is what makes people click
-again. A deli-counter ticket gives the student a number that goes down, which
-is the difference between "slow" and "broken".
+again. A queue position gives the student a number that goes down, which is
+the difference between "slow" and "broken", and an ETA says how long that is.
+
+Which run is served next, and so what the position is, is apps/lab/scheduler.py.
 """
 import time
 import uuid
 
 from django.core.cache import cache
 
+from . import scheduler
+
 RUN_TTL = 600           # seconds a finished run stays readable
-TICKET_TTL = 3600
 QUEUED, RUNNING, DONE, SUPERSEDED = 'queued', 'running', 'done', 'superseded'
 
 
@@ -36,37 +39,13 @@ def _inflight_key(participant_id) -> str:
     return f'lab:inflight:{participant_id}'
 
 
-def _ticket_key(lab_id) -> str:
-    return f'lab:ticket:{lab_id}'
-
-
-def _served_key(lab_id) -> str:
-    return f'lab:served:{lab_id}'
-
-
-def _next(key: str) -> int:
-    """Atomic increment that also works on a cold key.
-
-    `cache.incr` raises ValueError when the key is missing, which is the state
-    every lab starts in. `cache.add` is the atomic part: it returns False if
-    another request created the key first, and that caller then increments
-    normally rather than both believing they hold ticket 1.
+def start(*, lab_id, participant_id, language, code, stdin='',
+          problem_id=None, purpose='run', user_id=None) -> dict:
+    """Book a run and supersede whatever that student had in flight.
 
-    An earlier version seeded the key and then incremented it, so the first
-    caller returned 1 while leaving the counter at 2 — every lab silently
-    skipped a ticket and every queue position after it was one too high.
+    `lab_id` names the queue the run waits in. Coding challenges share this
+    bookkeeping with one queue of their own (learning/challenge_grading.py).
     """
-    try:
-        return cache.incr(key)
-    except ValueError:
-        if cache.add(key, 1, TICKET_TTL):
-            return 1
-        return cache.incr(key)
-
-
-def start(*, lab_id, participant_id, language, code, stdin='',
-          problem_id=None, purpose='run') -> dict:
-    """Book a run and supersede whatever that student had in flight."""
     previous_id = cache.get(_inflight_key(participant_id))
     if previous_id:
         previous = cache.get(_run_key(previous_id))
@@ -75,6 +54,7 @@ def start(*, lab_id, participant_id, language, code, stdin='',
             # handed out — cancelling a queued Celery task is not reliable.
             previous['state'] = SUPERSEDED
             cache.set(_run_key(previous_id), previous, RUN_TTL)
+            scheduler.cancel(previous)
 
     run_id = str(uuid.uuid4())
     record = {
@@ -86,8 +66,8 @@ def start(*, lab_id, participant_id, language, code, stdin='',
         'code': code,
         'stdin': stdin,
         'purpose': purpose,
+        'user_id': user_id,
         'state': QUEUED,
-        'ticket': _next(_ticket_key(lab_id)),
         'stdout': '',
         'stderr': '',
         'error': None,
@@ -95,6 +75,7 @@ def start(*, lab_id, participant_id, language, code, stdin='',
     }
     cache.set(_run_key(run_id), record, RUN_TTL)
     cache.set(_inflight_key(participant_id), run_id, 120)
+    scheduler.enqueue(record)
     return record
 
 
@@ -107,17 +88,19 @@ def mark_running(run_id) -> dict | None:
     if record is None or record['state'] != QUEUED:
         return None       # superseded while it waited; the worker skips it
     record['state'] = RUNNING
+    record['started_at'] = time.time()
     cache.set(_run_key(run_id), record, RUN_TTL)
-    _next(_served_key(record['lab_id']))
+    scheduler.cancel(record)    # already out if the scheduler handed it over
     return record
 
 
-def finish(run_id, *, stdout='', stderr='', error=None) -> dict | None:
+def finish(run_id, *, stdout='', stderr='', error=None, result=None) -> dict | None:
+    """Record the outcome. `result` carries a graded run's full response."""
     record = get(run_id)
     if record is None:
         return None
     record.update({'state': DONE, 'stdout': stdout, 'stderr': stderr,
-                   'error': error, 'finished_at': time.time()})
+                   'error': error, 'result': result, 'finished_at': time.time()})
     cache.set(_run_key(run_id), record, RUN_TTL)
     if cache.get(_inflight_key(record['participant_id'])) == run_id:
         cache.delete(_inflight_key(record['participant_id']))
@@ -126,19 +109,23 @@ def finish(run_id, *, stdout='', stderr='', error=None) -> dict | None:
 
 def queue_position(record: dict) -> int:
     """How many runs are ahead of this one. Zero once it is being served."""
-    if record['state'] in (RUNNING, DONE):
+    if record['state'] != QUEUED:
         return 0
-    served = cache.get(_served_key(record['lab_id'])) or 0
-    return max(0, record['ticket'] - int(served) - 1)
+    return scheduler.position(record)
 
 
 def public(record: dict) -> dict:
     """The shape the browser sees. Never echoes the code back."""
-    return {
+    shape = {
         'run_id': record['id'],
         'state': record['state'],
         'queue_position': queue_position(record),
+        # Seconds until the output, while it waits; None once it is running.
+        'eta_seconds': scheduler.eta(record) if record['state'] == QUEUED else None,
         'stdout': record['stdout'],
         'stderr': record['stderr'],
         'error': record['error'],
     }
+    if record.get('result') is not None:
+        shape['result'] = record['result']
+    return shape
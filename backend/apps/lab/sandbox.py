@@ -19,6 +19,8 @@ argument to this function for turning limits off and no code path that produces
 a container without them, because the failure mode of "usually remembered" is
 an unreachable production box.
 """
+import os
+import shlex
 from dataclasses import dataclass
 
 # Deliberately conservative. A student's exercise that needs more than this is
@@ -29,6 +31,7 @@ PIDS = 64
 OUTPUT_BYTES = 64 * 1024
 WALL_CLOCK_SECONDS = 300      # a whole interactive session
 IDLE_SECONDS = 120            # no input and no output for this long
+BUILD_SECONDS = 60            # one compile
 
 
 @dataclass(frozen=True)
@@ -37,40 +40,50 @@ class Runtime:
     # Argv to run the source file inside the container. {file} is substituted.
     command: tuple
     filename: str
+    # Compiled languages: argv that compiles {file} into /build, once per
+    # distinct source (builds.py). The run then mounts what it left there at
+    # /src, read-only, and `command` runs that instead of the source.
+    build: tuple = ()
 
 
 RUNTIMES = {
     'python': Runtime('python:3.12-slim', ('python', '-u', '{file}'), 'main.py'),
     'javascript': Runtime('node:20-slim', ('node', '{file}'), 'main.js'),
+    # stdbuf: the interactive counterpart of `python -u`. A pipe makes stdio
+    # fully buffered, and a prompt without a newline would never be seen.
+    'cpp': Runtime(
+        'gcc:13', ('stdbuf', '-o0', '-e0', '/src/main'), 'main.cpp',
+        build=('g++', '-std=c++17', '-O2', '-pipe', '-o', '/build/main', '{file}')),
+    # Serial GC and C1 only: fewer threads under --pids-limit, faster start.
+    'java': Runtime(
+        'eclipse-temurin:21-jdk',
+        ('java', '-XX:+UseSerialGC', '-XX:TieredStopAtLevel=1', '-cp', '/src', 'Main'),
+        'Main.java',
+        build=('javac', '-J-XX:+UseSerialGC', '-d', '/build', '{file}')),
 }
 
-# Compiled languages need a build step before the interactive run and are not
-# wired up yet. Listing them here rather than in RUNTIMES keeps the failure a
-# clear "not supported" instead of a confusing crash.
-PLANNED = {'java', 'cpp'}
+# Languages the lab lists but cannot run yet. Listing them here rather than
+# leaving them out keeps the failure a clear "not supported" instead of a
+# confusing crash.
+PLANNED: set = set()
 
 
 class UnsupportedLanguage(ValueError):
     pass
 
 
-def container_argv(language: str, *, host_dir: str, name: str) -> list[str]:
-    """The full `docker run` argv for one interactive execution.
-
-    Every resource bound is applied here and none of them is optional.
-
-    `--network none` because a student exercise has no business reaching the
-    internet, and because the box's own services are on loopback.
-    `--read-only` with the source mounted read-only: nothing the program writes
-    survives, and it cannot modify the code it was given.
-    """
+def runtime(language: str) -> Runtime:
+    """The runtime for `language`, or UnsupportedLanguage saying why not."""
     if language in PLANNED:
         raise UnsupportedLanguage(
             f'{language} is not available in the lab yet')
     if language not in RUNTIMES:
         raise UnsupportedLanguage(f'unsupported language: {language}')
+    return RUNTIMES[language]
+
 
-    runtime = RUNTIMES[language]
+def _bounded(name: str) -> list[str]:
+    """`docker run` up to the image: every bound, for every kind of container."""
     return [
         'docker', 'run', '--rm', '-i',
         '--name', name,
@@ -85,13 +98,86 @@ def container_argv(language: str, *, host_dir: str, name: str) -> list[str]:
         '--tmpfs', '/tmp:rw,noexec,nosuid,size=32m',
         '--cap-drop', 'ALL',
         '--security-opt', 'no-new-privileges',
-        '-v', f'{host_dir}:/src:ro',
-        '-w', '/src',
-        runtime.image,
-        *[part.replace('{file}', f'/src/{runtime.filename}') for part in runtime.command],
     ]
 
 
+def container_argv(language: str, *, host_dir: str, name: str) -> list[str]:
+    """The full `docker run` argv for one interactive execution.
+
+    Every resource bound is applied here and none of them is optional.
+
+    `--network none` because a student exercise has no business reaching the
+    internet, and because the box's own services are on loopback.
+    `--read-only` with the source mounted read-only: nothing the program writes
+    survives, and it cannot modify the code it was given. For a compiled
+    language `host_dir` is the build output (builds.py), not the source.
+    """
+    spec = runtime(language)
+    return [
+        *_mounted(host_dir, name),
+        spec.image,
+        *[part.replace('{file}', f'/src/{spec.filename}') for part in spec.command],
+    ]
+
+
+def _mounted(host_dir: str, name: str) -> list[str]:
+    """The bounds, plus `host_dir` read-only at /src as the working directory."""
+    return [*_bounded(name), '-v', f'{host_dir}:/src:ro', '-w', '/src']
+
+
+def warm_argv(language: str, *, host_dir: str, name: str) -> list[str]:
+    """`docker run` for a container started before there is code to run.
+
+    The same bounds and the same layout as container_argv — the same lists,
+    not copies of them. `host_dir` is empty when the container starts; the
+    source is written into it on the host when the run claims the container,
+    and the container waits in bootstrap() until then. Inside, the program
+    sees what a cold run sees: its source in a read-only /src, and /src as
+    its working directory.
+    """
+    spec = runtime(language)
+    if spec.build:
+        # What a compiled run needs is its build output, not a loader.
+        raise UnsupportedLanguage(f'{language} cannot be started ahead of its build')
+    return [*_mounted(host_dir, name), spec.image, *bootstrap(spec)]
+
+
+def build_argv(language: str, *, source_dir: str, out_dir: str, name: str) -> list[str]:
+    """`docker run` for a compile: the same bounds again, the source read-only
+    at /src and only `out_dir` writable, at /build.
+
+    The compiler runs as this process's user, so the cache directory it writes
+    can be renamed and evicted without root.
+    """
+    spec = runtime(language)
+    if not spec.build:
+        raise UnsupportedLanguage(f'{language} has nothing to build')
+    user = ['--user', f'{os.getuid()}:{os.getgid()}'] if hasattr(os, 'getuid') else []
+    return [
+        *_bounded(name),
+        *user,
+        '-v', f'{source_dir}:/src:ro',
+        '-v', f'{out_dir}:/build:rw',
+        '-w', '/build',
+        spec.image,
+        *[part.replace('{file}', f'/src/{spec.filename}') for part in spec.build],
+    ]
+
+
+def bootstrap(spec: Runtime, directory: str = '/src') -> list[str]:
+    """The command a warm container waits in.
+
+    It reads one line — the signal that the source is now in `directory` —
+    then execs the program on it. Whatever follows on stdin is the program's:
+    `read` takes nothing past its newline, so the first thing the student
+    types is not swallowed by the loader. The container cannot write the
+    source itself; `directory` is read-only to it, as in a cold run.
+    """
+    path = f'{directory}/{spec.filename}'
+    run = ' '.join(shlex.quote(part.replace('{file}', path)) for part in spec.command)
+    return ['sh', '-c', f'read go && exec {run}']
+
+
 def kill_argv(name: str) -> list[str]:
     """How to actually stop it.
 
@@ -0,0 +1,291 @@
+"""
+Which queued run the execution worker serves next.
+
+execution.start booked a run and the view handed its id straight to Celery,
+so the worker served runs in the order they arrived, across every lab on the
+box. A lab of 60 pressing Run together put 60 runs in front of the lab next
+door, and a student's submission — the run that counts — waited behind all of
+them.
+
+Now a Celery task is a worker slot rather than a particular run: each booking
+still sends one (tasks.execute_run, learning's grade_challenge), and whichever
+slot comes up asks take() for the run to serve. take() picks:
+
+  * submissions before runs, anywhere on the box;
+  * round-robin across labs with anything queued — a lab that was just served
+    goes to the back of the ring, so two labs alternate however long either
+    queue is;
+  * never a lab already running LAB_RUN_BUDGET runs; its turn passes to the
+    next lab in the ring.
+
+A slot that finds every waiting lab at its budget does nothing, and the next
+run to finish sends another slot, so the blocked lab is served as soon as it
+has room. A run that is superseded leaves its queue at once (cancel), which is
+what keeps queue positions exact: the position is how many runs are ahead in
+the same lab — every submission, then the runs before this one.
+
+ETA comes from observed durations: a moving average per lab, and the share of
+the LAB_WORKERS worker slots the lab can expect while the other labs in the
+ring are waiting too.
+
+The queues, the ring and the running sets live in Redis when there is one
+(core.shared_redis), and take() is one Lua script there, so two workers never
+serve the same run.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from django.conf import settings
+
+from apps.core import shared_redis
+
+KEY_PREFIX = 'lab:sched:'
+RING_KEY = 'lab:sched:ring'
+AVG_KEY = 'lab:sched:avg'
+LANES = ('submit', 'run')
+# A run that has not been released after this long is presumed lost with its
+# worker, and stops counting against its lab's budget.
+LEASE_SECONDS = 300
+QUEUE_TTL = 3600
+DEFAULT_DURATION = 2.0      # seconds, until a lab has run something
+SMOOTHING = 0.2             # weight of the newest duration in the average
+
+
+def _budget() -> int:
+    return max(1, getattr(settings, 'LAB_RUN_BUDGET', 2))
+
+
+def _workers() -> int:
+    return max(1, getattr(settings, 'LAB_WORKERS', 2))
+
+
+def _lane(purpose: str) -> str:
+    return 'submit' if purpose == 'submit' else 'run'
+
+
+class _MemoryScheduler:
+    """In-process stand-in for the Redis lists, ring and running sets."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._queues: dict[tuple[str, str], list[str]] = {}
+            self._ring: list[str] = []
+            self._running: dict[str, dict[str, float]] = {}
+            self._avg: dict[str, float] = {}
+
+    def push(self, lab, lane, run_id):
+        with self._lock:
+            self._queues.setdefault((lab, lane), []).append(run_id)
+            if lab not in self._ring:
+                self._ring.append(lab)
+
+    def remove(self, lab, lane, run_id):
+        with self._lock:
+            queue = self._queues.get((lab, lane), [])
+            if run_id in queue:
+                queue.remove(run_id)
+
+    def _queued(self, lab):
+        return sum(len(self._queues.get((lab, lane), [])) for lane in LANES)
+
+    def take(self, now, budget):
+        with self._lock:
+            for lane in LANES:
+                for lab in list(self._ring):
+                    running = self._running.setdefault(lab, {})
+                    for run_id, started in list(running.items()):
+                        if started < now - LEASE_SECONDS:
+                            del running[run_id]
+                    queue = self._queues.get((lab, lane))
+                    if len(running) >= budget or not queue:
+                        continue
+                    run_id = queue.pop(0)
+                    running[run_id] = now
+                    self._ring.remove(lab)
+                    if self._queued(lab):
+                        self._ring.append(lab)
+                    return run_id, lab
+            self._ring[:] = [lab for lab in self._ring if self._queued(lab)]
+            return None
+
+    def release(self, lab, run_id):
+        with self._lock:
+            self._running.get(lab, {}).pop(run_id, None)
+
+    def lane(self, lab, lane):
+        with self._lock:
+            return list(self._queues.get((lab, lane), []))
+
+    def labs(self):
+        with self._lock:
+            return len(self._ring)
+
+    def pending(self):
+        with self._lock:
+            return any(self._queues.values())
+
+    def average(self, lab):
+        return self._avg.get(lab)
+
+    def set_average(self, lab, seconds):
+        self._avg[lab] = seconds
+
+
+class _RedisScheduler:
+    """Per-lab lane lists, the ring of labs with work, a running ZSET per lab."""
+
+    def __init__(self, client):
+        self.r = client
+
+    def reset(self):
+        keys = list(self.r.scan_iter(f'{KEY_PREFIX}*'))
+        if keys:
+            self.r.delete(*keys)
+
+    def push(self, lab, lane, run_id):
+        self.r.eval(_PUSH, 2, RING_KEY, f'{KEY_PREFIX}q:{lab}:{lane}', lab, run_id, QUEUE_TTL)
+
+    def remove(self, lab, lane, run_id):
+        self.r.lrem(f'{KEY_PREFIX}q:{lab}:{lane}', 0, run_id)
+
+    def take(self, now, budget):
+        taken = self.r.eval(_TAKE, 1, RING_KEY, KEY_PREFIX, now, LEASE_SECONDS, budget)
+        if not taken:
+            return None
+        return tuple(v.decode() if isinstance(v, bytes) else v for v in taken)
+
+    def release(self, lab, run_id):
+        self.r.zrem(f'{KEY_PREFIX}running:{lab}', run_id)
+
+    def lane(self, lab, lane):
+        return [i.decode() if isinstance(i, bytes) else i
+                for i in self.r.lrange(f'{KEY_PREFIX}q:{lab}:{lane}', 0, -1)]
+
+    def labs(self):
+        return self.r.llen(RING_KEY)
+
+    def pending(self):
+        return self.r.llen(RING_KEY) > 0
+
+    def average(self, lab):
+        value = self.r.hget(AVG_KEY, lab)
+        return float(value) if value is not None else None
+
+    def set_average(self, lab, seconds):
+        self.r.hset(AVG_KEY, lab, seconds)
+
+
+# Queue the run; put its lab in the ring unless it is there already.
+_PUSH = """
+redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+for _, lab in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    if lab == ARGV[1] then return 0 end
+end
+redis.call('RPUSH', KEYS[1], ARGV[1])
+return 1
+"""
+
+# The same walk as _MemoryScheduler.take: submissions first, then runs; labs
+# in ring order; skip a lab at its budget; the served lab to the back.
+_TAKE = """
+local prefix, now = ARGV[1], tonumber(ARGV[2])
+local lease, budget = tonumber(ARGV[3]), tonumber(ARGV[4])
+local labs = redis.call('LRANGE', KEYS[1], 0, -1)
+local function queued(lab)
+    return redis.call('LLEN', prefix .. 'q:' .. lab .. ':submit')
+         + redis.call('LLEN', prefix .. 'q:' .. lab .. ':run')
+end
+for _, lane in ipairs({'submit', 'run'}) do
+    for _, lab in ipairs(labs) do
+        local running = prefix .. 'running:' .. lab
+        redis.call('ZREMRANGEBYSCORE', running, '-inf', now - lease)
+        if redis.call('ZCARD', running) < budget then
+            local id = redis.call('LPOP', prefix .. 'q:' .. lab .. ':' .. lane)
+            if id then
+                redis.call('ZADD', running, now, id)
+                redis.call('EXPIRE', running, lease)
+                redis.call('LREM', KEYS[1], 0, lab)
+                if queued(lab) > 0 then redis.call('RPUSH', KEYS[1], lab) end
+                return {id, lab}
+            end
+        end
+    end
+end
+for _, lab in ipairs(labs) do
+    if queued(lab) == 0 then redis.call('LREM', KEYS[1], 0, lab) end
+end
+return false
+"""
+
+
+_memory = _MemoryScheduler()
+
+
+def _scheduler():
+    r = shared_redis.client()
+    return _memory if r is None else _RedisScheduler(r)
+
+
+def enqueue(record: dict) -> None:
+    """Queue a booked run (execution.start)."""
+    _scheduler().push(record['lab_id'], _lane(record['purpose']), record['id'])
+
+
+def cancel(record: dict) -> None:
+    """Take a superseded or started run out of its queue, if it is still there."""
+    _scheduler().remove(record['lab_id'], _lane(record['purpose']), record['id'])
+
+
+def take() -> tuple[str, str] | None:
+    """(run id, lab) of the run to serve now, counted as running; None if none may run."""
+    return _scheduler().take(time.time(), _budget())
+
+
+def release(lab: str, run_id: str, duration: float | None = None) -> None:
+    """A run taken by take() is over. `duration` feeds the ETA if it actually ran."""
+    scheduler = _scheduler()
+    scheduler.release(lab, run_id)
+    if duration is not None:
+        previous = scheduler.average(lab)
+        scheduler.set_average(lab, duration if previous is None
+                              else previous + SMOOTHING * (duration - previous))
+
+
+def pending() -> bool:
+    """Whether any lab has a run waiting."""
+    return _scheduler().pending()
+
+
+def position(record: dict) -> int:
+    """How many runs in the same lab will be served before this one."""
+    scheduler = _scheduler()
+    lab, lane = record['lab_id'], _lane(record['purpose'])
+    queue = scheduler.lane(lab, lane)
+    if record['id'] not in queue:
+        return 0
+    ahead = queue.index(record['id'])
+    if lane == 'run':
+        ahead += len(scheduler.lane(lab, 'submit'))
+    return ahead
+
+
+def eta(record: dict) -> float:
+    """Seconds until this run's result, from what this lab's runs have taken."""
+    scheduler = _scheduler()
+    lab = record['lab_id']
+    duration = scheduler.average(lab) or DEFAULT_DURATION
+    # The lab's share of the worker slots while the other waiting labs take theirs.
+    share = min(_budget(), _workers() / max(1, scheduler.labs()))
+    return round((position(record) + 1) * duration / share, 1)
+
+
+def reset() -> None:
+    """Forget every queue. For tests."""
+    _scheduler().reset()
@@ -0,0 +1,144 @@
+"""
+How many lab terminal containers may run at once, counted across every worker.
+
+This was one integer in the cache: INCR to take a slot, DECR to give it back.
+Shared through Redis it held the ceiling across processes, but only for as
+long as every process lived to give its slots back. A worker that died — an
+OOM kill, a restart mid-class — took its DECRs with it, the counter stayed
+high until its hour-long TTL, and the lab said "busy" to a room with nothing
+running. One process made that rare; several make it routine, since gunicorn
+recycles workers as a matter of course. (Creating the counter was racy too:
+two first runs could both find it missing, and one of them was never counted.)
+
+So a slot is now a lease: the holder's token in a sorted set, scored by when
+the lease runs out. acquire() drops expired leases and adds one if fewer than
+`limit` remain, atomically (one Lua script); the terminal's watchdog renews
+its lease while the program runs; release() removes it. A worker that dies
+stops renewing, and its slots come back within LEASE_SECONDS without anyone
+cleaning up after it.
+
+The set lives in Redis when there is one (core.shared_redis), shared by every
+worker.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from apps.core import shared_redis
+
+logger = logging.getLogger(__name__)
+
+SLOTS_KEY = 'lab:slots'
+# Long enough to cover a compile (sandbox.BUILD_SECONDS), which runs before
+# the watchdog that renews the lease has started.
+LEASE_SECONDS = 90
+
+
+class _MemorySlots:
+    """In-process stand-in for the Redis sorted set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._leases: dict[str, float] = {}
+
+    def acquire(self, token, limit, now, until):
+        with self._lock:
+            for held, expires in list(self._leases.items()):
+                if expires <= now:
+                    del self._leases[held]
+            if token not in self._leases and len(self._leases) >= limit:
+                return False
+            self._leases[token] = until
+            return True
+
+    def renew(self, token, until):
+        with self._lock:
+            if token in self._leases:
+                self._leases[token] = until
+
+    def release(self, token):
+        with self._lock:
+            self._leases.pop(token, None)
+
+    def held(self, now):
+        with self._lock:
+            return sum(1 for expires in self._leases.values() if expires > now)
+
+
+class _RedisSlots:
+    """A ZSET of token -> lease expiry."""
+
+    def __init__(self, client):
+        self.r = client
+
+    def reset(self):
+        self.r.delete(SLOTS_KEY)
+
+    def acquire(self, token, limit, now, until):
+        return bool(self.r.eval(ACQUIRE_LUA, 1, SLOTS_KEY, token, limit, now, until))
+
+    def renew(self, token, until):
+        # XX: a lease already given up (or expired and taken) is not revived.
+        self.r.zadd(SLOTS_KEY, {token: until}, xx=True)
+
+    def release(self, token):
+        self.r.zrem(SLOTS_KEY, token)
+
+    def held(self, now):
+        return self.r.zcount(SLOTS_KEY, f'({now!r}', '+inf')
+
+
+ACQUIRE_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+if not redis.call('ZSCORE', KEYS[1], ARGV[1])
+   and redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[4]) - tonumber(ARGV[3])) + 60)
+return 1
+"""
+
+
+_memory = _MemorySlots()
+
+
+def _slots():
+    r = shared_redis.client()
+    return _memory if r is None else _RedisSlots(r)
+
+
+def acquire(token: str, limit: int) -> bool:
+    """Take a slot for `token` if fewer than `limit` are held. Idempotent per token."""
+    now = time.time()
+    return _slots().acquire(token, limit, now, now + LEASE_SECONDS)
+
+
+def renew(token: str) -> None:
+    try:
+        _slots().renew(token, time.time() + LEASE_SECONDS)
+    except Exception as e:
+        logger.warning(f"[LAB] Could not renew slot {token}: {e}")
+
+
+def release(token: str) -> None:
+    try:
+        _slots().release(token)
+    except Exception as e:
+        logger.warning(f"[LAB] Could not release slot {token}: {e}")
+
+
+def held() -> int:
+    """How many slots are taken right now, across every worker."""
+    return _slots().held(time.time())
+
+
+def reset() -> None:
+    """Give back every slot. For tests."""
+    _slots().reset()
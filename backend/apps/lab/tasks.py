@@ -7,20 +7,53 @@ five seconds of somebody else's page not loading.
 
 The worker's `--concurrency` is the real concurrency cap for the room. On the
 two-core production box that is 2, which matches what the sandbox will give us
-anyway.
+anyway; LAB_WORKERS tells the scheduler's ETA the same number. Which run a
+slot serves is the scheduler's call (scheduler.py).
 """
 import logging
+import time
 
 from celery import shared_task
 
-from . import execution
+from . import execution, scheduler
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task(name='lab.execute', bind=True, max_retries=0)
-def execute_run(self, run_id: str) -> None:
-    """Run one student's code and record the output.
+def execute_run(self, run_id: str | None = None) -> None:
+    """A worker slot. It serves the run the scheduler picks, not necessarily
+    `run_id`: that only says which booking sent it (scheduler.py).
+    """
+    serve_next()
+
+
+def serve_next() -> None:
+    """Serve the scheduler's next run, then make sure a blocked lab gets a slot.
+
+    Lab runs and coding challenges share the worker and the queue, so either
+    task lands here.
+    """
+    from apps.learning import challenge_grading
+    from apps.learning.tasks import grade
+
+    taken = scheduler.take()
+    if taken is None:
+        return      # nothing waiting, or every waiting lab is at its budget
+    run_id, lab = taken
+    started = time.monotonic()
+    ran = False
+    try:
+        ran = grade(run_id) if lab == challenge_grading.QUEUE else _execute(run_id)
+    finally:
+        scheduler.release(lab, run_id, time.monotonic() - started if ran else None)
+    # A slot that found its lab at budget did nothing; this finish made room.
+    if scheduler.pending():
+        execute_run.delay()
+
+
+def _execute(run_id: str) -> bool:
+    """Run one student's code and record the output. False if superseded unrun.
 
     Deliberately never raises. A crash here would leave the student's console
     spinning forever with no way to tell whether it was their code or ours.
@@ -30,7 +63,7 @@ def execute_run(self, run_id: str) -> None:
         # Superseded while queued — the student pressed Run again. Dropping it
         # is the point of superseding.
         logger.debug('lab run %s skipped', run_id)
-        return
+        return False
 
     from apps.learning.code_executor import CodeExecutor
 
@@ -52,3 +85,4 @@ def execute_run(self, run_id: str) -> None:
         logger.exception('lab run %s failed', run_id)
         execution.finish(run_id, stderr='The execution service failed.',
                          error='internal_error')
+    return True
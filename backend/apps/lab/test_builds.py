@@ -0,0 +1,161 @@
+"""
+The compile step for C++ and Java: built once per distinct source, reused after.
+
+Docker and the compilers are not here, so the build container is replaced by a
+local "compiler" that copies the source into the output directory and counts
+its invocations. What is under test is the part that is ours: the cache key,
+that a failed compile is not kept, that Stop leaves nothing behind, and
+eviction. The compile container's bounds are pinned in test_sandbox_limits.py.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+from apps.lab import builds, sandbox
+
+COMPILER = """
+import os, shutil, sys
+source, out, log = sys.argv[1:4]
+open(log, 'a').write('x')
+code = open(os.path.join(source, 'main.cpp')).read()
+if 'SLOW' in code:
+    import time; time.sleep(30)
+if 'error' in code:
+    print('main.cpp:1: error: expected ;')
+    sys.exit(1)
+shutil.copy(os.path.join(source, 'main.cpp'), os.path.join(out, 'main'))
+print('built')
+"""
+
+
+@pytest.fixture
+def compiler(monkeypatch, tmp_path, settings):
+    settings.LAB_BUILD_CACHE_DIR = str(tmp_path / 'cache')
+    log = tmp_path / 'invocations'
+    log.write_text('')
+    killed = []
+
+    def argv(language, *, source_dir, out_dir, name):
+        return [sys.executable, '-c', COMPILER, source_dir, out_dir, str(log)]
+
+    async def kill(name):
+        killed.append(name)
+    monkeypatch.setattr(sandbox, 'build_argv', argv)
+    monkeypatch.setattr(builds, '_kill', kill)
+    return lambda: len(log.read_text()), killed
+
+
+def _build(code, name='lab_build_t'):
+    return asyncio.run(builds.build('cpp', code, name=name))
+
+
+def test_a_build_leaves_its_output_for_the_run(compiler):
+    result = _build('int main() {}')
+
+    assert result.ok and not result.cached
+    assert result.output == 'built\n'
+    with open(os.path.join(result.directory, 'main')) as handle:
+        assert handle.read() == 'int main() {}'
+
+
+def test_unchanged_code_skips_the_compiler(compiler):
+    invocations, _ = compiler
+    first = _build('int main() {}')
+    second = _build('int main() {}')
+
+    assert invocations() == 1
+    assert second.cached and second.directory == first.directory
+
+
+def test_changed_code_is_built_again(compiler):
+    invocations, _ = compiler
+    first = _build('int main() {}')
+    second = _build('int main() { return 0; }')
+
+    assert invocations() == 2
+    assert first.directory != second.directory
+
+
+def test_the_key_covers_the_compiler_not_just_the_source(monkeypatch):
+    before = builds.key('cpp', 'int main() {}')
+    spec = sandbox.RUNTIMES['cpp']
+    monkeypatch.setitem(sandbox.RUNTIMES, 'cpp', sandbox.Runtime(
+        spec.image, spec.command, spec.filename, build=spec.build + ('-Wall',)))
+
+    assert builds.key('cpp', 'int main() {}') != before
+
+
+def test_a_failed_compile_reports_and_is_not_kept(compiler, settings):
+    invocations, _ = compiler
+    result = _build('error')
+
+    assert not result.ok
+    assert result.code == 1
+    assert 'expected ;' in result.output
+    assert os.listdir(settings.LAB_BUILD_CACHE_DIR) == []
+    _build('error')
+    assert invocations() == 2
+
+
+def test_stopping_a_build_kills_it_and_leaves_nothing(compiler, settings):
+    _, killed = compiler
+
+    async def scenario():
+        task = asyncio.create_task(builds.build('cpp', 'SLOW', name='lab_build_slow'))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+    assert killed == ['lab_build_slow']
+    assert os.listdir(settings.LAB_BUILD_CACHE_DIR) == []
+
+
+def test_the_least_recently_used_builds_are_evicted(compiler, settings):
+    settings.LAB_BUILD_CACHE_ENTRIES = 2
+    old = _build('int a;').directory
+    kept = _build('int b;').directory
+    os.utime(old, (1, 1))
+    os.utime(kept, (2, 2))
+    builds.cached('cpp', 'int a;')        # used again: now the newest
+    _build('int c;')
+
+    assert os.path.isdir(old)
+    assert not os.path.isdir(kept)
+    assert len(os.listdir(settings.LAB_BUILD_CACHE_DIR)) == 2
+
+
+def test_a_build_a_run_may_still_be_using_is_not_evicted(compiler, settings):
+    settings.LAB_BUILD_CACHE_ENTRIES = 1
+    running = _build('int a;').directory
+    latest = _build('int b;').directory
+
+    assert os.path.isdir(running) and os.path.isdir(latest)
+
+    # Once no run can still hold it, it goes like any other.
+    past = os.stat(running).st_mtime - builds.IN_USE_SECONDS - 1
+    os.utime(running, (past, past))
+    newest = _build('int c;').directory
+
+    assert not os.path.exists(running)
+    assert os.path.isdir(latest) and os.path.isdir(newest)
+    assert sorted(os.listdir(settings.LAB_BUILD_CACHE_DIR)) == sorted(
+        os.path.basename(p) for p in (latest, newest))
+
+
+def test_an_entry_used_while_it_is_evicted_is_put_back(compiler, monkeypatch):
+    path = _build('int a;').directory
+    rename = os.rename
+
+    def used_meanwhile(src, dst):
+        rename(src, dst)
+        if src == path:
+            os.utime(dst)       # the lookup's touch, landing just before the rename
+    monkeypatch.setattr(builds.os, 'rename', used_meanwhile)
+    builds._discard(path)
+
+    assert os.path.isdir(path)
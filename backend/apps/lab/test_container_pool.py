@@ -0,0 +1,104 @@
+"""
+Warm lab containers: started ahead of Run, one run each, replaced behind it.
+
+Docker is not here, so the pool starts the container's own loader
+(sandbox.bootstrap) as a local process instead of `docker run ... image`. What
+is under test is the part that is ours: that code fed to a waiting container
+runs, that the program's stdin is the student's and not eaten by the loader,
+and the pool's bookkeeping. The container's bounds are pinned separately in
+test_sandbox_limits.py.
+"""
+import asyncio
+import sys
+
+import pytest
+
+from apps.lab import container_pool, sandbox
+
+
+@pytest.fixture
+def local_runtime(monkeypatch, tmp_path, settings):
+    settings.LAB_WARM_CONTAINERS = 1
+    spec = sandbox.Runtime('n/a', (sys.executable, '-u', '{file}'), 'main.py')
+
+    def argv(language, name, directory):
+        return sandbox.bootstrap(spec, directory)
+    monkeypatch.setattr(container_pool, '_argv', argv)
+
+
+async def _until_ready(language):
+    for _ in range(200):
+        if container_pool.ready(language):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('the pool never filled')
+
+
+async def _output(process):
+    return (await asyncio.wait_for(process.stdout.read(), 10)).decode()
+
+
+def test_the_pool_is_off_by_default(settings):
+    settings.LAB_WARM_CONTAINERS = 0
+
+    async def scenario():
+        container_pool.fill()
+        return await container_pool.claim('python')
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_a_claimed_container_runs_the_code_it_is_fed(local_runtime):
+    async def scenario():
+        container_pool.fill('python')
+        await _until_ready('python')
+        warm = await container_pool.claim('python')
+        await warm.feed("name = input('who? ')\nprint('hello ' + name)\n", 'main.py')
+        # The loader read exactly the source: this line is the program's.
+        warm.process.stdin.write(b'ada\n')
+        warm.process.stdin.close()
+        output = await _output(warm.process)
+        await container_pool.drain()
+        return output
+
+    assert asyncio.run(scenario()) == 'who? hello ada\n'
+
+
+def test_a_claim_is_replaced_in_the_background(local_runtime):
+    async def scenario():
+        container_pool.fill('python')
+        await _until_ready('python')
+        first = await container_pool.claim('python')
+        await _until_ready('python')
+        second = await container_pool.claim('python')
+        names = {first.name, second.name}
+        for warm in (first, second):
+            await warm.feed('pass\n', 'main.py')
+            await warm.process.wait()
+        await container_pool.drain()
+        return names
+
+    assert len(asyncio.run(scenario())) == 2      # never the same container twice
+
+
+def test_a_container_that_died_idle_is_not_handed_out(local_runtime):
+    async def scenario():
+        container_pool.fill('python')
+        await _until_ready('python')
+        (warm,) = container_pool._idle['python']
+        warm.process.kill()
+        await warm.process.wait()
+        claimed = await container_pool.claim('python')
+        # ...and the pool backs off rather than starting more that will die.
+        backing_off = container_pool._starting.get('python', 0) == 0
+        await container_pool.drain()
+        return claimed, backing_off
+
+    assert asyncio.run(scenario()) == (None, True)
+
+
+def test_a_compiled_or_unknown_language_is_never_warm(local_runtime):
+    async def scenario():
+        return [await container_pool.claim(lang) for lang in ('java', 'cpp', 'rust')]
+
+    assert asyncio.run(scenario()) == [None, None, None]
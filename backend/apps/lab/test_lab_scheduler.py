@@ -0,0 +1,110 @@
+"""
+The worker serves labs in turn, submissions first, within each lab's budget,
+and a waiting student is told where they stand and for how long.
+"""
+import pytest
+
+from apps.lab import execution, scheduler
+
+
+def _book(lab, student, purpose='run'):
+    return execution.start(lab_id=lab, participant_id=f'{lab}-{student}',
+                           language='python', code='print(1)', purpose=purpose)
+
+
+def _serve_all():
+    order = []
+    while (taken := scheduler.take()) is not None:
+        run_id, lab = taken
+        order.append(execution.get(run_id)['participant_id'])
+        scheduler.release(lab, run_id)
+    return order
+
+
+class TestOrder:
+    def test_a_crowded_lab_does_not_starve_the_one_next_door(self):
+        for i in range(4):
+            _book('big', i)
+        for i in range(2):
+            _book('small', i)
+
+        assert _serve_all() == ['big-0', 'small-0', 'big-1', 'small-1', 'big-2', 'big-3']
+
+    def test_submissions_are_served_before_runs(self):
+        _book('a', 0)
+        _book('b', 0)
+        _book('b', 1, purpose='submit')
+
+        assert _serve_all()[0] == 'b-1'
+
+    def test_a_superseded_run_is_not_served(self):
+        _book('a', 0)
+        _book('a', 0)       # pressed Run again
+
+        assert _serve_all() == ['a-0']
+
+
+class TestBudget:
+    def test_a_lab_at_its_budget_waits_while_others_are_served(self, settings):
+        settings.LAB_RUN_BUDGET = 1
+        for i in range(2):
+            _book('a', i)
+        _book('b', 0)
+
+        first, lab = scheduler.take()               # a-0, now running
+        assert scheduler.take()[1] == 'b'           # a is at budget: b's turn
+        assert scheduler.take() is None             # only a is left, still full
+
+        scheduler.release(lab, first)
+        assert execution.get(scheduler.take()[0])['participant_id'] == 'a-1'
+
+    def test_a_run_lost_with_its_worker_stops_counting_after_the_lease(self, settings):
+        import time
+        settings.LAB_RUN_BUDGET = 1
+        _book('a', 0)
+        _book('a', 1)
+        scheduler.take()                            # never released
+
+        assert scheduler.take() is None
+        later = time.time() + scheduler.LEASE_SECONDS + 1
+        assert scheduler._memory.take(later, 1) is not None
+
+
+class TestWhatTheStudentSees:
+    def test_the_position_counts_submissions_and_skips_the_superseded(self):
+        runs = [_book('a', i) for i in range(3)]
+        _book('a', 1)                               # student 1 pressed Run again
+        submission = _book('a', 9, purpose='submit')
+
+        assert execution.queue_position(submission) == 0
+        # One submission ahead, and a-1's first run is gone.
+        assert execution.queue_position(execution.get(runs[2]['id'])) == 2
+        assert execution.queue_position(execution.get(runs[1]['id'])) == 0
+
+    def test_the_eta_follows_observed_durations(self, settings):
+        settings.LAB_WORKERS = 1
+        records = [_book('a', i) for i in range(3)]
+        run_id, lab = scheduler.take()
+        scheduler.release(lab, run_id, duration=4.0)
+
+        # Third in line was second once the first ran: one ahead, then its own run.
+        assert execution.public(execution.get(records[2]['id']))['eta_seconds'] == \
+            pytest.approx(8.0)
+
+    def test_the_eta_accounts_for_sharing_the_worker(self, settings):
+        settings.LAB_WORKERS = 2
+        settings.LAB_RUN_BUDGET = 2
+        alone = _book('a', 0)
+        assert scheduler.eta(alone) == pytest.approx(scheduler.DEFAULT_DURATION / 2)
+
+        _book('b', 0)
+        # Two labs waiting: each can count on one slot.
+        assert scheduler.eta(alone) == pytest.approx(scheduler.DEFAULT_DURATION)
+
+    def test_a_running_run_has_no_eta(self):
+        record = _book('a', 0)
+        execution.mark_running(record['id'])
+
+        shape = execution.public(execution.get(record['id']))
+        assert shape['queue_position'] == 0
+        assert shape['eta_seconds'] is None
@@ -11,6 +11,8 @@ So what is asserted here is not "the function works". It is that there is **no
 way to obtain a container without each bound**, because the thing that failed
 was human memory, and a test is the only part of this that does not get tired.
 """
+import shlex
+
 import pytest
 
 from apps.lab import sandbox
@@ -81,13 +83,65 @@ class TestThereIsNoWayAround:
             for option in ('--memory', '--memory-swap', '--cpus', '--pids-limit'):
                 assert option in argv, f'{language} would run unbounded'
 
+    def test_a_warm_container_is_bounded_exactly_like_a_cold_one(self):
+        # Started before the code exists, but nothing about it is looser: the
+        # pool must not be a way around the limits.
+        for language, spec in sandbox.RUNTIMES.items():
+            if spec.build:
+                continue
+            cold = sandbox.container_argv(language, host_dir='/tmp/x', name='n')
+            warm = sandbox.warm_argv(language, host_dir='/tmp/x', name='n')
+            assert warm[:warm.index(spec.image)] == cold[:cold.index(spec.image)]
+
+    def test_a_warm_container_sees_the_layout_of_a_cold_one(self):
+        # Source read-only at /src, /src the working directory, the program run
+        # from there: code that works cold must not behave differently warm.
+        for language, spec in sandbox.RUNTIMES.items():
+            if spec.build:
+                continue
+            cold = sandbox.container_argv(language, host_dir='/tmp/x', name='n')
+            warm = sandbox.warm_argv(language, host_dir='/tmp/x', name='n')
+            for argv in (cold, warm):
+                assert flag(argv, '-v') == '/tmp/x:/src:ro'
+                assert flag(argv, '-w') == '/src'
+            program = ' '.join(shlex.quote(part) for part in cold[cold.index(spec.image) + 1:])
+            assert warm[-1].endswith(f'exec {program}')
+
+    def test_a_warm_container_is_named_so_it_can_be_killed(self):
+        assert flag(sandbox.warm_argv('python', host_dir='/x', name='lab_warm'),
+                    '--name') == 'lab_warm'
+
+    @pytest.mark.parametrize('language', ['cpp', 'java'])
+    def test_a_compile_is_bounded_exactly_like_the_run(self, language):
+        # A compiler is a program too, and g++ on a template-heavy file will
+        # take all the memory it is given.
+        run = sandbox.container_argv(language, host_dir='/tmp/x', name='n')
+        build = sandbox.build_argv(language, source_dir='/tmp/s', out_dir='/tmp/o', name='n')
+        assert build[:len(sandbox._bounded('n'))] == run[:run.index('-v')]
+        assert '/tmp/s:/src:ro' in build
+        assert '/tmp/o:/build:rw' in build
+
+    def test_a_compile_is_named_so_it_can_be_killed(self):
+        argv = sandbox.build_argv('cpp', source_dir='/s', out_dir='/o', name='lab_build')
+        assert flag(argv, '--name') == 'lab_build'
+
+    def test_the_run_of_a_compiled_program_mounts_its_build_read_only(self):
+        argv = sandbox.container_argv('cpp', host_dir='/cache/abc', name='n')
+        assert flag(argv, '-v') == '/cache/abc:/src:ro'
+        assert argv[-1] == '/src/main'
+
+    def test_a_compiled_language_is_never_started_warm(self):
+        with pytest.raises(sandbox.UnsupportedLanguage):
+            sandbox.warm_argv('java', host_dir='/x', name='n')
+
     def test_an_unknown_language_is_refused_rather_than_improvised(self):
         with pytest.raises(sandbox.UnsupportedLanguage):
             sandbox.container_argv('rust', host_dir='/tmp/x', name='n')
 
-    def test_a_planned_language_says_so_plainly(self):
+    def test_a_planned_language_says_so_plainly(self, monkeypatch):
+        monkeypatch.setattr(sandbox, 'PLANNED', {'go'})
         with pytest.raises(sandbox.UnsupportedLanguage, match='not available'):
-            sandbox.container_argv('java', host_dir='/tmp/x', name='n')
+            sandbox.container_argv('go', host_dir='/tmp/x', name='n')
 
 
 class TestTheLimitsAreSane:
@@ -0,0 +1,86 @@
+"""
+Lab terminal slots are leases, counted across every worker.
+
+What is pinned: the ceiling holds, a slot given back is free at once, and a
+slot whose holder stopped renewing it — a worker that died — comes back on its
+own instead of leaving the lab "busy" with nothing running — and a terminal
+that takes one gives it back however its start fails.
+"""
+import asyncio
+
+import pytest
+
+from apps.lab import consumers, container_pool, slots
+
+
+def test_the_ceiling_holds_and_a_release_frees_a_slot():
+    assert slots.acquire('a', 2) and slots.acquire('b', 2)
+    assert not slots.acquire('c', 2)
+
+    slots.release('a')
+
+    assert slots.acquire('c', 2)
+    assert slots.held() == 2
+
+
+def test_taking_the_same_slot_twice_counts_once():
+    assert slots.acquire('a', 1)
+    assert slots.acquire('a', 1)
+    assert slots.held() == 1
+
+
+def test_a_lease_nobody_renews_runs_out(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(slots.time, 'time', lambda: now[0])
+    assert slots.acquire('dead-worker', 1)
+    assert not slots.acquire('alive', 1)
+
+    now[0] += slots.LEASE_SECONDS + 1
+
+    assert slots.acquire('alive', 1)
+
+
+def test_a_renewed_lease_does_not(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(slots.time, 'time', lambda: now[0])
+    assert slots.acquire('running', 1)
+
+    for _ in range(3):
+        now[0] += slots.LEASE_SECONDS - 1
+        slots.renew('running')
+
+    assert not slots.acquire('waiting', 1)
+
+
+def test_renewing_a_released_slot_does_not_take_it_back():
+    slots.acquire('a', 1)
+    slots.release('a')
+    slots.renew('a')
+
+    assert slots.held() == 0
+
+
+@pytest.mark.parametrize('failing', ['claim', 'prepare'])
+def test_a_run_that_fails_to_start_gives_its_slot_back(monkeypatch, failing):
+    async def broken(*args):
+        raise OSError('no space left on device')
+
+    async def nothing_warm(language):
+        return None
+    monkeypatch.setattr(container_pool, 'claim', broken if failing == 'claim' else nothing_warm)
+    consumer = consumers.LabTerminalConsumer()
+    if failing == 'prepare':
+        monkeypatch.setattr(consumer, '_prepare', broken)
+    consumer.container = consumer.workdir = consumer.starting = consumer.process = None
+    consumer.pump = consumer.watchdog = consumer.slot = None
+    sent = []
+
+    async def send(kind, payload):
+        sent.append(kind)
+    consumer._send = send
+
+    asyncio.run(consumer._run('python', 'print(1)'))
+
+    assert sent == ['error']
+    assert consumer.slot is None
+    assert slots.held() == 0
@@ -0,0 +1,96 @@
+"""
+How a running program's output reaches the terminal: in frames, at a bounded rate.
+
+A local process stands in for the container — the framing is ours, the
+container is not — and the messages the consumer would send are collected
+instead of going over a socket.
+"""
+import asyncio
+import sys
+
+from apps.lab import consumers, sandbox
+
+
+async def _pump(program):
+    consumer = consumers.LabTerminalConsumer()
+    consumer.lab_id = 'lab'
+    consumer.container = consumer.workdir = consumer.starting = None
+    consumer.pump = consumer.watchdog = None
+    consumer.slot = None
+    consumer.stats = {'bytes': 0, 'frames': 0, 'throttled_seconds': 0.0}
+    sent = []
+
+    async def send(kind, payload):
+        sent.append((asyncio.get_running_loop().time(), kind, payload))
+    consumer._send = send
+    process = consumer.process = await asyncio.create_subprocess_exec(
+        sys.executable, '-u', '-c', program,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+    started = asyncio.get_running_loop().time()
+    await asyncio.wait_for(consumer._pump_output(), 30)
+    await process.wait()
+    return [(at - started, kind, payload) for at, kind, payload in sent]
+
+
+def _text(sent):
+    return ''.join(p['data'] for _, kind, p in sent if kind == 'output')
+
+
+def _exit(sent):
+    (payload,) = [p for _, kind, p in sent if kind == 'exit']
+    return payload
+
+
+def test_a_flood_is_coalesced_into_a_few_frames():
+    sent = asyncio.run(_pump('for i in range(5000): print(i)'))
+
+    expected = ''.join(f'{i}\n' for i in range(5000))
+    assert _text(sent) == expected
+    stats = _exit(sent)['stats']
+    assert stats['bytes'] == len(expected)
+    assert stats['frames'] <= len(expected) // consumers.FRAME_BYTES + 10
+    assert '[output throttled]' not in _text(sent)
+
+
+def test_a_prompt_without_a_newline_is_not_held_back():
+    sent = asyncio.run(_pump(
+        "import sys, time\nsys.stdout.write('who? ')\nsys.stdout.flush()\ntime.sleep(1)"))
+
+    at, kind, payload = sent[0]
+    assert (kind, payload['data']) == ('output', 'who? ')
+    assert at < 0.5
+
+
+def test_past_the_burst_output_is_throttled_and_says_so_once(monkeypatch):
+    monkeypatch.setattr(consumers, 'OUTPUT_BURST', 4096)
+    monkeypatch.setattr(consumers, 'OUTPUT_RATE', 32 * 1024)
+
+    sent = asyncio.run(_pump("for _ in range(200): print('x' * 99)"))
+
+    text = _text(sent)
+    assert text.count('[output throttled]') == 1
+    assert text.replace('\n[output throttled]\n', '') == ('x' * 99 + '\n') * 200
+    stats = _exit(sent)['stats']
+    assert stats['throttled_seconds'] > 0.3
+
+
+def test_output_past_the_cap_is_cut_at_the_cap(monkeypatch):
+    monkeypatch.setattr(sandbox, 'OUTPUT_BYTES', 1000)
+
+    sent = asyncio.run(_pump("print('y' * 5000)"))
+
+    text = _text(sent)
+    assert text.startswith('y' * 1000 + '\n[output truncated')
+    assert _exit(sent)['stopped'] is True
+    assert _exit(sent)['stats']['bytes'] == 1000
+
+
+def test_a_character_split_across_frames_arrives_whole():
+    sent = asyncio.run(_pump("print('é' * 6000)"))
+
+    assert _text(sent) == 'é' * 6000 + '\n'
+
+
+def test_a_frame_always_fits_the_burst():
+    # Otherwise a full frame could never be paid for.
+    assert consumers.FRAME_BYTES <= consumers.OUTPUT_BURST
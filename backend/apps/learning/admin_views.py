@@ -898,11 +898,15 @@ class LearningProgressView(views.APIView):
             if not created:
                 progress.completion_percentage = max(progress.completion_percentage, completion_percentage)
                 
-                if completion_percentage >= 100:
+                newly_completed = completion_percentage >= 100 and not progress.is_completed
+                if newly_completed:
                     progress.is_completed = True
                     progress.completed_at = timezone.now()
                 
                 progress.save()
+                if newly_completed:
+                    from .leaderboard_service import record_module_completed
+                    record_module_completed(request.user, progress)
             
             return Response({
                 'message': 'Progress updated successfully',
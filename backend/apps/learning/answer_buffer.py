@@ -0,0 +1,416 @@
+"""
+Write-behind buffer for live quiz answers.
+
+An answer was an INSERT and an UPDATE in its own transaction, on the one
+thread Channels runs every consumer's queries on. When the timer runs out the
+whole room answers in the same second, and those transactions queued behind
+each other on that thread and the round trip to Postgres — the last student's
+"answer received" arrived seconds after they pressed the button.
+
+Now the socket handler scores the answer (the question is in the room state,
+live_state.py), appends it to this buffer and acknowledges at once. The buffer
+is written to the database in batches: LIVE_ANSWER_FLUSH_INTERVAL after a
+room's first unflushed answer, and immediately when the instructor ends the
+question or the quiz, so results are never read from a half-written room. A batch is one
+transaction: one locked read of the participants, one read of the responses
+they already have, one bulk INSERT, one bulk UPDATE of changed responses and
+one bulk UPDATE of participant totals, however many answers it holds.
+
+Crash safety. Flushing first moves the room's whole pending list to a
+processing list (an atomic RENAME), writes it, and only then deletes it. A
+worker that dies in between leaves the processing list behind, and the next
+flush of that room — the next answer, the end of the question, or the beat
+task that sweeps every room with anything pending — replays it first. Replay
+is harmless because totals move by the difference between an answer and the
+response row already stored for it: applied twice, the second time the
+difference is zero. Within a batch the latest answer to a question wins, as
+it always did.
+
+That same rule is also how a changed answer is scored now — by its
+difference from the stored one, rather than by recounting every response — so
+a violation penalty taken off the total in between is no longer undone.
+
+The lists live in Redis when there is one (core.shared_redis), so whichever
+worker flushes drains every worker's answers.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from apps.core import db_pool, shared_redis
+
+logger = logging.getLogger(__name__)
+
+LOCK_TTL = 30               # a flush that takes longer is presumed dead
+DEAD_TTL = 7 * 24 * 3600    # answers that could not be written, kept for a look
+LOCK_POLL = 0.05            # seconds between attempts on a room another worker holds
+KEY_PREFIX = 'live_answers:'
+ROOMS_KEY = 'live_answers:rooms'
+
+_RESPONSE_FIELDS = (
+    'answer_text', 'code_submission', 'test_results',
+    'is_correct', 'points_earned', 'response_time_seconds',
+)
+_TOTAL_FIELDS = ('total_score', 'total_correct', 'total_attempted', 'average_response_time')
+
+
+def _interval() -> float:
+    return getattr(settings, 'LIVE_ANSWER_FLUSH_INTERVAL', 1.0)
+
+
+class _MemoryBuffer:
+    """In-process stand-in for the Redis lists."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._pending: dict[str, list[str]] = {}
+            self._processing: dict[str, list[str]] = {}
+            self._dead: dict[str, list[str]] = {}
+            self._flushing: set[str] = set()
+
+    def push(self, room, item):
+        with self._lock:
+            self._pending.setdefault(room, []).append(item)
+
+    def lock(self, room):
+        with self._lock:
+            if room in self._flushing:
+                return False
+            self._flushing.add(room)
+            return True
+
+    def unlock(self, room):
+        with self._lock:
+            self._flushing.discard(room)
+
+    def claim(self, room):
+        with self._lock:
+            if not self._processing.get(room):
+                self._processing[room] = self._pending.pop(room, [])
+            return list(self._processing[room])
+
+    def done(self, room):
+        with self._lock:
+            self._processing.pop(room, None)
+
+    def bury(self, room, items):
+        with self._lock:
+            self._dead.setdefault(room, []).extend(items)
+
+    def dead(self, room):
+        with self._lock:
+            return list(self._dead.get(room, []))
+
+    def rooms(self):
+        with self._lock:
+            return {r for r, items in (*self._pending.items(), *self._processing.items()) if items}
+
+
+class _RedisBuffer:
+    """A pending and a processing list per room in the shared Redis."""
+
+    def __init__(self, client):
+        self.r = client
+
+    def reset(self):
+        keys = list(self.r.scan_iter(f'{KEY_PREFIX}*'))
+        if keys:
+            self.r.delete(*keys)
+
+    def push(self, room, item):
+        pipe = self.r.pipeline(transaction=False)
+        pipe.rpush(f'{KEY_PREFIX}{room}', item)
+        pipe.sadd(ROOMS_KEY, room)
+        pipe.execute()
+
+    def lock(self, room):
+        return bool(self.r.set(f'{KEY_PREFIX}{room}:flushing', 1, nx=True, ex=LOCK_TTL))
+
+    def unlock(self, room):
+        self.r.delete(f'{KEY_PREFIX}{room}:flushing')
+
+    def claim(self, room):
+        pending, processing = f'{KEY_PREFIX}{room}', f'{KEY_PREFIX}{room}:processing'
+        if not self.r.exists(processing):
+            # RENAMENX: moves everything pushed so far in one step, and never
+            # over a processing list a crashed flush left behind.
+            try:
+                self.r.renamenx(pending, processing)
+            except Exception:
+                return []       # "no such key": nothing is pending
+        return [i.decode() if isinstance(i, bytes) else i
+                for i in self.r.lrange(processing, 0, -1)]
+
+    def done(self, room):
+        self.r.eval(_DONE, 3, f'{KEY_PREFIX}{room}:processing',
+                    f'{KEY_PREFIX}{room}', ROOMS_KEY, room)
+
+    def bury(self, room, items):
+        key = f'{KEY_PREFIX}{room}:dead'
+        pipe = self.r.pipeline(transaction=False)
+        pipe.rpush(key, *items)
+        pipe.expire(key, DEAD_TTL)
+        pipe.execute()
+
+    def dead(self, room):
+        return [i.decode() if isinstance(i, bytes) else i
+                for i in self.r.lrange(f'{KEY_PREFIX}{room}:dead', 0, -1)]
+
+    def rooms(self):
+        return {m.decode() if isinstance(m, bytes) else m for m in self.r.smembers(ROOMS_KEY)}
+
+
+# Drop the processing list and, if nothing new is pending, the room from the
+# set the beat task sweeps — in one step, so a push in between cannot be
+# left out of that set.
+_DONE = """
+redis.call('DEL', KEYS[1])
+if redis.call('LLEN', KEYS[2]) == 0 then
+    redis.call('SREM', KEYS[3], ARGV[1])
+end
+"""
+
+
+_memory = _MemoryBuffer()
+_scheduled: set[str] = set()
+
+
+def _buffer():
+    r = shared_redis.client()
+    return _memory if r is None else _RedisBuffer(r)
+
+
+def record(join_code: str, session_id: str, participant_id, question_id, *,
+           is_correct: bool, points_earned: int, response_time: float,
+           answer_text: str = '', code_submission: str = '', test_results=None) -> None:
+    """Buffer one scored answer. The caller schedules the flush (schedule_flush)."""
+    _buffer().push(join_code, json.dumps({
+        'session_id': str(session_id),
+        'participant_id': str(participant_id),
+        'question_id': str(question_id),
+        'answer_text': answer_text,
+        'code_submission': code_submission,
+        'test_results': test_results if test_results is not None else {},
+        'is_correct': bool(is_correct),
+        'points_earned': int(points_earned),
+        'response_time_seconds': float(response_time),
+    }))
+
+
+async def schedule_flush(join_code: str) -> None:
+    """Flush this room LIVE_ANSWER_FLUSH_INTERVAL from now, unless one is already due."""
+    if join_code in _scheduled:
+        return
+    _scheduled.add(join_code)
+
+    def due():
+        _scheduled.discard(join_code)
+        asyncio.ensure_future(flush_async(join_code))
+
+    asyncio.get_running_loop().call_later(_interval(), due)
+
+
+async def flush_async(join_code: str, wait: float = 0.0) -> list[str]:
+    """flush() off the event loop, then tell the instructor monitor who changed.
+
+    Waiting on another worker's flush happens here, on the event loop: each
+    attempt on the pool returns at once, so a room held elsewhere never ties up
+    one of db_pool's few threads (under SQLite, the only one).
+    """
+    from . import live_monitor
+
+    deadline = time.monotonic() + wait
+    try:
+        while True:
+            changed = await db_pool.run(flush, join_code)
+            if changed is not None or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(LOCK_POLL)
+    except Exception:
+        logger.exception('flushing answers for quiz %s failed; kept for replay', join_code)
+        return []
+    if changed is None:
+        # Another worker holds the room. It may have claimed before our
+        # answers arrived, so look again rather than leave them for the beat.
+        await schedule_flush(join_code)
+        return []
+    for participant_id in changed:
+        await live_monitor.changed(join_code, participant_id)
+    return changed
+
+
+def flush(join_code: str, wait: float = 0.0) -> list[str] | None:
+    """
+    Write the room's buffered answers. The participant ids whose totals changed,
+    or None if another worker was flushing the room for longer than `wait`
+    seconds. Raises if the write fails; the batch stays behind for replay.
+
+    Blocks for up to `wait`, so only synchronous callers (the end-of-quiz view)
+    pass one; consumers wait in flush_async instead.
+    """
+    buffer = _buffer()
+    deadline = time.monotonic() + wait
+    while not buffer.lock(join_code):
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(LOCK_POLL)
+    try:
+        changed: set[str] = set()
+        # Twice at most: a leftover batch from a crashed flush, then what is pending.
+        for _ in range(2):
+            items = buffer.claim(join_code)
+            if not items:
+                break
+            changed |= _apply_batch(buffer, join_code, items)
+            buffer.done(join_code)
+        return sorted(changed)
+    finally:
+        buffer.unlock(join_code)
+
+
+# What one answer can fail on by itself: a row it refers to is gone (a question
+# deleted mid-quiz), a value the column will not take, a record that does not
+# parse. Anything else — the database unreachable, say — fails the batch and
+# keeps it for replay.
+def _bad_record_errors():
+    from django.db import DataError, IntegrityError
+    return (IntegrityError, DataError, KeyError, TypeError, ValueError)
+
+
+def _apply_batch(buffer, join_code: str, items: list[str]) -> set[str]:
+    """
+    _apply() the batch; if one bad answer sinks it, write the answers one at a
+    time and set aside those that fail.
+
+    The processing list is replayed before anything pending, so a batch that
+    fails the same way every time would hold every later answer in the room
+    behind it for good — answers the students were told had been received.
+    The ones that cannot be written go to a dead-letter list with an error
+    logged, and the rest of the room carries on.
+    """
+    bad = _bad_record_errors()
+    try:
+        return _apply([json.loads(i) for i in items])
+    except bad:
+        logger.warning('a buffered answer for quiz %s failed its batch; writing one at a time',
+                       join_code, exc_info=True)
+
+    changed: set[str] = set()
+    dead = []
+    for item in items:
+        try:
+            changed |= _apply([json.loads(item)])
+        except bad:
+            logger.error('cannot write buffered answer for quiz %s, set aside: %s',
+                         join_code, item, exc_info=True)
+            dead.append(item)
+    if dead:
+        buffer.bury(join_code, dead)
+    return changed
+
+
+def dead_letters(join_code: str) -> list[dict]:
+    """Answers for the room that could not be written (_apply_batch)."""
+    return [json.loads(i) for i in _buffer().dead(join_code)]
+
+
+def flush_all() -> int:
+    """Flush every room with anything buffered. For the beat task; rooms flushed."""
+    flushed = 0
+    for join_code in _buffer().rooms():
+        try:
+            flush(join_code)
+            flushed += 1
+        except Exception:
+            logger.exception('flushing answers for quiz %s failed; kept for replay', join_code)
+    return flushed
+
+
+def _is_uuid(value) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def _apply(records: list[dict]) -> set[str]:
+    from django.db import transaction
+    from .models import LiveQuizParticipant, LiveQuizResponse
+
+    latest = {}
+    for r in records:
+        if _is_uuid(r['participant_id']) and _is_uuid(r['question_id']):
+            latest[(r['participant_id'], r['question_id'])] = r   # later answers win
+        else:
+            # Would fail the query below on every replay and hold up the room.
+            logger.warning('dropping malformed buffered answer: %r', r)
+    if not latest:
+        return set()
+
+    with transaction.atomic():
+        participants = {
+            str(p.id): p for p in LiveQuizParticipant.objects.select_for_update().filter(
+                id__in={pid for pid, _ in latest})
+        }
+        stored = {
+            (str(r.participant_id), str(r.question_id)): r
+            for r in LiveQuizResponse.objects.filter(
+                participant_id__in=participants, question_id__in={qid for _, qid in latest})
+        }
+
+        creates, updates, touched = [], [], {}
+        for (pid, qid), r in latest.items():
+            p = participants.get(pid)
+            if p is None or str(p.session_id) != r['session_id']:
+                logger.warning('dropping buffered answer for %s: not in session %s', pid, r['session_id'])
+                continue
+            old = stored.get((pid, qid))
+            if old is None:
+                creates.append(LiveQuizResponse(
+                    participant_id=pid, question_id=qid, **{f: r[f] for f in _RESPONSE_FIELDS}))
+                p.total_attempted += 1
+                p.total_correct += int(r['is_correct'])
+                p.total_score += r['points_earned']
+                p.average_response_time = (
+                    p.average_response_time * (p.total_attempted - 1) + r['response_time_seconds']
+                ) / p.total_attempted
+            else:
+                if all(getattr(old, f) == r[f] for f in _RESPONSE_FIELDS):
+                    continue    # already written: a replay, or the same answer twice
+                p.total_correct += int(r['is_correct']) - int(old.is_correct)
+                # Floored at zero, as a violation penalty is (consumers._record_violation).
+                p.total_score = max(0, p.total_score + r['points_earned'] - old.points_earned)
+                if p.total_attempted:
+                    p.average_response_time += (
+                        r['response_time_seconds'] - old.response_time_seconds
+                    ) / p.total_attempted
+                for f in _RESPONSE_FIELDS:
+                    setattr(old, f, r[f])
+                updates.append(old)
+            touched[pid] = p
+
+        if creates:
+            LiveQuizResponse.objects.bulk_create(creates)
+        if updates:
+            LiveQuizResponse.objects.bulk_update(updates, list(_RESPONSE_FIELDS))
+        if touched:
+            LiveQuizParticipant.objects.bulk_update(list(touched.values()), list(_TOTAL_FIELDS))
+    return set(touched)
+
+
+def reset() -> None:
+    """Drop everything buffered without writing it. For tests."""
+    _buffer().reset()
+    _scheduled.clear()
@@ -8,3 +8,6 @@ class LearningConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.learning'
     verbose_name = 'Learning'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (catalog cache versioning)
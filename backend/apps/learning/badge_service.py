@@ -32,6 +32,7 @@ def check_and_grant_badges(user, trigger_type: str, current_count: int) -> list[
     Returns:
         List of badge names newly earned (empty if none).
     """
+    from .leaderboard_service import record_badge
     from .models import BadgeDefinition, UserBadge
 
     newly_earned: list[str] = []
@@ -49,11 +50,12 @@ def check_and_grant_badges(user, trigger_type: str, current_count: int) -> list[
 
     for badge in candidates:
         try:
-            UserBadge.objects.create(
+            user_badge = UserBadge.objects.create(
                 user=user,
                 badge=badge,
                 context_note=f"Reached {current_count} {trigger_type.replace('_', ' ')}"
             )
+            record_badge(user, user_badge)
             newly_earned.append(badge.name)
             logger.info(f"[BADGE] {user.username} earned '{badge.name}'")
         except Exception as e:
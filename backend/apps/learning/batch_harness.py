@@ -0,0 +1,282 @@
+"""
+Running every test case of a submission in ONE sandbox execution.
+
+Piston has no compile-once API, so the per-case path pays an HTTP round trip
+per test — and a full compile per test for C++. Here the submission is sent
+once, together with a small driver that runs it against each input in turn and
+reports one line per case:
+
+    @@ccis@@ 3f9c...e1 {"i": 0, "out": "...", "err": "...", "rc": 0, "sig": 0, "ms": 12}
+
+`sig` is the number of the signal that ended the case, 0 if it exited.
+
+The records are only worth anything if the submission cannot write them. A
+fixed marker could be printed by the student's code itself — from Python or
+JavaScript module top level to the driver's stdout through /proc/<ppid>/fd/1,
+or from a C++ static initializer, which runs inside the harness binary before
+its main — passing every case, the hardcode probes included. So each
+execution gets a random nonce (nonce()), generated here and handed to the
+driver on the sandbox's stdin, and only lines carrying it count. The driver
+reads it before any student code runs; it is never in a file, an argument or
+the environment the student's process can see, and the student's process gets
+stdin of its own. In C++ the driver is a static initializer placed ahead of
+the student's source, so it has the nonce and has forked away every case
+before any of the student's initializers run; the forked child wipes its copy
+of the nonce before running the submission, and the parent writes records with
+write(2) rather than stdio, so no FILE buffer the child inherits ever held it.
+The student's main is left as written, implicit `return 0` included. A case
+reported twice is not
+trusted either way and is re-run alone, like a missing one.
+
+Each case still runs as its own process, so no state leaks from one test into
+the next and an `exit()` ends only that case: Python and JavaScript re-run the
+interpreter on the solution file, C++ forks the already-compiled binary.
+
+The batch is an optimisation and never the only way to a verdict. Piston caps a
+whole execution at the run timeout and the output size; if a slow case or a
+noisy program gets the batch killed, every case without a line is re-run on its
+own, where it gets the full limits it would have had anyway. Java is not
+batched — its runtime has no process to fork and no second interpreter to
+spawn cheaply — and goes through the per-case path unchanged.
+"""
+import json
+import logging
+import secrets
+
+logger = logging.getLogger(__name__)
+
+MARKER = '@@ccis@@ '
+MAX_OUTPUT_BYTES = 16_384
+
+SUPPORTED = {'python', 'javascript', 'cpp'}
+
+
+def build(language: str, source: str, stdins: list) -> list | None:
+    """
+    The Piston `files` list for one batched execution, entry point first.
+    None when the language is not batched.
+    """
+    if language == 'python':
+        return [
+            {'name': 'driver.py', 'content': _python_driver(stdins)},
+            {'name': 'solution.py', 'content': source},
+        ]
+    if language == 'javascript':
+        return [
+            {'name': 'driver.js', 'content': _javascript_driver(stdins)},
+            {'name': 'solution.js', 'content': source},
+        ]
+    if language == 'cpp':
+        return [{'name': 'solution.cpp', 'content': _cpp_program(source, stdins)}]
+    return None
+
+
+def nonce() -> str:
+    """A fresh secret for one execution; send it as the sandbox's stdin."""
+    return secrets.token_hex(16)
+
+
+def parse(stdout: str, nonce: str, count: int) -> dict:
+    """{case index: record} for every complete line the driver got out.
+
+    Only lines carrying this execution's nonce, and only indexes below
+    `count`. An index reported more than once is dropped: something other
+    than the driver wrote one of them, and the case is re-run alone.
+    """
+    prefix = f'{MARKER}{nonce} '
+    records, seen = {}, set()
+    for line in stdout.splitlines():
+        if not line.startswith(prefix):
+            continue
+        try:
+            record = json.loads(line[len(prefix):])
+            index = int(record['i'])
+        except (ValueError, KeyError, TypeError):
+            # A line cut off by the output cap. Its case is re-run alone.
+            continue
+        if not 0 <= index < count:
+            continue
+        if index in seen:
+            logger.warning('batched execution reported case %d twice; re-running it alone', index)
+            records.pop(index, None)
+            continue
+        seen.add(index)
+        records[index] = record
+    return records
+
+
+def _python_driver(stdins: list) -> str:
+    return f'''import json, subprocess, sys, time
+
+# First, before any student code runs; the solution gets stdin of its own.
+NONCE = sys.stdin.readline().strip()
+CASES = json.loads({json.dumps(json.dumps(stdins))})
+LIMIT = {MAX_OUTPUT_BYTES}
+
+for i, stdin in enumerate(CASES):
+    started = time.monotonic()
+    proc = subprocess.run([sys.executable, 'solution.py'], input=stdin.encode(),
+                          capture_output=True)
+    print({MARKER!r} + NONCE + ' ' + json.dumps({{
+        'i': i,
+        'out': proc.stdout.decode(errors='replace')[:LIMIT],
+        'err': proc.stderr.decode(errors='replace')[:LIMIT],
+        'rc': max(proc.returncode, 0),
+        'sig': max(-proc.returncode, 0),
+        'ms': int((time.monotonic() - started) * 1000),
+    }}), flush=True)
+'''
+
+
+def _javascript_driver(stdins: list) -> str:
+    return f'''const {{ spawnSync }} = require('child_process');
+const {{ constants }} = require('os');
+
+// First, before any student code runs; the solution gets stdin of its own.
+const NONCE = require('fs').readFileSync(0, 'utf8').trim();
+const CASES = {json.dumps(stdins)};
+const LIMIT = {MAX_OUTPUT_BYTES};
+
+CASES.forEach((stdin, i) => {{
+    const started = Date.now();
+    const proc = spawnSync(process.execPath, ['solution.js'], {{
+        input: stdin, maxBuffer: 4 * LIMIT,
+    }});
+    process.stdout.write({json.dumps(MARKER)} + NONCE + ' ' + JSON.stringify({{
+        i,
+        out: (proc.stdout || '').toString().slice(0, LIMIT),
+        err: (proc.stderr || '').toString().slice(0, LIMIT),
+        rc: proc.status || 0,
+        sig: proc.signal ? constants.signals[proc.signal] : 0,
+        ms: Date.now() - started,
+    }}) + '\\n');
+}});
+'''
+
+
+def _c_literal(text: str) -> str:
+    # Octal escapes are fixed-width, so no following character can be read as
+    # part of one (which is exactly what goes wrong with \\x escapes).
+    return '"' + ''.join(f'\\{b:03o}' for b in text.encode()) + '"'
+
+
+def _cpp_program(source: str, stdins: list) -> str:
+    inputs = ',\n    '.join(_c_literal(s) for s in stdins) or '""'
+    lengths = ', '.join(str(len(s.encode())) for s in stdins) or '0'
+    # The supervisor runs from the first dynamic initializer in the file, ahead
+    # of the student's source: it reads the nonce, forks one child per case and
+    # never returns in the parent. Each child wipes the nonce, returns, and only
+    # then do the student's initializers and their own, untouched main run,
+    # with stdin and stdout redirected to the case's files.
+    #
+    # The parent never touches stdio: a child inherits its memory, and a FILE
+    # buffer keeps every byte written through it after a flush. The nonce is
+    # read and written with read(2)/write(2) straight from the one array each
+    # child wipes, and the rest of a record is built in a std::string that
+    # never holds it.
+    return f'''#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <string>
+#include <fcntl.h>
+#include <sys/time.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+static const char *__ccis_inputs[] = {{
+    {inputs}
+}};
+static const size_t __ccis_lengths[] = {{ {lengths} }};
+static const int __ccis_count = {len(stdins)};
+static const size_t __ccis_limit = {MAX_OUTPUT_BYTES};
+
+static void __ccis_write_file(const char *path, const char *data, size_t n) {{
+    FILE *f = fopen(path, "wb");
+    if (f) {{ fwrite(data, 1, n, f); fclose(f); }}
+}}
+
+static std::string __ccis_read_file(const char *path) {{
+    std::string s;
+    FILE *f = fopen(path, "rb");
+    if (!f) return s;
+    char buf[4096];
+    size_t n;
+    while ((n = fread(buf, 1, sizeof buf, f)) > 0 && s.size() < __ccis_limit) s.append(buf, n);
+    fclose(f);
+    if (s.size() > __ccis_limit) s.resize(__ccis_limit);
+    return s;
+}}
+
+static void __ccis_json_string(std::string &out, const std::string &s) {{
+    out += '"';
+    for (unsigned char c : s) {{
+        char escaped[8];
+        if (c == '"' || c == '\\\\') {{ out += '\\\\'; out += (char) c; }}
+        else if (c == '\\n') out += "\\\\n";
+        else if (c == '\\t') out += "\\\\t";
+        else if (c == '\\r') out += "\\\\r";
+        else if (c < 0x20) {{ snprintf(escaped, sizeof escaped, "\\\\u%04x", c); out += escaped; }}
+        else out += (char) c;
+    }}
+    out += '"';
+}}
+
+static void __ccis_emit(const char *data, size_t n) {{
+    while (n > 0) {{
+        ssize_t wrote = write(1, data, n);
+        if (wrote <= 0) return;
+        data += wrote;
+        n -= wrote;
+    }}
+}}
+
+static int __ccis_supervise() {{
+    char nonce[80];
+    size_t got = 0;
+    while (got < sizeof nonce - 1) {{
+        ssize_t n = read(0, nonce + got, 1);
+        if (n <= 0 || nonce[got] == '\\n') break;
+        got += n;
+    }}
+    nonce[got] = 0;
+
+    for (int i = 0; i < __ccis_count; ++i) {{
+        __ccis_write_file(".ccis_in", __ccis_inputs[i], __ccis_lengths[i]);
+        struct timeval t0, t1;
+        gettimeofday(&t0, nullptr);
+        pid_t pid = fork();
+        if (pid == 0) {{
+            // Nothing of the nonce may outlive this point in the child.
+            volatile char *wipe = nonce;
+            for (size_t k = 0; k < sizeof nonce; ++k) wipe[k] = 0;
+            int in = open(".ccis_in", O_RDONLY);
+            int out = open(".ccis_out", O_WRONLY | O_CREAT | O_TRUNC, 0600);
+            int err = open(".ccis_err", O_WRONLY | O_CREAT | O_TRUNC, 0600);
+            dup2(in, 0); dup2(out, 1); dup2(err, 2);
+            close(in); close(out); close(err);
+            return 0;
+        }}
+        int status = 0;
+        waitpid(pid, &status, 0);
+        gettimeofday(&t1, nullptr);
+        long ms = (t1.tv_sec - t0.tv_sec) * 1000 + (t1.tv_usec - t0.tv_usec) / 1000;
+        int rc = WIFEXITED(status) ? WEXITSTATUS(status) : 0;
+        int sig = WIFSIGNALED(status) ? WTERMSIG(status) : 0;
+        std::string record = "{{\\"i\\": " + std::to_string(i) + ", \\"out\\": ";
+        __ccis_json_string(record, __ccis_read_file(".ccis_out"));
+        record += ", \\"err\\": ";
+        __ccis_json_string(record, __ccis_read_file(".ccis_err"));
+        record += ", \\"rc\\": " + std::to_string(rc) + ", \\"sig\\": " + std::to_string(sig)
+                + ", \\"ms\\": " + std::to_string(ms) + "}}\\n";
+        __ccis_emit("{MARKER}", {len(MARKER)});
+        __ccis_emit(nonce, got);
+        __ccis_emit(" ", 1);
+        __ccis_emit(record.data(), record.size());
+    }}
+    _exit(0);
+}}
+
+static int __ccis_boot = __ccis_supervise();
+
+{source}
+'''
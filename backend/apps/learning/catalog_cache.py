@@ -0,0 +1,135 @@
+"""
+The course catalog, served from the cache instead of rebuilt per request.
+
+Career paths, modules, the career map and the badge list change when an
+admin edits them or a seed/import command runs — a few times a term — and are
+read on every page load: the catalog, a path's module list, the mentor's
+course context. Each of those reads was the same few annotated queries, a long
+round trip away, producing the same JSON as the request before it.
+
+So the serialized output is cached, under a key that carries a catalog version:
+
+  * the version is one value in the shared cache, bumped (bump()) whenever a
+    catalog row is saved or deleted (signals.py) and at the end of every
+    seed/import command, which also cover bulk .update() calls that send no
+    signal;
+  * a bump does not delete anything — every entry is keyed by the version it
+    was built under, so the old ones simply stop being asked for and expire;
+  * an entry is also dropped after CATALOG_CACHE_TTL seconds, which bounds
+    what the version does not track: enrolled_count moves with every
+    enrollment, and bumping the whole catalog on each one would make the
+    cache useless on the busiest days. It may lag by that long.
+
+Responses carry an ETag (a hash of the body), and a request whose
+If-None-Match matches gets a 304 with no body — the catalog screens are
+revisited far more often than they change.
+
+Anything per-user — "am I enrolled", "have I earned it" — is laid over the
+cached part after it is read, never stored in it. Entries are keyed by the full
+request URL, host and query string included: absolute file URLs and
+pagination links are part of the cached body.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'catalog:'
+VERSION_KEY = 'catalog:version'
+
+
+def _ttl() -> int:
+    return getattr(settings, 'CATALOG_CACHE_TTL', 300)
+
+
+def version() -> int:
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        # A clock reading rather than 1: if the key is ever evicted, starting
+        # again at 1 could bring back entries built under an earlier 1.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def _set_version() -> None:
+    try:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    except Exception as e:
+        logger.warning(f"[CATALOG] Could not bump the catalog version: {e}")
+
+
+def bump() -> None:
+    """Retire every cached catalog entry.
+
+    Bumped now, so the rest of this transaction reads its own writes, and again
+    once it commits: a request that read the old rows between the two would
+    otherwise have cached them under the new version.
+    """
+    _set_version()
+    transaction.on_commit(_set_version)
+
+
+def _etag(data) -> str:
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+
+
+def _entry(name: str, key: str, build):
+    """(etag, data) for this entry, built and stored if missing."""
+    ttl = _ttl()
+    if ttl <= 0:
+        data = build()
+        return _etag(data), data
+    cache_key = f'{KEY_PREFIX}{version()}:{name}:{hashlib.sha1(key.encode()).hexdigest()}'
+    entry = cache.get(cache_key)
+    if entry is None:
+        data = build()
+        entry = (_etag(data), data)
+        cache.set(cache_key, entry, ttl)
+    return entry
+
+
+def memo(name: str, build, key: str = ''):
+    """The catalog data `build()` returns, cached until the catalog changes.
+
+    Every backend pickles, so what comes back is the caller's own copy.
+    """
+    return _entry(name, key, build)[1]
+
+
+def respond(request, name: str, build, overlay=None) -> Response:
+    """A response for this catalog request, 304 if the client's copy is current.
+
+    build() returns the response data; it is called only on a miss, and
+    whatever it raises (a 404, say) is raised unchanged and nothing is cached.
+    overlay(data), if given, returns the body with this user's part added.
+    """
+    etag, data = _entry(name, request.build_absolute_uri(), build)
+    if overlay is not None:
+        data = overlay(data)
+        etag = _etag(data)
+
+    client = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in client or etag in client or f'W/{etag}' in client:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    # Revalidate every time: a stale catalog must not outlive an edit in a
+    # browser cache any more than in ours.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,186 @@
+"""
+Grading coding-challenge Run and Submit on the Celery worker.
+
+Both endpoints used to call CodeExecutor inside the request. Daphne serves the
+whole site from one process, so a submission's seconds of test cases were
+seconds of everyone else's pages not loading — the problem the lab already
+solved (apps/lab/tasks.py). This uses the lab's bookkeeping as is
+(apps/lab/execution.py): the request books a run and returns its place in the
+queue, the worker grades it, and the browser polls the run until it is done.
+Pressing Submit again while a previous attempt is still queued supersedes it,
+which is what keeps a slow queue from filling up with retries.
+
+All challenge runs share one queue, keyed on QUEUE where a lab's would be on
+the lab, and take their turn with the labs (apps/lab/scheduler.py). The
+"participant" is the student on one challenge, doing one thing: a Run replaces
+their queued Run and a Submit their queued Submit, on that challenge only. A
+Run pressed while a Submit waits must not cancel it — the Submit is the one
+that counts — and neither should anything done on another challenge.
+
+The submission row, the challenge counters, leaderboard points and badges are
+all written here, on the worker, once the result is known. A superseded
+attempt never ran and leaves nothing behind.
+"""
+import logging
+import time
+
+from apps.lab import execution
+
+logger = logging.getLogger(__name__)
+
+QUEUE = 'challenges'
+
+
+def participant_key(user, challenge_id, purpose: str) -> str:
+    return f'challenge-user:{user.pk}:{challenge_id}:{purpose}'
+
+
+def start(user, challenge, *, language: str, code: str, purpose: str) -> dict:
+    """Book a Run ('run') or Submit ('submit') and queue it for the worker."""
+    from .tasks import grade_challenge
+
+    record = execution.start(
+        lab_id=QUEUE, participant_id=participant_key(user, challenge.pk, purpose),
+        language=language, code=code, problem_id=challenge.pk,
+        purpose=purpose, user_id=user.pk)
+    grade_challenge.delay(record['id'])
+    return execution.get(record['id'])
+
+
+def grade_run(challenge, language: str, code: str) -> dict:
+    """Public test cases only; stops at the first failure."""
+    from .code_executor import CodeExecutor
+
+    result = CodeExecutor().run_public_only(language, code, challenge.test_cases or [])
+    return {
+        'status': 'run_complete',
+        'passed': result.get('passed', 0),
+        'total': result.get('total', 0),
+        'results': result.get('results', []),
+    }
+
+
+def _submission_status(result: dict) -> str:
+    passed = result.get('passed', 0)
+    if result.get('all_passed', False):
+        return 'accepted'
+    if result.get('status') == 'hardcoded_output':
+        # Output matched but wasn't computed from the input — don't let
+        # passing no-input tests dress this up as a partial solution.
+        return 'wrong_answer'
+    if passed > 0:
+        return 'partial'
+    if any(r.get('error') == 'timeout' for r in result.get('results', [])):
+        return 'timeout'
+    if any(r.get('error') in ('compilation_error', 'runtime_error') for r in result.get('results', [])):
+        return 'error'
+    return 'wrong_answer'
+
+
+def _safe_results(result: dict) -> list:
+    """Per-test results for the browser, with hidden test details removed."""
+    safe_results = []
+    for r in result.get('results', []):
+        entry = {
+            'test_case_index': r.get('test_case_index', 0),
+            'passed': r.get('passed', False),
+            'error': r.get('error'),
+        }
+        if not r.get('is_hidden', False):
+            entry['stdout'] = r.get('stdout', '')
+            entry['stderr'] = r.get('stderr', '')
+            entry['expected'] = r.get('expected', '')
+        else:
+            entry['is_hidden'] = True
+        safe_results.append(entry)
+    return safe_results
+
+
+def grade_submission(user, challenge, language: str, code: str) -> dict:
+    """Grade against every test case, record the submission, award points."""
+    from .code_executor import CodeExecutor
+    from .models import CodingSubmission
+
+    submission = CodingSubmission.objects.create(
+        user=user,
+        challenge=challenge,
+        language=language,
+        code=code,
+        status='running',
+        total_tests=len(challenge.test_cases or []),
+    )
+
+    try:
+        start_time = time.time()
+        result = CodeExecutor().run(language, code, challenge.test_cases or [])
+        elapsed_ms = int((time.time() - start_time) * 1000)
+    except Exception as e:
+        logger.error(f'Code execution failed for challenge {challenge.slug}: {e}')
+        submission.status = 'error'
+        submission.results_json = [{'error': str(e)}]
+        submission.save()
+        return {
+            'submission_id': str(submission.id),
+            'status': 'error',
+            'error': 'Code execution failed. Please try again.',
+        }
+
+    passed = result.get('passed', 0)
+    total = result.get('total', 0)
+    all_passed = result.get('all_passed', False)
+    sub_status = _submission_status(result)
+
+    # Calculate points
+    points = 0
+    if all_passed:
+        points = challenge.points
+    elif total > 0:
+        points = int(challenge.points * passed / total * 0.5)  # Partial credit = 50% weight
+
+    safe_results = _safe_results(result)
+
+    submission.status = sub_status
+    submission.passed_tests = passed
+    submission.results_json = safe_results
+    submission.execution_time_ms = elapsed_ms
+    submission.points_earned = points
+    submission.save()
+
+    # Update challenge stats (acceptance_rate is a @property, computed automatically)
+    challenge.total_attempts += 1
+    if all_passed:
+        prev_accepted = CodingSubmission.objects.filter(
+            user=user, challenge=challenge, status='accepted'
+        ).exclude(id=submission.id).exists()
+        if not prev_accepted:
+            challenge.total_solved += 1
+    challenge.save(update_fields=['total_attempts', 'total_solved'])
+
+    # Update leaderboard score (non-fatal)
+    newly_earned_badges = []
+    if sub_status == 'accepted':
+        try:
+            from .leaderboard_service import record_challenge_solved
+            record_challenge_solved(user, challenge)
+        except Exception as lb_err:
+            logger.warning(f'Leaderboard update failed (non-fatal): {lb_err}')
+
+        # Grant badges for challenge completion
+        try:
+            from .badge_service import grant_badges_after_challenge
+            newly_earned_badges = grant_badges_after_challenge(
+                user, time_seconds=elapsed_ms // 1000
+            )
+        except Exception as badge_err:
+            logger.warning(f'Badge grant failed (non-fatal): {badge_err}')
+
+    return {
+        'submission_id': str(submission.id),
+        'status': sub_status,
+        'passed_tests': passed,
+        'total_tests': total,
+        'points_earned': points,
+        'execution_time_ms': elapsed_ms,
+        'results': safe_results,
+        'badges_earned': newly_earned_badges,
+    }
@@ -14,6 +14,14 @@ Security (best-effort, NOT a true sandbox):
 
 Performance improvement (v2):
   - Java and C++ are compiled ONCE per submission, not once per test case.
+  - In the sandbox, all test cases (and the hardcode probes) go out as one
+    batched execution where the language allows it — see batch_harness.py.
+  - Otherwise test cases run side by side, CODE_EXEC_CONCURRENCY at a time,
+    so a submission takes about as long as its slowest test, not their sum.
+  - A verdict is cached by content (execution_cache.py), so unchanged code
+    against unchanged tests is not executed twice.
+  - Optionally, local Python runs fork from a warm worker instead of paying
+    interpreter startup per test case (warm_pool.py).
 """
 
 import subprocess
@@ -22,6 +30,8 @@ import os
 import re
 import sys
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 logger = logging.getLogger(__name__)
@@ -30,6 +40,10 @@ TIMEOUT = 5        # seconds per test case execution
 COMPILE_TIMEOUT = 15  # seconds for compilation step
 MAX_OUTPUT_BYTES = 16_384  # 16 KB
 
+# How the sandbox reports a case it had to kill: SIGKILL, SIGTERM, SIGXCPU.
+# The same set piston.execute treats as a timeout for a single run.
+_KILL_SIGNALS = {9, 15, 24}
+
 
 def _sandbox_env() -> dict:
     """
@@ -51,24 +65,20 @@ def _sandbox_env() -> dict:
     return env
 
 
-def _posix_cpu_limit():
+def _cpu_limited(cmd: list) -> list:
     """
-    Return a preexec_fn that caps child CPU time on POSIX, or None elsewhere.
+    Wrap a run command so the child's CPU time is capped on POSIX.
 
     A wall-clock timeout can be dodged by code that spawns work or blocks; a
-    CPU-time rlimit sends SIGXCPU when the cap is exceeded. Not available on
-    Windows (no os.fork / resource module), where we rely on the wall-clock
-    timeout alone.
+    CPU-time rlimit sends SIGXCPU when the cap is exceeded. The limit is set by
+    a shell that then execs the program, rather than in a preexec_fn: test
+    cases run on a thread pool, and preexec_fn is not safe with threads (the
+    forked child can deadlock on a lock another thread held). Not available on
+    Windows, where we rely on the wall-clock timeout alone.
     """
     if os.name != 'posix':
-        return None
-    import resource  # POSIX-only
-
-    def _set_limits():
-        cpu = TIMEOUT + 2
-        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
-
-    return _set_limits
+        return cmd
+    return ['/bin/sh', '-c', f'ulimit -t {TIMEOUT + 2} && exec "$@"', 'sh', *cmd]
 
 # Language → (file extension, run command template)
 LANG_CONFIG = {
@@ -109,8 +119,14 @@ class CodeExecutor:
         ]
     """
 
-    def run(self, language: str, code: str, test_cases: list) -> dict:
-        """Execute code against all test cases and return aggregated results."""
+    def run(self, language: str, code: str, test_cases: list,
+            stop_on_first_failure: bool = False) -> dict:
+        """Execute code against all test cases and return aggregated results.
+
+        With stop_on_first_failure, cases after the first failing one are
+        reported as 'skipped' rather than graded — enough for "Run", which only
+        needs to show the student where they went wrong.
+        """
         if not test_cases:
             return {
                 'passed': 0,
@@ -135,6 +151,23 @@ class CodeExecutor:
         # Auto-wrap student code with I/O harness (LeetCode-style)
         wrapped_code = self._auto_wrap(lang, code)
 
+        # The same code against the same tests has a verdict already — Run
+        # pressed twice, a room of unchanged starter code.
+        from apps.learning import execution_cache
+        cache_key = execution_cache.key(
+            lang, wrapped_code, test_cases,
+            submitted=code, stop_on_first_failure=stop_on_first_failure)
+        cached = execution_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        result = self._grade(lang, config, code, wrapped_code, test_cases, stop_on_first_failure)
+        execution_cache.put(cache_key, result)
+        return result
+
+    def _grade(self, lang: str, config: dict, code: str, wrapped_code: str,
+               test_cases: list, stop_on_first_failure: bool) -> dict:
+        """Compile, run every case, then apply the anti-hardcode gate."""
         # Use a single temp directory for the entire submission
         with tempfile.TemporaryDirectory() as tmpdir:
             # Write source file
@@ -169,14 +202,15 @@ class CodeExecutor:
             run_cmd = self._build_run_cmd(lang, config, src_path, tmpdir)
 
             # Run each test case
-            results = []
-            for i, tc in enumerate(test_cases):
-                result = self._run_single_with_cmd(
-                    run_cmd, tc.get('input', ''), tc.get('expected_output', ''), tmpdir
-                )
+            results = self._run_many(
+                run_cmd,
+                [(tc.get('input', ''), tc.get('expected_output', '')) for tc in test_cases],
+                tmpdir,
+                stop_on_failure=stop_on_first_failure,
+            )
+            for i, (result, tc) in enumerate(zip(results, test_cases)):
                 result['test_case_index'] = i
                 result['is_hidden'] = tc.get('is_hidden', False)
-                results.append(result)
 
             passed = sum(1 for r in results if r['passed'])
             status = 'completed'
@@ -211,10 +245,25 @@ class CodeExecutor:
             'results': results,
         }
 
+    async def run_async(self, language: str, code: str, test_cases: list,
+                        stop_on_first_failure: bool = False) -> dict:
+        """
+        run() for async callers (Channels consumers), on a thread of its own.
+
+        Not database_sync_to_async: that queues onto the single thread Django
+        serialises ORM work from async code on, so a slow submission would hold
+        up every other consumer's queries. run() does no ORM work, so it does
+        not need that thread.
+        """
+        from asgiref.sync import sync_to_async
+
+        return await sync_to_async(self.run, thread_sensitive=False)(
+            language, code, test_cases, stop_on_first_failure)
+
     def run_public_only(self, language: str, code: str, test_cases: list) -> dict:
         """Run against public (non-hidden) test cases only — used by the 'Run' endpoint."""
         public_tests = [tc for tc in test_cases if not tc.get('is_hidden', False)]
-        return self.run(language, code, public_tests)
+        return self.run(language, code, public_tests, stop_on_first_failure=True)
 
     def _run_single_with_cmd(self, cmd, stdin_data: str, expected: str, cwd: str) -> dict:
         """Run one test case using an already-compiled command.
@@ -227,19 +276,25 @@ class CodeExecutor:
         if isinstance(cmd, dict) and cmd.get('sandbox'):
             return self._run_single_sandboxed(cmd, stdin_data, expected)
 
+        from apps.learning import warm_pool
+
         try:
-            proc = subprocess.run(
-                cmd,
-                input=stdin_data,
-                capture_output=True,
-                text=True,
-                timeout=TIMEOUT,
-                cwd=cwd,
-                env=_sandbox_env(),   # never inherit the server's secrets
-                preexec_fn=_posix_cpu_limit(),
-            )
-            stdout = proc.stdout[:MAX_OUTPUT_BYTES]
-            stderr = proc.stderr[:MAX_OUTPUT_BYTES]
+            # A warm worker when the pool is on (Python only); None means run
+            # the command directly.
+            proc = warm_pool.run(cmd, stdin_data, cwd, TIMEOUT) if warm_pool.handles(cmd) else None
+            if proc is None:
+                completed = subprocess.run(
+                    _cpu_limited(cmd),
+                    input=stdin_data,
+                    capture_output=True,
+                    text=True,
+                    timeout=TIMEOUT,
+                    cwd=cwd,
+                    env=_sandbox_env(),   # never inherit the server's secrets
+                )
+                proc = {'stdout': completed.stdout, 'stderr': completed.stderr}
+            stdout = proc['stdout'][:MAX_OUTPUT_BYTES]
+            stderr = proc['stderr'][:MAX_OUTPUT_BYTES]
             passed = self._normalize_output(stdout) == self._normalize_output(expected)
             return {
                 'passed': passed,
@@ -397,12 +452,16 @@ class CodeExecutor:
         if not self._expected_as_literals(code, expected_outputs):
             return None
 
-        for index, tc in input_tests[:2]:  # cap probe cost
+        probes = [
+            (index, mutated)
+            for index, tc in input_tests[:2]  # cap probe cost
+            for mutated in self._mutated_inputs(tc.get('input', ''))
+        ]
+        outputs = self._run_many(run_cmd, [(mutated, '') for _, mutated in probes], tmpdir)
+        for (index, _), probe in zip(probes, outputs):
             base_output = self._normalize_output(results[index]['stdout'])
-            for mutated in self._mutated_inputs(tc.get('input', '')):
-                probe = self._run_single_with_cmd(run_cmd, mutated, '', tmpdir)
-                if self._normalize_output(probe['stdout']) != base_output:
-                    return None  # output reacts to input — genuinely computed
+            if self._normalize_output(probe['stdout']) != base_output:
+                return None  # output reacts to input — genuinely computed
         return 'hardcoded_literals'
 
     def _compile(self, language: str, config: dict, src_path: str, tmpdir: str) -> str | None:
@@ -446,13 +505,145 @@ class CodeExecutor:
         except Exception as e:
             return str(e)
 
+    def _run_many(self, cmd, cases: list, cwd: str, stop_on_failure: bool = False) -> list:
+        """Run (stdin, expected) pairs with one command; results in the same order.
+
+        In the sandbox, more than one case goes out as a single batched
+        execution. Everywhere else the cases run side by side on a thread pool.
+        """
+        from django.conf import settings
+
+        if (isinstance(cmd, dict) and cmd.get('sandbox') and len(cases) > 1
+                and getattr(settings, 'PISTON_BATCH', True)):
+            results = self._run_batch_sandboxed(cmd, cases, stop_on_failure)
+        else:
+            results = self._run_parallel(
+                lambda stdin, expected: self._run_single_with_cmd(cmd, stdin, expected, cwd),
+                cases, stop_on_failure,
+            )
+
+        if stop_on_failure:
+            # Whatever happened to run past the first failure is dropped, so
+            # which cases are reported never depends on thread timing.
+            first = next((i for i, r in enumerate(results) if not (r and r['passed'])), len(results))
+            results[first + 1:] = [self._skipped(expected) for _, expected in cases[first + 1:]]
+        return results
+
+    @staticmethod
+    def _run_parallel(run_one, cases: list, stop_on_failure: bool = False) -> list:
+        """
+        run_one(stdin, expected) for every case, at most CODE_EXEC_CONCURRENCY
+        at a time. Each case is its own subprocess or sandbox request and waits
+        on I/O, so threads are enough.
+
+        With stop_on_failure, a case that has not started yet is not started
+        once an earlier one has failed. Its slot comes back as None; _run_many
+        fills it in.
+        """
+        from django.conf import settings
+
+        workers = min(max(1, getattr(settings, 'CODE_EXEC_CONCURRENCY', 4)), len(cases))
+        results = [None] * len(cases)
+        first_failure = [len(cases)]
+        lock = threading.Lock()
+
+        def task(i):
+            if stop_on_failure and i > first_failure[0]:
+                return
+            results[i] = run_one(*cases[i])
+            if not results[i]['passed']:
+                with lock:
+                    first_failure[0] = min(first_failure[0], i)
+
+        if workers <= 1:
+            for i in range(len(cases)):
+                task(i)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(task, range(len(cases))))
+        return results
+
+    @staticmethod
+    def _skipped(expected: str) -> dict:
+        return {
+            'passed': False, 'stdout': '', 'stderr': '',
+            'error': 'skipped', 'expected': expected,
+        }
+
+    def _run_batch_sandboxed(self, handle: dict, cases: list, stop_on_failure: bool = False) -> list:
+        """Every case in one sandbox execution; see batch_harness for the protocol.
+
+        Cases the batch did not report — it hit Piston's run-time or output cap
+        part way — are re-run individually, so batching can change how fast a
+        verdict arrives but never what it is.
+        """
+        from apps.learning import batch_harness, piston
+
+        files = batch_harness.build(handle['language'], handle['source'], [s for s, _ in cases])
+        def run_one(stdin, expected):
+            return self._run_single_sandboxed(handle, stdin, expected)
+
+        if files is None:
+            return self._run_parallel(run_one, cases, stop_on_failure)
+
+        # Only the driver knows it, so only the driver can write a record.
+        nonce = batch_harness.nonce()
+        try:
+            result = piston.execute(handle['language'], handle['source'], nonce + '\n',
+                                    files=files)
+        except piston.PistonUnavailable as exc:
+            logger.error('sandbox unavailable: %s', exc)
+            return [{
+                'passed': False, 'stdout': '', 'stderr': 'Execution service unavailable',
+                'error': 'sandbox_unavailable', 'expected': expected,
+            } for _, expected in cases]
+
+        if result['compile_error']:
+            return [{
+                'passed': False, 'stdout': '', 'stderr': result['compile_error'],
+                'error': 'compilation_error', 'expected': expected,
+            } for _, expected in cases]
+
+        records = batch_harness.parse(result['stdout'], nonce, len(cases))
+        if len(records) < len(cases):
+            logger.info('batched execution reported %d/%d cases; re-running the rest',
+                        len(records), len(cases))
+
+        results = []
+        for i, (stdin_data, expected) in enumerate(cases):
+            record = records.get(i)
+            if record is None:
+                results.append(None)
+            elif record.get('sig') in _KILL_SIGNALS:
+                results.append({
+                    'passed': False, 'stdout': '',
+                    'stderr': f'Execution timed out after {TIMEOUT}s',
+                    'error': 'timeout', 'expected': expected,
+                })
+            else:
+                stdout = record.get('out', '')
+                results.append({
+                    'passed': self._normalize_output(stdout) == self._normalize_output(expected),
+                    'stdout': stdout,
+                    'stderr': record.get('err', ''),
+                    'error': None,
+                    'expected': expected,
+                })
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            rerun = self._run_parallel(run_one, [cases[i] for i in missing], stop_on_failure)
+            for i, result in zip(missing, rerun):
+                results[i] = result
+        return results
+
     def _run_single_sandboxed(self, handle: dict, stdin_data: str, expected: str) -> dict:
         """One test case, inside the sandbox.
 
         Compilation happens per call here rather than once per submission —
         Piston has no compile-once API. That is free for Python and JavaScript
-        and real for C++ and Java; if it ever hurts, the fix is to batch the
-        test cases into one execution, not to compile on the host.
+        and real for C++ and Java, which is why submissions normally go through
+        _run_batch_sandboxed; this is its fallback and Java's only path.
         """
         from apps.learning import piston
 
@@ -11,16 +11,28 @@ Groups:
 import json
 import random
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from asgiref.sync import sync_to_async
 from django.utils import timezone
 
-# Participant presence is tracked via Django cache (Redis-backed in production)
-# so it works correctly across multiple Daphne/Gunicorn workers.
-_PARTICIPANT_CACHE_TTL = 7200  # 2 hours
+from apps.core import db_pool
+from apps.core.profiling import ProfiledConsumer
 
+from . import answer_buffer, live_monitor, presence
+
+
+# How long ending a question or the quiz waits on another worker's flush of
+# the same room before going ahead (answer_buffer.flush).
+_FLUSH_WAIT = 5.0
+
+
+class LiveQuizConsumer(ProfiledConsumer, AsyncWebsocketConsumer):
+    # What receive() dispatches on; profiling names routes after these only.
+    MESSAGE_TYPES = frozenset({
+        'instructor_join', 'start_quiz', 'next_question', 'end_question', 'end_quiz',
+        'pause_session', 'resume_session', 'pause_participant', 'resume_participant',
+        'request_state', 'join', 'heartbeat', 'submit_answer', 'submit_code',
+        'report_violation', 'resume_from_fullscreen',
+    })
 
-class LiveQuizConsumer(AsyncWebsocketConsumer):
     # ------------------------------------------------------------------ #
     #  Connection lifecycle                                                #
     # ------------------------------------------------------------------ #
@@ -44,7 +56,7 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
                 self.is_instructor = True
                 await self.channel_layer.group_add(self.instructor_group, self.channel_name)
                 await self.send_json({'type': 'instructor_registered'})
-                await self._broadcast_rich_participants()
+                await self._send_monitor_snapshot()
             else:
                 await self._add_participant(self.username)
                 await self._broadcast_participants()
@@ -78,62 +90,29 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_discard(self.instructor_group, self.channel_name)
 
     # ------------------------------------------------------------------ #
-    #  Participant tracking helpers                                        #
-    # ------------------------------------------------------------------ #
-
-    # ------------------------------------------------------------------ #
-    #  Participant tracking helpers (cache-backed, multi-worker-safe)      #
+    #  Participant tracking helpers (presence.py, multi-worker-safe)      #
     # ------------------------------------------------------------------ #
 
     async def _add_participant(self, username: str):
-        await self._mutate_participant_cache(username, add=True)
+        await db_pool.run(presence.join, self.room_group_name, username)
 
     async def _remove_participant(self, username: str):
-        await self._mutate_participant_cache(username, add=False)
+        await db_pool.run(presence.leave, self.room_group_name, username)
 
-    @sync_to_async
-    def _mutate_participant_cache(self, username: str, add: bool):
-        from django.core.cache import cache
-        key = f'quiz_room_{self.room_group_name}'
-        participants: set = cache.get(key) or set()
-        if add:
-            participants.add(username)
-        else:
-            participants.discard(username)
-        cache.set(key, participants, timeout=_PARTICIPANT_CACHE_TTL)
-
-    @sync_to_async
-    def _get_participants_cached(self) -> list:
-        from django.core.cache import cache
-        return list(cache.get(f'quiz_room_{self.room_group_name}') or set())
+    async def _get_participants_cached(self) -> list:
+        return await db_pool.run(presence.members, self.room_group_name)
 
-    @database_sync_to_async
-    def _get_rich_participants(self) -> list:
-        """Fetch full participant records from DB for instructor display."""
-        from .models import LiveQuiz, LiveQuizParticipant
-        try:
-            quiz = LiveQuiz.objects.get(join_code=self.join_code)
-            session = quiz.session
-            participants = LiveQuizParticipant.objects.filter(
-                session=session, is_active=True
-            ).select_related('student').order_by('joined_at')
-            return [{
-                'id': str(p.id),
-                'nickname': p.nickname,
-                'total_score': p.total_score,
-                'total_correct': p.total_correct,
-                'total_attempted': p.total_attempted,
-                'fullscreen_violations': p.fullscreen_violations,
-                'tab_switch_count': p.tab_switch_count,
-                'copy_paste_attempts': p.copy_paste_attempts,
-                'is_flagged': p.is_flagged,
-                'is_paused': p.is_paused,
-                'pause_reason': p.pause_reason or '',
-            } for p in participants]
-        except Exception:
-            return []
+    async def _handle_heartbeat(self):
+        """Keep this student listed, and sweep out sockets that died silently."""
+        if not self.username or self.is_instructor:
+            return
+        room = self.room_group_name
+        back = await db_pool.run(presence.heartbeat, room, self.username)
+        swept = await db_pool.run(presence.sweep, room)
+        if back or swept:
+            await self._broadcast_participants()
 
-    @sync_to_async
+    @db_pool.pooled
     def _get_user_role(self) -> str:
         try:
             profile = self.user.profile
@@ -142,26 +121,22 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             return 'student'
 
     async def _broadcast_participants(self):
-        """Broadcast simple username list to room + rich data to instructor group."""
+        """Broadcast simple username list to room; the monitor diffs the whole room."""
         participants = await self._get_participants_cached()
         await self.channel_layer.group_send(
             self.room_group_name,
             {'type': 'participant_update_handler', 'participants': participants}
         )
-        # Also push rich data to instructor group
-        await self._broadcast_rich_participants()
+        await live_monitor.changed(self.join_code)
 
-    async def _broadcast_rich_participants(self):
-        """Push full participant DB records to the instructor group."""
-        rich = await self._get_rich_participants()
-        await self.channel_layer.group_send(
-            self.instructor_group,
-            {'type': 'instructor_participant_update', 'participants': rich}
-        )
+    async def _send_monitor_snapshot(self):
+        """Full roster to this instructor connection; deltas follow (live_monitor)."""
+        snapshot = await live_monitor.snapshot(self.join_code)
+        await self.send_json({'type': 'instructor_participant_update', **snapshot})
 
     # ── Active question cache (for late-joining students) ─────────────
 
-    @sync_to_async
+    @db_pool.pooled
     def _cache_active_question(self, question_data, time_limit):
         from django.core.cache import cache
         cache.set(
@@ -170,43 +145,50 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             timeout=3600,  # 1 hour
         )
 
-    @sync_to_async
+    @db_pool.pooled
     def _get_active_question(self):
         from django.core.cache import cache
         return cache.get(f'quiz_active_q_{self.join_code}')
 
-    @sync_to_async
+    @db_pool.pooled
     def _clear_active_question(self):
         from django.core.cache import cache
         cache.delete(f'quiz_active_q_{self.join_code}')
 
-    @database_sync_to_async
+    # ── Room state (live_state.py) ──────────────────────────────────────
+    # Quiz settings, session and question bank come from the cached room
+    # state; the handlers below only write. Each write that changes what the
+    # state describes invalidates it.
+
+    @db_pool.pooled
     def _set_session_in_progress(self):
-        from .models import LiveQuiz
+        from . import live_state
+        from .models import LiveQuizSession
         try:
-            quiz = LiveQuiz.objects.get(join_code=self.join_code)
-            if hasattr(quiz, 'session'):
-                session = quiz.session
-                if session.status in ('lobby', 'not_started'):
-                    session.status = 'in_progress'
-                    session.save(update_fields=['status'])
+            LiveQuizSession.objects.filter(
+                quiz__join_code=self.join_code, status='lobby',
+            ).update(status='in_progress')
+            # The quiz as the instructor starts it: load the room state once
+            # now, rather than on the first answer of the first question.
+            live_state.invalidate(self.join_code)
+            live_state.get(self.join_code)
         except Exception:
             pass
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _get_session_state(self):
-        """Check DB for current session status and active question (fallback)."""
-        from .models import LiveQuiz
+        """Current session status and active question, from the room state (fallback)."""
+        from . import live_state
         try:
-            quiz = LiveQuiz.objects.get(join_code=self.join_code)
-            if not hasattr(quiz, 'session'):
+            state = live_state.get(self.join_code)
+            if not state or not state['session']:
                 return None
-            session = quiz.session
-            result = {'status': session.status}
-            if session.current_question:
-                q = session.current_question
+            session = state['session']
+            result = {'status': session['status']}
+            q = session['current_question_id'] and live_state.question(state, session['current_question_id'])
+            if q:
                 result['question'] = {
-                    'id': str(q.id),
+                    'id': q.id,
                     'text': q.question_text,
                     'type': 'code' if q.question_type == 'coding' else 'mcq',
                     'questionType': q.question_type,
@@ -226,42 +208,40 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
         except Exception:
             return None
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _save_current_question(self, question_data):
         """Persist the current question to the session model for DB fallback."""
-        from .models import LiveQuiz, LiveQuizQuestion
+        from . import live_state
+        from .models import LiveQuizSession
         from django.utils import timezone
         try:
-            quiz = LiveQuiz.objects.get(join_code=self.join_code)
-            if not hasattr(quiz, 'session'):
+            state = live_state.get(self.join_code)
+            if not state or not state['session']:
                 return
-            session = quiz.session
             q_id = question_data.get('id') if question_data else None
-            if q_id:
-                try:
-                    question = LiveQuizQuestion.objects.get(id=q_id)
-                    session.current_question = question
-                    session.current_question_started_at = timezone.now()
-                    session.status = 'in_progress'
-                    session.save(update_fields=['current_question', 'current_question_started_at', 'status'])
-                except LiveQuizQuestion.DoesNotExist:
-                    pass
+            if q_id and live_state.question(state, q_id):
+                LiveQuizSession.objects.filter(id=state['session']['id']).update(
+                    current_question_id=q_id,
+                    current_question_started_at=timezone.now(),
+                    status='in_progress',
+                )
+                live_state.invalidate(self.join_code)
         except Exception:
             pass
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _update_session_status(self, status: str):
         """Persist session status (in_progress / paused / completed) to DB."""
-        from .models import LiveQuiz
+        from . import live_state
+        from .models import LiveQuizSession
         try:
-            quiz = LiveQuiz.objects.get(join_code=self.join_code)
-            if hasattr(quiz, 'session'):
-                quiz.session.status = status
-                quiz.session.save(update_fields=['status'])
+            state = live_state.get(self.join_code)
+            if state and state['session']:
+                LiveQuizSession.objects.filter(id=state['session']['id']).update(status=status)
+                live_state.invalidate(self.join_code)
         except Exception:
             pass
 
-
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
@@ -276,9 +256,9 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             self.is_instructor = True
             await self.channel_layer.group_add(self.instructor_group, self.channel_name)
             await self.send_json({'type': 'instructor_registered'})
-            # Immediately send current participants
-            rich = await self._get_rich_participants()
-            await self.send_json({'type': 'instructor_participant_update', 'participants': rich})
+            # Immediately send current participants. Also how the monitor
+            # resyncs after missing a delta.
+            await self._send_monitor_snapshot()
 
         elif msg_type == 'start_quiz':
             # Update session status in DB
@@ -301,6 +281,9 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             )
 
         elif msg_type == 'end_question':
+            # Everything answered so far is in the database before anyone
+            # looks at results.
+            await answer_buffer.flush_async(self.join_code, wait=_FLUSH_WAIT)
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
@@ -311,6 +294,7 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             )
 
         elif msg_type == 'end_quiz':
+            await answer_buffer.flush_async(self.join_code, wait=_FLUSH_WAIT)
             await self.channel_layer.group_send(self.room_group_name, {'type': 'quiz_end'})
             await self._update_session_status('ended')
 
@@ -381,10 +365,16 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
 
         elif msg_type == 'join':
             username = data.get('nickname') or 'Anonymous'
+            if self.username and self.username != username and not self.is_instructor:
+                # Listed under the account name on connect; the nickname replaces it.
+                await self._remove_participant(self.username)
             self.username = username
             await self._add_participant(username)
             await self._broadcast_participants()
 
+        elif msg_type == 'heartbeat':
+            await self._handle_heartbeat()
+
         elif msg_type == 'submit_answer':
             await self._handle_submit_answer(data)
 
@@ -417,9 +407,9 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             participant_id, question_id, answer_text, response_time
         )
         await self.send_json({'type': 'answer_submitted', 'data': result})
-        # Push updated scores to instructor monitor
+        # Buffered; the flush writes it and updates the instructor monitor.
         if result.get('success'):
-            await self._broadcast_rich_participants()
+            await answer_buffer.schedule_flush(self.join_code)
 
     async def _handle_submit_code(self, data: dict):
         """Handle coding question submission with test execution."""
@@ -434,9 +424,9 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             participant_id, question_id, code, language, response_time, run_only
         )
         await self.send_json({'type': 'code_submitted', 'data': result})
-        # Push updated scores to instructor monitor (skip for run_only)
+        # Buffered (skip for run_only); the flush updates the instructor monitor.
         if result.get('success') and not run_only:
-            await self._broadcast_rich_participants()
+            await answer_buffer.schedule_flush(self.join_code)
 
     # ------------------------------------------------------------------ #
     #  Violation enforcement                                               #
@@ -482,7 +472,9 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
                 await self._set_participant_paused(participant_id, True, 'tab_switch')
                 await self._notify_instructor_pause(participant_id, True, 'Tab switch')
             if action == 'shuffle':
-                # Pick a random question from the quiz and send it
+                # Pick a random question from the quiz and send it. What
+                # counts as answered is read from the database, so flush first.
+                await answer_buffer.flush_async(self.join_code, wait=_FLUSH_WAIT)
                 shuffled_q = await self._get_random_question(participant_id)
                 if shuffled_q:
                     await self.send_json({
@@ -497,6 +489,9 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
 
         # Always acknowledge with violation summary
         await self.send_json({'type': 'violation_recorded', 'data': result})
+        if result.get('success'):
+            # Counters and any penalty changed the roster row.
+            await live_monitor.changed(self.join_code, participant_id)
 
         # Flagged-out participants show as paused/closed on the monitor too
         if result.get('is_flagged') and action == 'close':
@@ -519,52 +514,26 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
     #  Database operations                                                 #
     # ------------------------------------------------------------------ #
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _save_mcq_response(self, participant_id, question_id, answer_text, response_time):
-        from .models import LiveQuizResponse, LiveQuizParticipant, LiveQuizQuestion
+        from . import live_state
         try:
-            participant = LiveQuizParticipant.objects.get(id=participant_id)
-            question = LiveQuizQuestion.objects.get(id=question_id)
+            state = live_state.get(self.join_code)
+            question = state and live_state.question(state, question_id)
+            if not question or not state['session']:
+                return {'success': False, 'error': 'Question is not part of this quiz'}
+            if not live_state.has_participant(state, participant_id):
+                return {'success': False, 'error': 'Participant is not in this quiz'}
 
             # Shared scorer — identical to the REST path. (Req 9.)
             from .live_quiz_scoring import score_mcq
             is_correct, points_earned = score_mcq(question, answer_text, response_time)
 
-            response, created = LiveQuizResponse.objects.update_or_create(
-                participant=participant,
-                question=question,
-                defaults={
-                    'answer_text': answer_text,
-                    'is_correct': is_correct,
-                    'response_time_seconds': response_time,
-                    'points_earned': points_earned,
-                }
+            answer_buffer.record(
+                self.join_code, state['session']['id'], participant_id, question.id,
+                answer_text=answer_text, is_correct=is_correct,
+                points_earned=points_earned, response_time=response_time,
             )
-
-            if created:
-                participant.total_attempted += 1
-                if is_correct:
-                    participant.total_correct += 1
-                participant.total_score += points_earned
-                # Update rolling average
-                total_time = (
-                    participant.average_response_time * (participant.total_attempted - 1)
-                    + response_time
-                )
-                participant.average_response_time = total_time / participant.total_attempted
-                participant.save()
-            else:
-                # Re-submission: recalculate totals from all responses to avoid drift
-                all_responses = LiveQuizResponse.objects.filter(participant=participant)
-                participant.total_score = sum(r.points_earned for r in all_responses)
-                participant.total_correct = all_responses.filter(is_correct=True).count()
-                participant.total_attempted = all_responses.count()
-                if participant.total_attempted > 0:
-                    participant.average_response_time = (
-                        sum(r.response_time_seconds for r in all_responses) / participant.total_attempted
-                    )
-                participant.save()
-
             return {
                 'success': True,
                 'is_correct': is_correct,
@@ -574,25 +543,28 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
-    @database_sync_to_async
-    def _save_code_response(self, participant_id, question_id, code, language, response_time, run_only=False):
-        """Execute code against test cases and save response."""
-        from .models import LiveQuizResponse, LiveQuizParticipant, LiveQuizQuestion
+    async def _save_code_response(self, participant_id, question_id, code, language, response_time, run_only=False):
+        """Execute code against test cases and save response.
+
+        Only the lookups and the save run on the database pool. The execution
+        between them can take seconds, and inside it held one of the few
+        threads every consumer's queries run on — a single student's
+        infinite loop stalled answers for the whole room. It now runs on its
+        own thread (CodeExecutor.run_async).
+        """
         from .code_executor import CodeExecutor
 
         try:
-            participant = LiveQuizParticipant.objects.get(id=participant_id)
-            question = LiveQuizQuestion.objects.get(id=question_id)
+            state, question = await self._load_code_question(participant_id, question_id)
 
             # Check if code execution is enabled
-            enable_exec = getattr(question.quiz, 'enable_code_execution', True)
+            enable_exec = state['quiz']['enable_code_execution']
             test_results = {}
             is_correct = False
             points_earned = 0
 
             if enable_exec and question.test_cases:
-                executor = CodeExecutor()
-                exec_result = executor.run(
+                exec_result = await CodeExecutor().run_async(
                     language=language or question.programming_language or 'python',
                     code=code,
                     test_cases=question.test_cases,
@@ -615,42 +587,12 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
                     'run_only': True,
                 }
 
-            response, created = LiveQuizResponse.objects.update_or_create(
-                participant=participant,
-                question=question,
-                defaults={
-                    'answer_text': '',
-                    'code_submission': code,
-                    'test_results': test_results,
-                    'is_correct': is_correct,
-                    'points_earned': points_earned,
-                    'response_time_seconds': response_time,
-                }
+            await db_pool.run(
+                answer_buffer.record, self.join_code, state['session']['id'], participant_id, question.id,
+                code_submission=code, test_results=test_results, is_correct=is_correct,
+                points_earned=points_earned, response_time=response_time,
             )
 
-            if created:
-                participant.total_attempted += 1
-                if is_correct:
-                    participant.total_correct += 1
-                participant.total_score += points_earned
-                total_time = (
-                    participant.average_response_time * (participant.total_attempted - 1)
-                    + response_time
-                )
-                participant.average_response_time = total_time / participant.total_attempted
-                participant.save()
-            else:
-                # Re-submission: recalculate totals from all responses to avoid drift
-                all_responses = LiveQuizResponse.objects.filter(participant=participant)
-                participant.total_score = sum(r.points_earned for r in all_responses)
-                participant.total_correct = all_responses.filter(is_correct=True).count()
-                participant.total_attempted = all_responses.count()
-                if participant.total_attempted > 0:
-                    participant.average_response_time = (
-                        sum(r.response_time_seconds for r in all_responses) / participant.total_attempted
-                    )
-                participant.save()
-
             # Broadcast updated scores to instructor
             return {
                 'success': True,
@@ -661,7 +603,25 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
-    @database_sync_to_async
+    @db_pool.pooled
+    def _load_code_question(self, participant_id, question_id):
+        """(room state, question) to grade against; raises if either id is not in this room.
+
+        The participant is checked before running anything: execution is the
+        expensive part, and it is only for people actually taking this quiz.
+        """
+        from . import live_state
+        from .models import LiveQuizParticipant
+
+        state = live_state.get(self.join_code)
+        question = state and live_state.question(state, question_id)
+        if not question or not state['session']:
+            raise LiveQuizParticipant.DoesNotExist('Question is not part of this quiz')
+        if not live_state.has_participant(state, participant_id):
+            raise LiveQuizParticipant.DoesNotExist('Participant is not in this quiz')
+        return state, question
+
+    @db_pool.pooled
     def _record_violation(self, participant_id, violation_type):
         from .models import LiveQuizParticipant
         try:
@@ -724,7 +684,7 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             return {'success': False, 'error': str(e), 'action': 'warn'}
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _set_participant_paused(self, participant_id, paused: bool, reason: str = ''):
         from .models import LiveQuizParticipant
         try:
@@ -735,28 +695,29 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
         except Exception:
             pass
 
-    @database_sync_to_async
+    @db_pool.pooled
     def _get_random_question(self, participant_id):
         """Pick a random question from the quiz excluding already-answered ones."""
-        from .models import LiveQuizParticipant, LiveQuizQuestion, LiveQuizResponse
+        from . import live_state
+        from .models import LiveQuizResponse
         try:
-            participant = LiveQuizParticipant.objects.select_related('session__quiz').get(
-                id=participant_id
-            )
-            answered_ids = LiveQuizResponse.objects.filter(
-                participant=participant
-            ).values_list('question_id', flat=True)
-
-            unanswered = LiveQuizQuestion.objects.filter(
-                quiz=participant.session.quiz
-            ).exclude(id__in=answered_ids)
+            state = live_state.get(self.join_code)
+            if not state or not state['session']:
+                return None
+            answered_ids = {
+                str(qid) for qid in LiveQuizResponse.objects.filter(
+                    participant_id=participant_id,
+                    participant__session_id=state['session']['id'],
+                ).values_list('question_id', flat=True)
+            }
 
-            if not unanswered.exists():
+            unanswered = [qid for qid in state['questions'] if qid not in answered_ids]
+            if not unanswered:
                 return None
 
-            q = random.choice(list(unanswered))
+            q = live_state.question(state, random.choice(unanswered))
             return {
-                'id': str(q.id),
+                'id': q.id,
                 'type': 'code' if q.question_type == 'coding' else 'mcq',
                 'question_type': q.question_type,
                 'question_text': q.question_text,
@@ -857,11 +818,13 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             'nickname': event['nickname'],
         })
 
-    async def instructor_participant_update(self, event):
-        """Push rich participant list to instructor connections."""
+    async def instructor_participant_delta(self, event):
+        """Only instructors are in the group; see live_monitor for the protocol."""
         await self.send_json({
-            'type': 'instructor_participant_update',
-            'participants': event['participants'],
+            'type': 'instructor_participant_delta',
+            'seq': event['seq'],
+            'changed': event['changed'],
+            'removed': event['removed'],
         })
 
     async def quiz_session_paused(self, event):
@@ -900,3 +863,5 @@ class LiveQuizConsumer(AsyncWebsocketConsumer):
             'paused': paused,
             'reason': reason,
         })
+        # Immediate for the badge; the diff keeps the monitor's row state in step.
+        await live_monitor.changed(self.join_code, participant_id)
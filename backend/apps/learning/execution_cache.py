@@ -0,0 +1,114 @@
+"""
+Content-addressed cache in front of CodeExecutor.run.
+
+Students press Run again on code they have not changed, a live quiz grades the
+same starter-code submission for half the room, and Submit re-runs what Run
+just ran. Each of those is the same (language, source, test cases) triple, and
+grading is a pure function of it — so the second one should cost a cache read,
+not a sandbox execution.
+
+The key is a hash of everything the verdict depends on: the language, the
+source as it will actually run (after auto-wrapping), the test cases in order,
+the flags that change what is reported, and the runtime — the pinned Piston
+version in the sandbox, the host interpreter otherwise. CACHE_VERSION is part
+of it too; bump it when grading itself changes (comparison, hardcode
+detection), so no verdict from the old rules is served under the new ones.
+
+Only verdicts that would come out the same next time are stored. Timeouts
+depend on how loaded the box was, and sandbox or host failures are ours, not
+the student's code's; those always run again. Code that is itself
+nondeterministic (random, time) gets its first outcome for the TTL, which is
+also what a student re-pressing Run within a minute would expect to see.
+
+Entries live in the default cache, so eviction is its job: the TTL here,
+maxmemory/LRU in Redis, MAX_ENTRIES in the local-memory cache. Results larger
+than CODE_EXEC_CACHE_MAX_BYTES are not stored at all.
+"""
+import hashlib
+import json
+import logging
+import pickle
+import platform
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+KEY_PREFIX = 'exec:result:'
+HITS_KEY = 'exec:cache:hits'
+MISSES_KEY = 'exec:cache:misses'
+
+# Outcomes that say something about the environment, not the code.
+UNCACHEABLE_ERRORS = {'timeout', 'sandbox_unavailable', 'runtime_error', 'internal_error'}
+
+
+def _ttl() -> int:
+    return getattr(settings, 'CODE_EXEC_CACHE_TTL', 600)
+
+
+def _runtime(language: str):
+    from . import piston
+    if piston.enabled():
+        return piston.RUNTIMES.get(language)
+    return ('local', platform.python_version()) if language == 'python' else ('local',)
+
+
+def key(language: str, source: str, test_cases: list, **flags) -> str:
+    material = json.dumps({
+        'v': CACHE_VERSION,
+        'language': language,
+        'runtime': _runtime(language),
+        'source': source,
+        'tests': [
+            [tc.get('input', ''), tc.get('expected_output', ''), bool(tc.get('is_hidden', False))]
+            for tc in test_cases
+        ],
+        'flags': flags,
+    }, sort_keys=True)
+    return KEY_PREFIX + hashlib.sha256(material.encode()).hexdigest()
+
+
+def get(cache_key: str) -> dict | None:
+    if _ttl() <= 0:
+        return None
+    result = cache.get(cache_key)
+    _bump(HITS_KEY if result is not None else MISSES_KEY)
+    return result
+
+
+def put(cache_key: str, result: dict) -> bool:
+    """Store a verdict if it is deterministic and small enough. True if stored."""
+    ttl = _ttl()
+    if ttl <= 0:
+        return False
+    if any(r.get('error') in UNCACHEABLE_ERRORS for r in result.get('results', [])):
+        return False
+    if len(pickle.dumps(result)) > getattr(settings, 'CODE_EXEC_CACHE_MAX_BYTES', 64 * 1024):
+        return False
+    cache.set(cache_key, result, ttl)
+    return True
+
+
+def stats() -> dict:
+    """Hit/miss counters since the cache was last flushed."""
+    hits = int(cache.get(HITS_KEY) or 0)
+    misses = int(cache.get(MISSES_KEY) or 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+    }
+
+
+def _bump(counter_key: str) -> None:
+    # incr fails on a missing key; add() is the atomic part of seeding it.
+    try:
+        try:
+            cache.incr(counter_key)
+        except ValueError:
+            if not cache.add(counter_key, 1, None):
+                cache.incr(counter_key)
+    except Exception as e:
+        logger.debug(f'execution cache counter {counter_key} not updated: {e}')
@@ -0,0 +1,258 @@
+"""
+Sorted-set index over LeaderboardSnapshot, for rank and window reads.
+
+Ranking off the table costs a `COUNT(*) WHERE total_points > x` and a full
+`count()` per lookup, and the old "me" view loaded every snapshot into a list
+just to slice ten neighbours out of it. A sorted set answers rank, top-N and a
+neighbour window in O(log n) without touching Postgres.
+
+Each board is a ZSET in Redis when there is one (core.shared_redis), shared by
+every web process and worker.
+
+The index is derived data. Scoring writes go to Postgres first and are mirrored
+here (leaderboard_service), a cold or flushed index reloads itself from the
+table on first read, and the hourly window rollup rebuilds it outright, so any
+drift heals within the hour.
+
+Ranks follow the original COUNT semantics: tied scores share a rank (one plus
+the number of strictly higher scores). Windows and top-N lists are positional.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+
+from apps.core import shared_redis
+
+logger = logging.getLogger(__name__)
+
+# Board name -> the LeaderboardSnapshot column it ranks.
+BOARDS: dict[str, str] = {
+    'all_time': 'total_points',
+    'weekly': 'weekly_points',
+    'monthly': 'monthly_points',
+    'modules': 'modules_completed',
+    'challenges': 'challenges_solved',
+    'certificates': 'certificates_earned',
+}
+
+KEY_PREFIX = 'lb:z:'
+LOADED_KEY = 'lb:loaded'
+
+
+class _MemoryBoards:
+    """In-process stand-in for the Redis ZSETs: a score map plus a sorted list."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._scores: dict[str, dict[str, int]] = {b: {} for b in BOARDS}
+            self._sorted: dict[str, list[tuple[int, str]]] = {b: [] for b in BOARDS}
+            self.loaded = False
+
+    def mark_loaded(self):
+        self.loaded = True
+
+    def _set(self, board, member, score):
+        scores, ordered = self._scores[board], self._sorted[board]
+        old = scores.get(member)
+        if old is not None:
+            del ordered[bisect.bisect_left(ordered, (old, member))]
+        scores[member] = score
+        bisect.insort(ordered, (score, member))
+
+    def set_many(self, board, mapping):
+        with self._lock:
+            for member, score in mapping.items():
+                self._set(board, member, int(score))
+
+    def incr(self, member, deltas):
+        with self._lock:
+            for board, delta in deltas.items():
+                self._set(board, member, self._scores[board].get(member, 0) + int(delta))
+
+    def replace(self, board, mapping):
+        with self._lock:
+            self._scores[board] = {}
+            self._sorted[board] = []
+            for member, score in mapping.items():
+                self._set(board, member, int(score))
+
+    def score(self, board, member):
+        return self._scores[board].get(member)
+
+    def count(self, board):
+        return len(self._sorted[board])
+
+    def count_above(self, board, score):
+        ordered = self._sorted[board]
+        return len(ordered) - bisect.bisect_right(ordered, (score, '\uffff'))
+
+    def position(self, board, member):
+        """Zero-based position, highest first (ZREVRANK)."""
+        score = self._scores[board].get(member)
+        if score is None:
+            return None
+        ordered = self._sorted[board]
+        return len(ordered) - 1 - bisect.bisect_left(ordered, (score, member))
+
+    def slice(self, board, start, stop):
+        """Members at positions start..stop inclusive, highest first (ZREVRANGE)."""
+        ordered = self._sorted[board]
+        n = len(ordered)
+        lo, hi = max(0, n - 1 - stop), n - start
+        return [m for _, m in reversed(ordered[lo:hi])]
+
+
+class _RedisBoards:
+    """One ZSET per board in the shared Redis."""
+
+    def __init__(self, client):
+        self.r = client
+
+    @property
+    def loaded(self):
+        return bool(self.r.exists(LOADED_KEY))
+
+    def mark_loaded(self):
+        self.r.set(LOADED_KEY, 1)
+
+    def reset(self):
+        self.r.delete(LOADED_KEY, *(KEY_PREFIX + b for b in BOARDS))
+
+    def set_many(self, board, mapping):
+        if mapping:
+            self.r.zadd(KEY_PREFIX + board, mapping)
+
+    def incr(self, member, deltas):
+        pipe = self.r.pipeline(transaction=False)
+        for board, delta in deltas.items():
+            pipe.zincrby(KEY_PREFIX + board, delta, member)
+        pipe.execute()
+
+    def replace(self, board, mapping):
+        # Build aside and swap, so readers never see a half-loaded board.
+        tmp = f'{KEY_PREFIX}{board}:building'
+        pipe = self.r.pipeline()
+        pipe.delete(tmp)
+        if mapping:
+            pipe.zadd(tmp, mapping)
+            pipe.rename(tmp, KEY_PREFIX + board)
+        else:
+            pipe.delete(KEY_PREFIX + board)
+        pipe.execute()
+
+    def score(self, board, member):
+        value = self.r.zscore(KEY_PREFIX + board, member)
+        return None if value is None else int(value)
+
+    def count(self, board):
+        return self.r.zcard(KEY_PREFIX + board)
+
+    def count_above(self, board, score):
+        return self.r.zcount(KEY_PREFIX + board, f'({score}', '+inf')
+
+    def position(self, board, member):
+        return self.r.zrevrank(KEY_PREFIX + board, member)
+
+    def slice(self, board, start, stop):
+        return [m.decode() if isinstance(m, bytes) else m
+                for m in self.r.zrevrange(KEY_PREFIX + board, start, stop)]
+
+
+_memory = _MemoryBoards()
+
+
+def _boards():
+    r = shared_redis.client()
+    return _memory if r is None else _RedisBoards(r)
+
+
+def _ready():
+    boards = _boards()
+    if not boards.loaded:
+        rebuild(boards)
+    return boards
+
+
+def rebuild(boards=None) -> int:
+    """Reload every board from LeaderboardSnapshot in one query."""
+    from .models import LeaderboardSnapshot
+
+    boards = boards or _boards()
+    rows = list(LeaderboardSnapshot.objects.order_by().values_list('user_id', *BOARDS.values()))
+    for i, board in enumerate(BOARDS, start=1):
+        boards.replace(board, {str(row[0]): row[i] for row in rows})
+    boards.mark_loaded()
+    return len(rows)
+
+
+def reset() -> None:
+    """Drop the index; the next read reloads it. For tests and after restores."""
+    _boards().reset()
+
+
+def sync_snapshot(entry) -> None:
+    """Mirror one snapshot's current values into every board."""
+    try:
+        boards = _boards()
+        if not boards.loaded:
+            return  # the next read reloads everything, this row included
+        member = str(entry.user_id)
+        for board, field in BOARDS.items():
+            boards.set_many(board, {member: getattr(entry, field)})
+    except Exception as e:
+        logger.warning(f"[LEADERBOARD] Index sync failed for {entry.user_id}: {e}")
+
+
+def apply_increment(user_id, deltas: dict[str, int]) -> None:
+    """Mirror an F() increment: {board: delta}. Zero deltas are skipped."""
+    try:
+        boards = _boards()
+        if not boards.loaded:
+            return
+        boards.incr(str(user_id), {b: d for b, d in deltas.items() if d})
+    except Exception as e:
+        logger.warning(f"[LEADERBOARD] Index increment failed for {user_id}: {e}")
+
+
+def rank(user_id, board: str = 'all_time') -> dict | None:
+    """Rank, board size and percentile for one user; None if not on the board."""
+    boards = _ready()
+    score = boards.score(board, str(user_id))
+    if score is None:
+        return None
+    position = boards.count_above(board, score) + 1
+    total = boards.count(board)
+    return {
+        'rank': position,
+        'total_users': total,
+        'percentile': round((1 - (position / max(total, 1))) * 100),
+        'score': score,
+    }
+
+
+def top(board: str = 'all_time', n: int = 50) -> list[str]:
+    """User ids of the first n on a board, highest first."""
+    return _ready().slice(board, 0, n - 1)
+
+
+def window(user_id, board: str = 'all_time', radius: int = 5) -> tuple[int, list[str]]:
+    """
+    Up to `radius` users either side of this one, as (first position, ids).
+    Positions are 1-based. Empty if the user is not on the board.
+    """
+    boards = _ready()
+    position = boards.position(board, str(user_id))
+    if position is None:
+        return 1, []
+    start = max(0, position - radius)
+    return start + 1, boards.slice(board, start, position + radius)
+
+
+def count(board: str = 'all_time') -> int:
+    return _ready().count(board)
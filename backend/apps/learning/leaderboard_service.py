@@ -1,8 +1,23 @@
 """
 Leaderboard scoring service for CCIS-CodeHub.
 
-Call `update_leaderboard_score(user)` after any scoring action.
-It recalculates that user's LeaderboardSnapshot from scratch.
+Scoring actions call one of the `record_*` helpers. Each appends a
+PointsLedgerEntry and applies its points to the user's LeaderboardSnapshot as
+an atomic F() increment — an insert and an update, instead of the ~15 queries a
+full recount costs. The unique ledger key makes a repeated event a no-op.
+
+Each event also lands in its DailyPoints bucket. The weekly and monthly
+columns are sums over the last 7 and 30 buckets, rolled forward for everyone by
+`roll_windows` (scheduled as tasks.roll_leaderboard_windows) so points age out
+even for users who stop scoring. Windows are whole calendar days, today
+included, in every path — increment, rollup and recount — so they agree.
+
+Every snapshot write is mirrored into the sorted-set rank index
+(leaderboard_index), which serves rank, top-N and neighbour reads.
+
+`update_leaderboard_score(user)` still recalculates a snapshot from the source
+tables. It is the verify/repair path (see `verify_snapshot` and
+`recalculate_leaderboard --verify`).
 
 Point table:
   module completed      → 10 pts
@@ -17,8 +32,14 @@ Point table:
 from __future__ import annotations
 import logging
 from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from . import leaderboard_index
+
 logger = logging.getLogger(__name__)
 
 BADGE_RARITY_POINTS: dict[str, int] = {
@@ -28,98 +49,130 @@ BADGE_RARITY_POINTS: dict[str, int] = {
     'legendary': 300,
 }
 
+# Points per ledger kind; badges are priced by rarity instead.
+EVENT_POINTS: dict[str, int] = {
+    'module': 10,
+    'path': 100,
+    'challenge': 50,
+    'certificate': 200,
+}
 
-def _period_points(user, since) -> int:
-    """
-    Total points a user earned across ALL scored activity types since `since`.
-    Each activity is filtered by its own timestamp; a missing model/timestamp
-    contributes 0 rather than raising. (Remediation Req 29.)
-    """
-    from .models import UserProgress, Certificate, Enrollment, UserBadge
+# The snapshot counter each ledger kind advances by one.
+EVENT_COMPONENTS: dict[str, str] = {
+    'module': 'modules_completed',
+    'path': 'paths_completed',
+    'challenge': 'challenges_solved',
+    'certificate': 'certificates_earned',
+    'badge': 'badges_earned',
+}
 
-    modules = UserProgress.objects.filter(
-        user=user, is_completed=True, completed_at__gte=since
-    ).count()
-    paths = Enrollment.objects.filter(
-        user=user, status='completed', completed_at__gte=since
-    ).count()
-    certs = Certificate.objects.filter(user=user, issued_at__gte=since).count()
+# Rolling window lengths in calendar days, today included.
+WEEK_DAYS = 7
+MONTH_DAYS = 30
 
-    challenges = 0
-    try:
-        from .models import CodingSubmission
-        challenges = (
-            CodingSubmission.objects
-            .filter(user=user, status='accepted', submitted_at__gte=since)
-            .values('challenge').distinct().count()
-        )
-    except Exception:
-        pass
+# Fields the recount owns; verify_snapshot compares exactly these.
+SNAPSHOT_FIELDS = (
+    'total_points', 'weekly_points', 'monthly_points', 'modules_completed',
+    'challenges_solved', 'paths_completed', 'certificates_earned', 'badges_earned',
+)
 
-    badge_pts = sum(
-        BADGE_RARITY_POINTS.get(ub.badge.rarity, 0)
-        for ub in UserBadge.objects.filter(user=user, earned_at__gte=since).select_related('badge')
-    )
 
-    return modules * 10 + paths * 100 + challenges * 50 + certs * 200 + badge_pts
+def window_starts(today=None):
+    """First day (inclusive) of the weekly and monthly windows."""
+    today = today or timezone.localdate()
+    return today - timedelta(days=WEEK_DAYS - 1), today - timedelta(days=MONTH_DAYS - 1)
 
 
-def _calc_points(user) -> dict:
-    """Return raw component counts and total_points for a user."""
-    from .models import UserProgress, Certificate, Enrollment, UserBadge
+def _empty_components() -> dict:
+    return {field: 0 for field in SNAPSHOT_FIELDS}
 
-    modules = UserProgress.objects.filter(user=user, is_completed=True).count()
-    paths = Enrollment.objects.filter(user=user, status='completed').count()
-    certs = Certificate.objects.filter(user=user).count()
 
-    # Challenges — distinct first solves
-    challenges = 0
-    try:
-        from .models import CodingSubmission
-        challenges = (
-            CodingSubmission.objects
-            .filter(user=user, status='accepted')
-            .values('challenge')
-            .distinct()
-            .count()
+def _aggregate_components(user_ids) -> dict:
+    """
+    Recount snapshot fields for many users at once: one grouped query per
+    source table, whatever the number of users. Returns {user_id: fields};
+    users with no scored activity are absent.
+
+    Each activity's weekly/monthly share is filtered by its own timestamp, so
+    the rolling windows span ALL scored activity types. (Remediation Req 29.)
+    """
+    from .models import UserProgress, Certificate, Enrollment, UserBadge, CodingSubmission
+
+    week, month = window_starts()
+    out: dict = {}
+
+    def add(user_id, component, count, points, weekly, monthly):
+        row = out.setdefault(user_id, _empty_components())
+        if component:
+            row[component] += count
+        row['total_points'] += points
+        row['weekly_points'] += weekly
+        row['monthly_points'] += monthly
+
+    def windowed(qs, stamp):
+        return qs.values('user_id').annotate(
+            n=Count('id'),
+            w=Count('id', filter=Q(**{f'{stamp}__date__gte': week})),
+            m=Count('id', filter=Q(**{f'{stamp}__date__gte': month})),
         )
-    except Exception:
-        pass
+
+    def first_solves():
+        # A challenge scores once, on the day of its first accepted submission
+        # — what record_challenge_solved writes to the ledger and the day
+        # buckets. Windowing every accepted submission instead would put an old
+        # challenge solved again this week back into the week. The windows are
+        # taken over the first solves, one row per (user, challenge).
+        counts: dict = {}
+        rows = (CodingSubmission.objects.filter(user_id__in=user_ids, status='accepted')
+                .values('user_id', 'challenge_id').annotate(first=Min('submitted_at')))
+        for r in rows:
+            day = timezone.localdate(r['first'])
+            c = counts.setdefault(r['user_id'], {'user_id': r['user_id'], 'n': 0, 'w': 0, 'm': 0})
+            c['n'] += 1
+            c['w'] += day >= week
+            c['m'] += day >= month
+        return counts.values()
+
+    sources = [
+        ('module', windowed(
+            UserProgress.objects.filter(user_id__in=user_ids, is_completed=True), 'completed_at')),
+        ('path', windowed(
+            Enrollment.objects.filter(user_id__in=user_ids, status='completed'), 'completed_at')),
+        ('certificate', windowed(
+            Certificate.objects.filter(user_id__in=user_ids), 'issued_at')),
+        ('challenge', first_solves()),
+    ]
+    for kind, rows in sources:
+        pts = EVENT_POINTS[kind]
+        for r in rows:
+            add(r['user_id'], EVENT_COMPONENTS[kind], r['n'], r['n'] * pts, r['w'] * pts, r['m'] * pts)
 
     # Badges — weighted by rarity
-    badge_qs = UserBadge.objects.filter(user=user).select_related('badge')
-    badge_pts = sum(BADGE_RARITY_POINTS.get(ub.badge.rarity, 0) for ub in badge_qs)
-    badge_count = badge_qs.count()
-
-    total = (
-        modules * 10
-        + paths * 100
-        + challenges * 50
-        + certs * 200
-        + badge_pts
+    badges = (
+        UserBadge.objects.filter(user_id__in=user_ids)
+        .values('user_id', 'badge__rarity')
+        .annotate(
+            n=Count('id'),
+            w=Count('id', filter=Q(earned_at__date__gte=week)),
+            m=Count('id', filter=Q(earned_at__date__gte=month)),
+        )
     )
+    for r in badges:
+        pts = BADGE_RARITY_POINTS.get(r['badge__rarity'], 0)
+        add(r['user_id'], 'badges_earned', r['n'], r['n'] * pts, r['w'] * pts, r['m'] * pts)
 
-    # Rolling window points — sum ALL scored activity types in the period, not
-    # just completed modules, so weekly/monthly rankings are complete. (Req 29.)
-    now = timezone.now()
-    weekly = _period_points(user, now - timedelta(days=7))
-    monthly = _period_points(user, now - timedelta(days=30))
+    return out
 
-    return {
-        'total_points': total,
-        'weekly_points': weekly,
-        'monthly_points': monthly,
-        'modules_completed': modules,
-        'challenges_solved': challenges,
-        'paths_completed': paths,
-        'certificates_earned': certs,
-        'badges_earned': badge_count,
-    }
+
+def _calc_points(user) -> dict:
+    """Return raw component counts and total_points for a user."""
+    return _aggregate_components([user.pk]).get(user.pk) or _empty_components()
 
 
 def update_leaderboard_score(user) -> None:
     """
-    Recalculate and persist LeaderboardSnapshot for a single user.
+    Recalculate and persist LeaderboardSnapshot for a single user from the
+    source tables. The repair path — scoring actions go through `record_event`.
     Non-fatal — errors are logged but never bubble up.
     """
     from .models import LeaderboardSnapshot
@@ -129,56 +182,306 @@ def update_leaderboard_score(user) -> None:
         for field, value in data.items():
             setattr(entry, field, value)
         entry.save()
+        leaderboard_index.sync_snapshot(entry)
         logger.debug(f"[LEADERBOARD] Updated {user.username}: {data['total_points']} pts")
     except Exception as e:
         logger.warning(f"[LEADERBOARD] Failed to update {getattr(user, 'username', '?')}: {e}")
 
 
-def recalculate_all() -> int:
-    """Rebuild snapshots for ALL users. Used by management command."""
+def record_event(user, kind: str, source_id, *, points: int | None = None,
+                 occurred_at=None) -> bool:
+    """
+    Append a scoring event to the ledger and apply it to the user's snapshot.
+
+    Returns True when the event was new, False when it had already been
+    recorded (the ledger's unique key absorbs the repeat). The ledger row and
+    the F() increment commit together, so the snapshot never counts an event
+    the ledger does not hold. A user without a snapshot yet gets one summed
+    from their ledger, which already includes the event just written.
+
+    Non-fatal — errors are logged but never bubble up.
+    """
+    from .models import LeaderboardSnapshot, PointsLedgerEntry
+
+    if points is None:
+        points = EVENT_POINTS[kind]
+    now = timezone.now()
+    occurred_at = occurred_at or now
+    day = timezone.localdate(occurred_at)
+    week, month = window_starts()
+    in_week, in_month = day >= week, day >= month
+
+    try:
+        with transaction.atomic():
+            PointsLedgerEntry.objects.create(
+                user=user, kind=kind, source_id=str(source_id),
+                points=points, occurred_at=occurred_at,
+            )
+            _add_to_day(user, day, points)
+            updated = LeaderboardSnapshot.objects.filter(user=user).update(
+                total_points=F('total_points') + points,
+                weekly_points=F('weekly_points') + (points if in_week else 0),
+                monthly_points=F('monthly_points') + (points if in_month else 0),
+                last_updated=now,
+                **{EVENT_COMPONENTS[kind]: F(EVENT_COMPONENTS[kind]) + 1},
+            )
+    except IntegrityError:
+        return False
+    except Exception as e:
+        logger.warning(f"[LEADERBOARD] Failed to record {kind} for {getattr(user, 'username', '?')}: {e}")
+        return False
+
+    if not updated:
+        _create_snapshot_from_ledger(user)
+        return True
+
+    field_board = {field: board for board, field in leaderboard_index.BOARDS.items()}
+    deltas = {
+        'all_time': points,
+        'weekly': points if in_week else 0,
+        'monthly': points if in_month else 0,
+    }
+    if EVENT_COMPONENTS[kind] in field_board:
+        deltas[field_board[EVENT_COMPONENTS[kind]]] = 1
+    leaderboard_index.apply_increment(user.pk, deltas)
+    return True
+
+
+def _add_to_day(user, day, points: int) -> None:
+    """Add points to the user's bucket for `day`, creating it on first use."""
+    from .models import DailyPoints
+
+    if DailyPoints.objects.filter(user=user, day=day).update(points=F('points') + points):
+        return
+    try:
+        with transaction.atomic():
+            DailyPoints.objects.create(user=user, day=day, points=points)
+    except IntegrityError:
+        # A concurrent event created the bucket between the two statements.
+        DailyPoints.objects.filter(user=user, day=day).update(points=F('points') + points)
+
+
+def _create_snapshot_from_ledger(user) -> None:
+    """
+    First event for a user with no snapshot: sum their ledger in one aggregate.
+    The ledger already holds the event just written (and, via the backfill
+    migration, everything scored before incremental scoring existed).
+    """
+    from .models import LeaderboardSnapshot, PointsLedgerEntry
+
+    week, month = window_starts()
+    agg = PointsLedgerEntry.objects.filter(user=user).aggregate(
+        total_points=Sum('points'),
+        weekly_points=Sum('points', filter=Q(occurred_at__date__gte=week)),
+        monthly_points=Sum('points', filter=Q(occurred_at__date__gte=month)),
+        **{
+            field: Count('id', filter=Q(kind=kind))
+            for kind, field in EVENT_COMPONENTS.items()
+        },
+    )
+    entry, _ = LeaderboardSnapshot.objects.get_or_create(
+        user=user, defaults={k: v or 0 for k, v in agg.items()},
+    )
+    leaderboard_index.sync_snapshot(entry)
+
+
+def record_module_completed(user, progress) -> bool:
+    """Convenience: a UserProgress row was just marked complete."""
+    return record_event(user, 'module', progress.pk, occurred_at=progress.completed_at)
+
+
+def record_path_completed(user, enrollment) -> bool:
+    """Convenience: an Enrollment was just marked complete."""
+    return record_event(user, 'path', enrollment.pk, occurred_at=enrollment.completed_at)
+
+
+def record_certificate(user, certificate) -> bool:
+    """Convenience: a Certificate was just issued."""
+    return record_event(user, 'certificate', certificate.pk, occurred_at=certificate.issued_at)
+
+
+def record_challenge_solved(user, challenge) -> bool:
+    """Convenience: an accepted submission. Only the first solve per challenge scores."""
+    return record_event(user, 'challenge', challenge.pk)
+
+
+def record_badge(user, user_badge) -> bool:
+    """Convenience: a UserBadge was just granted; points follow its rarity."""
+    # Keyed by the badge, as the ledger backfill (migration 0028) keyed it.
+    return record_event(
+        user, 'badge', user_badge.badge_id,
+        points=BADGE_RARITY_POINTS.get(user_badge.badge.rarity, 0),
+        occurred_at=user_badge.earned_at,
+    )
+
+
+def roll_windows() -> int:
+    """
+    Recompute weekly_points and monthly_points for every snapshot from the
+    DailyPoints buckets, in a single UPDATE. Returns the rows updated.
+
+    Increments keep the windows right as points arrive; this is what ages
+    points OUT of them, so it has to run at least once a day.
+    """
+    from .models import DailyPoints, LeaderboardSnapshot
+
+    week, month = window_starts()
+
+    def window_sum(since):
+        return Coalesce(Subquery(
+            DailyPoints.objects
+            .filter(user_id=OuterRef('user_id'), day__gte=since)
+            .values('user_id')
+            .annotate(total=Sum('points'))
+            .values('total')[:1]
+        ), 0)
+
+    updated = LeaderboardSnapshot.objects.update(
+        weekly_points=window_sum(week),
+        monthly_points=window_sum(month),
+    )
+    # Every window moved at once; reloading the index is one more query and
+    # doubles as its hourly self-heal.
+    leaderboard_index.rebuild()
+    return updated
+
+
+def verify_snapshot(user, repair: bool = False) -> dict:
+    """
+    Compare a user's snapshot with a full recount from the source tables.
+
+    Returns {field: (snapshot_value, recounted_value)} for every field that
+    drifted — empty when the incremental path and the recount agree. Drift is
+    expected only where scoring is undone (a deleted certificate, a reset
+    module), which the append-only ledger does not reverse. With `repair`, the
+    recounted values are written back.
+    """
+    from .models import LeaderboardSnapshot
+
+    data = _calc_points(user)
+    entry = LeaderboardSnapshot.objects.filter(user=user).first()
+    drift = {
+        field: (getattr(entry, field, None), data[field])
+        for field in SNAPSHOT_FIELDS
+        if getattr(entry, field, None) != data[field]
+    }
+    if drift and repair:
+        entry = entry or LeaderboardSnapshot(user=user)
+        for field, value in data.items():
+            setattr(entry, field, value)
+        entry.save()
+        leaderboard_index.sync_snapshot(entry)
+    return drift
+
+
+def _chunked_user_ids(chunk_size: int):
     from django.contrib.auth import get_user_model
+
+    ids = list(get_user_model().objects.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(ids), chunk_size):
+        yield ids[i:i + chunk_size], len(ids)
+
+
+def recalculate_all(chunk_size: int = 500, on_chunk=None) -> int:
+    """
+    Rebuild snapshots for ALL users. Used by management command.
+
+    Set-based: each chunk of users costs one grouped aggregate per source table
+    plus one upsert, instead of ~15 queries and a save per user. `on_chunk`, if
+    given, is called as on_chunk(done, total) after each chunk is written.
+    """
     from .models import LeaderboardSnapshot
 
-    User = get_user_model()
-    users = User.objects.all()
-    count = 0
-    for user in users:
-        try:
-            data = _calc_points(user)
-            entry, _ = LeaderboardSnapshot.objects.get_or_create(user=user)
-            for field, value in data.items():
-                setattr(entry, field, value)
-            entry.save()
-            count += 1
-        except Exception as e:
-            logger.warning(f"[LEADERBOARD] Failed for {user.username}: {e}")
-    return count
-
-
-def get_user_rank(user) -> dict:
-    """Return rank, total users, and percentile for a given user."""
+    done = 0
+    for ids, total in _chunked_user_ids(chunk_size):
+        components = _aggregate_components(ids)
+        LeaderboardSnapshot.objects.bulk_create(
+            [
+                LeaderboardSnapshot(user_id=uid, **(components.get(uid) or _empty_components()))
+                for uid in ids
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[*SNAPSHOT_FIELDS, 'last_updated'],
+        )
+        done += len(ids)
+        if on_chunk:
+            on_chunk(done, total)
+    leaderboard_index.rebuild()
+    return done
+
+
+def verify_all(chunk_size: int = 500, repair: bool = False, on_chunk=None) -> dict:
+    """
+    `verify_snapshot` for every user, chunked like `recalculate_all`.
+    Returns {user_id: drift} for the users whose snapshot drifted.
+    """
+    from .models import LeaderboardSnapshot
+
+    drifted: dict = {}
+    done = 0
+    for ids, total in _chunked_user_ids(chunk_size):
+        components = _aggregate_components(ids)
+        snapshots = LeaderboardSnapshot.objects.in_bulk(ids, field_name='user_id')
+        chunk_drift = {}
+        for uid in ids:
+            data = components.get(uid) or _empty_components()
+            entry = snapshots.get(uid)
+            drift = {
+                field: (getattr(entry, field, None), data[field])
+                for field in SNAPSHOT_FIELDS
+                if getattr(entry, field, None) != data[field]
+            }
+            if drift:
+                chunk_drift[uid] = drift
+        drifted.update(chunk_drift)
+        if repair and chunk_drift:
+            LeaderboardSnapshot.objects.bulk_create(
+                [
+                    LeaderboardSnapshot(user_id=uid, **(components.get(uid) or _empty_components()))
+                    for uid in chunk_drift
+                ],
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=[*SNAPSHOT_FIELDS, 'last_updated'],
+            )
+        done += len(ids)
+        if on_chunk:
+            on_chunk(done, total)
+    if repair and drifted:
+        leaderboard_index.rebuild()
+    return drifted
+
+
+def get_user_rank(user, board: str = 'all_time') -> dict:
+    """
+    Return rank, total users, and percentile for a given user on a board
+    (leaderboard_index.BOARDS). Rank comes from the sorted-set index; only the
+    user's own snapshot row is read from the database.
+    """
     from .models import LeaderboardSnapshot
 
     try:
-        entry = LeaderboardSnapshot.objects.get(user=user)
+        entry = LeaderboardSnapshot.objects.select_related('user').get(user=user)
     except LeaderboardSnapshot.DoesNotExist:
         update_leaderboard_score(user)
         try:
-            entry = LeaderboardSnapshot.objects.get(user=user)
+            entry = LeaderboardSnapshot.objects.select_related('user').get(user=user)
         except LeaderboardSnapshot.DoesNotExist:
             return {'rank': None, 'total_users': 0, 'percentile': 0, 'total_points': 0}
 
-    rank = LeaderboardSnapshot.objects.filter(
-        total_points__gt=entry.total_points
-    ).count() + 1
-
-    total = LeaderboardSnapshot.objects.count()
-    percentile = round((1 - (rank / max(total, 1))) * 100)
+    info = leaderboard_index.rank(user.pk, board)
+    if info is None:
+        # Written before the index was warm, or lost with a Redis flush.
+        leaderboard_index.sync_snapshot(entry)
+        info = leaderboard_index.rank(user.pk, board) or {
+            'rank': None, 'total_users': 0, 'percentile': 0,
+        }
 
     return {
-        'rank': rank,
-        'total_users': total,
-        'percentile': percentile,
+        'rank': info['rank'],
+        'total_users': info['total_users'],
+        'percentile': info['percentile'],
         'total_points': entry.total_points,
         'entry': entry,
     }
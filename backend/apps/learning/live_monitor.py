@@ -0,0 +1,155 @@
+"""
+Instructor monitor updates for a live quiz room, coalesced and sent as deltas.
+
+Every answer, code submission, join and leave used to re-read every participant
+of the session and send the whole list to the instructor group. Sixty students
+answering in the same second was sixty full reads and sixty full payloads, all
+but one of them stale on arrival.
+
+Now a change only marks the room dirty — with the participant it concerns when
+the caller knows it — and the first mark opens a short window (WINDOW). When
+it closes, one query reads just the participants that changed, they are
+compared against what the monitor was last sent, and only rows that differ go
+out as an `instructor_participant_delta`: {seq, changed, removed}.
+
+`seq` is a per-room counter in the shared cache, so it is one sequence across
+every worker process. The monitor applies a delta only if it is the next
+number; on a gap it asks for a snapshot again (`instructor_join`), which is
+what it gets on every (re)connect. A snapshot carries the seq it is current
+as of, read BEFORE the rows, so a delta racing it is applied again rather than
+lost — applying a row twice is harmless.
+
+A join or leave does not name a participant row (presence is by username), so
+it marks the whole room, and the flush diffs the full list instead.
+
+The window is per process. With several workers each coalesces its own
+students' changes; the shared seq keeps their deltas in one order.
+"""
+import asyncio
+import logging
+
+from channels.layers import get_channel_layer
+
+from apps.core import db_pool
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 0.25           # seconds a room's changes are gathered before a flush
+STATE_TTL = 7200        # matches presence.ROOM_TTL
+
+_pending: dict[str, dict] = {}
+
+
+def instructor_group(join_code: str) -> str:
+    return f'quiz_{join_code}_instructor'
+
+
+def _seq_key(join_code: str) -> str:
+    return f'quiz_monitor_seq_{join_code}'
+
+
+def _state_key(join_code: str) -> str:
+    return f'quiz_monitor_state_{join_code}'
+
+
+def _row(p) -> dict:
+    return {
+        'id': str(p.id),
+        'nickname': p.nickname,
+        'total_score': p.total_score,
+        'total_correct': p.total_correct,
+        'total_attempted': p.total_attempted,
+        'fullscreen_violations': p.fullscreen_violations,
+        'tab_switch_count': p.tab_switch_count,
+        'copy_paste_attempts': p.copy_paste_attempts,
+        'is_flagged': p.is_flagged,
+        'is_paused': p.is_paused,
+        'pause_reason': p.pause_reason or '',
+    }
+
+
+@db_pool.pooled
+def _rows(join_code: str, ids=None) -> list[dict]:
+    """Active participants of the room, or just `ids` of them, in one query."""
+    from .models import LiveQuizParticipant
+
+    participants = LiveQuizParticipant.objects.filter(
+        session__quiz__join_code=join_code, is_active=True,
+    ).order_by('joined_at')
+    if ids is not None:
+        participants = participants.filter(id__in=ids)
+    return [_row(p) for p in participants]
+
+
+@db_pool.pooled
+def _current_seq(join_code: str) -> int:
+    from django.core.cache import cache
+    return int(cache.get(_seq_key(join_code)) or 0)
+
+
+@db_pool.pooled
+def _diff(join_code: str, rows: list[dict], ids) -> dict | None:
+    """Rows that differ from what the monitor was last sent, and rows now gone.
+
+    `ids` None means `rows` is the whole room, so anything sent before and
+    missing now has left.
+    """
+    from django.core.cache import cache
+
+    sent = cache.get(_state_key(join_code)) or {}
+    changed = [row for row in rows if sent.get(row['id']) != row]
+    present = {row['id'] for row in rows}
+    candidates = sent.keys() if ids is None else ids
+    removed = [pid for pid in candidates if pid in sent and pid not in present]
+    if not changed and not removed:
+        return None
+
+    for row in changed:
+        sent[row['id']] = row
+    for pid in removed:
+        sent.pop(pid, None)
+    cache.set(_state_key(join_code), sent, STATE_TTL)
+
+    try:
+        seq = cache.incr(_seq_key(join_code))
+    except ValueError:
+        # Cold counter: add is the atomic part, as in lab.execution._next.
+        seq = 1 if cache.add(_seq_key(join_code), 1, STATE_TTL) else cache.incr(_seq_key(join_code))
+    return {'seq': seq, 'changed': changed, 'removed': removed}
+
+
+async def snapshot(join_code: str) -> dict:
+    """The full roster for one instructor connection, with the seq it is current as of."""
+    seq = await _current_seq(join_code)
+    return {'participants': await _rows(join_code), 'seq': seq}
+
+
+async def changed(join_code: str, participant_id=None) -> None:
+    """Mark a participant (or, with None, the whole room) as changed."""
+    pending = _pending.get(join_code)
+    if pending is None:
+        pending = _pending[join_code] = {'ids': set(), 'full': False}
+        asyncio.get_running_loop().call_later(
+            WINDOW, lambda: asyncio.ensure_future(flush(join_code)))
+    if participant_id is None:
+        pending['full'] = True
+    else:
+        pending['ids'].add(str(participant_id))
+
+
+async def flush(join_code: str) -> None:
+    """Send whatever changed in the room since the window opened."""
+    pending = _pending.pop(join_code, None)
+    if pending is None:
+        return
+    ids = None if pending['full'] else pending['ids']
+    try:
+        rows = await _rows(join_code, ids)
+        delta = await _diff(join_code, rows, ids)
+        if delta:
+            await get_channel_layer().group_send(
+                instructor_group(join_code),
+                {'type': 'instructor_participant_delta', **delta},
+            )
+    except Exception:
+        logger.exception('monitor flush failed for quiz %s', join_code)
@@ -0,0 +1,186 @@
+"""
+What a live quiz room's socket handlers need to know, loaded once per change.
+
+Every handler in LiveQuizConsumer looked its room up from scratch: the quiz by
+join code, then `quiz.session` — two queries per message before doing anything
+— and an answer then read the participant and the question as well, all to
+score one letter. With a room answering together that is hundreds of identical
+reads a second for data that changes a handful of times per quiz.
+
+The room state is a plain dict: the quiz's scoring and proctoring settings,
+the session's id, status and current question, and the question bank (minus
+model solutions). It lives in three places, cheapest first:
+
+  * a per-process dict, checked against the room's version number;
+  * the shared cache (Redis in production), under a key that includes the
+    version, so every worker loads it from the database at most once;
+  * the database, read in two queries when neither has it.
+
+Anything that changes what the state describes calls invalidate(), which bumps
+the version. A worker that loaded the old version keeps it under the old key,
+so a write racing a load can never be served as current. The consumer
+invalidates after its own session writes; the REST views do after editing a
+quiz, its questions or its session. Writes that go around both (the admin, a
+shell) are covered by STATE_TTL, after which every copy is reloaded anyway.
+
+Reading the version is one cache round trip per message, against the two to
+four database queries it replaces.
+
+The per-process copies are swept as they go stale: a room that ended, or that
+this worker stopped serving, is dropped STATE_TTL after its copy was loaded,
+and a session's known participants STATE_TTL after the last one was checked.
+invalidate() only reaches the worker that called it, so without the sweep a
+long-lived worker would keep every room it had ever served.
+"""
+import logging
+import time
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+STATE_TTL = 300         # seconds any copy is trusted without a version bump
+VERSION_TTL = 86400     # outlives every copy, so a counter that expires restarts safely
+
+_QUIZ_FIELDS = (
+    'max_violations', 'violation_penalty_points', 'fullscreen_exit_action',
+    'alt_tab_action', 'enable_code_execution',
+)
+_QUESTION_FIELDS = (
+    'question_text', 'question_type', 'option_a', 'option_b', 'option_c', 'option_d',
+    'correct_answer', 'programming_language', 'starter_code', 'test_cases',
+    'points', 'time_limit', 'time_bonus_enabled',
+)
+
+_local: dict[str, tuple[int, float, dict]] = {}
+# session id -> (last checked, participant ids seen in it)
+_participants: dict[str, tuple[float, set[str]]] = {}
+_swept_at = 0.0
+
+
+def _version_key(join_code: str) -> str:
+    return f'live_state:ver:{join_code}'
+
+
+def _state_key(join_code: str, version: int) -> str:
+    return f'live_state:{join_code}:{version}'
+
+
+def _load(join_code: str) -> dict | None:
+    from .models import LiveQuiz, LiveQuizQuestion
+
+    quiz = LiveQuiz.objects.filter(join_code=join_code).values(
+        'id', *_QUIZ_FIELDS, 'session__id', 'session__status', 'session__current_question_id',
+    ).first()
+    if quiz is None:
+        return None
+    session_id = quiz.pop('session__id')
+    status = quiz.pop('session__status')
+    current = quiz.pop('session__current_question_id')
+    questions = LiveQuizQuestion.objects.filter(quiz_id=quiz['id']).order_by('order').values(
+        'id', *_QUESTION_FIELDS)
+    return {
+        'quiz': {**quiz, 'id': str(quiz['id'])},
+        'session': session_id and {
+            'id': str(session_id),
+            'status': status,
+            'current_question_id': current and str(current),
+        },
+        'questions': {str(q['id']): {**q, 'id': str(q['id'])} for q in questions},
+    }
+
+
+def _sweep(now: float) -> None:
+    """Drop this process's copies that are past STATE_TTL; at most once per STATE_TTL."""
+    global _swept_at
+    if now - _swept_at < STATE_TTL:
+        return
+    _swept_at = now
+    # list() first: socket handlers on other pool threads may be adding.
+    for join_code, (_, loaded, _) in list(_local.items()):
+        if now - loaded >= STATE_TTL:
+            _local.pop(join_code, None)
+    for session_id, (checked, _) in list(_participants.items()):
+        if now - checked >= STATE_TTL:
+            _participants.pop(session_id, None)
+
+
+def get(join_code: str) -> dict | None:
+    """The room's state, or None if no quiz has this join code."""
+    version = int(cache.get(_version_key(join_code)) or 0)
+    now = time.monotonic()
+    _sweep(now)
+
+    local = _local.get(join_code)
+    if local and local[0] == version and now - local[1] < STATE_TTL:
+        return local[2]
+
+    state = cache.get(_state_key(join_code, version))
+    if state is None:
+        state = _load(join_code)
+        if state is None:
+            return None
+        cache.set(_state_key(join_code, version), state, STATE_TTL)
+    _local[join_code] = (version, now, state)
+    return state
+
+
+def invalidate(join_code: str) -> None:
+    """Retire every cached copy of this room's state; the next get() reloads."""
+    _local.pop(join_code, None)
+    key = _version_key(join_code)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Cold counter: incr raises on a missing key, and add() is the
+            # atomic part. Starts at 1, so a reader still holding version 0
+            # is stale.
+            if not cache.add(key, 1, VERSION_TTL):
+                cache.incr(key)
+    except Exception as e:
+        # A version we could not bump still expires with STATE_TTL.
+        logger.warning(f'live state for {join_code} not invalidated: {e}')
+
+
+def question(state: dict, question_id) -> SimpleNamespace | None:
+    """A question of this quiz, shaped for live_quiz_scoring; None if not in it."""
+    q = state['questions'].get(str(question_id))
+    return q and SimpleNamespace(**q)
+
+
+def has_participant(state: dict, participant_id) -> bool:
+    """
+    Whether this participant belongs to the room's session.
+
+    Participants join over REST, so they are not part of the state; a yes is
+    remembered per process instead (nobody is moved to another session), and
+    only a participant's first message costs a query.
+    """
+    from .models import LiveQuizParticipant
+
+    session = state['session']
+    if not session:
+        return False
+    _, known = _participants.get(session['id'], (None, set()))
+    _participants[session['id']] = (time.monotonic(), known)
+    if str(participant_id) in known:
+        return True
+    try:
+        found = LiveQuizParticipant.objects.filter(
+            id=participant_id, session_id=session['id']).exists()
+    except (ValueError, ValidationError):
+        return False    # not even a UUID
+    if found:
+        known.add(str(participant_id))
+    return found
+
+
+def reset() -> None:
+    """Forget this process's copies. For tests."""
+    global _swept_at
+    _local.clear()
+    _participants.clear()
+    _swept_at = 0.0
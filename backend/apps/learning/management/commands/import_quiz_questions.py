@@ -29,6 +29,7 @@ from html.parser import HTMLParser
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from apps.learning import catalog_cache
 from apps.learning.models import Question, QuestionChoice, Quiz
 
 
@@ -357,6 +358,7 @@ class Command(BaseCommand):
                 created_questions += 1
             touched_quizzes += 1
 
+        catalog_cache.bump()
         self.stdout.write('')
         verb = 'would create' if dry_run else 'created'
         self.stdout.write(self.style.SUCCESS(
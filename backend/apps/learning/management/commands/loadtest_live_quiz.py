@@ -0,0 +1,430 @@
+"""
+Load-test the live quiz WebSocket protocol: how many students can one room take?
+
+Nothing else tells us when LiveQuizConsumer stops keeping up. This drives the
+real consumer through Channels' WebsocketCommunicator — the same application
+the ASGI server routes to, minus the network — with one instructor and N
+students playing a quiz the way a class does:
+
+  * everyone connects to /ws/quiz/<join_code>/ at once;
+  * the instructor starts the quiz and sends each question;
+  * students answer over --window seconds, most of them early and a long tail
+    late (log-normal, like real reaction times), and --violations of them
+    switch tabs once along the way;
+  * the instructor ends the question, which flushes the answer buffer.
+
+It reports, per message type, the latency percentiles a student (or the
+instructor) sees, how long a broadcast takes to reach the LAST student, how
+far the instructor's monitor trails the answers it should show, and how many
+database queries each phase cost:
+
+    python manage.py loadtest_live_quiz                     # 50 students
+    python manage.py loadtest_live_quiz --students 300 --questions 5
+    python manage.py loadtest_live_quiz --redis redis://localhost:6379/1
+    python manage.py loadtest_live_quiz --json              # for a CI diff
+
+By default the channel layer is the in-memory one, so the numbers are the
+consumer's own cost. --redis points the channel layer AND the cache at a
+Redis (presence, room state and the answer buffer all live in the cache), so
+the multi-worker code paths are the ones measured. Everything runs in this one
+process: it measures the consumer, not the ASGI server.
+
+It writes to whatever database is configured — a throwaway instructor, quiz
+and students, named loadtest_<run>_*, deleted at the end unless --keep. The
+query counts are backend-independent; the timings belong to wherever the
+database lives, as with measure_queries.
+"""
+import asyncio
+import json
+import math
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+from apps.core import db_pool
+
+# Messages every student gets on every join and leave; counted, not waited on.
+NOISE = ('participant_update',)
+TIMEOUT = 30.0      # a wait this long means the consumer is stuck, not slow
+
+
+class _Socket:
+    """
+    One simulated browser tab. A reader task drains the communicator as fast
+    as the consumer sends, timestamping each message, so a slow wait on one
+    message type never holds up the clock on another.
+    """
+
+    def __init__(self, communicator, name):
+        self.communicator = communicator
+        self.name = name
+        self.inbox = []                 # (perf_counter, message)
+        self._arrived = asyncio.Condition()
+        self._reader = None
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect(timeout=TIMEOUT)
+        if not connected:
+            raise CommandError(f'{self.name}: the consumer refused the connection')
+        self._reader = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        # output_queue directly: receive_output() kills the application on
+        # timeout, and a quiet socket is not a dead one.
+        while True:
+            message = await self.communicator.output_queue.get()
+            if message['type'] != 'websocket.send':
+                continue
+            now = time.perf_counter()
+            async with self._arrived:
+                self.inbox.append((now, json.loads(message['text'])))
+                self._arrived.notify_all()
+
+    async def send(self, payload):
+        sent = time.perf_counter()
+        await self.communicator.send_json_to(payload)
+        return sent
+
+    async def first(self, kind, since, match=None):
+        """When the first `kind` message at or after `since` arrived."""
+        def found():
+            for at, message in self.inbox:
+                if at >= since and message.get('type') == kind and (match is None or match(message)):
+                    return at
+            return None
+
+        async with self._arrived:
+            await asyncio.wait_for(self._arrived.wait_for(lambda: found() is not None), TIMEOUT)
+            return found()
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+        await self.communicator.disconnect(timeout=TIMEOUT)
+
+
+class _QueryCounter:
+    """
+    Counts the queries of every connection the consumer uses, by phase.
+
+    The consumer's database work runs on apps/core/db_pool.py's threads, not
+    this one, so CaptureQueriesContext on our own connection would see none of
+    it. An execute wrapper goes on a pool thread's connection (install(), run
+    through the pool so it runs there) and on any connection opened while the
+    test runs.
+    """
+
+    def __init__(self):
+        self.phase = 'setup'
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._wrapped = []
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.counts[self.phase] += 1
+        return execute(sql, params, many, context)
+
+    def _wrap(self, conn):
+        if self not in conn.execute_wrappers:
+            conn.execute_wrappers.append(self)
+            self._wrapped.append(conn)
+
+    def _created(self, sender, connection, **kwargs):
+        self._wrap(connection)
+
+    def install(self):
+        self._wrap(connection)
+        connection_created.connect(self._created)
+
+    def uninstall(self):
+        connection_created.disconnect(self._created)
+        for conn in self._wrapped:
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+
+def percentiles(samples):
+    """n, p50, p95, p99 and max of `samples` (seconds), in milliseconds."""
+    if not samples:
+        return {'n': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    ordered = sorted(samples)
+
+    def at(q):
+        # Nearest-rank: the value at least q of the samples are at or below.
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)] * 1000
+
+    return {
+        'n': len(ordered),
+        'p50': statistics.median(ordered) * 1000,
+        'p95': at(0.95), 'p99': at(0.99), 'max': ordered[-1] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Simulate a class playing a live quiz over WebSockets and report latency and queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50,
+                            help='Students in the room (default: 50).')
+        parser.add_argument('--questions', type=int, default=3,
+                            help='Questions to play (default: 3).')
+        parser.add_argument('--window', type=float, default=3.0,
+                            help='Seconds over which a question\'s answers arrive (default: 3).')
+        parser.add_argument('--violations', type=float, default=0.1,
+                            help='Fraction of students who switch tabs once per question (default: 0.1).')
+        parser.add_argument('--correct', type=float, default=0.7,
+                            help='Fraction of answers that are right (default: 0.7).')
+        parser.add_argument('--redis', metavar='URL',
+                            help='Use this Redis for the channel layer and the cache.')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Seed the arrival times and answers, for comparable runs.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded quiz and users instead of deleting them.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the report as JSON.')
+
+    # -- fixtures ------------------------------------------------------------
+
+    def _seed(self, students, questions):
+        from apps.accounts.models import User
+        from apps.learning.models import (
+            LiveQuiz, LiveQuizParticipant, LiveQuizQuestion, LiveQuizSession,
+        )
+
+        run = uuid.uuid4().hex[:8]
+        # One hash for everybody: create_user would spend a PBKDF2 per student.
+        password = make_password(None)
+        instructor = User.objects.create(
+            username=f'loadtest_{run}_inst', email=f'loadtest_{run}_inst@example.com',
+            password=password, role='instructor')
+        quiz = LiveQuiz.objects.create(
+            instructor=instructor, title=f'Load test {run}', creation_method='manual')
+        session = LiveQuizSession.objects.create(quiz=quiz)
+        bank = [
+            LiveQuizQuestion.objects.create(
+                quiz=quiz, question_text=f'Question {i}', question_type='multiple_choice',
+                order=i, option_a='a', option_b='b', option_c='c', option_d='d',
+                correct_answer='A', points=100, time_limit=30)
+            for i in range(1, questions + 1)
+        ]
+        users = User.objects.bulk_create([
+            User(username=f'loadtest_{run}_{i}', email=f'loadtest_{run}_{i}@example.com',
+                 password=password, role='student')
+            for i in range(students)
+        ])
+        users = list(User.objects.filter(username__startswith=f'loadtest_{run}_', role='student')
+                     .order_by('username'))
+        participants = LiveQuizParticipant.objects.bulk_create([
+            LiveQuizParticipant(session=session, student=u, nickname=u.username) for u in users
+        ])
+        return run, instructor, quiz, bank, list(zip(users, participants))
+
+    def _cleanup(self, run):
+        from apps.accounts.models import User
+        from apps.learning.models import LiveQuiz
+
+        LiveQuiz.objects.filter(title=f'Load test {run}').delete()
+        User.objects.filter(username__startswith=f'loadtest_{run}_').delete()
+
+    # -- the class -----------------------------------------------------------
+
+    async def _play(self, quiz, bank, students, options, counter):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from django.contrib.auth.models import AnonymousUser
+
+        from apps.learning import live_monitor
+        from core.routing import websocket_urlpatterns
+
+        rng = random.Random(options['seed'])
+        application = URLRouter(websocket_urlpatterns)
+        path = f'/ws/quiz/{quiz.join_code}/'
+        samples = defaultdict(list)
+        await db_pool.run(counter.install)
+
+        def socket(user, name):
+            communicator = WebsocketCommunicator(application, path)
+            # What AuthMiddlewareStack would have put there from the session.
+            communicator.scope['user'] = user
+            return _Socket(communicator, name)
+
+        # The instructor identifies over the socket, as the monitor panel does.
+        instructor = socket(AnonymousUser(), 'instructor')
+        await instructor.connect()
+        await instructor.send({'type': 'instructor_join'})
+        await instructor.first('instructor_participant_update', 0)
+
+        counter.phase = 'join'
+        sockets = [socket(user, user.username) for user, _ in students]
+
+        async def join(s):
+            started = time.perf_counter()
+            await s.connect()
+            samples['connect'].append(time.perf_counter() - started)
+        await asyncio.gather(*(join(s) for s in sockets))
+
+        counter.phase = 'questions'
+        started = await instructor.send({'type': 'start_quiz'})
+        arrivals = await asyncio.gather(*(s.first('quiz_started', started) for s in sockets))
+        samples['quiz_started fan-out'] += [at - started for at in arrivals]
+
+        acks = []       # (participant id, acknowledged at)
+        for question in bank:
+            counter.phase = 'questions'
+            payload = {
+                'id': str(question.id), 'question_text': question.question_text,
+                'type': 'mcq', 'options': ['a', 'b', 'c', 'd'], 'points': question.points,
+            }
+            sent = await instructor.send({
+                'type': 'next_question', 'question': payload, 'timeLimit': question.time_limit})
+            arrivals = await asyncio.gather(*(s.first('question_start', sent) for s in sockets))
+            samples['question_start fan-out'] += [at - sent for at in arrivals]
+            samples['question_start, last student'].append(max(arrivals) - sent)
+
+            counter.phase = 'answers'
+
+            async def answer(s, participant):
+                # Log-normal reaction time, median a third of the window, the
+                # stragglers cut off when it closes.
+                delay = min(options['window'], rng.lognormvariate(
+                    math.log(options['window'] / 3), 0.6))
+                cheats = rng.random() < options['violations']
+                if cheats:
+                    await asyncio.sleep(delay * rng.random())
+                    sent = await s.send({
+                        'type': 'report_violation', 'participant_id': str(participant.id),
+                        'violation_type': 'tab_switch'})
+                    at = await s.first('violation_recorded', sent)
+                    samples['violation_recorded'].append(at - sent)
+                    alert = await instructor.first(
+                        'violation_alert', sent,
+                        lambda m: m['participant_id'] == str(participant.id))
+                    samples['violation_alert, instructor'].append(alert - sent)
+                    await asyncio.sleep(max(0.0, delay - (time.perf_counter() - sent)))
+                else:
+                    await asyncio.sleep(delay)
+                choice = 'A' if rng.random() < options['correct'] else rng.choice('BCD')
+                sent = await s.send({
+                    'type': 'submit_answer', 'participant_id': str(participant.id),
+                    'question_id': str(question.id), 'answer': choice, 'response_time': delay})
+                at = await s.first('answer_submitted', sent)
+                samples['answer_submitted'].append(at - sent)
+                acks.append((str(participant.id), at))
+
+            await asyncio.gather(*(
+                answer(s, participant) for s, (_, participant) in zip(sockets, students)))
+
+            counter.phase = 'end_question'
+            sent = await instructor.send({
+                'type': 'end_question', 'correctAnswer': 'A', 'points': question.points})
+            arrivals = await asyncio.gather(*(s.first('question_end', sent) for s in sockets))
+            samples['question_end fan-out'] += [at - sent for at in arrivals]
+            samples['question_end, last student'].append(max(arrivals) - sent)
+
+        # Let the last monitor window close before reading the instructor's inbox.
+        counter.phase = 'end_question'
+        await asyncio.sleep(live_monitor.WINDOW * 2 + 0.5)
+        deltas = [(at, {row['id'] for row in m['changed']})
+                  for at, m in instructor.inbox if m.get('type') == 'instructor_participant_delta']
+        for participant_id, acked in acks:
+            shown = next((at for at, ids in deltas if at >= acked and participant_id in ids), None)
+            if shown is not None:
+                samples['monitor lag after ack'].append(shown - acked)
+        samples['monitor deltas'] = [0.0] * len(deltas)     # a count, not a latency
+
+        counter.phase = 'leave'
+        await asyncio.gather(*(s.close() for s in sockets))
+        await instructor.close()
+        await db_pool.run(counter.uninstall)
+
+        noise = sum(1 for s in sockets for _, m in s.inbox if m.get('type') in NOISE)
+        return samples, noise, len(acks)
+
+    # -- entry point ---------------------------------------------------------
+
+    def handle(self, *args, **options):
+        if options['students'] < 1 or options['questions'] < 1:
+            raise CommandError('--students and --questions must be at least 1.')
+
+        if options['redis']:
+            layers = {'default': {
+                'BACKEND': 'channels_redis.core.RedisChannelLayer',
+                'CONFIG': {'hosts': [options['redis']]},
+            }}
+            caches = {'default': {
+                'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': options['redis'],
+                'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+            }}
+        else:
+            # Room for every student's roster updates: at the default capacity
+            # of 100 the in-memory layer drops messages past the 100th student.
+            layers = {'default': {
+                'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                'CONFIG': {'capacity': max(100, options['students'] * 4)},
+            }}
+            caches = settings.CACHES
+
+        run, _instructor, quiz, bank, students = self._seed(options['students'], options['questions'])
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        try:
+            with override_settings(CHANNEL_LAYERS=layers, CACHES=caches):
+                samples, noise, answers = asyncio.run(
+                    self._play(quiz, bank, students, options, counter))
+        finally:
+            counter.uninstall()
+            if not options['keep']:
+                self._cleanup(run)
+        elapsed = time.perf_counter() - started
+
+        deltas = len(samples.pop('monitor deltas', []))
+        report = {
+            'students': options['students'],
+            'questions': options['questions'],
+            'channel_layer': 'redis' if options['redis'] else 'in-memory',
+            'database': connection.vendor,
+            'elapsed_s': round(elapsed, 2),
+            'answers': answers,
+            'roster_broadcasts_received': noise,
+            'monitor_deltas': deltas,
+            'latency_ms': {name: percentiles(values) for name, values in samples.items()},
+            'queries': dict(counter.counts),
+            'queries_per_answer': round(counter.counts['answers'] / answers, 2) if answers else None,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self._print(report)
+
+    def _print(self, report):
+        self.stdout.write(
+            f"{report['students']} students, {report['questions']} questions, "
+            f"{report['channel_layer']} channel layer, {report['database']} database "
+            f"— {report['elapsed_s']}s")
+        self.stdout.write('')
+        self.stdout.write(f'{"latency (ms)":<32}{"n":>7}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}')
+        self.stdout.write('-' * 75)
+        for name, row in report['latency_ms'].items():
+            cells = ''.join(
+                f'{"-":>9}' if row[k] is None else f'{row[k]:>9.1f}'
+                for k in ('p50', 'p95', 'p99', 'max'))
+            self.stdout.write(f'{name:<32}{row["n"]:>7}{cells}')
+        self.stdout.write('')
+        self.stdout.write('queries: ' + '  '.join(
+            f'{phase} {count}' for phase, count in report['queries'].items()))
+        self.stdout.write(
+            f"{report['answers']} answers, {report['queries_per_answer']} queries per answer; "
+            f"{report['monitor_deltas']} monitor deltas; "
+            f"{report['roster_broadcasts_received']} roster updates delivered to students")
@@ -21,6 +21,7 @@ wrong one was picked.
 """
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from apps.learning import catalog_cache
 
 from apps.learning.models import (
     CareerPath, CareerRole, Certificate, Enrollment, UserProgress,
@@ -88,6 +89,7 @@ class Command(BaseCommand):
             source.is_active = False
             source.save(update_fields=['is_active'])
 
+        catalog_cache.bump()  # roles.update() sends no signal
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS(
             f'merged; {source.slug} is now inactive'))
@@ -16,6 +16,7 @@ against it is somebody's record and stays, whatever state it is in.
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from apps.learning import catalog_cache
 from apps.learning.models import Quiz, QuizAttempt
 
 
@@ -47,6 +48,7 @@ class Command(BaseCommand):
         if not options['dry_run'] and removable:
             with transaction.atomic():
                 Quiz.objects.filter(id__in=[q.id for q in removable]).delete()
+            catalog_cache.bump()
 
         verb = 'would delete' if options['dry_run'] else 'deleted'
         self.stdout.write(self.style.SUCCESS(f'{verb} {len(removable)} empty quiz(zes)'))
@@ -3,6 +3,7 @@ Management command to seed the BadgeDefinition catalog.
 Run once after migrations: python manage.py seed_badges
 """
 from django.core.management.base import BaseCommand
+from apps.learning import catalog_cache
 from apps.learning.models import BadgeDefinition
 
 BADGES = [
@@ -146,6 +147,7 @@ class Command(BaseCommand):
             else:
                 updated += 1
 
+        catalog_cache.bump()
         self.stdout.write(
             self.style.SUCCESS(
                 f'Badge seeding done: {created} created, {updated} updated. '
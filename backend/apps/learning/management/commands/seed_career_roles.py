@@ -14,6 +14,7 @@ seeded path, re-running this command must not unwire it.
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils.text import slugify
+from apps.learning import catalog_cache
 
 from apps.learning.models import CareerRole
 
@@ -344,6 +345,7 @@ class Command(BaseCommand):
             # hiding a card is reversible while losing the row is not.
             pruned = CareerRole.objects.exclude(slug__in=seen_slugs).update(is_active=False)
 
+        catalog_cache.bump()  # the --prune update() sends no signal
         total = CareerRole.objects.filter(is_active=True).count()
         linked = CareerRole.objects.filter(is_active=True, career_path__isnull=False).count()
 
@@ -20,6 +20,7 @@ page grades against. Follow with:
     python manage.py import_quiz_questions --fill-missing
 """
 from django.core.management.base import BaseCommand, CommandError
+from apps.learning import catalog_cache
 
 from apps.learning.content import paths as catalogue
 from apps.learning.content.builder import (
@@ -101,6 +102,7 @@ class Command(BaseCommand):
                 f'{modules} modules, {questions} questions')
             seeded += 1
 
+        catalog_cache.bump()
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS(f'seeded {seeded} path(s)'))
         if seeded:
@@ -22,6 +22,7 @@ from the import. Follow with:
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
+from apps.learning import catalog_cache
 from apps.learning.content import quizzes as catalogue
 from apps.learning.content.builder import check_questions, render_quiz
 from apps.learning.models import CareerPath, LearningModule, Quiz
@@ -92,6 +93,7 @@ class Command(BaseCommand):
                     )
                 written += 1
 
+        catalog_cache.bump()
         self.stdout.write('')
         verb = 'would write' if options['dry_run'] else 'wrote'
         total = sum(len(p) for _, p in plans)
@@ -0,0 +1,110 @@
+"""
+Points ledger for incremental leaderboard scoring.
+
+Backfills one row per event every existing snapshot already counts, so the
+first incremental event after deploy cannot score something twice: a student
+who re-submits a challenge they solved last term finds its ledger row waiting
+and the increment is skipped.
+
+The point values are copied here rather than imported from
+leaderboard_service — a migration has to keep meaning what it meant when it
+was written.
+"""
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+import django.db.models.deletion
+
+
+BADGE_RARITY_POINTS = {'common': 20, 'rare': 50, 'epic': 100, 'legendary': 300}
+
+
+def backfill_ledger(apps, schema_editor):
+    PointsLedgerEntry = apps.get_model('learning', 'PointsLedgerEntry')
+    UserProgress = apps.get_model('learning', 'UserProgress')
+    Enrollment = apps.get_model('learning', 'Enrollment')
+    Certificate = apps.get_model('learning', 'Certificate')
+    UserBadge = apps.get_model('learning', 'UserBadge')
+    CodingSubmission = apps.get_model('learning', 'CodingSubmission')
+
+    def rows():
+        for p in UserProgress.objects.filter(is_completed=True).iterator():
+            yield p.user_id, 'module', p.pk, 10, p.completed_at or p.started_at
+        for e in Enrollment.objects.filter(status='completed').iterator():
+            yield e.user_id, 'path', e.pk, 100, e.completed_at or e.enrolled_at
+        for c in Certificate.objects.iterator():
+            yield c.user_id, 'certificate', c.pk, 200, c.issued_at
+        for b in UserBadge.objects.select_related('badge').iterator():
+            yield (b.user_id, 'badge', b.badge_id,
+                   BADGE_RARITY_POINTS.get(b.badge.rarity, 0), b.earned_at)
+        solves = (
+            CodingSubmission.objects.filter(status='accepted')
+            .values('user_id', 'challenge_id')
+            .annotate(first=Min('submitted_at'))
+        )
+        for s in solves.iterator():
+            yield s['user_id'], 'challenge', s['challenge_id'], 50, s['first']
+
+    batch = []
+    for user_id, kind, source_id, points, occurred_at in rows():
+        batch.append(PointsLedgerEntry(
+            user_id=user_id, kind=kind, source_id=str(source_id),
+            points=points, occurred_at=occurred_at,
+        ))
+        if len(batch) >= 1000:
+            PointsLedgerEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    PointsLedgerEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("learning", "0027_align_job_tables_with_models"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PointsLedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("module", "Module Completed"),
+                            ("path", "Career Path Completed"),
+                            ("challenge", "Challenge First Solve"),
+                            ("certificate", "Certificate Earned"),
+                            ("badge", "Badge Earned"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("source_id", models.CharField(max_length=64)),
+                ("points", models.IntegerField()),
+                ("occurred_at", models.DateTimeField(db_index=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="points_ledger",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-occurred_at"],
+                "unique_together": {("user", "kind", "source_id")},
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+"""
+Day buckets for the rolling leaderboard windows, filled from the points ledger
+so the first scheduled rollup after deploy already sees every scored day.
+"""
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_days(apps, schema_editor):
+    PointsLedgerEntry = apps.get_model('learning', 'PointsLedgerEntry')
+    DailyPoints = apps.get_model('learning', 'DailyPoints')
+
+    days = (
+        PointsLedgerEntry.objects
+        .annotate(day=TruncDate('occurred_at'))
+        .values('user_id', 'day')
+        .annotate(points=Sum('points'))
+    )
+    batch = []
+    for row in days.iterator():
+        batch.append(DailyPoints(user_id=row['user_id'], day=row['day'], points=row['points']))
+        if len(batch) >= 1000:
+            DailyPoints.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    DailyPoints.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("learning", "0028_points_ledger"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyPoints",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(db_index=True)),
+                ("points", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_points",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+                "unique_together": {("user", "day")},
+            },
+        ),
+        migrations.RunPython(backfill_days, migrations.RunPython.noop),
+    ]
@@ -521,6 +521,72 @@ class LeaderboardSnapshot(models.Model):
         return f"{self.user.username}: {self.total_points} pts"
 
 
+class PointsLedgerEntry(models.Model):
+    """
+    One scoring event, appended once. The leaderboard applies each new row to
+    LeaderboardSnapshot as an F() increment instead of recounting every source
+    table; the unique key is what makes a repeated event (a re-accepted
+    challenge, a second press on Complete) a no-op rather than double points.
+
+    `source_id` is what the full recount counts once for that kind — the
+    UserProgress, Enrollment or Certificate row, the challenge for a first
+    solve, the badge for a badge earned — so the ledger and the recount agree
+    on what one event is. A badge is keyed by the badge, not the UserBadge row:
+    a user holds each badge once, and a badge revoked and granted again is
+    still the one event.
+    """
+
+    KINDS = [
+        ('module', 'Module Completed'),
+        ('path', 'Career Path Completed'),
+        ('challenge', 'Challenge First Solve'),
+        ('certificate', 'Certificate Earned'),
+        ('badge', 'Badge Earned'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='points_ledger',
+    )
+    kind = models.CharField(max_length=20, choices=KINDS)
+    source_id = models.CharField(max_length=64)
+    points = models.IntegerField()
+    occurred_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ['user', 'kind', 'source_id']
+        ordering = ['-occurred_at']
+
+    def __str__(self):
+        return f"{self.user.username}: +{self.points} ({self.kind})"
+
+
+class DailyPoints(models.Model):
+    """
+    Points a user earned on one calendar day — the ledger bucketed by day.
+
+    The weekly and monthly leaderboard columns are sums over the last 7 and 30
+    of these. Rolling the windows forward (tasks.roll_leaderboard_windows) is
+    then one set-based UPDATE over at most thirty rows per user, and points
+    age out of a window on schedule instead of only when the user next scores.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_points',
+    )
+    day = models.DateField(db_index=True)
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'day']
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.user.username} {self.day}: {self.points} pts"
+
+
 def generate_join_code():
     """Generate unique 6-character alphanumeric join code"""
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
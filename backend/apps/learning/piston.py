@@ -22,9 +22,10 @@ exposing its port would be a worse hole than the one it closes.
 """
 import json
 import logging
-import urllib.error
-import urllib.request
+import threading
+import time
 
+import requests
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
@@ -50,8 +51,95 @@ def enabled() -> bool:
     return bool(getattr(settings, 'PISTON_URL', ''))
 
 
+# One keep-alive session per process. A fresh urlopen per call paid a TCP
+# connect for every test case; with batching and a busy room that was most of
+# the round trip. The semaphore is the pool's admission control: at most
+# PISTON_POOL_SIZE requests in flight, the rest wait, and how long they wait is
+# the queueing figure in stats().
+_client_lock = threading.Lock()
+_client: tuple[requests.Session, threading.BoundedSemaphore] | None = None
+
+_stats_lock = threading.Lock()
+_stats = {'calls': 0, 'errors': 0, 'in_flight': 0, 'peak_in_flight': 0,
+          'total_ms': 0, 'max_ms': 0, 'total_wait_ms': 0, 'max_wait_ms': 0}
+
+
+def _pool() -> tuple[requests.Session, threading.BoundedSemaphore]:
+    global _client
+    with _client_lock:
+        if _client is None:
+            size = max(1, getattr(settings, 'PISTON_POOL_SIZE', 8))
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=size, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _client = (session, threading.BoundedSemaphore(size))
+        return _client
+
+
+def reset_pool() -> None:
+    """Close the pooled connections; the next call opens new ones."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client[0].close()
+        _client = None
+
+
+def stats() -> dict:
+    """Sandbox call counters for this process, with mean latency and queueing."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    calls = snapshot['calls'] or 1
+    snapshot['mean_ms'] = round(snapshot['total_ms'] / calls, 1)
+    snapshot['mean_wait_ms'] = round(snapshot['total_wait_ms'] / calls, 1)
+    return snapshot
+
+
+def _record(**values) -> None:
+    with _stats_lock:
+        for name, value in values.items():
+            _stats[name] += value
+        _stats['max_ms'] = max(_stats['max_ms'], values.get('total_ms', 0))
+        _stats['max_wait_ms'] = max(_stats['max_wait_ms'], values.get('total_wait_ms', 0))
+        _stats['peak_in_flight'] = max(_stats['peak_in_flight'], _stats['in_flight'])
+
+
+def _post(url: str, payload: bytes, deadline: float) -> dict:
+    session, slots = _pool()
+    queued = time.monotonic()
+    if not slots.acquire(timeout=deadline):
+        _record(calls=1, errors=1, total_wait_ms=int(deadline * 1000))
+        raise PistonUnavailable(f'no sandbox connection free within {deadline:.0f}s')
+    started = time.monotonic()
+    _record(in_flight=1)
+    failed = True
+    try:
+        response = session.post(
+            url, data=payload, headers={'Content-Type': 'application/json'},
+            timeout=(getattr(settings, 'PISTON_CONNECT_TIMEOUT', 2), deadline))
+        if response.status_code >= 400:
+            raise PistonUnavailable(
+                f'sandbox rejected the request: {response.status_code} {response.text[:200]}')
+        body = response.json()
+        failed = False
+        return body
+    except PistonUnavailable:
+        raise
+    except Exception as exc:
+        raise PistonUnavailable(f'sandbox unreachable: {exc}') from exc
+    finally:
+        slots.release()
+        finished = time.monotonic()
+        _record(calls=1, errors=int(failed), in_flight=-1,
+                total_ms=int((finished - started) * 1000),
+                total_wait_ms=int((started - queued) * 1000))
+
+
 def execute(language: str, source: str, stdin: str = '', *,
             filename: str = 'solution',
+            files: list | None = None,
             run_timeout_ms: int = 5_000,
             compile_timeout_ms: int = 15_000,
             memory_bytes: int = 256 * 1024 * 1024) -> dict:
@@ -60,6 +148,9 @@ def execute(language: str, source: str, stdin: str = '', *,
     Raises PistonUnavailable if the sandbox cannot be reached. That is
     deliberately not recoverable here: silently running unsandboxed on the
     application server is the failure this module exists to prevent.
+
+    `files` replaces the single source file with a prepared list, entry point
+    first — how batch_harness sends a driver alongside the submission.
     """
     if language not in RUNTIMES:
         raise ValueError(f'unsupported language: {language}')
@@ -70,7 +161,7 @@ def execute(language: str, source: str, stdin: str = '', *,
     payload = json.dumps({
         'language': piston_language,
         'version': version,
-        'files': [{'name': f'{filename}{ext}', 'content': source}],
+        'files': files or [{'name': f'{filename}{ext}', 'content': source}],
         'stdin': stdin,
         'run_timeout': run_timeout_ms,
         'compile_timeout': compile_timeout_ms,
@@ -78,19 +169,9 @@ def execute(language: str, source: str, stdin: str = '', *,
     }).encode()
 
     url = settings.PISTON_URL.rstrip('/') + '/api/v2/execute'
-    request = urllib.request.Request(
-        url, data=payload, headers={'Content-Type': 'application/json'})
-
-    try:
-        # Generous margin over the run timeout the sandbox itself enforces —
-        # this is the transport giving up, not the execution.
-        with urllib.request.urlopen(request, timeout=(run_timeout_ms + compile_timeout_ms) / 1000 + 10) as response:
-            body = json.loads(response.read().decode())
-    except urllib.error.HTTPError as exc:
-        detail = exc.read().decode(errors='replace')[:200]
-        raise PistonUnavailable(f'sandbox rejected the request: {exc.code} {detail}') from exc
-    except Exception as exc:
-        raise PistonUnavailable(f'sandbox unreachable: {exc}') from exc
+    # Generous margin over the run timeout the sandbox itself enforces —
+    # this is the transport giving up, not the execution.
+    body = _post(url, payload, (run_timeout_ms + compile_timeout_ms) / 1000 + 10)
 
     compile_stage = body.get('compile') or {}
     run_stage = body.get('run') or {}
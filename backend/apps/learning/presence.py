@@ -0,0 +1,201 @@
+"""
+Who is in a live quiz room right now, for the lobby list and participant count.
+
+This used to be one cache entry per room holding a pickled Python set: read it,
+add or remove a name, write it back. Two students connecting at the same moment
+both read the same set and the second write dropped the first one's join — in a
+200-seat room that starts, the lobby was reliably a few names short, and every
+join rewrote the whole set. A socket that died without a disconnect (a worker
+restart, a laptop lid) stayed listed until the two-hour TTL.
+
+Now each room is one hash, member -> last heartbeat time, and every change is a
+single atomic field write: HSET on join and on each heartbeat, HDEL on leave.
+Concurrent joins cannot overwrite each other and a join costs the same in an
+empty room as in a full one. (A separate member SET beside the hash would be a
+second structure to keep in step for nothing — the hash keys are the set.)
+
+Clients send a heartbeat every HEARTBEAT_INTERVAL seconds. A member not heard
+from in STALE_AFTER — three missed beats — is swept out. Sweeping reads the
+whole hash, so it is rationed to one pass per room per SWEEP_EVERY across all
+workers (a SET NX key), not run on every beat; the delete re-checks each
+timestamp atomically, so a beat racing the sweep survives it. A heartbeat from a member that
+was swept or removed by another tab's disconnect puts them back, and says so,
+so the caller can re-broadcast the roster.
+
+The hash lives in Redis when there is one (core.shared_redis), shared by every
+worker.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from apps.core import shared_redis
+
+HEARTBEAT_INTERVAL = 30     # seconds; clients ping this often
+STALE_AFTER = 90            # three missed heartbeats
+SWEEP_EVERY = 30            # at most one sweep per room this often
+ROOM_TTL = 7200             # a room nobody touches for two hours is dropped whole
+
+KEY_PREFIX = 'presence:'
+
+
+def _key(room: str) -> str:
+    return f'{KEY_PREFIX}{room}'
+
+
+class _MemoryPresence:
+    """In-process stand-in for the Redis hashes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._rooms: dict[str, dict[str, float]] = {}
+            self._swept: dict[str, float] = {}
+
+    def touch(self, room, member, now):
+        with self._lock:
+            beats = self._rooms.setdefault(room, {})
+            added = member not in beats
+            beats[member] = now
+            return added
+
+    def remove(self, room, member):
+        with self._lock:
+            return self._rooms.get(room, {}).pop(member, None) is not None
+
+    def beats(self, room):
+        with self._lock:
+            return dict(self._rooms.get(room, {}))
+
+    def count(self, room):
+        return len(self._rooms.get(room, {}))
+
+    def claim_sweep(self, room, now):
+        with self._lock:
+            if now - self._swept.get(room, 0) < SWEEP_EVERY:
+                return False
+            self._swept[room] = now
+            return True
+
+    def drop(self, room, members, older_than):
+        with self._lock:
+            beats = self._rooms.get(room, {})
+            # Re-checked under the lock: a beat since the read keeps the member.
+            gone = [m for m in members if m in beats and beats[m] < older_than]
+            for m in gone:
+                del beats[m]
+            return gone
+
+
+class _RedisPresence:
+    """One hash per room in the shared Redis."""
+
+    def __init__(self, client):
+        self.r = client
+
+    def reset(self):
+        keys = list(self.r.scan_iter(f'{KEY_PREFIX}*'))
+        if keys:
+            self.r.delete(*keys)
+
+    def touch(self, room, member, now):
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hset(_key(room), member, now)
+        pipe.expire(_key(room), ROOM_TTL)
+        added, _ = pipe.execute()
+        return bool(added)
+
+    def remove(self, room, member):
+        return bool(self.r.hdel(_key(room), member))
+
+    def beats(self, room):
+        return {
+            (m.decode() if isinstance(m, bytes) else m): float(ts)
+            for m, ts in self.r.hgetall(_key(room)).items()
+        }
+
+    def count(self, room):
+        return self.r.hlen(_key(room))
+
+    def claim_sweep(self, room, now):
+        return bool(self.r.set(f'{_key(room)}:swept', 1, nx=True, ex=SWEEP_EVERY))
+
+    def drop(self, room, members, older_than):
+        if not members:
+            return []
+        removed = self.r.eval(_DROP_STALE, 1, _key(room), older_than, *members)
+        return [m.decode() if isinstance(m, bytes) else m for m in removed]
+
+
+# Re-checks each timestamp inside Redis, so a beat that lands between the
+# sweep's read and its delete keeps the member — the same guarantee the
+# in-process lock gives.
+_DROP_STALE = """
+local removed = {}
+for i = 2, #ARGV do
+    local ts = redis.call('HGET', KEYS[1], ARGV[i])
+    if ts and tonumber(ts) < tonumber(ARGV[1]) then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        removed[#removed + 1] = ARGV[i]
+    end
+end
+return removed
+"""
+
+
+_memory = _MemoryPresence()
+
+
+def _store():
+    r = shared_redis.client()
+    return _memory if r is None else _RedisPresence(r)
+
+
+def join(room: str, member: str) -> bool:
+    """Mark a member present. True if they were not already listed."""
+    return _store().touch(room, member, time.time())
+
+
+def heartbeat(room: str, member: str) -> bool:
+    """
+    Refresh a member's heartbeat. True if they had dropped off the list (swept,
+    or removed by another tab's disconnect) and are back, so the roster changed.
+    """
+    return join(room, member)
+
+
+def leave(room: str, member: str) -> bool:
+    """Remove a member. True if they were listed."""
+    return _store().remove(room, member)
+
+
+def members(room: str) -> list[str]:
+    """Everyone present, sorted by name."""
+    return sorted(_store().beats(room))
+
+
+def count(room: str) -> int:
+    return _store().count(room)
+
+
+def sweep(room: str, force: bool = False) -> list[str]:
+    """
+    Remove members with no heartbeat in STALE_AFTER; the names removed.
+    Does nothing if this room was swept in the last SWEEP_EVERY, unless forced.
+    """
+    store = _store()
+    now = time.time()
+    if not force and not store.claim_sweep(room, now):
+        return []
+    cutoff = now - STALE_AFTER
+    stale = [m for m, ts in store.beats(room).items() if ts < cutoff]
+    return store.drop(room, stale, cutoff)
+
+
+def reset() -> None:
+    """Forget every room. For tests."""
+    _store().reset()
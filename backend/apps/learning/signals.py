@@ -0,0 +1,26 @@
+"""
+Retiring the cached catalog (catalog_cache.py) when a row it is built from changes.
+
+Signals rather than calls at each write site: paths, modules and quizzes are
+edited through the public viewsets, the admin viewsets, the Django admin and
+the content builder, and a missed call would serve the old catalog until the
+entries expired.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from . import catalog_cache
+from .models import BadgeDefinition, CareerPath, CareerRole, LearningModule, Quiz
+
+# Quiz is here for the module list's quiz_count.
+CATALOG_MODELS = (CareerPath, LearningModule, CareerRole, BadgeDefinition, Quiz)
+
+
+def catalog_changed(sender, **kwargs):
+    catalog_cache.bump()
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_save_{model.__name__}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_delete_{model.__name__}')
+for through in (CareerPath.prerequisites.through, LearningModule.prerequisites.through):
+    m2m_changed.connect(catalog_changed, sender=through, dispatch_uid=f'catalog_m2m_{through.__name__}')
@@ -0,0 +1,78 @@
+"""
+Learning work that runs on the Celery worker.
+
+Scheduled leaderboard maintenance and the live quiz answer sweep, fired by
+beat (CELERY_BEAT_SCHEDULE in settings). With no Redis configured nothing
+schedules them; `roll_windows` can be called directly, and the tests do.
+
+Coding-challenge grading, booked by challenge_grading.start and served in the
+lab scheduler's order. Without a broker CELERY_TASK_ALWAYS_EAGER runs it
+inline, so the run is already done when the request that booked it returns.
+"""
+import logging
+
+from celery import shared_task
+
+from .leaderboard_service import roll_windows
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='learning.roll_leaderboard_windows', max_retries=0)
+def roll_leaderboard_windows() -> int:
+    """Age points out of the weekly/monthly columns for every user at once."""
+    updated = roll_windows()
+    logger.info('[LEADERBOARD] rolled weekly/monthly windows for %d snapshots', updated)
+    return updated
+
+
+@shared_task(name='learning.flush_live_answers', max_retries=0)
+def flush_live_answers() -> int:
+    """Write live quiz answers a crashed or idle socket worker left buffered."""
+    from . import answer_buffer
+    return answer_buffer.flush_all()
+
+
+@shared_task(name='learning.grade_challenge', max_retries=0)
+def grade_challenge(run_id: str | None = None) -> None:
+    """A worker slot booked by challenge_grading.start.
+
+    The slot serves whichever run apps/lab/scheduler.py says is next — this
+    one, a lab's, or a submission that outranks both — so `run_id` only says
+    who booked it.
+    """
+    from apps.lab.tasks import serve_next
+    serve_next()
+
+
+def grade(run_id: str) -> bool:
+    """Grade one challenge Run or Submit. False if it was superseded unrun.
+
+    Like lab.execute, never raises: the browser is polling this run and a
+    crash would leave it polling until the record expires.
+    """
+    from apps.lab import execution
+
+    from . import challenge_grading
+    from .models import CodingChallenge
+
+    record = execution.mark_running(run_id)
+    if record is None:
+        logger.debug('challenge run %s skipped', run_id)
+        return False
+
+    try:
+        challenge = CodingChallenge.objects.get(pk=record['problem_id'])
+        if record['purpose'] == 'submit':
+            from django.contrib.auth import get_user_model
+            user = get_user_model().objects.get(pk=record['user_id'])
+            result = challenge_grading.grade_submission(
+                user, challenge, record['language'], record['code'])
+        else:
+            result = challenge_grading.grade_run(challenge, record['language'], record['code'])
+        execution.finish(run_id, result=result, error=result.get('error'))
+    except Exception:                              # noqa: BLE001 - see docstring
+        logger.exception('challenge run %s failed', run_id)
+        execution.finish(run_id, stderr='The execution service failed.',
+                         error='internal_error')
+    return True
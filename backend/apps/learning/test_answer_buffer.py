@@ -0,0 +1,221 @@
+"""
+Live quiz answers are written behind the acknowledgement, in batches, and a
+batch can be replayed after a crash without counting anything twice.
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core import db_pool
+from apps.learning import answer_buffer
+from apps.learning.models import (
+    LiveQuiz, LiveQuizParticipant, LiveQuizQuestion, LiveQuizResponse, LiveQuizSession,
+)
+
+
+@pytest.fixture
+def room(db):
+    instructor = User.objects.create_user(
+        username='buf_inst', email='bi@ssct.edu.ph', password='x', role='instructor')
+    quiz = LiveQuiz.objects.create(instructor=instructor, title='Q', creation_method='manual')
+    session = LiveQuizSession.objects.create(quiz=quiz, status='in_progress')
+    questions = [
+        LiveQuizQuestion.objects.create(
+            quiz=quiz, question_text=f'Q{i}', question_type='multiple_choice', order=i,
+            correct_answer='A', points=100, time_limit=30)
+        for i in (1, 2)
+    ]
+    participants = [
+        LiveQuizParticipant.objects.create(
+            session=session, nickname=f's{i}',
+            student=User.objects.create_user(
+                username=f'buf_stu{i}', email=f'bs{i}@ssct.edu.ph', password='x'))
+        for i in range(10)
+    ]
+    return SimpleNamespace(
+        quiz=quiz, session=session, questions=questions, participants=participants,
+        instructor=instructor, code=quiz.join_code,
+    )
+
+
+def _record(room, participant, question, answer, points, response_time=1.0):
+    answer_buffer.record(
+        room.code, room.session.id, participant.id, question.id,
+        answer_text=answer, is_correct=answer == 'A', points_earned=points,
+        response_time=response_time,
+    )
+
+
+def _statements(ctx):
+    return [q['sql'] for q in ctx.captured_queries
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+
+class TestFlushing:
+    def test_nothing_is_written_until_the_flush(self, room):
+        _record(room, room.participants[0], room.questions[0], 'A', 100)
+
+        assert not LiveQuizResponse.objects.exists()
+        assert answer_buffer.flush(room.code) == [str(room.participants[0].id)]
+        assert LiveQuizResponse.objects.count() == 1
+
+    def test_a_room_answering_together_is_one_batch(self, room):
+        for p in room.participants:
+            _record(room, p, room.questions[0], 'A', 80)
+
+        with CaptureQueriesContext(connection) as ctx:
+            changed = answer_buffer.flush(room.code)
+
+        assert len(changed) == 10
+        # participants, their responses, INSERT, UPDATE of totals — not 10 of each.
+        assert len(_statements(ctx)) == 4
+        assert LiveQuizResponse.objects.count() == 10
+        assert set(LiveQuizParticipant.objects.values_list('total_score', flat=True)) == {80}
+
+    def test_totals_and_the_rolling_average(self, room):
+        p = room.participants[0]
+        _record(room, p, room.questions[0], 'A', 100, response_time=4.0)
+        answer_buffer.flush(room.code)
+        _record(room, p, room.questions[1], 'B', 0, response_time=10.0)
+        answer_buffer.flush(room.code)
+
+        p.refresh_from_db()
+        assert (p.total_score, p.total_correct, p.total_attempted) == (100, 1, 2)
+        assert p.average_response_time == pytest.approx(7.0)
+
+    def test_a_changed_answer_moves_the_totals_by_the_difference(self, room):
+        p = room.participants[0]
+        _record(room, p, room.questions[0], 'A', 100, response_time=2.0)
+        answer_buffer.flush(room.code)
+        # A violation penalty taken in between must survive the change.
+        LiveQuizParticipant.objects.filter(pk=p.pk).update(total_score=90)
+        _record(room, p, room.questions[0], 'C', 30, response_time=6.0)
+        answer_buffer.flush(room.code)
+
+        p.refresh_from_db()
+        assert (p.total_score, p.total_correct, p.total_attempted) == (20, 0, 1)
+        assert p.average_response_time == pytest.approx(6.0)
+        assert LiveQuizResponse.objects.get().answer_text == 'C'
+
+    def test_the_latest_answer_in_a_batch_wins(self, room):
+        p = room.participants[0]
+        _record(room, p, room.questions[0], 'B', 0)
+        _record(room, p, room.questions[0], 'A', 70)
+        answer_buffer.flush(room.code)
+
+        p.refresh_from_db()
+        assert (p.total_score, p.total_attempted) == (70, 1)
+
+    def test_an_answer_for_another_session_is_dropped(self, room):
+        other = LiveQuizSession.objects.create(quiz=LiveQuiz.objects.create(
+            instructor=room.instructor, title='Other', creation_method='manual'))
+        answer_buffer.record(
+            room.code, other.id, room.participants[0].id, room.questions[0].id,
+            answer_text='A', is_correct=True, points_earned=100, response_time=1.0)
+
+        assert answer_buffer.flush(room.code) == []
+        assert not LiveQuizResponse.objects.exists()
+
+
+class TestCrashSafety:
+    def test_a_failed_write_is_kept_and_written_next_time(self, room, monkeypatch):
+        _record(room, room.participants[0], room.questions[0], 'A', 100)
+        real_apply = answer_buffer._apply
+
+        def down(records):
+            raise RuntimeError('database went away')
+        monkeypatch.setattr(answer_buffer, '_apply', down)
+        with pytest.raises(RuntimeError):
+            answer_buffer.flush(room.code)
+        _record(room, room.participants[1], room.questions[0], 'A', 100)
+
+        monkeypatch.setattr(answer_buffer, '_apply', real_apply)
+        assert len(answer_buffer.flush(room.code)) == 2
+        assert LiveQuizResponse.objects.count() == 2
+
+    def test_replaying_a_batch_that_was_written_counts_nothing_twice(self, room, monkeypatch):
+        p = room.participants[0]
+        _record(room, p, room.questions[0], 'A', 100, response_time=3.0)
+        buffer = answer_buffer._buffer()
+
+        # Dies after the transaction committed, before the batch was dropped.
+        def crash(join_code):
+            raise RuntimeError('worker killed')
+        monkeypatch.setattr(buffer, 'done', crash)
+        with pytest.raises(RuntimeError):
+            answer_buffer.flush(room.code)
+        monkeypatch.undo()
+
+        assert answer_buffer.flush(room.code) == []      # replayed, nothing changed
+        assert answer_buffer.flush(room.code) == []      # and gone
+        p.refresh_from_db()
+        assert (p.total_score, p.total_attempted) == (100, 1)
+        assert p.average_response_time == pytest.approx(3.0)
+
+    def test_an_answer_that_cannot_be_written_does_not_hold_up_the_room(
+            self, transactional_db, room):
+        """A question deleted mid-quiz: its answers fail their batch every time."""
+        doomed, kept = room.questions
+        _record(room, room.participants[0], doomed, 'A', 100)
+        _record(room, room.participants[1], kept, 'A', 100)
+        LiveQuizQuestion.objects.filter(pk=doomed.pk).delete()
+
+        assert answer_buffer.flush(room.code) == [str(room.participants[1].id)]
+        _record(room, room.participants[2], kept, 'A', 50)
+        assert answer_buffer.flush(room.code) == [str(room.participants[2].id)]
+
+        assert set(LiveQuizResponse.objects.values_list('participant_id', flat=True)) == {
+            room.participants[1].id, room.participants[2].id}
+        [dead] = answer_buffer.dead_letters(room.code)
+        assert dead['question_id'] == str(doomed.id)
+        assert answer_buffer._buffer().rooms() == set()
+
+    def test_the_beat_sweep_flushes_every_room(self, room):
+        _record(room, room.participants[0], room.questions[0], 'A', 100)
+
+        from apps.learning.tasks import flush_live_answers
+        assert flush_live_answers() == 1
+        assert LiveQuizResponse.objects.count() == 1
+        assert answer_buffer._buffer().rooms() == set()
+
+
+class TestWaitingForAnotherWorker:
+    def test_the_wait_is_on_the_event_loop_not_a_pool_thread(self, room):
+        """While a room is held elsewhere, the pool keeps serving other sockets."""
+        buffer = answer_buffer._buffer()
+        assert buffer.lock(room.code)       # another worker is flushing
+
+        async def scenario():
+            waiting = asyncio.ensure_future(answer_buffer.flush_async(room.code, wait=0.5))
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            await db_pool.run(threading.get_ident)
+            other_socket = time.monotonic() - started
+            return await waiting, other_socket
+
+        changed, other_socket = asyncio.run(scenario())
+
+        buffer.unlock(room.code)
+        assert changed == []
+        assert other_socket < 0.2
+
+
+class TestEndingTheQuiz:
+    def test_results_include_answers_still_buffered(self, room):
+        _record(room, room.participants[0], room.questions[0], 'A', 100)
+        client = APIClient()
+        client.force_authenticate(room.instructor)
+
+        response = client.post(f'/api/learning/live-quiz/{room.quiz.id}/end/')
+
+        assert response.status_code == 200, response.data
+        top = response.data['leaderboard'][0]
+        assert top['participant_id'] == str(room.participants[0].id)
+        assert top['total_score'] == 100
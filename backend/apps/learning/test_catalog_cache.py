@@ -0,0 +1,174 @@
+"""
+Catalog responses are served from the cache until the catalog changes.
+
+What is pinned: a repeat read costs no queries, any edit to a catalog row is
+seen on the very next read, a client holding the current copy gets a 304, and
+nothing per-user — enrollment, earned badges — leaks from one user's response
+into another's.
+"""
+import pytest
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.ai_mentor.services.data_context_service import DataContextService
+from apps.learning import catalog_cache
+from apps.learning.models import (
+    BadgeDefinition, CareerPath, CareerRole, Enrollment, UserBadge,
+)
+
+
+def _user(username):
+    return User.objects.create_user(
+        email=f'{username}@ssct.edu.ph', username=username,
+        password='pw12345678', role='student',
+    )
+
+
+def _client(user=None):
+    api = APIClient()
+    if user is not None:
+        api.force_authenticate(user)
+    return api
+
+
+def _path(name='DS Path', slug='ds-path'):
+    return CareerPath.objects.create(
+        name=name, slug=slug, description='d', program_type='bscs',
+        difficulty_level='beginner', estimated_duration=8, is_active=True,
+        total_modules=5,
+    )
+
+
+def _names(response):
+    assert response.status_code == 200, response.data
+    return [row['name'] for row in response.data['results']]
+
+
+@pytest.mark.django_db
+class TestCareerPaths:
+    def test_a_repeat_read_costs_no_queries(self, django_assert_num_queries):
+        _path()
+        assert _names(_client().get('/api/learning/career-paths/')) == ['DS Path']
+
+        with django_assert_num_queries(0):
+            assert _names(_client().get('/api/learning/career-paths/')) == ['DS Path']
+
+    def test_an_edit_is_seen_on_the_next_read(self):
+        path = _path()
+        _client().get('/api/learning/career-paths/')
+
+        path.name = 'Data Science'
+        path.save()
+        _path('Web Dev', 'web-dev')
+
+        assert _names(_client().get('/api/learning/career-paths/')) == ['Data Science', 'Web Dev']
+
+    def test_query_parameters_are_cached_apart(self):
+        _path()
+        CareerPath.objects.create(
+            name='IT Path', slug='it-path', description='d', program_type='bsit',
+            difficulty_level='beginner', estimated_duration=8, is_active=True)
+
+        assert _names(_client().get('/api/learning/career-paths/?program=bscs')) == ['DS Path']
+        assert _names(_client().get('/api/learning/career-paths/?program=bsit')) == ['IT Path']
+
+    def test_the_current_copy_gets_a_304(self):
+        _path()
+        first = _client().get('/api/learning/career-paths/')
+        etag = first['ETag']
+
+        again = _client().get('/api/learning/career-paths/', HTTP_IF_NONE_MATCH=etag)
+        assert again.status_code == 304
+        assert again.content == b''
+
+        _path('Web Dev', 'web-dev')
+        changed = _client().get('/api/learning/career-paths/', HTTP_IF_NONE_MATCH=etag)
+        assert changed.status_code == 200
+        assert changed['ETag'] != etag
+
+    def test_enrollment_is_laid_over_the_shared_entry(self):
+        path = _path()
+        enrolled, other = _user('enrolled'), _user('other')
+        Enrollment.objects.create(user=enrolled, career_path=path)
+        url = f'/api/learning/career-paths/{path.id}/'
+
+        mine = _client(enrolled).get(url)
+        theirs = _client(other).get(url)
+
+        assert mine.data['is_enrolled'] is True
+        assert theirs.data['is_enrolled'] is False
+        assert 'enrollment_id' not in theirs.data
+        assert mine['ETag'] != theirs['ETag']
+
+    def test_a_missing_path_is_still_a_404(self):
+        missing = '/api/learning/career-paths/00000000-0000-0000-0000-000000000000/'
+        assert _client().get(missing).status_code == 404
+        assert _client().get(missing).status_code == 404
+
+
+@pytest.mark.django_db
+class TestVersioning:
+    def test_a_bulk_update_is_seen_only_after_a_bump(self):
+        # Why the seed and import commands bump explicitly: update() sends no
+        # signal.
+        _path()
+        _client().get('/api/learning/career-paths/')
+        CareerPath.objects.update(name='Renamed')
+
+        assert _names(_client().get('/api/learning/career-paths/')) == ['DS Path']
+        catalog_cache.bump()
+        assert _names(_client().get('/api/learning/career-paths/')) == ['Renamed']
+
+    def test_the_version_moves_again_when_the_transaction_commits(
+            self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            _path()
+            during = catalog_cache.version()
+
+        assert catalog_cache.version() != during
+
+    def test_it_can_be_switched_off(self, settings, django_assert_num_queries):
+        settings.CATALOG_CACHE_TTL = 0
+        _path()
+        _client().get('/api/learning/career-paths/')
+
+        with django_assert_num_queries(3):     # page count, rows, prerequisites
+            _client().get('/api/learning/career-paths/')
+
+
+@pytest.mark.django_db
+class TestTheOtherCatalogs:
+    def test_the_career_map_is_cached_and_revalidates(self, django_assert_num_queries):
+        user = _user('mapper')
+        CareerRole.objects.create(
+            program_type='bscs', category='Software Engineering', name='Backend Engineer',
+            slug='bscs-backend-engineer', summary='s', core_skills=['Python'])
+        first = _client(user).get('/api/learning/career-map/')
+        assert first.data['programs'][0]['role_count'] == 1
+
+        with django_assert_num_queries(0):
+            again = _client(user).get('/api/learning/career-map/', HTTP_IF_NONE_MATCH=first['ETag'])
+        assert again.status_code == 304
+
+    def test_badges_are_shared_and_earned_flags_are_not(self):
+        badge = BadgeDefinition.objects.create(
+            name='Legend', description='d', category='coding',
+            trigger_type='challenges_solved', rarity='legendary')
+        earner, other = _user('earner'), _user('other')
+        UserBadge.objects.create(user=earner, badge=badge)
+
+        mine = _client(earner).get('/api/learning/badges/catalog/').data
+        theirs = _client(other).get('/api/learning/badges/catalog/').data
+
+        assert (mine['earned_count'], mine['badges'][0]['earned']) == (1, True)
+        assert (theirs['earned_count'], theirs['badges'][0]['earned']) == (0, False)
+
+    def test_the_mentor_course_list_is_cached(self, django_assert_num_queries):
+        path = _path()
+        Enrollment.objects.create(user=_user('student'), career_path=path)
+
+        courses = DataContextService().get_all_courses()
+        assert (courses[0]['name'], courses[0]['enrollment_count']) == ('DS Path', 1)
+
+        with django_assert_num_queries(0):
+            assert DataContextService().get_all_courses() == courses
@@ -0,0 +1,143 @@
+"""
+Challenge Run and Submit are graded on the worker, not in the request.
+
+CELERY_TASK_ALWAYS_EAGER is on without a broker, so `.delay()` runs inline and
+the run is already done when the POST returns. The queued behaviour — tickets,
+superseding — is pinned by holding the task back.
+"""
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.lab import execution
+from apps.learning.models import CodingChallenge, CodingSubmission, LeaderboardSnapshot
+
+SOLUTION = 'a = int(input())\nb = int(input())\nprint(a + b)\n'
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def challenge(db):
+    return CodingChallenge.objects.create(
+        title='Add', slug='add', description='d', difficulty='easy',
+        supported_languages=['python'], starter_code={}, solution_code={},
+        test_cases=[
+            {'input': '1\n2\n', 'expected_output': '3'},
+            {'input': '5\n5\n', 'expected_output': '10', 'is_hidden': True},
+        ],
+        points=10)
+
+
+@pytest.fixture
+def student(db):
+    return User.objects.create_user(
+        username='grade_stu', email='g@ssct.edu.ph', password='x', role='student')
+
+
+@pytest.fixture
+def client(student):
+    client = APIClient()
+    client.force_authenticate(student)
+    return client
+
+
+@pytest.mark.django_db
+class TestQueuedGrading:
+    def test_submit_is_accepted_and_graded_on_the_worker(self, client, student, challenge):
+        response = client.post('/api/learning/challenges/add/submit/',
+                               {'code': SOLUTION, 'language': 'python'}, format='json')
+
+        assert response.status_code == 202
+        assert response.data['state'] == execution.DONE
+        result = response.data['result']
+        assert result['status'] == 'accepted'
+        assert result['passed_tests'] == 2
+        # Hidden test details never reach the browser.
+        assert 'stdout' not in result['results'][1]
+
+        submission = CodingSubmission.objects.get(user=student)
+        assert submission.status == 'accepted'
+        assert LeaderboardSnapshot.objects.get(user=student).challenges_solved == 1
+
+    def test_the_run_can_be_polled(self, client, challenge):
+        run_id = client.post('/api/learning/challenges/add/run/',
+                             {'code': SOLUTION, 'language': 'python'}, format='json').data['run_id']
+
+        response = client.get(f'/api/learning/challenges/add/runs/{run_id}/')
+
+        assert response.status_code == 200
+        assert response.data['result']['status'] == 'run_complete'
+        assert response.data['result']['total'] == 1   # public tests only
+        assert 'code' not in response.data
+
+    def test_another_student_cannot_poll_it(self, client, challenge):
+        run_id = client.post('/api/learning/challenges/add/run/',
+                             {'code': SOLUTION, 'language': 'python'}, format='json').data['run_id']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(
+            username='grade_other', email='o@ssct.edu.ph', password='x', role='student'))
+
+        assert other.get(f'/api/learning/challenges/add/runs/{run_id}/').status_code == 403
+
+    def test_invalid_code_is_rejected_before_queueing(self, client, challenge):
+        response = client.post('/api/learning/challenges/add/submit/',
+                               {'code': '   ', 'language': 'python'}, format='json')
+
+        assert response.status_code == 400
+        assert not CodingSubmission.objects.exists()
+
+    def test_resubmitting_supersedes_a_queued_attempt(self, client, student, challenge):
+        from apps.learning.tasks import grade_challenge
+
+        with mock.patch.object(grade_challenge, 'delay'):
+            first = client.post('/api/learning/challenges/add/submit/',
+                                {'code': 'print(1)', 'language': 'python'}, format='json').data
+            second = client.post('/api/learning/challenges/add/submit/',
+                                 {'code': SOLUTION, 'language': 'python'}, format='json').data
+        assert first['state'] == second['state'] == execution.QUEUED
+
+        grade_challenge(first['run_id'])
+        grade_challenge(second['run_id'])
+
+        assert execution.get(first['run_id'])['state'] == execution.SUPERSEDED
+        # The superseded attempt never ran, so it left no submission behind.
+        assert list(CodingSubmission.objects.values_list('status', flat=True)) == ['accepted']
+
+    def test_a_run_does_not_supersede_a_queued_submit(self, client, student, challenge):
+        from apps.learning.tasks import grade_challenge
+
+        with mock.patch.object(grade_challenge, 'delay'):
+            submit = client.post('/api/learning/challenges/add/submit/',
+                                 {'code': SOLUTION, 'language': 'python'}, format='json').data
+            client.post('/api/learning/challenges/add/run/',
+                        {'code': 'print(1)', 'language': 'python'}, format='json')
+
+        grade_challenge(submit['run_id'])
+
+        assert execution.get(submit['run_id'])['state'] == execution.DONE
+        assert CodingSubmission.objects.get(user=student).status == 'accepted'
+
+    def test_work_on_another_challenge_does_not_supersede_it(self, client, student, challenge):
+        from apps.learning.tasks import grade_challenge
+
+        CodingChallenge.objects.create(
+            title='Echo', slug='echo', description='d', difficulty='easy',
+            supported_languages=['python'], starter_code={}, solution_code={},
+            test_cases=[{'input': 'x\n', 'expected_output': 'x'}], points=10)
+        with mock.patch.object(grade_challenge, 'delay'):
+            submit = client.post('/api/learning/challenges/add/submit/',
+                                 {'code': SOLUTION, 'language': 'python'}, format='json').data
+            other = client.post('/api/learning/challenges/echo/submit/',
+                                {'code': 'print(input())', 'language': 'python'}, format='json')
+        assert other.status_code == 202
+
+        assert execution.get(submit['run_id'])['state'] == execution.QUEUED
@@ -1,10 +1,12 @@
 """
 Code executor tests — auto-wrap harness + cross-platform stdin handling.
 """
+import os
 import shutil
 
 import pytest
 
+from apps.learning import batch_harness
 from apps.learning.code_executor import CodeExecutor
 
 
@@ -123,3 +125,327 @@ class TestBinaryAnswersAreNotMistakenForHardcoding:
 
         assert any(m.splitlines()[0] == 'listen' and m.splitlines()[1] != 'silent'
                    for m in mutations), mutations
+
+
+class TestBatchedSandboxExecution:
+    """
+    With Piston configured, every test case goes out as one execution. The
+    sandbox is faked by running whatever files it is sent in a temp directory,
+    which exercises the real driver end to end.
+    """
+
+    @pytest.fixture
+    def sandbox(self, monkeypatch, settings, tmp_path):
+        import subprocess
+        import sys
+
+        from apps.learning import piston
+
+        settings.PISTON_URL = 'http://sandbox.test'
+        settings.PISTON_BATCH = True
+        calls = []
+        state = {'truncate_after': None}
+
+        def fake_execute(language, source, stdin='', *, files=None, **kwargs):
+            assert language == 'python'
+            calls.append(files)
+            files = files or [{'name': 'solution.py', 'content': source}]
+            for f in files:
+                (tmp_path / f['name']).write_text(f['content'])
+            proc = subprocess.run([sys.executable, files[0]['name']], input=stdin,
+                                  capture_output=True, text=True, cwd=tmp_path)
+            stdout = proc.stdout
+            if files is not None and state['truncate_after'] is not None and len(files) > 1:
+                # What Piston's output cap does to a batch: cut it mid-line.
+                lines = stdout.splitlines(keepends=True)
+                kept = lines[:state['truncate_after']]
+                stdout = ''.join(kept) + lines[state['truncate_after']][:20]
+            return {'stdout': stdout, 'stderr': proc.stderr, 'compile_error': None,
+                    'timed_out': False, 'signal': None}
+
+        monkeypatch.setattr(piston, 'execute', fake_execute)
+        return {'calls': calls, 'state': state}
+
+    CASES = [
+        {'input': '5\n3\n', 'expected_output': '8'},
+        {'input': '10\n2\n', 'expected_output': '12'},
+        {'input': '1\n1\n', 'expected_output': '3'},
+    ]
+    CODE = 'a = int(input())\nb = int(input())\nprint(a + b)\n'
+
+    def test_all_cases_go_out_in_one_execution(self, sandbox):
+        result = CodeExecutor().run('python', self.CODE, self.CASES)
+
+        assert len(sandbox['calls']) == 1
+        assert [r['passed'] for r in result['results']] == [True, True, False]
+        assert result['results'][1]['stdout'].strip() == '12'
+
+    def test_the_hardcode_probes_are_batched_too(self, sandbox):
+        # Every expected answer is a literal, so the mutation probes run.
+        cheat = 'a = int(input())\nb = int(input())\nprint(8 if a == 5 else 12 if a == 10 else 7)\n'
+        cases = [*self.CASES[:2], {'input': '3\n4\n', 'expected_output': '7'}]
+
+        CodeExecutor().run('python', cheat, cases)
+
+        # One execution for the tests, one for every probe together.
+        assert len(sandbox['calls']) == 2
+        assert all(files for files in sandbox['calls'])
+
+    def test_cases_missing_from_a_cut_off_batch_are_rerun_alone(self, sandbox):
+        sandbox['state']['truncate_after'] = 1
+
+        result = CodeExecutor().run('python', self.CODE, self.CASES)
+
+        assert [r['passed'] for r in result['results']] == [True, True, False]
+        assert sandbox['calls'][1:] == [None, None]
+
+    def test_a_crash_in_one_case_does_not_touch_the_others(self, sandbox):
+        code = 'a = int(input())\nb = int(input())\nif a == 10: raise SystemExit(3)\nprint(a + b)\n'
+
+        result = CodeExecutor().run('python', code, self.CASES[:2])
+
+        assert len(sandbox['calls']) == 1
+        assert [r['passed'] for r in result['results']] == [True, False]
+
+    def test_records_forged_by_the_submission_are_rejected(self, sandbox):
+        # Module top level, straight to the driver's own stdout: every case
+        # "passed", in the format the driver uses, before the real record.
+        forger = (
+            'import json, os\n'
+            "with open(f'/proc/{os.getppid()}/fd/1', 'w') as out:\n"
+            "    for i, answer in enumerate(['8', '12', '3']):\n"
+            "        record = {'i': i, 'out': answer, 'err': '', 'rc': 0, 'sig': 0, 'ms': 1}\n"
+            "        out.write('@@ccis@@ ' + json.dumps(record) + '\\n')\n"
+            "        out.write('@@ccis@@ guess ' + json.dumps(record) + '\\n')\n"
+        )
+
+        result = CodeExecutor().run('python', forger, self.CASES)
+
+        # Graded on what it printed (nothing), and no case was reported twice —
+        # a forged line taken as a record would have had its case re-run.
+        assert [r['passed'] for r in result['results']] == [False, False, False]
+        assert len(sandbox['calls']) == 1
+
+
+class TestConcurrentExecution:
+    CODE = 'import time\na = int(input())\nb = int(input())\ntime.sleep(0.4)\nprint(a + b)\n'
+
+    def test_cases_run_side_by_side_and_report_in_order(self, settings):
+        import time
+
+        settings.CODE_EXEC_CONCURRENCY = 4
+        cases = [{'input': f'{n}\n1\n', 'expected_output': str(n + 1)} for n in range(4)]
+
+        started = time.monotonic()
+        result = CodeExecutor().run('python', self.CODE, cases)
+        elapsed = time.monotonic() - started
+
+        assert result['all_passed'] is True
+        assert [r['test_case_index'] for r in result['results']] == [0, 1, 2, 3]
+        assert [r['stdout'].strip() for r in result['results']] == ['1', '2', '3', '4']
+        # Four 0.4s tests one after another would take 1.6s.
+        assert elapsed < 1.3, elapsed
+
+    def test_run_stops_at_the_first_failure(self, settings):
+        settings.CODE_EXEC_CONCURRENCY = 2
+        cases = [
+            {'input': '1\n1\n', 'expected_output': '2'},
+            {'input': '2\n2\n', 'expected_output': '5'},  # wrong on purpose
+            {'input': '3\n3\n', 'expected_output': '6'},
+            {'input': '4\n4\n', 'expected_output': '8'},
+        ]
+
+        result = CodeExecutor().run_public_only('python', self.CODE, cases)
+
+        assert [r['passed'] for r in result['results']] == [True, False, False, False]
+        assert [r['error'] for r in result['results']] == [None, None, 'skipped', 'skipped']
+        assert result['passed'] == 1
+
+    def test_submit_grades_every_case(self, settings):
+        settings.CODE_EXEC_CONCURRENCY = 2
+        cases = [
+            {'input': '2\n2\n', 'expected_output': '5'},
+            {'input': '3\n3\n', 'expected_output': '6'},
+        ]
+
+        result = CodeExecutor().run('python', self.CODE, cases)
+
+        assert [r['passed'] for r in result['results']] == [False, True]
+
+
+class TestResultCache:
+    CODE = 'a = int(input())\nb = int(input())\nprint(a + b)\n'
+    CASES = [{'input': '1\n2\n', 'expected_output': '3'}]
+
+    def test_identical_code_and_tests_are_executed_once(self, monkeypatch):
+        from apps.learning import execution_cache
+
+        executor = CodeExecutor()
+        graded = []
+        real = executor._grade
+        monkeypatch.setattr(executor, '_grade', lambda *a: graded.append(a) or real(*a))
+
+        first = executor.run('python', self.CODE, self.CASES)
+        second = executor.run('python', self.CODE, self.CASES)
+
+        assert len(graded) == 1
+        assert second == first
+        assert execution_cache.stats()['hits'] == 1
+
+    def test_anything_the_verdict_depends_on_misses(self, monkeypatch):
+        executor = CodeExecutor()
+        graded = []
+        real = executor._grade
+        monkeypatch.setattr(executor, '_grade', lambda *a: graded.append(a) or real(*a))
+
+        executor.run('python', self.CODE, self.CASES)
+        executor.run('python', self.CODE + '\n', self.CASES)
+        executor.run('python', self.CODE, [{'input': '1\n2\n', 'expected_output': '4'}])
+        executor.run_public_only('python', self.CODE, self.CASES)
+
+        assert len(graded) == 4
+
+    def test_timeouts_are_not_cached(self):
+        from apps.learning import execution_cache
+
+        result = {'results': [{'passed': False, 'error': 'timeout'}]}
+
+        assert execution_cache.put('exec:result:x', result) is False
+        assert execution_cache.put('exec:result:x', {'results': [{'passed': True, 'error': None}]})
+
+    def test_a_zero_ttl_turns_it_off(self, settings):
+        from apps.learning import execution_cache
+
+        settings.CODE_EXEC_CACHE_TTL = 0
+        CodeExecutor().run('python', self.CODE, self.CASES)
+        CodeExecutor().run('python', self.CODE, self.CASES)
+
+        assert execution_cache.stats() == {'hits': 0, 'misses': 0, 'hit_rate': 0.0}
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='the warm pool forks')
+class TestWarmPool:
+    @pytest.fixture(autouse=True)
+    def pool(self, settings):
+        from apps.learning import warm_pool
+
+        settings.CODE_EXEC_WARM_POOL = True
+        settings.CODE_EXEC_CACHE_TTL = 0
+        yield warm_pool
+        warm_pool.shutdown()
+
+    def test_verdicts_match_a_fresh_interpreter(self, settings):
+        code = (
+            'import sys\n'
+            'a = int(input())\n'
+            'if a < 0:\n'
+            '    raise ValueError("negative")\n'
+            'if a == 0:\n'
+            '    sys.exit("zero")\n'
+            'print(a * 2)\n'
+        )
+        cases = [
+            {'input': '4\n', 'expected_output': '8'},
+            {'input': '-1\n', 'expected_output': ''},
+            {'input': '0\n', 'expected_output': ''},
+        ]
+
+        warm = CodeExecutor().run('python', code, cases)['results']
+        settings.CODE_EXEC_WARM_POOL = False
+        cold = CodeExecutor().run('python', code, cases)['results']
+
+        for w, c in zip(warm, cold):
+            assert (w['passed'], w['stdout'], w['error']) == (c['passed'], c['stdout'], c['error'])
+            assert w['stderr'].splitlines()[-1:] == c['stderr'].splitlines()[-1:]
+        assert 'runpy' not in warm[1]['stderr']
+
+    def test_workers_are_reused(self, pool, settings):
+        settings.CODE_EXEC_CONCURRENCY = 1
+        cases = [{'input': str(n), 'expected_output': ''} for n in range(3)]
+
+        results = CodeExecutor().run('python', 'import os\nprint(os.getppid())\n', cases)['results']
+
+        assert len({r['stdout'] for r in results}) == 1   # one warm worker forked all three
+        assert len(pool._idle) == 1
+
+    def test_a_worker_whose_child_is_killed_is_recycled(self, pool):
+        CodeExecutor().run('python', 'print(1)', [{'input': '', 'expected_output': '1'}])
+        assert len(pool._idle) == 1
+
+        CodeExecutor().run('python', 'import os, signal\nos.kill(os.getpid(), signal.SIGKILL)',
+                           [{'input': '', 'expected_output': ''}])
+
+        assert pool._idle == []
+
+
+class TestBatchRecords:
+    def test_only_lines_with_this_executions_nonce_count(self):
+        line = '{"i": 0, "out": "8"}'
+        stdout = f'@@ccis@@ {line}\n@@ccis@@ other {line}\n@@ccis@@ n0nce {line}\n'
+
+        assert batch_harness.parse(stdout, 'n0nce', 1) == {0: {'i': 0, 'out': '8'}}
+
+    def test_a_case_reported_twice_or_out_of_range_is_not_trusted(self):
+        stdout = ''.join(f'@@ccis@@ n {{"i": {i}, "out": "x"}}\n' for i in (0, 1, 1, 7, -1))
+
+        assert set(batch_harness.parse(stdout, 'n', 3)) == {0}
+
+    def test_every_execution_gets_its_own_nonce(self):
+        assert batch_harness.nonce() != batch_harness.nonce()
+
+
+@pytest.mark.skipif(shutil.which('g++') is None, reason='g++ not installed')
+class TestCppBatchDriver:
+    """The generated C++ driver, compiled and run here as the sandbox would."""
+
+    def _run(self, tmp_path, source, stdins, nonce='0123456789abcdef0123456789abcdef'):
+        import subprocess
+
+        [program] = batch_harness.build('cpp', source, stdins)
+        (tmp_path / program['name']).write_text(program['content'])
+        subprocess.run(['g++', '-std=c++17', '-O2', '-o', 'driver', program['name']],
+                       cwd=tmp_path, check=True)
+        proc = subprocess.run(['./driver'], input=nonce + '\n', cwd=tmp_path,
+                              capture_output=True, text=True, timeout=60)
+        return batch_harness.parse(proc.stdout, nonce, len(stdins))
+
+    def test_the_nonce_is_nowhere_in_the_solutions_memory(self, tmp_path):
+        # Every writable mapping the solution inherited, searched for a record
+        # prefix: the stdio buffers, the heap, the stack.
+        snoop = r'''
+#include <cctype>
+#include <cstdio>
+#include <cstring>
+#include <string>
+#include <vector>
+
+int main() {
+    const char marker[] = "@@ccis@@ ";
+    FILE *maps = fopen("/proc/self/maps", "r");
+    FILE *mem = fopen("/proc/self/mem", "rb");
+    unsigned long lo, hi;
+    char perms[8], line[512];
+    std::vector<char> chunk;
+    while (fgets(line, sizeof line, maps)) {
+        if (sscanf(line, "%lx-%lx %7s", &lo, &hi, perms) != 3 || perms[1] != 'w') continue;
+        chunk.resize(hi - lo);
+        if (fseek(mem, (long) lo, SEEK_SET) || fread(chunk.data(), 1, chunk.size(), mem) != chunk.size()) continue;
+        for (size_t k = 0; k + 9 + 32 <= chunk.size(); ++k) {
+            if (memcmp(&chunk[k], marker, 9)) continue;
+            size_t n = 0;
+            while (n < 32 && isxdigit((unsigned char) chunk[k + 9 + n])) ++n;
+            if (n == 32) { printf("%.32s\n", &chunk[k + 9]); return 0; }
+        }
+    }
+    printf("clean\n");
+    return 0;
+}
+'''
+        records = self._run(tmp_path, snoop, ['', '', ''])
+
+        assert [records[i]['out'] for i in range(3)] == ['clean\n'] * 3
+
+    def test_falling_off_the_end_of_main_exits_zero(self, tmp_path):
+        records = self._run(tmp_path, '#include <cstdio>\nint main() { puts("hi"); }\n', ['', ''])
+
+        assert [(r['out'], r['rc']) for r in records.values()] == [('hi\n', 0)] * 2
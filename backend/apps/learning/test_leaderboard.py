@@ -2,14 +2,28 @@
 Leaderboard tests (Req 29): weekly/monthly points span all scored activities,
 not just completed modules.
 """
+from datetime import timedelta
+
 import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
+from rest_framework.test import APIClient
 
 from apps.accounts.models import User
+from apps.learning import leaderboard_index
+from apps.learning.leaderboard_service import (
+    recalculate_all, record_badge, record_challenge_solved, record_event,
+    record_module_completed, roll_windows, update_leaderboard_score, verify_snapshot,
+)
 from apps.learning.models import (
-    CareerPath, LearningModule, UserProgress, Enrollment, LeaderboardSnapshot,
+    BadgeDefinition, CareerPath, CodingChallenge, CodingSubmission, DailyPoints,
+    Enrollment, LeaderboardSnapshot, LearningModule, PointsLedgerEntry, UserBadge,
+    UserProgress,
 )
-from apps.learning.leaderboard_service import update_leaderboard_score
+from apps.learning.tasks import roll_leaderboard_windows
 
 
 @pytest.mark.django_db
@@ -42,3 +56,285 @@ def test_weekly_points_include_paths_not_just_modules():
     assert snap.weekly_points == 110
     assert snap.monthly_points == 110
     assert snap.total_points == 110
+
+
+# ── Incremental scoring ──────────────────────────────────────────────────────
+
+
+def _student(name='inc'):
+    return User.objects.create_user(
+        email=f'{name}@ssct.edu.ph', username=name, password='pw12345678', role='student'
+    )
+
+
+def _challenge(slug='two-sum'):
+    return CodingChallenge.objects.create(
+        title=slug, slug=slug, description='d', difficulty='easy',
+        category='basics', points=50, test_cases=[{'input': '', 'expected_output': ''}],
+    )
+
+
+@pytest.mark.django_db
+def test_first_event_bootstraps_the_snapshot_and_later_events_increment():
+    user = _student()
+    record_challenge_solved(user, _challenge('a'))
+    snap = LeaderboardSnapshot.objects.get(user=user)
+    assert (snap.total_points, snap.challenges_solved) == (50, 1)
+
+    record_challenge_solved(user, _challenge('b'))
+    snap.refresh_from_db()
+    assert (snap.total_points, snap.weekly_points, snap.monthly_points) == (100, 100, 100)
+    assert snap.challenges_solved == 2
+
+
+@pytest.mark.django_db
+def test_a_repeated_event_scores_once():
+    user = _student()
+    challenge = _challenge()
+    assert record_challenge_solved(user, challenge) is True
+    assert record_challenge_solved(user, challenge) is False
+
+    assert LeaderboardSnapshot.objects.get(user=user).total_points == 50
+    assert PointsLedgerEntry.objects.filter(user=user).count() == 1
+
+
+@pytest.mark.django_db
+def test_an_event_on_an_existing_snapshot_is_an_insert_and_two_updates():
+    user = _student()
+    LeaderboardSnapshot.objects.create(user=user)
+    DailyPoints.objects.create(user=user, day=timezone.localdate())
+    challenge = _challenge()
+
+    with CaptureQueriesContext(connection) as ctx:
+        record_challenge_solved(user, challenge)
+
+    # ledger insert, day bucket increment, snapshot increment
+    writes = [q['sql'] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+    assert len(writes) == 3, writes
+
+
+@pytest.mark.django_db
+def test_badges_score_by_rarity():
+    user = _student()
+    LeaderboardSnapshot.objects.create(user=user)
+    badge = BadgeDefinition.objects.create(
+        name='Legend', description='d', category='coding',
+        trigger_type='challenges_solved', rarity='legendary',
+    )
+    record_badge(user, UserBadge.objects.create(user=user, badge=badge))
+
+    snap = LeaderboardSnapshot.objects.get(user=user)
+    assert (snap.total_points, snap.badges_earned) == (300, 1)
+
+
+@pytest.mark.django_db
+def test_a_badge_granted_again_scores_once():
+    user = _student()
+    LeaderboardSnapshot.objects.create(user=user)
+    badge = BadgeDefinition.objects.create(
+        name='Legend', description='d', category='coding',
+        trigger_type='challenges_solved', rarity='legendary',
+    )
+    record_badge(user, UserBadge.objects.create(user=user, badge=badge))
+    UserBadge.objects.filter(user=user, badge=badge).delete()
+
+    assert record_badge(user, UserBadge.objects.create(user=user, badge=badge)) is False
+    assert PointsLedgerEntry.objects.get(user=user, kind='badge').source_id == str(badge.pk)
+    assert LeaderboardSnapshot.objects.get(user=user).total_points == 300
+
+
+@pytest.mark.django_db
+def test_incremental_scoring_agrees_with_a_full_recount():
+    user = _student()
+    path = CareerPath.objects.create(
+        name='P', slug='p', description='d', program_type='bsit',
+        difficulty_level='beginner', estimated_duration=4,
+    )
+    module = LearningModule.objects.create(
+        career_path=path, title='M', description='d', module_type='text',
+        difficulty_level='beginner', content='x', order=1,
+    )
+    progress = UserProgress.objects.create(
+        user=user, career_path=path, learning_module=module,
+        is_completed=True, completion_percentage=100, completed_at=timezone.now(),
+    )
+    record_module_completed(user, progress)
+    record_event(user, 'challenge', 'not-a-real-solve')  # no source row behind it
+
+    drift = verify_snapshot(user)
+    assert drift == {
+        'total_points': (60, 10),
+        'weekly_points': (60, 10),
+        'monthly_points': (60, 10),
+        'challenges_solved': (1, 0),
+    }
+
+    verify_snapshot(user, repair=True)
+    assert verify_snapshot(user) == {}
+
+
+@pytest.mark.django_db
+def test_an_old_challenge_solved_again_is_not_drift():
+    user = _student()
+    challenge = _challenge()
+    long_ago = timezone.now() - timedelta(days=40)
+    first = CodingSubmission.objects.create(
+        user=user, challenge=challenge, language='python', code='x', status='accepted')
+    CodingSubmission.objects.filter(pk=first.pk).update(submitted_at=long_ago)
+    record_event(user, 'challenge', challenge.pk, occurred_at=long_ago)
+
+    CodingSubmission.objects.create(
+        user=user, challenge=challenge, language='python', code='x', status='accepted')
+    assert record_challenge_solved(user, challenge) is False
+
+    snap = LeaderboardSnapshot.objects.get(user=user)
+    assert (snap.total_points, snap.weekly_points, snap.monthly_points) == (50, 0, 0)
+    assert verify_snapshot(user) == {}
+
+
+# ── Bulk rebuild ─────────────────────────────────────────────────────────────
+
+
+@pytest.mark.django_db
+def test_bulk_rebuild_matches_the_per_user_recount():
+    users = [_student(f'bulk{i}') for i in range(5)]
+    challenge = _challenge()
+    for user in users[:3]:
+        # Two accepted submissions of one challenge are still one solve.
+        for _ in range(2):
+            CodingSubmission.objects.create(
+                user=user, challenge=challenge, language='python', code='x', status='accepted')
+    LeaderboardSnapshot.objects.create(user=users[4], total_points=999)  # stale
+
+    assert recalculate_all(chunk_size=2) == 5
+
+    for user in users[:3]:
+        snap = LeaderboardSnapshot.objects.get(user=user)
+        assert (snap.total_points, snap.weekly_points, snap.challenges_solved) == (50, 50, 1)
+    assert LeaderboardSnapshot.objects.get(user=users[4]).total_points == 0
+    assert all(verify_snapshot(u) == {} for u in users)
+
+
+@pytest.mark.django_db
+def test_bulk_rebuild_query_count_does_not_grow_with_users():
+    for i in range(12):
+        _student(f'q{i}')
+
+    with CaptureQueriesContext(connection) as ctx:
+        recalculate_all(chunk_size=100)
+
+    # user ids, five grouped aggregates, one upsert, one rank-index reload
+    assert len(ctx.captured_queries) == 8
+
+
+@pytest.mark.django_db
+def test_command_verify_reports_drift_and_repair_fixes_it(capsys):
+    user = _student()
+    LeaderboardSnapshot.objects.create(user=user, total_points=40)
+
+    call_command('recalculate_leaderboard', '--verify', '--chunk-size', '1')
+    assert 'total_points: 40 -> 0' in capsys.readouterr().out
+    assert LeaderboardSnapshot.objects.get(user=user).total_points == 40
+
+    call_command('recalculate_leaderboard', '--repair')
+    assert LeaderboardSnapshot.objects.get(user=user).total_points == 0
+
+
+# ── Rolling windows ──────────────────────────────────────────────────────────
+
+
+@pytest.mark.django_db
+def test_events_land_in_day_buckets_and_only_the_windows_they_fall_in():
+    user = _student()
+    record_event(user, 'challenge', 'today')
+    record_event(user, 'challenge', 'older', occurred_at=timezone.now() - timedelta(days=10))
+
+    snap = LeaderboardSnapshot.objects.get(user=user)
+    assert (snap.total_points, snap.weekly_points, snap.monthly_points) == (100, 50, 100)
+    assert DailyPoints.objects.filter(user=user).count() == 2
+
+
+@pytest.mark.django_db
+def test_rollup_ages_points_out_for_users_who_stopped_scoring():
+    user, idle = _student('active'), _student('idle')
+    record_event(user, 'challenge', 'x')
+    record_event(idle, 'challenge', 'y')
+    # Eight days later, nothing has touched either snapshot.
+    DailyPoints.objects.update(day=timezone.localdate() - timedelta(days=8))
+
+    assert roll_windows() == 2
+
+    for u in (user, idle):
+        snap = LeaderboardSnapshot.objects.get(user=u)
+        assert (snap.total_points, snap.weekly_points, snap.monthly_points) == (50, 0, 50)
+
+
+@pytest.mark.django_db
+def test_rollup_is_one_update_and_runs_as_a_task():
+    for i in range(4):
+        record_event(_student(f'r{i}'), 'challenge', 'x')
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert roll_leaderboard_windows.delay().get() == 4
+    # the windows UPDATE, then the rank index reloads the moved columns
+    assert len(ctx.captured_queries) == 2
+
+
+# ── Rank index ───────────────────────────────────────────────────────────────
+
+
+def _board_of(n, points=lambda i: i * 10):
+    users = [_student(f'b{i}') for i in range(n)]
+    for i, u in enumerate(users):
+        LeaderboardSnapshot.objects.create(user=u, total_points=points(i), weekly_points=i)
+    return users
+
+
+@pytest.mark.django_db
+def test_index_ranks_like_the_count_query_ties_included():
+    users = _board_of(4, points=lambda i: [30, 20, 20, 10][i])
+
+    ranks = [leaderboard_index.rank(u.pk)['rank'] for u in users]
+    assert ranks == [1, 2, 2, 4]
+    assert leaderboard_index.rank(users[3].pk)['percentile'] == 0
+    assert leaderboard_index.count() == 4
+
+
+@pytest.mark.django_db
+def test_index_follows_incremental_events():
+    users = _board_of(3)
+    leaderboard_index.top()  # warm it
+    record_event(users[0], 'certificate', 'c')
+
+    assert leaderboard_index.top('all_time', 1) == [str(users[0].pk)]
+    assert leaderboard_index.top('certificates', 1) == [str(users[0].pk)]
+    assert leaderboard_index.rank(users[0].pk, 'weekly')['rank'] == 1
+
+
+@pytest.mark.django_db
+def test_me_serves_a_neighbour_window_without_scanning_the_table():
+    users = _board_of(20)
+    client = APIClient()
+    client.force_authenticate(users[10])
+    client.get(reverse('leaderboard-me'))  # warm the index
+
+    with CaptureQueriesContext(connection) as ctx:
+        body = client.get(reverse('leaderboard-me')).json()
+
+    assert body['rank'] == 10
+    assert [n['rank'] for n in body['neighbours']] == list(range(5, 16))
+    assert [n['total_points'] for n in body['neighbours']] == [i * 10 for i in range(15, 4, -1)]
+    # the user's snapshot and the neighbour rows; no COUNTs, no full scan
+    assert len(ctx.captured_queries) == 2
+
+
+@pytest.mark.django_db
+def test_weekly_board_orders_by_the_weekly_column():
+    users = _board_of(3)
+    LeaderboardSnapshot.objects.filter(user=users[0]).update(weekly_points=99)
+    client = APIClient()
+    client.force_authenticate(users[1])
+
+    body = client.get(reverse('leaderboard-weekly')).json()
+    assert body['total_users'] == 3
+    assert [e['weekly_points'] for e in body['entries']] == [99, 2, 1]
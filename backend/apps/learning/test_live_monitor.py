@@ -0,0 +1,121 @@
+"""
+The instructor monitor gets one coalesced delta per window, not a roster per event.
+
+The flush runs database work from async code on another thread, so these tests
+need real transactions rather than pytest-django's per-test rollback.
+"""
+import asyncio
+
+import pytest
+from channels.layers import get_channel_layer
+
+from apps.accounts.models import User
+from apps.learning import live_monitor
+from apps.learning.models import LiveQuiz, LiveQuizParticipant, LiveQuizSession
+
+
+@pytest.fixture
+def room(transactional_db):
+    instructor = User.objects.create_user(
+        username='mon_inst', email='mi@ssct.edu.ph', password='x', role='instructor')
+    quiz = LiveQuiz.objects.create(instructor=instructor, title='Q', creation_method='manual')
+    session = LiveQuizSession.objects.create(quiz=quiz)
+    participants = [
+        LiveQuizParticipant.objects.create(
+            session=session, nickname=f'stu{i}',
+            student=User.objects.create_user(
+                username=f'mon_stu{i}', email=f'ms{i}@ssct.edu.ph', password='x'))
+        for i in range(3)
+    ]
+    return quiz.join_code, participants
+
+
+async def _listen(join_code):
+    layer = get_channel_layer()
+    channel = await layer.new_channel()
+    await layer.group_add(live_monitor.instructor_group(join_code), channel)
+    return layer, channel
+
+
+async def _drain(layer, channel):
+    messages = []
+    while True:
+        try:
+            messages.append(await asyncio.wait_for(layer.receive(channel), 0.05))
+        except asyncio.TimeoutError:
+            return messages
+
+
+def test_a_burst_of_answers_is_one_delta_with_only_the_changed_rows(room):
+    join_code, participants = room
+    first, second, _ = participants
+
+    async def scenario():
+        layer, channel = await _listen(join_code)
+        await live_monitor.changed(join_code)          # prime: monitor has seen everyone
+        await asyncio.sleep(live_monitor.WINDOW + 0.1)
+        primed = await _drain(layer, channel)
+
+        for p, score in ((first, 10), (second, 20), (first, 15)):
+            await asyncio.to_thread(
+                LiveQuizParticipant.objects.filter(pk=p.pk).update, total_score=score)
+            await live_monitor.changed(join_code, p.id)
+        await asyncio.sleep(live_monitor.WINDOW + 0.1)
+        return primed, await _drain(layer, channel)
+
+    primed, messages = asyncio.run(scenario())
+
+    assert len(primed) == 1 and len(primed[0]['changed']) == 3
+    assert len(messages) == 1
+    delta = messages[0]
+    assert delta['seq'] == primed[0]['seq'] + 1
+    assert {row['id']: row['total_score'] for row in delta['changed']} == {
+        str(first.id): 15, str(second.id): 20}
+    assert delta['removed'] == []
+
+
+def test_nothing_is_sent_when_nothing_changed(room):
+    join_code, participants = room
+
+    async def scenario():
+        layer, channel = await _listen(join_code)
+        await live_monitor.changed(join_code)
+        await asyncio.sleep(live_monitor.WINDOW + 0.1)
+        await _drain(layer, channel)
+        await live_monitor.changed(join_code, participants[0].id)
+        await asyncio.sleep(live_monitor.WINDOW + 0.1)
+        return await _drain(layer, channel)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_a_participant_who_leaves_is_removed(room):
+    join_code, participants = room
+
+    async def scenario():
+        layer, channel = await _listen(join_code)
+        await live_monitor.changed(join_code)
+        await asyncio.sleep(live_monitor.WINDOW + 0.1)
+        await _drain(layer, channel)
+        await asyncio.to_thread(
+            LiveQuizParticipant.objects.filter(pk=participants[2].pk).update, is_active=False)
+        await live_monitor.changed(join_code)
+        await asyncio.sleep(live_monitor.WINDOW + 0.1)
+        return await _drain(layer, channel)
+
+    (delta,) = asyncio.run(scenario())
+    assert delta['removed'] == [str(participants[2].id)]
+    assert delta['changed'] == []
+
+
+def test_a_snapshot_carries_the_sequence_it_is_current_as_of(room):
+    join_code, _ = room
+
+    async def scenario():
+        await live_monitor.changed(join_code)
+        await asyncio.sleep(live_monitor.WINDOW + 0.1)
+        return await live_monitor.snapshot(join_code)
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot['seq'] == 1
+    assert len(snapshot['participants']) == 3
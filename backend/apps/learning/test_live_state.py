@@ -0,0 +1,144 @@
+"""
+Live quiz room state: loaded once per change, and an answer reads nothing.
+"""
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.learning import answer_buffer, live_state
+from apps.learning.consumers import LiveQuizConsumer
+from apps.learning.models import (
+    LiveQuiz, LiveQuizParticipant, LiveQuizQuestion, LiveQuizResponse, LiveQuizSession,
+)
+
+
+@pytest.fixture
+def room(db):
+    instructor = User.objects.create_user(
+        username='state_inst', email='si@ssct.edu.ph', password='x', role='instructor')
+    quiz = LiveQuiz.objects.create(instructor=instructor, title='Q', creation_method='manual')
+    session = LiveQuizSession.objects.create(quiz=quiz, status='in_progress')
+    question = LiveQuizQuestion.objects.create(
+        quiz=quiz, question_text='Pick A', question_type='multiple_choice', order=1,
+        option_a='yes', option_b='no', correct_answer='A', points=100, time_limit=30,
+    )
+    student = User.objects.create_user(username='state_stu', email='ss@ssct.edu.ph', password='x')
+    participant = LiveQuizParticipant.objects.create(session=session, student=student, nickname='s')
+    return SimpleNamespace(
+        quiz=quiz, session=session, question=question, participant=participant,
+        instructor=instructor, consumer=SimpleNamespace(join_code=quiz.join_code),
+    )
+
+
+def _statements(ctx):
+    return [q['sql'] for q in ctx.captured_queries
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+
+def _answer(room, answer, response_time=0.0, participant=None):
+    return LiveQuizConsumer._save_mcq_response.__wrapped__(
+        room.consumer, str((participant or room.participant).id), str(room.question.id),
+        answer, response_time,
+    )
+
+
+class TestRoomState:
+    def test_is_read_from_the_database_once(self, room, django_assert_num_queries):
+        with django_assert_num_queries(2):
+            state = live_state.get(room.quiz.join_code)
+        with django_assert_num_queries(0):
+            assert live_state.get(room.quiz.join_code) is state
+
+        assert state['session'] == {
+            'id': str(room.session.id), 'status': 'in_progress', 'current_question_id': None}
+        assert state['questions'][str(room.question.id)]['correct_answer'] == 'A'
+
+    def test_another_worker_takes_it_from_the_shared_cache(self, room, django_assert_num_queries):
+        live_state.get(room.quiz.join_code)
+        live_state.reset()      # a process that has never seen this room
+
+        with django_assert_num_queries(0):
+            assert live_state.get(room.quiz.join_code)['quiz']['id'] == str(room.quiz.id)
+
+    def test_invalidation_reloads_it(self, room):
+        live_state.get(room.quiz.join_code)
+        LiveQuizSession.objects.filter(pk=room.session.pk).update(status='paused')
+        assert live_state.get(room.quiz.join_code)['session']['status'] == 'in_progress'
+
+        live_state.invalidate(room.quiz.join_code)
+
+        assert live_state.get(room.quiz.join_code)['session']['status'] == 'paused'
+
+    def test_an_unknown_join_code_has_no_state(self, db):
+        assert live_state.get('NOPE00') is None
+
+    def test_editing_a_question_over_rest_invalidates_it(self, room):
+        live_state.get(room.quiz.join_code)
+        client = APIClient()
+        client.force_authenticate(room.instructor)
+
+        response = client.patch(
+            f'/api/learning/live-quiz-questions/{room.question.id}/', {'correct_answer': 'B'},
+            format='json')
+
+        assert response.status_code == 200, response.data
+        question = live_state.get(room.quiz.join_code)['questions'][str(room.question.id)]
+        assert question['correct_answer'] == 'B'
+
+    def test_copies_nobody_reads_are_dropped_after_the_ttl(self, room, monkeypatch):
+        clock = SimpleNamespace(now=1000.0)
+        monkeypatch.setattr(live_state, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+        live_state.get(room.quiz.join_code)
+        _answer(room, 'A')
+        assert str(room.session.id) in live_state._participants
+
+        clock.now += live_state.STATE_TTL
+        live_state.get('NOPE00')        # any read in the process sweeps
+
+        assert room.quiz.join_code not in live_state._local
+        assert str(room.session.id) not in live_state._participants
+
+
+class TestAnswering:
+    def test_an_answer_is_acknowledged_without_touching_the_database(self, room):
+        live_state.get(room.quiz.join_code)
+        _answer(room, 'B')              # first message: membership looked up once
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = _answer(room, 'A')
+
+        assert result == {
+            'success': True, 'is_correct': True, 'points_earned': 100, 'correct_answer': None}
+        assert _statements(ctx) == []
+
+    def test_a_participant_from_another_session_is_refused(self, room):
+        other_quiz = LiveQuiz.objects.create(
+            instructor=room.instructor, title='Other', creation_method='manual')
+        other_session = LiveQuizSession.objects.create(quiz=other_quiz)
+        outsider = LiveQuizParticipant.objects.create(
+            session=other_session, nickname='o',
+            student=User.objects.create_user(username='o', email='o@ssct.edu.ph', password='x'))
+
+        result = _answer(room, 'A', participant=outsider)
+        answer_buffer.flush(room.quiz.join_code)
+
+        assert result['success'] is False
+        assert not LiveQuizResponse.objects.exists()
+
+    def test_a_question_from_another_quiz_is_refused(self, room):
+        other_quiz = LiveQuiz.objects.create(
+            instructor=room.instructor, title='Other', creation_method='manual')
+        foreign = LiveQuizQuestion.objects.create(
+            quiz=other_quiz, question_text='?', question_type='multiple_choice', order=1,
+            correct_answer='A')
+
+        result = LiveQuizConsumer._save_mcq_response.__wrapped__(
+            room.consumer, str(room.participant.id), str(foreign.id), 'A', 0.0)
+        answer_buffer.flush(room.quiz.join_code)
+
+        assert result['success'] is False
+        assert not LiveQuizResponse.objects.exists()
@@ -0,0 +1,44 @@
+"""
+The live quiz load test plays a whole (small) class through the real consumer.
+
+The consumer's database work runs on another thread, so this needs real
+transactions rather than pytest-django's per-test rollback.
+"""
+import json
+from io import StringIO
+
+from django.core.management import call_command
+
+from apps.accounts.models import User
+from apps.learning.models import LiveQuiz
+
+
+def _run(**options):
+    out = StringIO()
+    call_command('loadtest_live_quiz', json=True, seed=7, stdout=out, **options)
+    return json.loads(out.getvalue())
+
+
+def test_every_student_answers_and_every_phase_is_measured(transactional_db):
+    report = _run(students=4, questions=2, window=0.2, violations=0.5)
+
+    assert report['answers'] == 8
+    latency = report['latency_ms']
+    assert latency['connect']['n'] == 4
+    assert latency['question_start fan-out']['n'] == 8
+    assert latency['question_start, last student']['n'] == 2
+    assert latency['answer_submitted']['n'] == 8
+    assert latency['question_end fan-out']['n'] == 8
+    assert latency['violation_recorded']['n'] == latency['violation_alert, instructor']['n'] > 0
+    # Every answer reaches the monitor, and answering itself costs no query:
+    # the answer phase is violations and the buffered flushes.
+    assert latency['monitor lag after ack']['n'] == 8
+    assert report['queries']['answers'] > 0
+    assert report['queries_per_answer'] < 4
+
+
+def test_it_cleans_up_after_itself(transactional_db):
+    _run(students=2, questions=1, window=0.1, violations=0)
+
+    assert not User.objects.filter(username__startswith='loadtest_').exists()
+    assert not LiveQuiz.objects.exists()
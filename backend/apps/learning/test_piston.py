@@ -0,0 +1,90 @@
+"""
+The sandbox client: one pooled session per process, failures fail closed.
+"""
+import asyncio
+
+import pytest
+import requests
+
+from apps.learning import piston
+from apps.learning.code_executor import CodeExecutor
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self._body = body or {'run': {'stdout': 'ok\n', 'stderr': '', 'code': 0, 'signal': None}}
+        self.text = str(self._body)
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def sandbox(settings, monkeypatch):
+    settings.PISTON_URL = 'http://sandbox.test'
+    piston.reset_pool()
+    sessions, calls = [], []
+
+    def fake_post(session, url, data=None, headers=None, timeout=None):
+        sessions.append(session)
+        calls.append({'url': url, 'timeout': timeout})
+        return calls_response[0]
+
+    calls_response = [FakeResponse()]
+    monkeypatch.setattr(requests.Session, 'post', fake_post)
+    yield {'sessions': sessions, 'calls': calls, 'response': calls_response}
+    piston.reset_pool()
+
+
+class TestPooledClient:
+    def test_calls_share_one_keep_alive_session(self, sandbox):
+        piston.execute('python', 'print("ok")')
+        piston.execute('python', 'print("ok")')
+
+        assert len(sandbox['sessions']) == 2
+        assert sandbox['sessions'][0] is sandbox['sessions'][1]
+        assert sandbox['calls'][0]['url'] == 'http://sandbox.test/api/v2/execute'
+
+    def test_every_call_has_a_deadline(self, sandbox, settings):
+        settings.PISTON_CONNECT_TIMEOUT = 1.5
+
+        piston.execute('python', 'print("ok")', run_timeout_ms=5_000, compile_timeout_ms=15_000)
+
+        assert sandbox['calls'][0]['timeout'] == (1.5, 30.0)
+
+    def test_a_rejected_request_fails_closed(self, sandbox):
+        sandbox['response'][0] = FakeResponse(status_code=500, body={'message': 'boom'})
+
+        with pytest.raises(piston.PistonUnavailable):
+            piston.execute('python', 'print("ok")')
+
+    def test_an_unreachable_sandbox_fails_closed(self, sandbox, monkeypatch):
+        def refuse(*args, **kwargs):
+            raise requests.ConnectionError('refused')
+        monkeypatch.setattr(requests.Session, 'post', refuse)
+
+        with pytest.raises(piston.PistonUnavailable):
+            piston.execute('python', 'print("ok")')
+
+    def test_latency_and_errors_are_counted(self, sandbox):
+        before = piston.stats()
+        piston.execute('python', 'print("ok")')
+        sandbox['response'][0] = FakeResponse(status_code=503)
+        with pytest.raises(piston.PistonUnavailable):
+            piston.execute('python', 'print("ok")')
+
+        after = piston.stats()
+        assert after['calls'] - before['calls'] == 2
+        assert after['errors'] - before['errors'] == 1
+        assert after['in_flight'] == 0
+
+
+class TestAsyncExecution:
+    def test_run_async_grades_like_run(self):
+        code = 'a = int(input())\nb = int(input())\nprint(a + b)\n'
+        cases = [{'input': '2\n3\n', 'expected_output': '5'}]
+
+        result = asyncio.run(CodeExecutor().run_async('python', code, cases))
+
+        assert result['all_passed'] is True
@@ -0,0 +1,92 @@
+"""
+Live quiz room presence: joins cannot be lost, dead sockets age out.
+"""
+import threading
+
+import pytest
+
+from apps.learning import presence
+
+ROOM = 'quiz_ABC123'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(presence.time, 'time', lambda: now[0])
+    return now
+
+
+class TestMembership:
+    def test_simultaneous_joins_are_all_kept(self):
+        # The old get-mutate-set lost joins exactly like this.
+        barrier = threading.Barrier(20)
+
+        def connect(i):
+            barrier.wait()
+            presence.join(ROOM, f'student{i}')
+
+        threads = [threading.Thread(target=connect, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert presence.count(ROOM) == 20
+        assert presence.members(ROOM) == sorted(f'student{i}' for i in range(20))
+
+    def test_join_and_leave_report_whether_anything_changed(self):
+        assert presence.join(ROOM, 'ana') is True
+        assert presence.join(ROOM, 'ana') is False
+        assert presence.leave(ROOM, 'ana') is True
+        assert presence.leave(ROOM, 'ana') is False
+        assert presence.members(ROOM) == []
+
+    def test_rooms_are_separate(self):
+        presence.join(ROOM, 'ana')
+        presence.join('quiz_OTHER1', 'ben')
+
+        assert presence.members(ROOM) == ['ana']
+
+
+class TestSweeping:
+    def test_a_member_with_no_heartbeat_is_swept(self, clock):
+        presence.join(ROOM, 'gone')
+        presence.join(ROOM, 'here')
+        clock[0] += presence.STALE_AFTER - 10
+        presence.heartbeat(ROOM, 'here')
+        clock[0] += 20
+
+        assert presence.sweep(ROOM) == ['gone']
+        assert presence.members(ROOM) == ['here']
+
+    def test_sweeps_are_rationed_per_room(self, clock):
+        presence.join(ROOM, 'gone')
+        clock[0] += presence.STALE_AFTER - 5
+        assert presence.sweep(ROOM) == []           # nothing stale yet, but the pass is spent
+        clock[0] += 10
+
+        assert presence.sweep(ROOM) == []           # stale now, still inside SWEEP_EVERY
+        assert presence.sweep(ROOM, force=True) == ['gone']
+        clock[0] += presence.SWEEP_EVERY
+        presence.join(ROOM, 'late')
+        clock[0] += presence.STALE_AFTER + 1
+        assert presence.sweep(ROOM) == ['late']
+
+    def test_a_heartbeat_after_being_swept_says_the_member_is_back(self, clock):
+        presence.join(ROOM, 'sleepy')
+        clock[0] += presence.STALE_AFTER + 1
+        presence.sweep(ROOM, force=True)
+
+        assert presence.heartbeat(ROOM, 'sleepy') is True
+        assert presence.heartbeat(ROOM, 'sleepy') is False
+        assert presence.members(ROOM) == ['sleepy']
+
+    def test_a_beat_racing_the_sweep_keeps_the_member(self, clock):
+        presence.join(ROOM, 'racer')
+        clock[0] += presence.STALE_AFTER + 1
+        stale_at = clock[0] - presence.STALE_AFTER
+        presence.heartbeat(ROOM, 'racer')           # lands after the sweep read the hash
+
+        assert presence._store().drop(ROOM, ['racer'], stale_at) == []
+        assert presence.members(ROOM) == ['racer']
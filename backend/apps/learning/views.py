@@ -29,7 +29,10 @@ from .serializers import (
     LeaderboardEntrySerializer
 )
 from .badge_service import grant_badges_after_module, grant_badges_after_path
-from .leaderboard_service import update_leaderboard_score
+from . import catalog_cache, leaderboard_index
+from .leaderboard_service import (
+    record_certificate, record_module_completed, record_path_completed,
+)
 
 def annotated_career_paths(base=None):
     """
@@ -78,28 +81,34 @@ class CareerPathViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        parent = super().list
+        return catalog_cache.respond(
+            request, 'career_paths', lambda: parent(request, *args, **kwargs).data)
+
     def retrieve(self, request, *args, **kwargs):
         """Get single career path with enrollment status"""
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        data = serializer.data
-        
-        # Add enrollment status if user is authenticated
-        if request.user.is_authenticated:
-            enrollment = Enrollment.objects.filter(
-                user=request.user,
-                career_path=instance
-            ).first()
-            
-            if enrollment:
-                data['is_enrolled'] = True
-                data['enrollment_id'] = str(enrollment.id)
-                data['progress_percentage'] = enrollment.progress_percentage
-                data['enrollment_status'] = enrollment.status
-            else:
-                data['is_enrolled'] = False
-        
-        return Response(data)
+        def build():
+            return self.get_serializer(self.get_object()).data
+
+        def with_enrollment(data):
+            # Add enrollment status if user is authenticated
+            if request.user.is_authenticated:
+                enrollment = Enrollment.objects.filter(
+                    user=request.user,
+                    career_path_id=data['id']
+                ).first()
+
+                if enrollment:
+                    data['is_enrolled'] = True
+                    data['enrollment_id'] = str(enrollment.id)
+                    data['progress_percentage'] = enrollment.progress_percentage
+                    data['enrollment_status'] = enrollment.status
+                else:
+                    data['is_enrolled'] = False
+            return data
+
+        return catalog_cache.respond(request, 'career_path', build, overlay=with_enrollment)
     
     @action(detail=True, methods=['post'])
     def enroll(self, request, slug=None):
@@ -167,6 +176,16 @@ class LearningModuleViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(module_type=module_type)
         
         return queryset.order_by('order')
+
+    def list(self, request, *args, **kwargs):
+        parent = super().list
+        return catalog_cache.respond(
+            request, 'modules', lambda: parent(request, *args, **kwargs).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super().retrieve
+        return catalog_cache.respond(
+            request, 'module', lambda: parent(request, *args, **kwargs).data)
     
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
@@ -244,7 +263,7 @@ class LearningModuleViewSet(viewsets.ModelViewSet):
 
             # Update leaderboard score
             try:
-                update_leaderboard_score(user)
+                record_module_completed(user, progress)
             except Exception as e:
                 print(f"Leaderboard update failed (non-fatal): {e}")
 
@@ -376,6 +395,7 @@ class LearningModuleViewSet(viewsets.ModelViewSet):
                         enrollment.progress_percentage = 100
                         enrollment.completed_at = timezone.now()
                         enrollment.save()
+                        record_path_completed(user, enrollment)
                         print(f"Enrollment marked as completed for user {user.username}")
                     
                     # Award certificate if doesn't exist
@@ -391,6 +411,7 @@ class LearningModuleViewSet(viewsets.ModelViewSet):
                     
                     if created:
                         print(f"Certificate awarded to {user.username} for {career_path.name}")
+                        record_certificate(user, cert)
                         
                         # Update user profile certificate count
                         try:
@@ -942,10 +963,12 @@ class CertificateViewSet(viewsets.ReadOnlyModelViewSet):
             user=request.user, career_path=career_path,
             defaults={'status': 'active'}
         )
-        enrollment.status = 'completed'
-        enrollment.progress_percentage = 100
-        enrollment.completed_at = timezone.now()
-        enrollment.save()
+        if enrollment.status != 'completed':
+            enrollment.status = 'completed'
+            enrollment.progress_percentage = 100
+            enrollment.completed_at = timezone.now()
+            enrollment.save()
+            record_path_completed(request.user, enrollment)
         
         cert_id = build_certificate_id(request.user, career_path)
         cert, created = Certificate.objects.get_or_create(
@@ -955,6 +978,8 @@ class CertificateViewSet(viewsets.ReadOnlyModelViewSet):
         )
         
         if created:
+            record_certificate(request.user, cert)
+
             # Update profile cert count
             try:
                 profile = request.user.profile
@@ -1228,10 +1253,11 @@ class ModuleProgressViewSet(viewsets.ModelViewSet):
                 enrollment.save()
                 
                 # Check if all modules completed
-                if completed_modules == total_modules:
+                if completed_modules == total_modules and enrollment.status != 'completed':
                     enrollment.status = 'completed'
                     enrollment.completed_at = timezone.now()
                     enrollment.save()
+                    record_path_completed(progress.user, enrollment)
         
         return Response(ModuleProgressSerializer(progress).data)
 
@@ -1763,24 +1789,26 @@ class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
         the current user. Frontend uses this to render locked/unlocked states.
         """
         user = request.user
-        all_badges = BadgeDefinition.objects.filter(is_active=True)
-        earned_map = {
-            ub.badge_id: ub.earned_at
-            for ub in UserBadge.objects.filter(user=user).select_related('badge')
-        }
 
-        result = []
-        for badge in all_badges:
-            item = BadgeDefinitionSerializer(badge).data
-            item['earned'] = badge.id in earned_map
-            item['earned_at'] = earned_map.get(badge.id)
-            result.append(item)
+        def with_earned(badges):
+            earned_map = {
+                str(ub.badge_id): ub.earned_at
+                for ub in UserBadge.objects.filter(user=user)
+            }
+            for item in badges:
+                item['earned'] = item['id'] in earned_map
+                item['earned_at'] = earned_map.get(item['id'])
+            return {
+                'total_badges': len(badges),
+                'earned_count': len(earned_map),
+                'badges': badges,
+            }
 
-        return Response({
-            'total_badges': len(result),
-            'earned_count': len(earned_map),
-            'badges': result,
-        })
+        # The definitions are the same for everyone; only the flags are not.
+        return catalog_cache.respond(request, 'badges', lambda: [
+            BadgeDefinitionSerializer(badge).data
+            for badge in BadgeDefinition.objects.filter(is_active=True)
+        ], overlay=with_earned)
 
 
 class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
@@ -1789,67 +1817,63 @@ class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
     GET /learning/leaderboard/              — all-time top 50
     GET /learning/leaderboard/monthly/     — top this month
     GET /learning/leaderboard/weekly/      — top this week
-    GET /learning/leaderboard/me/          — my rank + percentile
+    GET /learning/leaderboard/me/          — my rank + percentile (?period=weekly|monthly)
     GET /learning/leaderboard/categories/  — breakdown by category
+
+    Ordering, ranks and board sizes come from the sorted-set index
+    (leaderboard_index); the database is read only for the rows on the page.
     """
     serializer_class = LeaderboardEntrySerializer
     permission_classes = [IsAuthenticated]
 
-    def _annotate_ranks(self, qs):
-        """Add rank numbers to a queryset ordered by total_points desc."""
-        entries = list(qs.select_related('user'))
-        for i, entry in enumerate(entries, start=1):
+    def _entries(self, user_ids, start=1):
+        """Snapshots for `user_ids` in that order, numbered from `start`."""
+        by_user = {
+            str(e.user_id): e
+            for e in LeaderboardSnapshot.objects.filter(user_id__in=user_ids).select_related('user')
+        }
+        entries = [by_user[uid] for uid in user_ids if uid in by_user]
+        for i, entry in enumerate(entries, start=start):
             entry.rank = i
         return entries
 
-    def get_queryset(self):
-        return LeaderboardSnapshot.objects.all().select_related('user')
-
-    def list(self, request, *args, **kwargs):
-        entries = self._annotate_ranks(
-            LeaderboardSnapshot.objects.order_by('-total_points')[:50]
-        )
+    def _board(self, request, board, period):
+        entries = self._entries(leaderboard_index.top(board, 50))
         data = LeaderboardEntrySerializer(entries, many=True, context={'request': request}).data
         return Response({
-            'period': 'all_time',
-            'total_users': LeaderboardSnapshot.objects.count(),
+            'period': period,
+            'total_users': leaderboard_index.count(board),
             'entries': data,
         })
 
+    def get_queryset(self):
+        return LeaderboardSnapshot.objects.all().select_related('user')
+
+    def list(self, request, *args, **kwargs):
+        return self._board(request, 'all_time', 'all_time')
+
     @action(detail=False, methods=['get'])
     def monthly(self, request):
-        entries = self._annotate_ranks(
-            LeaderboardSnapshot.objects.order_by('-monthly_points')[:50]
-        )
-        for i, e in enumerate(entries, start=1):
-            e.rank = i
-        data = LeaderboardEntrySerializer(entries, many=True, context={'request': request}).data
-        return Response({'period': 'monthly', 'total_users': LeaderboardSnapshot.objects.count(), 'entries': data})
+        return self._board(request, 'monthly', 'monthly')
 
     @action(detail=False, methods=['get'])
     def weekly(self, request):
-        entries = self._annotate_ranks(
-            LeaderboardSnapshot.objects.order_by('-weekly_points')[:50]
-        )
-        data = LeaderboardEntrySerializer(entries, many=True, context={'request': request}).data
-        return Response({'period': 'weekly', 'total_users': LeaderboardSnapshot.objects.count(), 'entries': data})
+        return self._board(request, 'weekly', 'weekly')
 
     @action(detail=False, methods=['get'])
     def me(self, request):
         from .leaderboard_service import get_user_rank
-        info = get_user_rank(request.user)
+        board = request.query_params.get('period', 'all_time')
+        if board not in ('all_time', 'weekly', 'monthly'):
+            board = 'all_time'
+        info = get_user_rank(request.user, board)
         entry = info.get('entry')
         if not entry:
             return Response({'rank': None, 'total_points': 0, 'percentile': 0, 'total_users': 0})
         entry.rank = info['rank']
         # Neighbours ±5
-        rank = info['rank']
-        qs = list(LeaderboardSnapshot.objects.order_by('-total_points').select_related('user'))
-        start = max(0, rank - 6)
-        end = min(len(qs), rank + 5)
-        neighbours = qs[start:end]
-        for i, n in enumerate(neighbours, start=start + 1):
-            n.rank = i
+        start, ids = leaderboard_index.window(request.user.pk, board, radius=5)
+        neighbours = self._entries(ids, start=start)
         return Response({
             'rank': info['rank'],
             'total_users': info['total_users'],
@@ -1862,28 +1886,14 @@ class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def categories(self, request):
         """Return per-category leaders: most modules, most challenges, most certs."""
-        top_modules = (
-            LeaderboardSnapshot.objects.order_by('-modules_completed')
-            .select_related('user')[:5]
-        )
-        top_challenges = (
-            LeaderboardSnapshot.objects.order_by('-challenges_solved')
-            .select_related('user')[:5]
-        )
-        top_certs = (
-            LeaderboardSnapshot.objects.order_by('-certificates_earned')
-            .select_related('user')[:5]
-        )
-        def serialize(qs, start=1):
-            entries = list(qs)
-            for i, e in enumerate(entries, start=start):
-                e.rank = i
+        def serialize(board):
+            entries = self._entries(leaderboard_index.top(board, 5))
             return LeaderboardEntrySerializer(entries, many=True, context={'request': request}).data
 
         return Response({
-            'most_modules': serialize(top_modules),
-            'most_challenges': serialize(top_challenges),
-            'most_certificates': serialize(top_certs),
+            'most_modules': serialize('modules'),
+            'most_challenges': serialize('challenges'),
+            'most_certificates': serialize('certificates'),
         })
 
 
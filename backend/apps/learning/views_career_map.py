@@ -9,9 +9,9 @@ arriving in pieces.
 from collections import OrderedDict
 
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from . import catalog_cache
 from .models import CareerRole
 
 PROGRAM_LABELS = OrderedDict([
@@ -27,6 +27,11 @@ class CareerMapView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        # The same tree for everyone, until a role or path changes.
+        return catalog_cache.respond(request, 'career_map', self.tree)
+
+    @staticmethod
+    def tree():
         roles = (
             CareerRole.objects.filter(is_active=True)
             # The path is read for every role (its id, name and slug drive the
@@ -83,4 +88,4 @@ class CareerMapView(APIView):
                 'categories': categories,
             })
 
-        return Response({'programs': payload})
+        return {'programs': payload}
@@ -17,6 +17,7 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Count, Q
 
 from apps.learning.models import CodingChallenge, CodingSubmission, LiveQuiz, LiveQuizQuestion
+from apps.lab import execution
 from apps.learning.code_executor import CodeExecutor
 
 logger = logging.getLogger(__name__)
@@ -193,176 +194,69 @@ class CodingChallengeViewSet(viewsets.ModelViewSet):
             'total_solved': challenge.total_solved,
         })
 
-    @action(detail=True, methods=['post'], url_path='run', throttle_classes=[CodeRunThrottle])
-    def run(self, request, slug=None):
-        """Run code against public test cases only — does NOT create a submission record."""
-        challenge = get_object_or_404(CodingChallenge, slug=slug, is_active=True)
+    def _validated_code(self, request, challenge):
+        """(language, code) from the request, or an error Response."""
         code = request.data.get('code', '')
         language = request.data.get('language', 'python')
 
         if not code.strip():
-            return Response({'error': 'Code cannot be empty'}, status=status.HTTP_400_BAD_REQUEST)
+            return None, Response({'error': 'Code cannot be empty'}, status=status.HTTP_400_BAD_REQUEST)
 
         if len(code) > MAX_CODE_LENGTH:
-            return Response({'error': f'Code exceeds maximum length of {MAX_CODE_LENGTH} characters'},
-                            status=status.HTTP_400_BAD_REQUEST)
+            return None, Response({'error': f'Code exceeds maximum length of {MAX_CODE_LENGTH} characters'},
+                                  status=status.HTTP_400_BAD_REQUEST)
 
         if language not in (challenge.supported_languages or ['python']):
-            return Response(
+            return None, Response(
                 {'error': f'Language "{language}" not supported for this challenge'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        return (language, code), None
 
-        try:
-            executor = CodeExecutor()
-            result = executor.run_public_only(language, code, challenge.test_cases or [])
-            return Response({
-                'status': 'run_complete',
-                'passed': result.get('passed', 0),
-                'total': result.get('total', 0),
-                'results': result.get('results', []),
-            })
-        except Exception as e:
-            logger.error(f'Code run failed for challenge {challenge.slug}: {e}')
-            return Response({'error': 'Code execution failed.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    @action(detail=True, methods=['post'], url_path='run', throttle_classes=[CodeRunThrottle])
+    def run(self, request, slug=None):
+        """
+        Queue a run against the public test cases. Returns 202 with a run id to
+        poll at runs/<run_id>/; the graded response arrives as its `result`.
+        """
+        challenge = get_object_or_404(CodingChallenge, slug=slug, is_active=True)
+        parsed, denied = self._validated_code(request, challenge)
+        if denied:
+            return denied
+        language, code = parsed
+
+        from .challenge_grading import start
+        record = start(request.user, challenge, language=language, code=code, purpose='run')
+        return Response(execution.public(record), status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['post'], url_path='submit', throttle_classes=[CodeSubmitThrottle])
     def submit(self, request, slug=None):
-        """Submit code for a challenge — run against all test cases"""
+        """
+        Queue a submission against all test cases. Grading, the submission
+        record, points and badges all happen on the worker; poll runs/<run_id>/.
+        """
         challenge = get_object_or_404(CodingChallenge, slug=slug, is_active=True)
-        code = request.data.get('code', '')
-        language = request.data.get('language', 'python')
-
-        if not code.strip():
-            return Response({'error': 'Code cannot be empty'}, status=status.HTTP_400_BAD_REQUEST)
-
-        if len(code) > MAX_CODE_LENGTH:
-            return Response({'error': f'Code exceeds maximum length of {MAX_CODE_LENGTH} characters'},
-                            status=status.HTTP_400_BAD_REQUEST)
-
-        if language not in (challenge.supported_languages or ['python']):
-            return Response(
-                {'error': f'Language "{language}" not supported for this challenge'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Create submission record
-        submission = CodingSubmission.objects.create(
-            user=request.user,
-            challenge=challenge,
-            language=language,
-            code=code,
-            status='running',
-            total_tests=len(challenge.test_cases or []),
-        )
-
-        # Run code against test cases
-        try:
-            executor = CodeExecutor()
-            start_time = time.time()
-            result = executor.run(language, code, challenge.test_cases or [])
-            elapsed_ms = int((time.time() - start_time) * 1000)
-
-            passed = result.get('passed', 0)
-            total = result.get('total', 0)
-            all_passed = result.get('all_passed', False)
-
-            # Determine status
-            if all_passed:
-                sub_status = 'accepted'
-            elif result.get('status') == 'hardcoded_output':
-                # Output matched but wasn't computed from the input — don't let
-                # passing no-input tests dress this up as a partial solution.
-                sub_status = 'wrong_answer'
-            elif passed > 0:
-                sub_status = 'partial'
-            elif any(r.get('error') == 'timeout' for r in result.get('results', [])):
-                sub_status = 'timeout'
-            elif any(r.get('error') in ('compilation_error', 'runtime_error') for r in result.get('results', [])):
-                sub_status = 'error'
-            else:
-                sub_status = 'wrong_answer'
-
-            # Calculate points
-            points = 0
-            if all_passed:
-                points = challenge.points
-            elif total > 0:
-                points = int(challenge.points * passed / total * 0.5)  # Partial credit = 50% weight
-
-            # Filter results for response (hide hidden test case details)
-            safe_results = []
-            for r in result.get('results', []):
-                entry = {
-                    'test_case_index': r.get('test_case_index', 0),
-                    'passed': r.get('passed', False),
-                    'error': r.get('error'),
-                }
-                if not r.get('is_hidden', False):
-                    entry['stdout'] = r.get('stdout', '')
-                    entry['stderr'] = r.get('stderr', '')
-                    entry['expected'] = r.get('expected', '')
-                else:
-                    entry['is_hidden'] = True
-                safe_results.append(entry)
-
-            # Update submission
-            submission.status = sub_status
-            submission.passed_tests = passed
-            submission.results_json = safe_results
-            submission.execution_time_ms = elapsed_ms
-            submission.points_earned = points
-            submission.save()
-
-            # Update challenge stats (acceptance_rate is a @property, computed automatically)
-            challenge.total_attempts += 1
-            if all_passed:
-                prev_accepted = CodingSubmission.objects.filter(
-                    user=request.user, challenge=challenge, status='accepted'
-                ).exclude(id=submission.id).exists()
-                if not prev_accepted:
-                    challenge.total_solved += 1
-            challenge.save(update_fields=['total_attempts', 'total_solved'])
-
-            # Update leaderboard score (non-fatal)
-            newly_earned_badges = []
-            if sub_status == 'accepted':
-                try:
-                    from .leaderboard_service import update_leaderboard_score
-                    update_leaderboard_score(request.user)
-                except Exception as lb_err:
-                    logger.warning(f'Leaderboard update failed (non-fatal): {lb_err}')
-
-                # Grant badges for challenge completion
-                try:
-                    from .badge_service import grant_badges_after_challenge
-                    newly_earned_badges = grant_badges_after_challenge(
-                        request.user, time_seconds=elapsed_ms // 1000
-                    )
-                except Exception as badge_err:
-                    logger.warning(f'Badge grant failed (non-fatal): {badge_err}')
-
-            return Response({
-                'submission_id': str(submission.id),
-                'status': sub_status,
-                'passed_tests': passed,
-                'total_tests': total,
-                'points_earned': points,
-                'execution_time_ms': elapsed_ms,
-                'results': safe_results,
-                'badges_earned': newly_earned_badges,
-            })
-
-        except Exception as e:
-            logger.error(f'Code execution failed for challenge {challenge.slug}: {e}')
-            submission.status = 'error'
-            submission.results_json = [{'error': str(e)}]
-            submission.save()
-            return Response({
-                'submission_id': str(submission.id),
-                'status': 'error',
-                'error': 'Code execution failed. Please try again.',
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        parsed, denied = self._validated_code(request, challenge)
+        if denied:
+            return denied
+        language, code = parsed
+
+        from .challenge_grading import start
+        record = start(request.user, challenge, language=language, code=code, purpose='submit')
+        return Response(execution.public(record), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path='runs/(?P<run_id>[^/.]+)')
+    def run_status(self, request, slug=None, run_id=None):
+        """Poll a queued Run or Submit. Only the student who started it may."""
+        from .challenge_grading import QUEUE, participant_key
+
+        record = execution.get(run_id)
+        if record is None or record['lab_id'] != QUEUE:
+            return Response({'error': 'That run has expired.'}, status=status.HTTP_404_NOT_FOUND)
+        if record['participant_id'] != participant_key(
+                request.user, record['problem_id'], record['purpose']):
+            return Response({'error': 'Not your run.'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(execution.public(record))
 
     @action(detail=True, methods=['get'], url_path='submissions')
     def submissions(self, request, slug=None):
@@ -35,6 +35,7 @@ from apps.learning.serializers_live_quiz import (
     QuizResultsSerializer
 )
 from apps.core.permissions import IsInstructorOrAdmin
+from apps.learning import answer_buffer, live_state
 
 
 class LiveQuizViewSet(viewsets.ModelViewSet):
@@ -72,6 +73,16 @@ class LiveQuizViewSet(viewsets.ModelViewSet):
             ).prefetch_related('live_questions').order_by('-created_at')
         # Students don't see quiz list
         return LiveQuiz.objects.none()
+
+    # Edits reach open quiz sockets through the room state (live_state.py).
+    def perform_update(self, serializer):
+        quiz = serializer.save()
+        live_state.invalidate(quiz.join_code)
+
+    def perform_destroy(self, instance):
+        join_code = instance.join_code
+        instance.delete()
+        live_state.invalidate(join_code)
     
     def create(self, request, *args, **kwargs):
         """Create quiz and return full serialized response with join_code"""
@@ -120,6 +131,7 @@ class LiveQuizViewSet(viewsets.ModelViewSet):
         quiz.is_active = True
         quiz.started_at = timezone.now()
         quiz.save(update_fields=['is_active', 'started_at'])
+        live_state.invalidate(quiz.join_code)
 
         serializer = LiveQuizSessionSerializer(session)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -139,11 +151,14 @@ class LiveQuizViewSet(viewsets.ModelViewSet):
         session = quiz.session
         session.status = 'ended'
         session.save(update_fields=['status'])
+        # Answers still buffered by the quiz sockets belong in the results.
+        answer_buffer.flush(quiz.join_code, wait=5.0)
 
         # Mark quiz as inactive
         quiz.is_active = False
         quiz.ended_at = timezone.now()
         quiz.save(update_fields=['is_active', 'ended_at'])
+        live_state.invalidate(quiz.join_code)
 
         # Generate results
         results = self._generate_results(session)
@@ -219,6 +234,7 @@ class LiveQuizViewSet(viewsets.ModelViewSet):
                     # (OneToOneField prevents creating a second session for this quiz)
                     session.status = 'in_progress'
                     session.save(update_fields=['status'])
+                    live_state.invalidate(quiz.join_code)
                 else:
                     return Response(
                         {'error': 'This quiz session has already ended'},
@@ -228,6 +244,7 @@ class LiveQuizViewSet(viewsets.ModelViewSet):
             # Auto-create session
             initial_status = 'in_progress' if quiz.quiz_mode == 'self_paced' else 'lobby'
             session = LiveQuizSession.objects.create(quiz=quiz, status=initial_status)
+            live_state.invalidate(quiz.join_code)
 
         # Check late join policy (live mode only — self_paced always allows join)
         if quiz.quiz_mode == 'live':
@@ -527,6 +544,20 @@ class LiveQuizQuestionViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(quiz_id=quiz_id)
         return queryset.order_by('order')
 
+    # The question bank is part of the room state (live_state.py).
+    def perform_create(self, serializer):
+        question = serializer.save()
+        live_state.invalidate(question.quiz.join_code)
+
+    def perform_update(self, serializer):
+        question = serializer.save()
+        live_state.invalidate(question.quiz.join_code)
+
+    def perform_destroy(self, instance):
+        join_code = instance.quiz.join_code
+        instance.delete()
+        live_state.invalidate(join_code)
+
 
 class LiveQuizSessionViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing quiz sessions"""
@@ -598,6 +629,7 @@ class LiveQuizSessionViewSet(viewsets.ReadOnlyModelViewSet):
         session.current_question_started_at = timezone.now()
         session.total_questions_shown += 1
         session.save(update_fields=['current_question', 'current_question_started_at', 'total_questions_shown'])
+        live_state.invalidate(session.quiz.join_code)
         
         serializer = self.get_serializer(session)
         return Response(serializer.data)
@@ -0,0 +1,238 @@
+"""
+Warm Python workers for local (unsandboxed) execution.
+
+Without Piston, every test case is `python solution.py` in a fresh process, and
+for the short programs most challenges are, interpreter startup is most of the
+time: tens of milliseconds to print one number. A worker here is a Python
+process that has already started. It forks once per run — the child inherits
+a warm interpreter and is ready in about a millisecond — and the child runs the
+solution as `__main__` exactly as the command line would: same argv, same
+sys.path[0], same traceback on an uncaught exception, exit status from
+SystemExit.
+
+Each run is still its own process, so nothing one submission does survives into
+the next. The worker is started the way the plain subprocess is: the stripped
+environment (_sandbox_env) and the CPU-time rlimit (_cpu_limited), which every
+forked child inherits with its own clock. Output goes to files capped by
+RLIMIT_FSIZE, so a print loop cannot fill the disk before the deadline.
+
+A worker is recycled after CODE_EXEC_WARM_POOL_MAX_RUNS runs, and killed
+outright — with everything it spawned — on any violation: a deadline missed,
+a child killed by a signal, a reply it could not give. The pool refills on
+demand. If a worker cannot be used at all, the caller falls back to the plain
+subprocess, so turning this on can change how fast a verdict arrives, never
+what it is.
+
+Python only. Node cannot fork a warm interpreter, and the in-process
+alternative (a fresh `vm` context per run) shares the worker's process with the
+student's code, which is not isolation. JavaScript keeps spawning `node`.
+
+POSIX only (fork); off unless CODE_EXEC_WARM_POOL is set.
+"""
+import json
+import logging
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Runs inside the worker. Protocol: one JSON request per line on stdin
+# ({path, stdin, cwd}), one JSON reply per line on stdout ({out, err, rc, sig}).
+_WORKER = r'''
+import json, os, resource, runpy, sys, traceback
+
+LIMIT = %(limit)d
+proto_in = os.fdopen(os.dup(0), 'r', encoding='utf-8')
+proto_out = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+# fds 0-2 are what each child's program reads and writes; the protocol
+# lives on duplicates so a child can never write into it.
+null = os.open(os.devnull, os.O_RDWR)
+for fd in (0, 1, 2):
+    os.dup2(null, fd)
+
+
+def child(job, paths):
+    os.chdir(job['cwd'])
+    os.dup2(os.open(paths['in'], os.O_RDONLY), 0)
+    os.dup2(os.open(paths['out'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 1)
+    os.dup2(os.open(paths['err'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 2)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (LIMIT * 64, LIMIT * 64))
+    sys.stdin = open(0, 'r', closefd=False)
+    sys.stdout = open(1, 'w', closefd=False)
+    sys.stderr = open(2, 'w', closefd=False)
+    sys.argv = [job['path']]
+    sys.path[0] = os.path.dirname(job['path'])
+    code = 0
+    try:
+        runpy.run_path(job['path'], run_name='__main__')
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # Drop the frames above the solution (this function, runpy) so the
+        # traceback reads exactly as `python solution.py` prints it.
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != job['path']:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        code = code or 1
+    os._exit(code)
+
+
+def read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(LIMIT).decode('utf-8', errors='replace')
+    except OSError:
+        return ''
+
+
+for line in proto_in:
+    job = json.loads(line)
+    # Test cases of one submission run side by side in the same directory;
+    # a worker serves one at a time, so its pid keeps the files apart.
+    paths = {n: os.path.join(job['cwd'], '.warm_{}_{}'.format(os.getpid(), n))
+             for n in ('in', 'out', 'err')}
+    with open(paths['in'], 'w', encoding='utf-8') as f:
+        f.write(job['stdin'])
+    pid = os.fork()
+    if pid == 0:
+        try:
+            proto_in.close()
+            proto_out.close()
+            child(job, paths)
+        finally:
+            os._exit(1)
+    _, status = os.waitpid(pid, 0)
+    proto_out.write(json.dumps({
+        'out': read(paths['out']),
+        'err': read(paths['err']),
+        'rc': os.WEXITSTATUS(status) if os.WIFEXITED(status) else 0,
+        'sig': os.WTERMSIG(status) if os.WIFSIGNALED(status) else 0,
+    }) + '\n')
+    proto_out.flush()
+    for path in paths.values():
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+'''
+
+
+class _Worker:
+    def __init__(self):
+        from .code_executor import MAX_OUTPUT_BYTES, _cpu_limited, _sandbox_env
+
+        self.runs = 0
+        self.proc = subprocess.Popen(
+            _cpu_limited([sys.executable, '-c', _WORKER % {'limit': MAX_OUTPUT_BYTES}]),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            env=_sandbox_env(),
+            start_new_session=True,   # its own process group, so kill() gets the children too
+        )
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, path: str, stdin: str, cwd: str, timeout: float) -> dict:
+        self.runs += 1
+        request = json.dumps({'path': path, 'stdin': stdin, 'cwd': cwd}) + '\n'
+        self.proc.stdin.write(request.encode())
+        self.proc.stdin.flush()
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not ready:
+            raise subprocess.TimeoutExpired(path, timeout)
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError('warm worker exited')
+        return json.loads(line)
+
+    def kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.wait()
+
+
+_idle: list[_Worker] = []
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.name == 'posix' and getattr(settings, 'CODE_EXEC_WARM_POOL', False)
+
+
+def handles(cmd) -> bool:
+    """True for a plain `python solution.py` run command while the pool is on."""
+    return (enabled() and isinstance(cmd, list) and len(cmd) == 2
+            and cmd[0] == sys.executable and cmd[1].endswith('.py'))
+
+
+def run(cmd: list, stdin: str, cwd: str, timeout: float) -> dict | None:
+    """
+    Run `python <file>` on a warm worker: {stdout, stderr}.
+    Raises subprocess.TimeoutExpired past the deadline, like subprocess.run.
+    None if no worker could do it; the caller runs the command itself.
+    """
+    worker = _checkout()
+    if worker is None:
+        return None
+    try:
+        reply = worker.run(cmd[1], stdin, cwd, timeout)
+    except subprocess.TimeoutExpired:
+        worker.kill()
+        raise
+    except Exception as e:
+        logger.warning(f'warm worker failed, running directly: {e}')
+        worker.kill()
+        return None
+
+    if reply['sig'] or worker.runs >= getattr(settings, 'CODE_EXEC_WARM_POOL_MAX_RUNS', 200):
+        worker.kill()
+    else:
+        _checkin(worker)
+    return {'stdout': reply['out'], 'stderr': reply['err']}
+
+
+def shutdown() -> None:
+    """Kill every idle worker. For tests and after a settings change."""
+    with _lock:
+        workers, _idle[:] = list(_idle), []
+    for worker in workers:
+        worker.kill()
+
+
+def _checkout() -> _Worker | None:
+    with _lock:
+        while _idle:
+            worker = _idle.pop()
+            if worker.alive():
+                return worker
+    try:
+        return _Worker()
+    except Exception as e:
+        logger.warning(f'could not start a warm worker: {e}')
+        return None
+
+
+def _checkin(worker: _Worker) -> None:
+    with _lock:
+        if len(_idle) < getattr(settings, 'CODE_EXEC_WARM_POOL_SIZE', 4):
+            _idle.append(worker)
+            return
+    worker.kill()
@@ -30,3 +30,88 @@ def _isolate_cache():
     cache.clear()
     yield
     cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_leaderboard_index():
+    """Drop the in-process leaderboard rank index around every test.
+
+    Without Redis the index (apps/learning/leaderboard_index.py) lives in module
+    state, which survives pytest-django's per-test rollback just as the cache
+    did. Reset, it reloads from the test's own snapshots on first read.
+    """
+    from apps.learning import leaderboard_index
+    leaderboard_index.reset()
+    yield
+    leaderboard_index.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_presence():
+    """Forget live-quiz room presence around every test.
+
+    Same reason as the leaderboard index: without Redis, apps/learning/presence.py
+    keeps rooms in module state, which no database rollback touches.
+    """
+    from apps.learning import presence
+    presence.reset()
+    yield
+    presence.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_live_state():
+    """Drop this process's copies of live quiz room state around every test.
+
+    The shared copies live in the cache, cleared above; these are the
+    per-process ones in apps/learning/live_state.py.
+    """
+    from apps.learning import live_state
+    live_state.reset()
+    yield
+    live_state.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_answer_buffer():
+    """Discard live quiz answers left buffered in-process by a previous test."""
+    from apps.learning import answer_buffer
+    answer_buffer.reset()
+    yield
+    answer_buffer.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_lab_scheduler():
+    """Empty the in-process lab run queues (apps/lab/scheduler.py) around every test."""
+    from apps.lab import scheduler
+    scheduler.reset()
+    yield
+    scheduler.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_lab_slots():
+    """Give back in-process lab terminal slots (apps/lab/slots.py) around every test."""
+    from apps.lab import slots
+    slots.reset()
+    yield
+    slots.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_home_feed():
+    """Drop in-process home feed timelines (apps/community/feed.py) around every test."""
+    from apps.community import feed
+    feed.reset()
+    yield
+    feed.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_profiling():
+    """Forget in-process request measurements (apps/core/profiling.py) around every test."""
+    from apps.core import profiling
+    profiling.reset()
+    yield
+    profiling.reset()
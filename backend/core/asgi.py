@@ -19,6 +19,11 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 # is populated before importing code that may import ORM models.
 django_asgi_app = get_asgi_application()
 
+# Several workers must share the channel layer and the cache; refuse to start
+# when they would each have their own (apps/core/worker_mode.py).
+from apps.core import worker_mode
+worker_mode.refuse_unsafe()
+
 # Import routing after Django is set up
 from core import routing
 
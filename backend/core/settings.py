@@ -125,6 +125,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it times everything below it: per-route latency, queries and
+    # cache use for /api/system/performance/ (apps/core/profiling.py).
+    'apps.core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -155,6 +158,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 ASGI_APPLICATION = 'core.asgi.application'
+# ASGI worker processes serving it (gunicorn.conf.py). More than one requires
+# the Redis channel layer and cache; startup refuses otherwise
+# (apps/core/worker_mode.py).
+ASGI_WORKERS = env.int('WEB_CONCURRENCY', default=1)
 
 
 # Database
@@ -416,6 +423,59 @@ CORS_ALLOW_METHODS = [
 # server, which is not isolated — see apps/learning/piston.py. Production sets
 # it; local development and CI leave it unset so tests need no Docker.
 PISTON_URL = env('PISTON_URL', default='')
+# Send all of a submission's test cases to the sandbox as one execution (see
+# apps/learning/batch_harness.py). Off restores one request per test case.
+PISTON_BATCH = env.bool('PISTON_BATCH', default=True)
+# Keep-alive connections to the sandbox per process, which is also the cap on
+# requests in flight (see apps/learning/piston.py). Connect timeout in seconds.
+PISTON_POOL_SIZE = env.int('PISTON_POOL_SIZE', default=8)
+PISTON_CONNECT_TIMEOUT = env.float('PISTON_CONNECT_TIMEOUT', default=2.0)
+# Test cases of one submission run in parallel, at most this many at a time —
+# per submission, so raise it only with the worker count in mind.
+CODE_EXEC_CONCURRENCY = env.int('CODE_EXEC_CONCURRENCY', default=4)
+# Verdicts for identical code + tests are reused for this long (seconds; 0 turns
+# the cache off). Results bigger than the byte cap are never stored.
+CODE_EXEC_CACHE_TTL = env.int('CODE_EXEC_CACHE_TTL', default=600)
+CODE_EXEC_CACHE_MAX_BYTES = env.int('CODE_EXEC_CACHE_MAX_BYTES', default=64 * 1024)
+# Local Python runs fork from pre-started workers instead of starting an
+# interpreter per test case (apps/learning/warm_pool.py). POSIX only; only
+# matters when PISTON_URL is unset.
+CODE_EXEC_WARM_POOL = env.bool('CODE_EXEC_WARM_POOL', default=False)
+CODE_EXEC_WARM_POOL_SIZE = env.int('CODE_EXEC_WARM_POOL_SIZE', default=4)
+CODE_EXEC_WARM_POOL_MAX_RUNS = env.int('CODE_EXEC_WARM_POOL_MAX_RUNS', default=200)
+# Live quiz answers are acknowledged at once and written in batches this many
+# seconds after a room's first unwritten one (apps/learning/answer_buffer.py).
+LIVE_ANSWER_FLUSH_INTERVAL = env.float('LIVE_ANSWER_FLUSH_INTERVAL', default=1.0)
+# Threads (and so database connections) per ASGI worker for websocket consumers'
+# queries (apps/core/db_pool.py). ASGI_WORKERS x this, plus HTTP and Celery,
+# should fit PgBouncer's default_pool_size (POOL_SIZE in setup-pgbouncer.sh).
+CONSUMER_DB_THREADS = env.int('CONSUMER_DB_THREADS', default=8)
+# Lab terminal containers started ahead of Run, per runtime and per worker
+# process (apps/lab/container_pool.py). 0 starts every run cold.
+LAB_WARM_CONTAINERS = env.int('LAB_WARM_CONTAINERS', default=0)
+# Lab and challenge runs waiting for the worker are served round-robin across
+# labs, submissions first, at most LAB_RUN_BUDGET at once per lab
+# (apps/lab/scheduler.py). LAB_WORKERS is the worker's --concurrency, for ETAs.
+LAB_RUN_BUDGET = env.int('LAB_RUN_BUDGET', default=2)
+LAB_WORKERS = env.int('LAB_WORKERS', default=2)
+# C++ and Java builds, kept by source hash so an unchanged program skips the
+# compiler (apps/lab/builds.py). Empty means a directory under the system temp.
+LAB_BUILD_CACHE_DIR = env('LAB_BUILD_CACHE_DIR', default='')
+LAB_BUILD_CACHE_ENTRIES = env.int('LAB_BUILD_CACHE_ENTRIES', default=200)
+# Home feed timelines (apps/community/feed.py): posts kept per user, the
+# audience above which a post is read from its source instead of pushed to
+# every timeline, and how long an unread timeline is kept.
+FEED_TIMELINE_LENGTH = env.int('FEED_TIMELINE_LENGTH', default=500)
+FEED_FANOUT_LIMIT = env.int('FEED_FANOUT_LIMIT', default=500)
+FEED_TIMELINE_TTL = env.int('FEED_TIMELINE_TTL', default=3 * 86400)
+# Per-route latency, query and cache histograms from live traffic
+# (apps/core/profiling.py), kept this many minutes.
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', default=True)
+PROFILING_RETENTION_MINUTES = env.int('PROFILING_RETENTION_MINUTES', default=60)
+# Cached catalog responses (apps/learning/catalog_cache.py): retired at once
+# when the catalog changes; this bounds how stale enrolled counts may get.
+# 0 turns the cache off.
+CATALOG_CACHE_TTL = env.int('CATALOG_CACHE_TTL', default=300)
 
 _REDIS_URL = env('REDIS_URL', default='')
 if _REDIS_URL:
@@ -462,6 +522,24 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Periodic jobs, fired by `celery -A core beat` (deploy/ccis-beat.service).
+# The leaderboard windows are whole days, so hourly is far more often than they
+# change — it just means a missed tick costs an hour, not a day.
+from celery.schedules import crontab  # noqa: E402
+
+CELERY_BEAT_SCHEDULE = {
+    'roll-leaderboard-windows': {
+        'task': 'learning.roll_leaderboard_windows',
+        'schedule': crontab(minute=5),
+    },
+    # Live quiz sockets flush their own answers within a second; this only
+    # picks up what a worker that died mid-quiz left behind.
+    'flush-live-answers': {
+        'task': 'learning.flush_live_answers',
+        'schedule': crontab(),
+    },
+}
+
 # Firebase Configuration
 FIREBASE_CREDENTIALS = {
     'type': 'service_account',
@@ -11,7 +11,9 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 from apps.core_views import root_view, api_root, health_check, admin_analytics, admin_projects, admin_tasks, get_app_settings
-from apps.core.views_system import verify_admin_password, update_app_settings, system_health
+from apps.core.views_system import (
+    verify_admin_password, update_app_settings, system_health, system_performance,
+)
 
 urlpatterns = [
     path('', root_view, name='root'),
@@ -20,6 +22,7 @@ urlpatterns = [
     path('api/settings/', get_app_settings, name='app-settings'),
     path('api/auth/admin/verify-password/', verify_admin_password, name='verify-admin-password'),
     path('api/system/health/', system_health, name='system-health'),
+    path('api/system/performance/', system_performance, name='system-performance'),
     path('api/admin/analytics/', admin_analytics, name='admin-analytics'),
     path('api/admin/projects/', admin_projects, name='admin-projects'),
     path('api/admin/tasks/', admin_tasks, name='admin-tasks'),
@@ -0,0 +1,48 @@
+"""
+gunicorn settings for serving core.asgi with several uvicorn worker processes.
+
+gunicorn reads this file from the working directory on its own, so the unit
+(deploy/ccis-backend.service) only names the application:
+
+    gunicorn core.asgi:application
+
+Each worker is a full ASGI server, HTTP and WebSocket alike, with its own event
+loop; nginx keeps sending /ws/ upgrades to the one port and gunicorn hands each
+connection to whichever worker accepts it. Nothing is pinned to a worker,
+because nothing a consumer needs lives in one (apps/core/worker_mode.py).
+
+WEB_CONCURRENCY sets the worker count (default: one per core). More than one
+requires REDIS_URL; the check runs here, before anything forks, and again in
+every worker when core.asgi is imported.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# nginx is the only client; trust its X-Forwarded-* (daphne's --proxy-headers).
+forwarded_allow_ips = '127.0.0.1'
+
+# A websocket is a long request. Workers heartbeat the arbiter from their event
+# loop, so `timeout` only catches a loop that has stopped turning, not a quiz
+# that has run for an hour.
+timeout = 60
+graceful_timeout = 30
+# Workers are never recycled by request count. Every open websocket lives in
+# one, and a class polling its runs once a second reaches any sensible count in
+# minutes; a restart would drop every socket on that worker, and the live quiz
+# client does not reconnect. A leak is for a deliberate restart to clear.
+max_requests = 0
+
+
+def on_starting(server):
+    # Exported before settings are first read, so the workers — forked from
+    # this process — see the count that was actually started, whether it came
+    # from WEB_CONCURRENCY or --workers.
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+    from apps.core import worker_mode
+    worker_mode.refuse_unsafe(server.cfg.workers)
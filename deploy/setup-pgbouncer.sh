@@ -24,6 +24,10 @@
 # still a continent away). Fewer queries per request still matters, and moving
 # the Neon project to a region near this VM would cut that too.
 #
+# Websocket consumers run their queries on a fixed pool of threads per worker
+# that keep their connections (backend/apps/core/db_pool.py). Keep
+# workers x CONSUMER_DB_THREADS, plus HTTP and Celery, within POOL_SIZE.
+#
 # Idempotent: safe to re-run.
 # =============================================================================
 set -Eeuo pipefail
@@ -35,11 +35,15 @@ for svc in ccis-backend nginx redis-server; do
     if systemctl is-active --quiet "$svc"; then ok "$svc active"; else bad "$svc NOT active"; fi
 done
 
-# daphne, not gunicorn — WSGI silently cannot serve WebSockets
-if systemctl cat ccis-backend 2>/dev/null | grep -q 'daphne'; then
+# daphne, or gunicorn with uvicorn workers (backend/gunicorn.conf.py) — never
+# gunicorn on core.wsgi: WSGI silently cannot serve WebSockets
+unit=$(systemctl cat ccis-backend 2>/dev/null)
+if echo "$unit" | grep -q 'daphne'; then
     ok "backend runs daphne (ASGI)"
+elif echo "$unit" | grep -q 'gunicorn' && echo "$unit" | grep -q 'core.asgi'; then
+    ok "backend runs gunicorn + uvicorn workers (ASGI)"
 else
-    bad "backend is NOT running daphne — WebSockets will fail"
+    bad "backend is NOT running an ASGI server — WebSockets will fail"
 fi
 
 # ---------------------------------------------------------------------------
@@ -201,3 +201,36 @@ describe('acting on a student', () => {
     expect(sent.find(m => m.type === 'resume_participant')?.participant_id).toBe('p3')
   })
 })
+
+describe('coalesced roster deltas', () => {
+  it('applies the next delta on top of the snapshot', async () => {
+    await show()
+    deliver({ type: 'instructor_participant_update', participants: PARTICIPANTS, seq: 4 })
+    await waitFor(() => expect(screen.getByText('Ana')).toBeTruthy())
+
+    deliver({
+      type: 'instructor_participant_delta', seq: 5,
+      changed: [{ id: 'p4', nickname: 'Dee', total_score: 5 }],
+      removed: ['p1'],
+    })
+
+    await waitFor(() => expect(screen.getByText('Dee')).toBeTruthy())
+    expect(screen.queryByText('Ana')).toBeNull()
+    expect(screen.getByText('Ben')).toBeTruthy()
+  })
+
+  it('asks for the roster again when a delta was missed', async () => {
+    await show()
+    deliver({ type: 'instructor_participant_update', participants: PARTICIPANTS, seq: 4 })
+    await waitFor(() => expect(screen.getByText('Ana')).toBeTruthy())
+
+    deliver({
+      type: 'instructor_participant_delta', seq: 6,
+      changed: [{ id: 'p4', nickname: 'Dee', total_score: 5 }], removed: [],
+    })
+
+    const joins = sockets[0].sent.map(s => JSON.parse(s)).filter(m => m.type === 'instructor_join')
+    expect(joins).toHaveLength(2)
+    expect(screen.queryByText('Dee')).toBeNull()
+  })
+})
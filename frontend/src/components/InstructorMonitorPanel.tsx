@@ -58,6 +58,19 @@ const VIOLATION_COLORS: Record<string, string> = {
     copy_paste: 'text-red-300 bg-red-500/10 border-red-500/30',
 };
 
+/** A roster row as the consumer sends it (live_monitor._row). */
+function toParticipantStatus(p: any): ParticipantStatus {
+    return {
+        participantId: p.id || p.participant_id,
+        nickname: p.nickname || p.id,
+        score: p.total_score || 0,
+        violations: (p.fullscreen_violations || 0) + (p.tab_switch_count || 0) + (p.copy_paste_attempts || 0),
+        isFlagged: p.is_flagged || false,
+        isPaused: p.is_paused || false,
+        pauseReason: p.pause_reason || '',
+    };
+}
+
 function relativeTime(date: Date): string {
     const secs = Math.round((Date.now() - date.getTime()) / 1000);
     if (secs < 60) return `${secs}s ago`;
@@ -84,6 +97,7 @@ const InstructorMonitorPanel: React.FC<InstructorMonitorPanelProps> = ({ joinCod
 
     // ── WebSocket connect (single source, with auto-reconnect + backoff) ────
     const reconnectAttempts = useRef(0);
+    const lastSeq = useRef(0);
     const reconnectTimer = useRef<ReturnType<typeof setTimeout>>();
     const manuallyClosed = useRef(false);
 
@@ -158,17 +172,32 @@ const InstructorMonitorPanel: React.FC<InstructorMonitorPanelProps> = ({ joinCod
             }
 
             case 'instructor_participant_update': {
-                // Rich participant data from DB — use this as the source of truth
-                const list: ParticipantStatus[] = (data.participants || []).map((p: any) => ({
-                    participantId: p.id || p.participant_id,
-                    nickname: p.nickname || p.id,
-                    score: p.total_score || 0,
-                    violations: (p.fullscreen_violations || 0) + (p.tab_switch_count || 0) + (p.copy_paste_attempts || 0),
-                    isFlagged: p.is_flagged || false,
-                    isPaused: p.is_paused || false,
-                    pauseReason: p.pause_reason || '',
-                }));
-                setParticipants(list);
+                // Full roster from the DB — the source of truth. Deltas numbered
+                // after `seq` build on it.
+                lastSeq.current = data.seq ?? 0;
+                setParticipants((data.participants || []).map(toParticipantStatus));
+                break;
+            }
+
+            case 'instructor_participant_delta': {
+                // Only rows that changed, coalesced server-side. A gap in the
+                // sequence means a delta was missed: ask for the roster again.
+                if (data.seq <= lastSeq.current) break;
+                if (data.seq !== lastSeq.current + 1) {
+                    wsRef.current?.send(JSON.stringify({ type: 'instructor_join', join_code: joinCode }));
+                    break;
+                }
+                lastSeq.current = data.seq;
+                const changed: ParticipantStatus[] = (data.changed || []).map(toParticipantStatus);
+                const removed = new Set<string>(data.removed || []);
+                setParticipants(prev => {
+                    const byId = new Map(changed.map(p => [p.participantId, p]));
+                    const kept = prev
+                        .filter(p => !removed.has(p.participantId))
+                        .map(p => byId.get(p.participantId) ?? p);
+                    const known = new Set(kept.map(p => p.participantId));
+                    return [...kept, ...changed.filter(p => !known.has(p.participantId))];
+                });
                 break;
             }
 
@@ -9,7 +9,9 @@ import Editor, { type OnMount } from '@monaco-editor/react'
 import '../lib/monacoSetup'   // bundle Monaco locally; see the module for why
 import Navbar from '../components/Navbar'
 import BadgeUnlockToast from '../components/BadgeUnlockToast'
-import codingService, { CodingChallenge, CodingSubmissionResult, SubmissionHistory } from '../services/codingService'
+import codingService, {
+    CodingChallenge, CodingSubmissionResult, RunFailedError, SubmissionHistory
+} from '../services/codingService'
 import useExamLockdown from '../hooks/useExamLockdown'
 
 const LANGUAGE_LABELS: Record<string, string> = {
@@ -151,7 +153,9 @@ export default function CodingChallengePage() {
             setRunResult(res)
             toast.success(`${res.passed}/${res.total} public tests passed`)
         } catch (error: any) {
-            toast.error(error.response?.data?.error || 'Run failed')
+            toast.error(error instanceof RunFailedError
+                ? error.message
+                : error.response?.data?.error || 'Run failed')
         } finally {
             setRunning(false)
         }
@@ -178,7 +182,9 @@ export default function CodingChallengePage() {
             const subs = await codingService.getSubmissions(slug)
             setSubmissions(subs)
         } catch (error: any) {
-            toast.error(error.response?.data?.error || 'Submission failed')
+            toast.error(error instanceof RunFailedError
+                ? error.message
+                : error.response?.data?.error || 'Submission failed')
         } finally {
             setSubmitting(false)
         }
@@ -13,6 +13,7 @@ import DOMPurify from 'dompurify';
 import Editor from '@monaco-editor/react';
 import '../lib/monacoSetup';   // bundle Monaco locally; see the module for why
 import ViolationWarningModal from '../components/ViolationWarningModal';
+import { startPresenceHeartbeat } from '../services/liveQuizService';
 
 // ─────────────────────────────────────────────────────────────────────────────
 // Types
@@ -382,6 +383,7 @@ const LiveQuizSession = () => {
         const wsBase = import.meta.env.VITE_WS_URL || 'ws://localhost:8000/ws';
         const socket = new WebSocket(`${wsBase}/quiz/${joinCode}/`);
         wsRef.current = socket;
+        const stopHeartbeat = startPresenceHeartbeat(socket);
 
         socket.onopen = () => {
             console.log('Quiz WS connected');
@@ -403,7 +405,10 @@ const LiveQuizSession = () => {
         socket.onerror = () => toast.error('Connection error. Please try rejoining.');
         socket.onclose = () => console.log('WS disconnected');
 
-        return () => socket.close();
+        return () => {
+            stopHeartbeat();
+            socket.close();
+        };
     }, [joinCode]);
 
     // ─────────────────────────────────────────────────────────────────────────
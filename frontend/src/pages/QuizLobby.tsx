@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate, useLocation } from 'react-router-dom';
 import { Users, Clock, Loader2, AlertCircle, Info } from 'lucide-react';
 import { toast } from 'react-hot-toast';
+import { startPresenceHeartbeat } from '../services/liveQuizService';
 
 // Define message types
 interface WebSocketMessage {
@@ -53,6 +54,7 @@ const QuizLobby = () => {
 
         const socket = new WebSocket(wsUrl);
         wsRef.current = socket;
+        const stopHeartbeat = startPresenceHeartbeat(socket);
 
         socket.onopen = () => {
             console.log('Connected to Quiz WebSocket');
@@ -113,6 +115,7 @@ const QuizLobby = () => {
         };
 
         return () => {
+            stopHeartbeat();
             if (!navigated && wsRef.current) {
                 wsRef.current.close();
             }
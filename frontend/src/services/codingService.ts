@@ -44,6 +44,16 @@ export interface CodingSubmissionResult {
     }[]
 }
 
+export interface QueuedRun {
+    run_id: string
+    state: 'queued' | 'running' | 'done' | 'superseded'
+    queue_position: number
+    stdout: string
+    stderr: string
+    error: string | null
+    result?: any
+}
+
 export interface CodingStats {
     solved: number
     total_challenges: number
@@ -65,6 +75,14 @@ export interface SubmissionHistory {
     submitted_at: string
 }
 
+/** A queued Run or Submit that finished without a graded result. */
+export class RunFailedError extends Error {
+    constructor(message: string) {
+        super(message)
+        this.name = 'RunFailedError'
+    }
+}
+
 class CodingService {
     private baseUrl = '/learning/challenges'
 
@@ -87,7 +105,7 @@ class CodingService {
         results: CodingSubmissionResult['results']
     }> {
         const response = await api.post(`${this.baseUrl}/${slug}/run/`, { code, language })
-        return response.data
+        return this.waitForResult(slug, response.data)
     }
 
     async submitCode(slug: string, code: string, language: string): Promise<CodingSubmissionResult> {
@@ -95,7 +113,26 @@ class CodingService {
             code,
             language,
         })
-        return response.data
+        return this.waitForResult(slug, response.data)
+    }
+
+    /**
+     * Run and Submit are graded on the worker: the POST returns a queued run,
+     * which we poll until it is done and then unwrap its graded result.
+     */
+    private async waitForResult(slug: string, run: QueuedRun): Promise<any> {
+        while (run.state === 'queued' || run.state === 'running') {
+            await new Promise(resolve => setTimeout(resolve, run.state === 'queued' ? 1000 : 400))
+            const response = await api.get(`${this.baseUrl}/${slug}/runs/${run.run_id}/`)
+            run = response.data
+        }
+        if (run.state === 'superseded') {
+            throw new RunFailedError('Replaced by a newer run')
+        }
+        if (!run.result) {
+            throw new RunFailedError(run.stderr || 'Code execution failed.')
+        }
+        return run.result
     }
 
     async getSubmissions(slug: string): Promise<SubmissionHistory[]> {
@@ -281,4 +281,24 @@ class LiveQuizService {
     }
 }
 
+// presence.HEARTBEAT_INTERVAL on the server
+export const PRESENCE_HEARTBEAT_MS = 30_000
+
+/**
+ * Keep this socket listed in the room's presence while it is open.
+ *
+ * The server drops a member it has not heard from in three intervals
+ * (backend apps/learning/presence.py), which is how sockets that died without
+ * a close — a sleeping laptop, a restarted worker — leave the lobby list.
+ * Returns the function that stops the heartbeat.
+ */
+export function startPresenceHeartbeat(socket: WebSocket): () => void {
+    const timer = setInterval(() => {
+        if (socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: 'heartbeat' }))
+        }
+    }, PRESENCE_HEARTBEAT_MS)
+    return () => clearInterval(timer)
+}
+
 export default new LiveQuizService()